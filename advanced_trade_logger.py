@@ -3,9 +3,9 @@
 import csv
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from config_manager import get_config_value
+import config_manager
 from logger import logger
-from decimal import Decimal
+from records import Position
 
 LOG_FILE = Path("logs/trade_log.csv")
 
@@ -36,23 +36,11 @@ CSV_HEADER = [
     "SL_IGNORE_MINUTES"
 ]
 
+# The thresholds in force when the position opened (they may be reloaded while it runs)
 def _get_strategy_params():
-    return {
-        "MIN_DELTA": get_config_value("MIN_DELTA"),
-        "MIN_DELTA_LIFETIME": get_config_value("MIN_DELTA_LIFETIME"),
-        "POSITION_SIZE_USD": get_config_value("POSITION_SIZE_USD"),
-        "LEVERAGE": get_config_value("LEVERAGE"),
-        "MIN_PROFIT": get_config_value("MIN_PROFIT"),
-        "TAKE_PROFIT_THRESHOLD": get_config_value("TAKE_PROFIT_THRESHOLD"),
-        "STOP_LOSS_PCT": get_config_value("STOP_LOSS_PCT"),
-        "FAILOVER_TRAILING_STOP_PCT": get_config_value("FAILOVER_TRAILING_STOP_PCT"),
-        "FAILOVER_INITIAL_TAKE_PROFIT_PCT": get_config_value("FAILOVER_INITIAL_TAKE_PROFIT_PCT"),
-        "MAX_HOLD_TIME_MINUTES": get_config_value("MAX_HOLD_TIME_MINUTES"),
-        "COOLDOWN_AFTER_TIMEOUT_MINUTES": get_config_value("COOLDOWN_AFTER_TIMEOUT_MINUTES"),
-        "SL_IGNORE_MINUTES": get_config_value("SL_IGNORE_MINUTES")
-    }
-
-def log_new_position(position: dict):
+    return config_manager.settings.as_dict()
+
+def log_new_position(position: Position):
     now = datetime.now(timezone.utc).astimezone(timezone(timedelta(hours=5)))
     date_str = now.strftime("%Y-%m-%d %H:%M:%S")
     params = _get_strategy_params()
@@ -71,7 +59,7 @@ def log_new_position(position: dict):
     row = [
         trade_number,
         date_str,
-        position["symbol"],
+        position.symbol,
         "", "", "", "", "", "", "", "",  
         params["MIN_DELTA"],
         params["MIN_DELTA_LIFETIME"],
@@ -93,7 +81,7 @@ def log_new_position(position: dict):
 
     # logger.info(f"[ADVANCED LOGGER] Trade #{trade_number} logged.")
 
-def update_position_result(position: dict):
+def update_position_result(position: Position):
     import pandas as pd
 
     if not LOG_FILE.exists():
@@ -102,16 +90,16 @@ def update_position_result(position: dict):
 
     df = pd.read_csv(LOG_FILE, encoding="utf-8-sig", dtype={"Delta Reason (TP/SL/Timeout)": "string", "Failover Reason (TP/SL/Timeout)": "string"})
 
-    match = df["Symbol"] == position["symbol"]
+    match = df["Symbol"] == position.symbol
     if not match.any():
-        logger.warning(f"[ADVANCED LOGGER] No entry found for {position['symbol']} in CSV.")
+        logger.warning(f"[ADVANCED LOGGER] No entry found for {position.symbol} in CSV.")
         return
 
     idx = df[match].index[-1]  
 
-    pnl = position.get("final_pnl_total", "")
-    entry_time = position.get("entry_time")
-    exit_time = position.get("exit_time")
+    pnl = position.final_pnl_total if position.final_pnl_total is not None else ""
+    entry_time = position.entry_time
+    exit_time = position.exit_time
 
     if entry_time and exit_time:
         duration = (exit_time - entry_time).total_seconds() / 60
@@ -123,19 +111,19 @@ def update_position_result(position: dict):
     df.at[idx, "Total Duration (min)"] = round(duration, 2) if duration else ""
 
     from failover_manager import failover_positions
-    pos_id = position["position_id"]
+    pos_id = position.position_id
     failover = failover_positions.get(pos_id)
 
     # --- Delta stage ---
-    delta_reason = position.get("start_reason", position.get("exit_reason", ""))
+    delta_reason = position.start_reason or position.exit_reason or ""
     df.at[idx, "Delta Reason (TP/SL/Timeout)"] = str(delta_reason)
 
     # PnL of the delta stage (first side)
-    first_pnl = position.get("start_pnl", Decimal("0"))
+    first_pnl = position.start_pnl
 
     # Timestamps
-    first_entry_time = position.get("entry_time")
-    failover_entry_time = failover.get("entry_time") if failover else None
+    first_entry_time = position.entry_time
+    failover_entry_time = failover.entry_time if failover else None
 
     if not failover:
         # No failover → delta covers the full position
@@ -150,12 +138,12 @@ def update_position_result(position: dict):
     df.at[idx, "Delta PnL ($)"] = float(delta_pnl) if delta_pnl != "" else ""
 
     # --- Failover stage ---
-    if failover and failover.get("status") == "closed":
-        failover_reason = failover.get("exit_reason", "")
-        failover_pnl = failover.get("final_pnl_total", "")
+    if failover and failover.status == "closed":
+        failover_reason = failover.exit_reason or ""
+        failover_pnl = failover.final_pnl_total if failover.final_pnl_total is not None else ""
 
-        failover_exit_time = failover.get("exit_time")
-        failover_start_time = failover.get("entry_time")
+        failover_exit_time = failover.exit_time
+        failover_start_time = failover.entry_time
 
         if failover_start_time and failover_exit_time:
             failover_duration = (failover_exit_time - failover_start_time).total_seconds() / 60
@@ -167,4 +155,4 @@ def update_position_result(position: dict):
         df.at[idx, "Failover PnL ($)"] = float(failover_pnl) if failover_pnl != "" else ""
 
     df.to_csv(LOG_FILE, index=False, encoding="utf-8-sig")
-    # logger.info(f"[ADVANCED LOGGER] Trade {position['symbol']} updated in CSV.")
\ No newline at end of file
+    # logger.info(f"[ADVANCED LOGGER] Trade {position.symbol} updated in CSV.")
\ No newline at end of file
@@ -1,49 +1,69 @@
 import asyncio
+import json
+import time
+import hmac
+import hashlib
+import uuid
 from logger import logger
 from decimal import Decimal
+import config_manager
 from config_manager import get_config_value
+from rate_limiter import acquire_slot, observe_response
 from order_manager import sign_bybit_request, sign_kucoin_request
-from telegram_bot import send_message
+from telegram_bot import notify
+from exchange_adapters import get_adapter, get_adapters, get_exchange_names, BYBIT_REST_URL, KUCOIN_REST_URL, BYBIT_WS_PRIVATE_URL
 import aiohttp
+import websockets
 
-BALANCE_MARGIN_PCT = Decimal(get_config_value("BALANCE_MARGIN_PCT", "20"))
 BALANCE_CHECK_INTERVAL_SEC = int(get_config_value("BALANCE_CHECK_INTERVAL_SEC", "30"))
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD", "100"))
+BALANCE_REFRESH_DELAY_SEC = float(get_config_value("BALANCE_REFRESH_DELAY_SEC", "0.5"))  # lets the venue settle after a fill
+BALANCE_WS_ENABLED = get_config_value("BALANCE_WS_ENABLED", "true").lower() == "true"
 
 # Trading block status by exchange
-_trading_blocked = {
-    "Bybit": False,
-    "KuCoin": False
-}
+_trading_blocked = {name: False for name in get_exchange_names()}
 
 # Cache of last successful balances
-_last_balance = {
-    "Bybit": Decimal("0"),
-    "KuCoin": Decimal("0")
-}
+_last_balance = {name: Decimal("0") for name in get_exchange_names()}
+
+# Margin reserved by entries not yet reflected in _last_balance:
+# exchange -> {key: (usd, settled_at)}; settled_at is None while the order is in flight
+_reserved: dict[str, dict[object, tuple[Decimal, float | None]]] = {}
+
+# Set to wake an exchange's refresh loop before its next scheduled check
+_refresh_requested: dict[str, asyncio.Event] = {}
+
+_http_session: aiohttp.ClientSession | None = None
+
+def _session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+    return _http_session
 
 async def fetch_bybit_balance() -> Decimal:
-    url = "https://api.bybit.com/v5/account/wallet-balance?accountType=UNIFIED"
+    url = f"{BYBIT_REST_URL}/v5/account/wallet-balance?accountType=UNIFIED"
     query = "accountType=UNIFIED"
+    await acquire_slot("Bybit", "account", endpoint="/v5/account/wallet-balance")
     headers = sign_bybit_request(
         get_config_value("BYBIT_KEY"),
         get_config_value("BYBIT_SECRET"),
         method="GET",
         path_or_body=query
     )
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-            usdt = Decimal("0")
-            # print(f"[WATCHDOG DEBUG] Bybit balance raw response: {data}")  # temporary debug print
-            for coin in data.get("result", {}).get("list", [{}])[0].get("coin", []):
-                if coin["coin"] == "USDT":
-                    usdt = Decimal(coin.get("walletBalance", "0"))
-            return usdt
+    async with _session().get(url, headers=headers) as resp:
+        observe_response("Bybit", "account", resp, endpoint="/v5/account/wallet-balance")
+        data = await resp.json()
+        usdt = Decimal("0")
+        # print(f"[WATCHDOG DEBUG] Bybit balance raw response: {data}")  # temporary debug print
+        for coin in data.get("result", {}).get("list", [{}])[0].get("coin", []):
+            if coin["coin"] == "USDT":
+                usdt = Decimal(coin.get("walletBalance", "0"))
+        return usdt
 
 async def fetch_kucoin_balance() -> Decimal:
     url_path = "/api/v1/account-overview?currency=USDT"
-    url = f"https://api-futures.kucoin.com{url_path}"
+    url = f"{KUCOIN_REST_URL}{url_path}"
+    await acquire_slot("KuCoin", "account")
     headers = sign_kucoin_request(
         get_config_value("KUCOIN_KEY"),
         get_config_value("KUCOIN_SECRET"),
@@ -51,61 +71,199 @@ async def fetch_kucoin_balance() -> Decimal:
         "GET",
         url_path
     )
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-            return Decimal(data["data"]["availableBalance"])
+    async with _session().get(url, headers=headers) as resp:
+        observe_response("KuCoin", "account", resp)
+        data = await resp.json()
+        return Decimal(data["data"]["availableBalance"])
+
+# --- Private WS wallet streams: call on_balance(Decimal) on every wallet push ---
+async def stream_bybit_wallet(on_balance) -> None:
+    api_key = get_config_value("BYBIT_KEY")
+    api_secret = get_config_value("BYBIT_SECRET")
+    async with websockets.connect(BYBIT_WS_PRIVATE_URL) as ws:
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(api_secret.encode(), f"GET/realtime{expires}".encode(), hashlib.sha256).hexdigest()
+        await ws.send(json.dumps({"op": "auth", "args": [api_key, expires, signature]}))
+        await ws.send(json.dumps({"op": "subscribe", "args": ["wallet"]}))
+        async for message in ws:
+            data = json.loads(message)
+            if data.get("op") == "auth" and not data.get("success"):
+                raise ConnectionError(f"Bybit private WS auth failed: {data.get('ret_msg')}")
+            if data.get("topic") != "wallet":
+                continue
+            for account in data.get("data", []):
+                for coin in account.get("coin", []):
+                    if coin.get("coin") == "USDT":
+                        await on_balance(Decimal(coin.get("walletBalance", "0")))
+
+async def stream_kucoin_wallet(on_balance) -> None:
+    url_path = "/api/v1/bullet-private"
+    await acquire_slot("KuCoin", "account")
+    headers = sign_kucoin_request(
+        get_config_value("KUCOIN_KEY"),
+        get_config_value("KUCOIN_SECRET"),
+        get_config_value("KUCOIN_PASSPHRASE"),
+        "POST",
+        url_path
+    )
+    async with _session().post(f"{KUCOIN_REST_URL}{url_path}", headers=headers) as resp:
+        observe_response("KuCoin", "account", resp)
+        res = await resp.json()
+    server = res["data"]["instanceServers"][0]
+    ping_interval = int(server.get("pingInterval", 18000)) / 1000
+
+    async with websockets.connect(f"{server['endpoint']}?token={res['data']['token']}", ping_interval=None) as ws:
+        await ws.send(json.dumps({
+            "id": uuid.uuid4().hex,
+            "type": "subscribe",
+            "topic": "/contractAccount/wallet",
+            "privateChannel": True,
+            "response": True
+        }))
+
+        async def ping():
+            while True:
+                await asyncio.sleep(ping_interval)
+                await ws.send(json.dumps({"id": uuid.uuid4().hex, "type": "ping"}))
+
+        ping_task = asyncio.create_task(ping())
+        try:
+            async for message in ws:
+                data = json.loads(message)
+                if data.get("subject") != "walletBalance.change":
+                    continue
+                payload = data.get("data", {})
+                if payload.get("currency", "USDT") == "USDT" and payload.get("availableBalance") is not None:
+                    await on_balance(Decimal(str(payload["availableBalance"])))
+        finally:
+            ping_task.cancel()
+
+# --- Reserved margin ---
+def reserve_margin(exchange: str, key, usd: Decimal) -> None:
+    _reserved.setdefault(exchange, {})[key] = (Decimal(str(usd)), None)
+
+# Order filled: the reservation is dropped by the first balance update after now
+def settle_margin(key) -> None:
+    now = time.monotonic()
+    for reserved in _reserved.values():
+        if key in reserved:
+            reserved[key] = (reserved[key][0], now)
 
-async def get_balance(exchange: str) -> Decimal:
+# Order failed or was rejected: the margin was never used
+def release_margin(key) -> None:
+    for reserved in _reserved.values():
+        reserved.pop(key, None)
+
+def get_free_balance(exchange: str) -> Decimal:
+    reserved = _reserved.get(exchange)
+    committed = sum((usd for usd, _ in reserved.values()), Decimal("0")) if reserved else Decimal("0")
+    return _last_balance.get(exchange, Decimal("0")) - committed
+
+def get_free_balances() -> dict[str, Decimal]:
+    return {exchange: get_free_balance(exchange) for exchange in _last_balance}
+
+# Wake the refresh loop now (after a fill or close) instead of waiting for the next interval
+def request_balance_refresh(exchange: str = None) -> None:
+    for name in ([exchange] if exchange else list(_refresh_requested)):
+        event = _refresh_requested.get(name)
+        if event is not None:
+            event.set()
+
+async def get_balance(exchange: str) -> tuple[Decimal, bool]:
     attempts = 3
     for attempt in range(1, attempts + 1):
         try:
-            if exchange == "Bybit":
-                return await fetch_bybit_balance()
-            elif exchange == "KuCoin":
-                return await fetch_kucoin_balance()
+            return await get_adapter(exchange).fetch_balance(), True
         except Exception as e:
             logger.warning(f"[WATCHDOG] Failed to fetch balance from {exchange} (attempt {attempt}/3): {e}")
             await asyncio.sleep(3)
     # If all attempts fail
     prev = _last_balance.get(exchange, Decimal("0"))
     logger.warning(f"[WATCHDOG] {exchange}: failed to fetch balance after 3 attempts. Keeping previous value: {prev:.2f} USD")
-    return prev
+    return prev, False
 
+# Blocked when the last balance check failed the margin requirement, or when
+# in-flight entries already reserve more than the cached balance
 def is_exchange_blocked(exchange: str) -> bool:
-    return _trading_blocked.get(exchange, False)
+    return _trading_blocked.get(exchange, False) or get_free_balance(exchange) < 0
 
-async def balance_watchdog_loop():
-    logger.info("[WATCHDOG] Balance watchdog started 🛡")
-    required = POSITION_SIZE_USD * (Decimal("1") + BALANCE_MARGIN_PCT / Decimal("100"))
+_notified: dict[str, str | None] = {}
+
+async def _apply_balance(exchange: str, balance: Decimal, fetched_at: float, source: str) -> None:
+    _last_balance[exchange] = balance  # Update balance cache
+    reserved = _reserved.get(exchange)
+    if reserved:
+        # Settled fills before this snapshot are now part of the balance itself
+        for key in [k for k, (_, settled_at) in reserved.items() if settled_at is not None and settled_at < fetched_at]:
+            del reserved[key]
+
+    settings = config_manager.settings
+    required = settings.POSITION_SIZE_USD * (Decimal("1") + settings.BALANCE_MARGIN_PCT / Decimal("100"))
+    _notified.setdefault(exchange, None)
+    _trading_blocked.setdefault(exchange, False)
+
+    if balance >= required:
+        logger.info(f"[WATCHDOG] {exchange}: free_balance={balance:.2f} USD | required={required:.2f} USD → OK ({source})")
+        if _trading_blocked[exchange]:
+            _trading_blocked[exchange] = False
+            if _notified[exchange] != "ok":
+                msg = f"✅ Balance on {exchange} restored. Trading resumed."
+                logger.info(f"[WATCHDOG] {msg}")
+                notify(msg, key=f"balance:{exchange}")
+                _notified[exchange] = "ok"
+    else:
+        logger.warning(f"[WATCHDOG] {exchange}: free_balance={balance:.2f} USD | required={required:.2f} USD → BLOCKED ({source})")
+        if not _trading_blocked[exchange]:
+            _trading_blocked[exchange] = True
+            if _notified[exchange] != "blocked":
+                msg = f"❌ Insufficient balance on {exchange} to open positions. Trading paused."
+                logger.info(f"[WATCHDOG] {msg}")
+                notify(msg, critical=True, key=f"balance:{exchange}")
+                _notified[exchange] = "blocked"
 
-    notified = {
-        "Bybit": None,
-        "KuCoin": None
-    }
+# REST refresh on its own schedule per exchange; woken early by request_balance_refresh()
+async def _refresh_loop(exchange: str) -> None:
+    event = _refresh_requested.setdefault(exchange, asyncio.Event())
+    while True:
+        fetched_at = time.monotonic()
+        balance, ok = await get_balance(exchange)
+        if ok:
+            try:
+                await _apply_balance(exchange, balance, fetched_at, "rest")
+            except Exception as e:
+                logger.warning(f"[WATCHDOG] {exchange}: failed to apply balance: {e}")
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout=BALANCE_CHECK_INTERVAL_SEC)
+            await asyncio.sleep(BALANCE_REFRESH_DELAY_SEC)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
 
+async def _wallet_stream_loop(adapter) -> None:
+    async def on_balance(balance: Decimal):
+        await _apply_balance(adapter.name, balance, time.monotonic(), "ws")
+
+    delay = 1
     while True:
-        for exchange in ["Bybit", "KuCoin"]:
-            balance = await get_balance(exchange)
-            _last_balance[exchange] = balance  # Update balance cache
-
-            if balance >= required:
-                logger.info(f"[WATCHDOG] {exchange}: free_balance={balance:.2f} USD | required={required:.2f} USD → OK")
-                if _trading_blocked[exchange]:
-                    _trading_blocked[exchange] = False
-                    if notified[exchange] != "ok":
-                        msg = f"✅ Balance on {exchange} restored. Trading resumed."
-                        logger.info(f"[WATCHDOG] {msg}")
-                        await send_message(msg)
-                        notified[exchange] = "ok"
-            else:
-                logger.warning(f"[WATCHDOG] {exchange}: free_balance={balance:.2f} USD | required={required:.2f} USD → BLOCKED")
-                if not _trading_blocked[exchange]:
-                    _trading_blocked[exchange] = True
-                    if notified[exchange] != "blocked":
-                        msg = f"❌ Insufficient balance on {exchange} to open positions. Trading paused."
-                        logger.info(f"[WATCHDOG] {msg}")
-                        await send_message(msg)
-                        notified[exchange] = "blocked"
-
-        await asyncio.sleep(BALANCE_CHECK_INTERVAL_SEC)
+        started = time.monotonic()
+        try:
+            if not await adapter.stream_balance(on_balance):
+                return  # venue has no private wallet stream
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[WATCHDOG] {adapter.name} wallet stream dropped: {e}")
+        delay = 1 if time.monotonic() - started > 60 else min(delay * 2, 60)
+        await asyncio.sleep(delay)
+
+async def balance_watchdog_loop():
+    logger.info("[WATCHDOG] Balance watchdog started 🛡")
+    tasks = [_refresh_loop(name) for name in get_exchange_names()]
+    if BALANCE_WS_ENABLED:
+        tasks += [_wallet_stream_loop(adapter) for adapter in get_adapters()]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if _http_session is not None and not _http_session.closed:
+            await _http_session.close()
@@ -0,0 +1,626 @@
+# benchmark.py
+# Benchmarks of the hot paths, from single functions up to tick-to-order latency against stubbed
+# exchanges. Results go to a JSON file; --compare fails (exit 1) when a metric regresses
+# beyond the threshold against a previous run.
+#
+#   python benchmark.py                                  # writes logs/benchmark.json
+#   python benchmark.py --output new.json --compare logs/benchmark.json --threshold 25
+#   python benchmark.py --only sign calculate_quantity    # benchmark name prefixes
+#
+# No network is used: exchange adapters are replaced by in-process stubs and state is seeded
+# directly, so numbers reflect this code only. The one exception is event_loop, which compares
+# asyncio and uvloop against exchange_simulator.py on localhost (started by the benchmark).
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, UTC
+from decimal import Decimal
+
+# Keys the hot modules read at import time; real values from .env take precedence
+for _key, _value in {
+    "TELEGRAM_BOT_TOKEN": "123456:BENCH", "TELEGRAM_CHAT_ID": "1",
+    "POSITION_SIZE_USD": "100", "LEVERAGE": "3", "ORDER_TIMEOUT_SEC": "3",
+    "MIN_DELTA": "0.5", "MAX_QUOTE_AGE_SEC": "3", "MIN_PROFIT": "0.01",
+    "BYBIT_KEY": "bench", "BYBIT_SECRET": "bench",
+    "KUCOIN_KEY": "bench", "KUCOIN_SECRET": "bench", "KUCOIN_PASSPHRASE": "bench",
+}.items():
+    os.environ.setdefault(_key, _value)
+# The tick-to-order path only reaches execute_order in live mode; exchanges are stubbed below
+os.environ["LIVE_MODE"] = "true"
+os.environ["CANDIDATE_FLUSH_SEC"] = "0"
+os.environ["SINGLE_FLIGHT_TTL_ORDERBOOK"] = "0"
+
+import logging
+from logger import logger
+from config_manager import get_config_value
+from exchange_adapters import BybitAdapter, KuCoinAdapter, register_adapter
+from records import ArbCandidate, FundingLeg, FundingSchedule, Quote
+
+BENCH_OUTPUT = get_config_value("BENCH_OUTPUT", "logs/benchmark.json")
+BENCH_REGRESSION_PCT = float(get_config_value("BENCH_REGRESSION_PCT", "25"))  # back-to-back runs differ by up to ~20%
+BENCH_REPEATS = int(get_config_value("BENCH_REPEATS", "5"))
+BENCH_INGEST_PROCESSES = int(get_config_value("BENCH_INGEST_PROCESSES", "2"))
+BENCH_LOOP_SECONDS = float(get_config_value("BENCH_LOOP_SECONDS", "5"))  # tick measurement window per loop
+BENCH_LOOP_SYMBOLS = int(get_config_value("BENCH_LOOP_SYMBOLS", "200"))
+BENCH_LOOP_SIM_TICKS = float(get_config_value("BENCH_LOOP_SIM_TICKS", "100000"))  # offered ticks/s, above what one client takes
+BENCH_LOOP_REST_CALLS = int(get_config_value("BENCH_LOOP_REST_CALLS", "500"))
+
+SYMBOLS = [f"BENCH{i}USDT" for i in range(500)]
+BASE_PRICE = 100.0
+
+# --- Stubbed exchanges: synthetic books, zero funding, instant acks ---
+def _book(levels: int, price: float = BASE_PRICE, level_usd: float = 5000.0) -> tuple[list, list]:
+    bids = [[str(round(price * (1 - 0.0002 * (i + 1)), 6)), str(round(level_usd / price, 4))] for i in range(levels)]
+    asks = [[str(round(price * (1 + 0.0002 * (i + 1)), 6)), str(round(level_usd / price, 4))] for i in range(levels)]
+    return bids, asks
+
+class _StubMixin:
+    mid: dict[str, float] = {}
+    order_times: list[int] = []
+    on_order = None
+
+    async def fetch_orderbook(self, session, symbol: str) -> tuple[list, list]:
+        return _book(20, self.mid.get((self.name, symbol), BASE_PRICE))
+
+    async def fetch_funding_calendar(self, session) -> list:
+        return []
+
+    async def place_market_order(self, symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+        self.order_times.append(time.perf_counter_ns())
+        if self.on_order:
+            self.on_order()
+        # Rejected, so execute_order unwinds nothing and the next iteration starts clean
+        return {"success": False, "exchange": self.name, "side": side, "qty": qty, "symbol": symbol, "response": {}}
+
+    async def get_position_size(self, symbol: str) -> float:
+        return 0.0
+
+    async def cancel_order(self, symbol: str, client_id: str) -> None:
+        pass
+
+    async def fetch_order_fill(self, symbol: str, order_id: str = None, client_id: str = None):
+        return Decimal("0"), None, True
+
+class StubBybit(_StubMixin, BybitAdapter):
+    pass
+
+class StubKuCoin(_StubMixin, KuCoinAdapter):
+    pass
+
+def _install_stubs():
+    from symbol_specs import symbol_specs
+    from funding_fetcher import funding_calendar
+    import balance_watchdog
+
+    for adapter in (StubBybit(), StubKuCoin()):
+        register_adapter(adapter)
+        specs = symbol_specs.setdefault(adapter.name, {})
+        for symbol in SYMBOLS:
+            specs[adapter.to_exchange_symbol(symbol)] = {
+                "min_qty": Decimal("0.001"), "step_qty": Decimal("0.001"),
+                "tick_size": Decimal("0.0001"), "contract_value": Decimal("1"),
+            }
+            funding_calendar[(adapter.name, symbol)] = FundingSchedule(adapter.name, symbol, Decimal("0"), 8 * 3600, time.time() + 3600)
+        balance_watchdog._last_balance[adapter.name] = Decimal("1000000")
+
+# --- Measurement helpers ---
+# Median over BENCH_REPEATS timed runs, so one lucky or preempted round doesn't set the result
+def _throughput(fn, n: int) -> float:
+    fn()  # warm-up: lazy imports and caches stay out of the timings
+    runs = []
+    for _ in range(BENCH_REPEATS):
+        started = time.perf_counter()
+        for _ in range(n):
+            fn()
+        runs.append(time.perf_counter() - started)
+    return n / statistics.median(runs)
+
+async def _athroughput(fn, n: int) -> float:
+    await fn()
+    runs = []
+    for _ in range(BENCH_REPEATS):
+        started = time.perf_counter()
+        for _ in range(n):
+            await fn()
+        runs.append(time.perf_counter() - started)
+    return n / statistics.median(runs)
+
+def _ops(value: float) -> dict:
+    return {"value": round(value, 1), "unit": "ops/s", "better": "higher"}
+
+def _latency(samples_us: list[float]) -> dict:
+    samples_us.sort()
+    return {
+        "value": round(statistics.median(samples_us), 1),
+        "p99": round(samples_us[int(len(samples_us) * 0.99) - 1], 1),
+        "unit": "us",
+        "better": "lower",
+    }
+
+# --- Benchmarks: each returns {metric name: metric} ---
+def bench_sign() -> dict:
+    from order_manager import sign_bybit_request, sign_kucoin_request
+
+    body = json.dumps({"category": "linear", "symbol": "BTCUSDT", "side": "Buy", "orderType": "Market", "qty": "0.01"})
+    return {
+        "sign_bybit_request": _ops(_throughput(lambda: sign_bybit_request("key", "secret", "POST", body), 20000)),
+        "sign_kucoin_request": _ops(_throughput(lambda: sign_kucoin_request("key", "secret", "pass", "POST", "/api/v1/orders", body), 20000)),
+    }
+
+def bench_calculate_quantity() -> dict:
+    from order_manager import calculate_quantity
+
+    price = Decimal("123.456")
+    return {
+        "calculate_quantity_bybit": _ops(_throughput(lambda: calculate_quantity(price, "Bybit", SYMBOLS[0]), 20000)),
+        "calculate_quantity_kucoin": _ops(_throughput(lambda: calculate_quantity(price, "KuCoin", SYMBOLS[0]), 20000)),
+    }
+
+def bench_simulate_market_fill() -> dict:
+    from fill_simulator import simulate_market_fill
+
+    metrics = {}
+    for levels in (10, 50, 200):
+        _, asks = _book(levels, level_usd=1000.0)
+        usd = Decimal(str(levels * 1000.0 / 2))
+        metrics[f"simulate_market_fill_{levels}_levels"] = _ops(_throughput(lambda: simulate_market_fill(asks, usd), 2000))
+    return metrics
+
+async def bench_simulate_profit() -> dict:
+    from fill_simulator import build_fill_curve
+    from profit_simulator import simulate_profit
+
+    long_curve = build_fill_curve(_book(20, 100.0)[1])
+    short_curve = build_fill_curve(_book(20, 99.9)[0])  # crossed the wrong way: evaluated fully, never queued
+
+    async def run():
+        arb = ArbCandidate(SYMBOLS[0], "Bybit", "KuCoin", 100.0, 99.9, -0.1, time.time())
+        arb.long_avg_price, arb.short_avg_price = long_curve[0][2], short_curve[0][2]
+        arb.long_curve, arb.short_curve, arb.max_size_usd = long_curve, short_curve, Decimal("100")
+        arb.funding_long = FundingLeg("Bybit", Decimal("0"), 2.0, Decimal("0.01"))
+        arb.funding_short = FundingLeg("KuCoin", Decimal("0"), 2.0, Decimal("0.01"))
+        await simulate_profit(arb)
+    return {"simulate_profit": _ops(await _athroughput(run, 2000))}
+
+async def bench_fetch_funding() -> dict:
+    from funding_fetcher import fetch_funding
+
+    arb = ArbCandidate(SYMBOLS[0], "Bybit", "KuCoin", 100.0, 100.1, 0.1, time.time())
+    return {"fetch_funding": _ops(await _athroughput(lambda: fetch_funding(arb), 20000))}
+
+async def bench_process_signal() -> dict:
+    from signal_engine import process_signal
+
+    async def run():
+        arb = ArbCandidate(SYMBOLS[1], "Bybit", "KuCoin", 100.0, 100.0, 0.0, time.time())
+        arb.net_profit, arb.profit_percent = Decimal("-1"), Decimal("-1")
+        await process_signal(arb)
+    return {"process_signal_reject": _ops(await _athroughput(run, 20000))}
+
+# One candidate outcome into the rolling counts and the event buffer (buffer reset between rounds)
+def bench_funnel_record(n: int = 50000) -> dict:
+    import funnel
+
+    arbs = []
+    for i, symbol in enumerate(SYMBOLS):
+        arb = ArbCandidate(symbol, "Bybit", "KuCoin", 100.0, 100.1, 0.1, time.time())
+        arb.net_profit = Decimal("0.5")
+        arbs.append((arb, funnel.OUTCOMES[i % len(funnel.OUTCOMES)]))
+    events = [arbs[i % len(arbs)] for i in range(n)]
+    runs = []
+    for _ in range(BENCH_REPEATS):
+        funnel._events.rows = 0
+        started = time.perf_counter()
+        for arb, outcome in events:
+            funnel.record_outcome(arb, outcome)
+        runs.append(time.perf_counter() - started)
+    funnel._events.rows = 0
+    return {"funnel_record": _ops(n / statistics.median(runs))}
+
+async def bench_handle_price_update(n: int = 20000) -> dict:
+    import pair_monitor
+
+    # Same price on both venues: below MIN_DELTA, the common per-tick path.
+    # One Quote per (symbol, exchange), as the WS clients keep them.
+    quotes = []
+    for i in range(min(n, 2 * len(SYMBOLS))):
+        quote = Quote(SYMBOLS[(i // 2) % len(SYMBOLS)], "KuCoin" if i % 2 else "Bybit")
+        quote.bid, quote.ask = BASE_PRICE, BASE_PRICE * 1.0001
+        quotes.append(quote)
+    ticks = [quotes[i % len(quotes)] for i in range(n)]
+    runs = []
+    for _ in range(BENCH_REPEATS):
+        now = time.time()  # fresh per round so quotes never age out
+        for quote in quotes:
+            quote.ts = now
+        started = time.perf_counter()
+        for quote in ticks:
+            await pair_monitor.handle_price_update(quote)
+        runs.append(time.perf_counter() - started)
+    for symbol in SYMBOLS:
+        pair_monitor.prune_symbol(symbol)
+    return {"handle_price_update": _ops(n / statistics.median(runs))}
+
+# Failover trailing stop on a tick of the surviving leg's venue (local quote, no REST)
+def bench_failover_tick(n: int = 50000) -> dict:
+    import failover_manager
+    from records import FailoverLeg
+
+    legs = {}
+    for i, symbol in enumerate(SYMBOLS[:50]):
+        notional = Decimal("300")
+        leg = FailoverLeg("Bybit", symbol, "long" if i % 2 else "short", Decimal(str(BASE_PRICE)), Decimal("3"),
+                          Decimal("-3"), Decimal("-9"), Decimal("10.5"), Decimal("0.1"), Decimal("0"), notional,
+                          datetime.now(UTC), trail_distance=notional * Decimal("0.02"))
+        legs[f"bench-{i}"] = leg
+        failover_manager.failover_positions[f"bench-{i}"] = leg
+        failover_manager._legs_by_quote[(symbol, "Bybit")] = {f"bench-{i}": leg}
+    quotes = []
+    for i, symbol in enumerate(SYMBOLS[:50]):
+        quote = Quote(symbol, "Bybit")
+        # Within the trailing band, so no exit is triggered
+        quote.bid, quote.ask, quote.ts = BASE_PRICE * (1 + (i % 5) * 0.0001), BASE_PRICE * 1.0001, time.time()
+        quotes.append(quote)
+    next_quote = itertools.cycle(quotes).__next__
+    ops = _throughput(lambda: failover_manager.on_quote(next_quote()), n)
+    for position_id, leg in legs.items():
+        failover_manager.failover_positions.pop(position_id, None)
+        failover_manager._legs_by_quote.pop((leg.symbol, leg.exchange), None)
+    return {"failover_on_quote": _ops(ops)}
+
+# Replays raw WS ticks through price_feed's parsers into price_queue and pair_monitor, in bursts
+# (the queue fills while the loop is busy elsewhere), and reports the traced memory peak
+# and what stays allocated afterwards.
+async def bench_tick_replay_memory(ticks: int = 20000, burst: int = 2000) -> dict:
+    import pair_monitor
+    from price_feed import BybitWSClient, KuCoinWSClient, price_queue
+
+    symbols = SYMBOLS[:200]
+    bybit, kucoin = BybitWSClient(symbols), KuCoinWSClient([s + "M" for s in symbols])
+    messages = []
+    for i in range(ticks):
+        symbol = symbols[(i // 2) % len(symbols)]
+        price = BASE_PRICE * (1 + (i % 7) * 0.00001)
+        if i % 2:
+            messages.append((kucoin, {"data": {"symbol": symbol + "M", "bestBidPrice": price, "bestAskPrice": price * 1.0001}}))
+        else:
+            messages.append((bybit, {"data": {"symbol": symbol, "bid1Price": str(price), "ask1Price": str(price * 1.0001)}}))
+
+    async def replay():
+        for start in range(0, ticks, burst):
+            for client, message in messages[start:start + burst]:
+                await client.parse_message(message)
+            while not price_queue.empty():
+                await pair_monitor.handle_price_update(price_queue.get_nowait())
+
+    await replay()  # warm-up: per-symbol state that lives for the whole session
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await replay()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    for symbol in symbols:
+        pair_monitor.prune_symbol(symbol)
+    return {
+        "tick_replay_peak_memory": {"value": round((peak - before) / 1024, 1), "unit": "KiB", "better": "lower"},
+        "tick_replay_retained_memory": {"value": round((current - before) / 1024, 1), "unit": "KiB", "better": "lower"},
+    }
+
+def _ticker_frames(symbols: list[str], n: int) -> list[str]:
+    frames = []
+    for i in range(n):
+        price = BASE_PRICE * (1 + (i % 11) * 0.00001)
+        frames.append(json.dumps({
+            "topic": f"tickers.{symbols[i % len(symbols)]}", "type": "snapshot", "ts": 1700000000000 + i,
+            "data": {"symbol": symbols[i % len(symbols)], "bid1Price": f"{price:.4f}", "bid1Size": "12.5",
+                     "ask1Price": f"{price * 1.0001:.4f}", "ask1Size": "9.1", "lastPrice": f"{price:.4f}",
+                     "markPrice": f"{price:.4f}", "fundingRate": "0.0001", "volume24h": "123456.7"},
+        }))
+    return frames
+
+# Shard process body for bench_ingest: decode + parse frames into the shared table, as fast as possible
+def _replay_shard(writer: int, table_spec: tuple, pairs: list, frames: list[str], ready, start) -> None:
+    from exchange_adapters import get_adapter
+    from ingest_workers import shared_client
+    from quote_table import QuoteTable
+
+    logger.setLevel(logging.ERROR)
+    table = QuoteTable.attach(table_spec)
+    client = shared_client(get_adapter("Bybit"), table, writer, pairs)
+
+    async def replay():
+        for frame in frames:
+            await client.parse_message(json.loads(frame))
+
+    ready.put(writer)
+    start.wait()
+    asyncio.run(replay())
+    table.close()
+
+# Market-data ingestion: raw WS frames -> pair_monitor, in the trading process vs in shard processes
+# writing the shared quote table. "main_us_per_frame" is the trading process's CPU per frame — what
+# competes with order execution; conflation lets the sharded path skip superseded quotes.
+async def bench_ingest(n: int = 40000) -> dict:
+    import pair_monitor
+    from price_feed import BybitWSClient, price_queue
+    from ingest_workers import ShardedFeed
+
+    symbols = SYMBOLS[:400]
+    frames = _ticker_frames(symbols, n)
+
+    async def handle_queued():
+        while not price_queue.empty():
+            await pair_monitor.handle_price_update(price_queue.get_nowait())
+
+    # Single process: what BaseWSClient.handle_messages does per frame, then pair_monitor
+    client = BybitWSClient(symbols)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for frame in frames:
+        await client.parse_message(json.loads(frame))
+        await handle_queued()
+    single_cpu, single_wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    # Sharded: each process gets the frames of its own symbols
+    feed = ShardedFeed(BENCH_INGEST_PROCESSES, capacity=1024, ring_size=4096)
+    ctx = multiprocessing.get_context("spawn")
+    ready, start = ctx.Queue(), ctx.Event()
+    processes = []
+    for shard, pairs in feed._assign("Bybit", symbols).items():
+        shard_symbols = {symbol for symbol, _ in pairs}
+        shard_frames = [frame for i, frame in enumerate(frames) if symbols[i % len(symbols)] in shard_symbols]
+        process = ctx.Process(target=_replay_shard, args=(shard, feed.table.spec(), pairs, shard_frames, ready, start), daemon=True)
+        process.start()
+        processes.append(process)
+    for _ in processes:
+        ready.get(timeout=60)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    start.set()
+    while True:
+        count = feed.drain()
+        await handle_queued()
+        if not count:
+            if not any(process.is_alive() for process in processes) and not feed.drain():
+                break
+            await asyncio.sleep(0.0005)
+    sharded_cpu, sharded_wall = time.process_time() - cpu, time.perf_counter() - wall
+    for process in processes:
+        process.join()
+    feed.stop()
+    for symbol in symbols:
+        pair_monitor.prune_symbol(symbol)
+
+    return {
+        "ingest_single_process_main_us_per_frame": {"value": round(single_cpu / n * 1e6, 2), "unit": "us", "better": "lower"},
+        "ingest_sharded_main_us_per_frame": {"value": round(sharded_cpu / n * 1e6, 2), "unit": "us", "better": "lower"},
+        "ingest_single_process_frames_per_sec": _ops(n / single_wall),
+        "ingest_sharded_frames_per_sec": _ops(n / sharded_wall),
+    }
+
+# Simulator process for bench_event_loop; always the stock loop, so only the client side varies
+def _loop_sim(port: int) -> None:
+    os.environ.update({"SIM_SYMBOLS": str(BENCH_LOOP_SYMBOLS), "SIM_TICKS_PER_SEC": str(BENCH_LOOP_SIM_TICKS),
+                       "SIM_STATS_INTERVAL_SEC": "3600"})
+    logger.setLevel(logging.ERROR)
+    import exchange_simulator
+    asyncio.run(exchange_simulator.run_simulator("127.0.0.1", port))
+
+# Client process for bench_event_loop: the real Bybit WS client and an aiohttp session, on the given loop
+def _loop_probe(mode: str, port: int, results) -> None:
+    import event_loop
+    logger.setLevel(logging.ERROR)
+    results.put(event_loop.run(_loop_probe_run(port), mode))
+
+async def _loop_probe_run(port: int) -> dict:
+    import aiohttp
+    import event_loop
+    from price_feed import BybitWSClient
+
+    base = f"127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(f"http://{base}/v5/market/tickers", params={"category": "linear"}) as resp:
+                    symbols = [item["symbol"] for item in (await resp.json())["result"]["list"]]
+                break
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"exchange simulator not reachable on {base}")
+
+        ticks = 0
+
+        class CountingClient(BybitWSClient):
+            async def parse_message(self, msg):
+                nonlocal ticks
+                ticks += 1
+                await super().parse_message(msg)
+
+        # Ticks: WS frames decoded and parsed by the real client while the simulator floods it
+        client = CountingClient(symbols)
+        client.ws_url = f"ws://{base}/v5/public/linear"
+        feed = asyncio.create_task(client.connect())
+        await asyncio.sleep(1)  # connect, subscribe, warm up
+        start_ticks, cpu, wall = ticks, time.process_time(), time.perf_counter()
+        await asyncio.sleep(BENCH_LOOP_SECONDS)
+        n, cpu, wall = ticks - start_ticks, time.process_time() - cpu, time.perf_counter() - wall
+        feed.cancel()
+        await asyncio.gather(feed, return_exceptions=True)
+        for chunk_id in list(client.chunks):
+            await client._stop_chunk(chunk_id)
+
+        # REST: sequential order book requests over a keep-alive session
+        samples = []
+        for i in range(BENCH_LOOP_REST_CALLS + 20):
+            started = time.perf_counter()
+            async with session.get(f"http://{base}/v5/market/orderbook",
+                                   params={"category": "linear", "symbol": symbols[i % len(symbols)], "limit": "50"}) as resp:
+                await resp.json()
+            samples.append((time.perf_counter() - started) * 1e6)
+    return {"loop": event_loop.loop_name(), "ticks": n, "cpu": cpu, "wall": wall, "rest_us": samples[20:]}
+
+# asyncio vs uvloop on the client side, against the local exchange simulator: WS tick throughput
+# (and client CPU per tick) under a flood of ticker frames, then REST round trips
+def bench_event_loop() -> dict:
+    import socket
+    from event_loop import LOOP_MODES
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    ctx = multiprocessing.get_context("spawn")
+    sim = ctx.Process(target=_loop_sim, args=(port,), name="bench-sim", daemon=True)
+    sim.start()
+    metrics = {}
+    try:
+        for mode in LOOP_MODES:
+            if mode == "uvloop":
+                try:
+                    import uvloop  # noqa: F401
+                except ImportError:
+                    print("uvloop not installed, skipping its event_loop metrics")
+                    continue
+            results = ctx.Queue()
+            probe = ctx.Process(target=_loop_probe, args=(mode, port, results), name=f"bench-{mode}", daemon=True)
+            probe.start()
+            result = results.get(timeout=BENCH_LOOP_SECONDS + 120)
+            probe.join()
+            print(f"event_loop[{mode}] ran on {result['loop']}")
+            metrics[f"loop_{mode}_ws_ticks_per_sec"] = _ops(result["ticks"] / result["wall"])
+            metrics[f"loop_{mode}_ws_cpu_us_per_tick"] = {"value": round(result["cpu"] / max(result["ticks"], 1) * 1e6, 2), "unit": "us", "better": "lower"}
+            metrics[f"loop_{mode}_rest_round_trip"] = _latency(result["rest_us"])
+    finally:
+        sim.terminate()
+        sim.join()
+    return metrics
+
+# Full pipeline: a crossed tick goes through pair_monitor -> arb worker (fill, funding, profit)
+# -> candidate scheduler -> signal/decision engines -> execute_order's first order
+async def bench_tick_to_order(iterations: int = 200) -> dict:
+    import config_manager
+    import pair_monitor
+    from arb_worker import arb_worker
+    from candidate_scheduler import candidate_scheduler_loop
+
+    saved_settings = config_manager.settings
+    config_manager.settings = saved_settings.replace(MIN_DELTA_LIFETIME=0)
+    tasks = [asyncio.create_task(arb_worker(0)), asyncio.create_task(candidate_scheduler_loop())]
+    ordered = asyncio.Event()
+    _StubMixin.on_order = ordered.set
+    samples = []
+    try:
+        for i in range(iterations):
+            symbol = SYMBOLS[i % len(SYMBOLS)]
+            cheap, rich = BASE_PRICE, BASE_PRICE * 1.02
+            _StubMixin.mid[("Bybit", symbol)] = cheap
+            _StubMixin.mid[("KuCoin", symbol)] = rich
+            kucoin_quote, bybit_quote = Quote(symbol, "KuCoin"), Quote(symbol, "Bybit")
+            kucoin_quote.bid, kucoin_quote.ask = rich, rich * 1.0001
+            bybit_quote.bid, bybit_quote.ask = cheap * 0.9999, cheap
+            kucoin_quote.ts = bybit_quote.ts = time.time()
+            await pair_monitor.handle_price_update(kucoin_quote)
+            # Second tick on a standing delta is the one that triggers
+            await pair_monitor.handle_price_update(bybit_quote)
+            ordered.clear()
+            started = time.perf_counter_ns()
+            await pair_monitor.handle_price_update(bybit_quote)
+            await asyncio.wait_for(ordered.wait(), timeout=5)
+            samples.append((_StubMixin.order_times[-1] - started) / 1000)
+            await asyncio.sleep(0.01)  # let execute_order finish its failsafe path
+            pair_monitor.prune_symbol(symbol)
+    finally:
+        config_manager.settings = saved_settings
+        _StubMixin.on_order = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        from fill_simulator import close_session
+        await close_session()
+    return {"tick_to_order": _latency(samples)}
+
+SYNC_BENCHMARKS = [bench_sign, bench_calculate_quantity, bench_simulate_market_fill, bench_failover_tick, bench_funnel_record, bench_event_loop]
+ASYNC_BENCHMARKS = [bench_fetch_funding, bench_simulate_profit, bench_process_signal, bench_handle_price_update, bench_tick_replay_memory, bench_ingest, bench_tick_to_order]
+
+async def run_benchmarks(only: list[str] = None) -> dict:
+    _install_stubs()
+    metrics = {}
+    for bench in SYNC_BENCHMARKS + ASYNC_BENCHMARKS:
+        name = bench.__name__.removeprefix("bench_")
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        result = await bench() if asyncio.iscoroutinefunction(bench) else bench()
+        for metric, value in result.items():
+            metrics[metric] = value
+            print(f"{metric:<40} {value['value']:>14,.1f} {value['unit']}" + (f" (p99 {value['p99']:,.1f})" if "p99" in value else ""))
+    return metrics
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+# Metrics that got worse by more than threshold_pct: [(name, baseline, current, change %)]
+def compare(baseline: dict, current: dict, threshold_pct: float) -> list[tuple]:
+    regressions = []
+    for name, metric in current["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if not base or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"] * 100
+        worse = -change if metric["better"] == "higher" else change
+        print(f"{name:<40} {base['value']:>14,.1f} -> {metric['value']:>14,.1f} {metric['unit']} ({change:+.1f}%)")
+        if worse > threshold_pct:
+            regressions.append((name, base["value"], metric["value"], change))
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths")
+    parser.add_argument("--output", default=BENCH_OUTPUT, help="where to write the results (JSON)")
+    parser.add_argument("--compare", help="baseline results file; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=BENCH_REGRESSION_PCT, help="allowed regression per metric (%%)")
+    parser.add_argument("--only", nargs="*", help="run only benchmarks with these name prefixes (e.g. sign tick_to_order)")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)  # per-event log lines would dominate the timings
+    metrics = asyncio.run(run_benchmarks(args.only))
+    results = {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "metrics": metrics,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            for name, base, value, change in regressions:
+                print(f"REGRESSION {name}: {base:,.1f} -> {value:,.1f} ({change:+.1f}%, threshold {args.threshold}%)")
+            return 1
+        print(f"No regressions beyond {args.threshold}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
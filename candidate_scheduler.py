@@ -0,0 +1,121 @@
+# candidate_scheduler.py
+# Collects profitable candidates from the arb workers, sizes them with capital_allocator
+# and dispatches the chosen ones to signal_engine.
+import asyncio
+import heapq
+import itertools
+import time
+from decimal import Decimal
+from logger import logger
+import config_manager
+from config_manager import get_config_value
+from capital_allocator import allocate
+from records import ArbCandidate
+from funnel import record_outcome
+
+# Max time between the first queued candidate and its dispatch
+CANDIDATE_FLUSH_SEC = float(get_config_value("CANDIDATE_FLUSH_SEC", "0.5"))
+
+# Heap of (-net_profit, -quote_ts, seq, arb): best profit first, fresher quotes break ties
+_heap: list[tuple] = []
+# symbol -> seq of its live heap entry; older entries for the symbol are skipped when popped
+_latest_seq: dict[str, int] = {}
+_seq = itertools.count()
+_pending = asyncio.Event()
+_first_queued_at: float | None = None
+# Dispatched candidates still in signal_engine / order execution
+_dispatched: set[asyncio.Task] = set()
+
+def submit_candidate(arb: ArbCandidate) -> None:
+    global _first_queued_at
+    seq = next(_seq)
+    # A newer candidate for the same symbol supersedes the queued one
+    _latest_seq[arb.symbol] = seq
+    heapq.heappush(_heap, (-Decimal(str(arb.net_profit or 0)), -arb.quote_ts, seq, arb))
+    if _first_queued_at is None:
+        _first_queued_at = time.monotonic()
+    _pending.set()
+
+# Symbols with a candidate waiting for the next flush
+def pending_candidates() -> int:
+    return len(_latest_seq)
+
+def _free_slots() -> int:
+    from position_manager import get_open_positions
+    from failover_manager import failover_positions
+
+    busy = len(get_open_positions()) + sum(1 for f in failover_positions.values() if f.status != "closed")
+    return max(0, config_manager.settings.MAX_PARALLEL_POSITIONS - busy)
+
+# Pops live candidates best-first, skipping superseded and expired ones.
+# Candidates on the same symbol conflict; only the best one is taken.
+def pop_best(limit: int | None = None) -> list[ArbCandidate]:
+    now = time.time()
+    max_age = config_manager.settings.MAX_QUOTE_AGE_SEC
+    selected: list[ArbCandidate] = []
+    taken: set[str] = set()
+    expired = 0
+    while _heap and (limit is None or len(selected) < limit):
+        _, _, seq, arb = heapq.heappop(_heap)
+        symbol = arb.symbol
+        if _latest_seq.get(symbol) != seq or symbol in taken:
+            record_outcome(arb, "superseded")
+            continue
+        if now - arb.quote_ts > max_age:
+            expired += 1
+            record_outcome(arb, "expired")
+            continue
+        taken.add(symbol)
+        selected.append(arb)
+    if expired:
+        logger.debug(f"[SCHEDULER] Dropped {expired} expired candidates")
+    return selected
+
+def _reset():
+    global _first_queued_at
+    # Anything not dispatched is re-evaluated on the next quotes
+    _heap.clear()
+    _latest_seq.clear()
+    _first_queued_at = None
+    _pending.clear()
+
+async def candidate_scheduler_loop():
+    from signal_engine import process_signal
+
+    while True:
+        await _pending.wait()
+        wait = _first_queued_at + CANDIDATE_FLUSH_SEC - time.monotonic() if _first_queued_at else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        candidates = []
+        try:
+            candidates = pop_best()
+            best = allocate(candidates, _free_slots())
+        except Exception as e:
+            logger.warning(f"[SCHEDULER] Failed to select candidates: {e}")
+            for arb in candidates:
+                record_outcome(arb, "scheduler_error")
+            best = []
+        _reset()
+
+        for arb in best:
+            logger.info(
+                f"[SCHEDULER] Best arbitrage in batch: {arb.symbol} | "
+                f"Net Profit = ${arb.net_profit:.4f} ({arb.profit_percent or 0:.2f}%) | "
+                f"size=${arb.position_size_usd}"
+            )
+            task = asyncio.create_task(process_signal(arb), name=f"signal:{arb.symbol}")
+            _dispatched.add(task)
+            task.add_done_callback(_dispatched.discard)
+
+# Shutdown, after the scheduler loop is cancelled: lets dispatched candidates finish their entry
+# so close_all_positions() sees every position. Returns False if some had to be cancelled.
+async def drain_dispatched(timeout: float = 10) -> bool:
+    if not _dispatched:
+        return True
+    _, pending = await asyncio.wait(set(_dispatched), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return not pending
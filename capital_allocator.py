@@ -0,0 +1,102 @@
+# capital_allocator.py
+# Decides, once per scheduler flush, which candidates to open and with how much margin each.
+import itertools
+import time
+from decimal import Decimal
+from logger import logger
+import config_manager
+from config_manager import get_config_value
+from records import ArbCandidate
+from funnel import record_outcome
+
+LIVE_MODE = get_config_value("LIVE_MODE", "false").lower() == "true"
+
+_allocation_ids = itertools.count(1)
+
+def _commit(arb: ArbCandidate, required: float) -> None:
+    from balance_watchdog import reserve_margin
+
+    allocation_id = next(_allocation_ids)
+    arb.allocation_id = allocation_id
+    for exchange in (arb.long_exchange, arb.short_exchange):
+        reserve_margin(exchange, allocation_id, Decimal(str(round(required, 2))))
+
+# Order failed or signal rejected — return its margin to the pool
+def release_allocation(arb: ArbCandidate) -> None:
+    from balance_watchdog import release_margin
+
+    allocation_id = arb.allocation_id
+    arb.allocation_id = None
+    if allocation_id is not None:
+        release_margin(allocation_id)
+
+# Order filled — the reservation lasts until a balance update reflects the fill
+def settle_allocation(arb: ArbCandidate) -> None:
+    from balance_watchdog import settle_margin
+
+    allocation_id = arb.allocation_id
+    if allocation_id is not None:
+        settle_margin(allocation_id)
+
+# Greedy by expected return per margin dollar: each candidate gets the size profit_simulator found
+# optimal (POSITION_SIZE_USD if unknown), cut down to what both venues' free balances allow.
+# Sets arb.position_size_usd. Candidates must be one per symbol and carry
+# net_profit/profit_percent from profit_simulator, evaluated at optimal_size_usd; a candidate
+# that is cut is re-priced on its fill curves, so net_profit is always the profit at the size opened.
+def allocate(candidates: list[ArbCandidate], slots: int) -> list[ArbCandidate]:
+    started = time.perf_counter()
+    from balance_watchdog import get_free_balances
+    from profit_simulator import reprice_at_size
+
+    settings = config_manager.settings
+    default_size = float(settings.POSITION_SIZE_USD)  # max margin per trade
+    min_size = float(settings.MIN_POSITION_SIZE_USD)
+
+    # Paper trading is not capital-bound
+    free = {exchange: float(balance) for exchange, balance in get_free_balances().items()} if LIVE_MODE else None
+    buffer = 1 + float(settings.BALANCE_MARGIN_PCT) / 100
+    min_profit = float(settings.MIN_PROFIT)
+
+    selected = []
+    rejected = []
+    for arb in sorted(candidates, key=lambda a: float(a.profit_percent or 0), reverse=True):
+        if len(selected) >= slots:
+            rejected.append((arb, "too_many_open_positions"))
+            continue
+        # Net profit peaks at optimal_size_usd, so a candidate already short of MIN_PROFIT there is out
+        if float(arb.net_profit or 0) < min_profit:
+            rejected.append((arb, "low_net_profit"))
+            continue
+
+        planned = float(arb.optimal_size_usd or default_size)
+        size = planned
+        max_size = arb.max_size_usd
+        if max_size is not None:
+            size = min(size, float(max_size))
+        if free is not None:
+            size = min(size, free.get(arb.long_exchange, 0.0) / buffer, free.get(arb.short_exchange, 0.0) / buffer)
+        if size < min_size:
+            rejected.append((arb, "insufficient_capital" if max_size is None or float(max_size) >= min_size else "insufficient_depth"))
+            continue
+        size = round(size, 2)
+        if size < round(planned, 2):
+            net_profit = reprice_at_size(arb, Decimal(str(size)))
+            if net_profit is None or float(net_profit) < min_profit:
+                rejected.append((arb, "low_net_profit"))
+                continue
+
+        required = size * buffer
+        if free is not None:
+            free[arb.long_exchange] -= required
+            free[arb.short_exchange] -= required
+            _commit(arb, required)
+
+        arb.position_size_usd = Decimal(str(size))
+        selected.append(arb)
+
+    elapsed_us = (time.perf_counter() - started) * 1e6
+    for arb, reason in rejected:
+        logger.info(f"[ALLOCATOR] {arb.symbol}: ❌ REJECT — {reason}")
+        record_outcome(arb, reason)
+    logger.debug(f"[ALLOCATOR] {len(selected)}/{len(candidates)} candidates allocated in {elapsed_us:.0f} µs")
+    return selected
@@ -1,8 +1,208 @@
+# config_manager.py
+# Configuration from .env (real environment variables take precedence over the file).
+#   - get_config_value(): raw string lookup, for the keys modules read once at import
+#     (URLs, API keys, intervals, buffer sizes); changing those needs a restart
+#   - settings: the strategy thresholds, parsed and validated once into a Settings object
+#     that hot paths read by attribute. Built on first access (main validates it at startup),
+#     so tools that never trade (exchange_simulator, benchmark) do not need them. reload_settings() re-reads .env and swaps in a new,
+#     fully validated object (Telegram /reload, or settings_watch_loop when the file changes),
+#     so thresholds change without a restart and without touching the WS subscriptions.
+import asyncio
 import os
-from dotenv import load_dotenv
+from decimal import Decimal, InvalidOperation
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+ENV_PATH = find_dotenv()
+_PROCESS_KEYS = frozenset(os.environ)  # set outside .env: reloads never override them
 
 # Load .env into environment
-load_dotenv()
+load_dotenv(ENV_PATH)
+_startup_file = dotenv_values(ENV_PATH) if ENV_PATH else {}
 
 def get_config_value(key: str, default=None):
     return os.getenv(key, default)
+
+SETTINGS_WATCH_SEC = float(get_config_value("SETTINGS_WATCH_SEC", "2"))  # 0 = reload only from Telegram
+
+def _parse_bool(value: str) -> bool:
+    value = value.strip().lower()
+    if value not in ("true", "false"):
+        raise ValueError("expected true or false")
+    return value == "true"
+
+def _positive(value) -> bool:
+    return value > 0
+
+def _non_negative(value) -> bool:
+    return value >= 0
+
+# Reloadable keys: name -> (parser, default, check). None default = required.
+SETTINGS_FIELDS = {
+    # pair_monitor / candidate_scheduler
+    "MIN_DELTA": (float, None, None),
+    "MIN_DELTA_LIFETIME": (int, "2", _non_negative),
+    "DELTA_CACHE_EXPIRATION_SEC": (int, "10", _positive),
+    "MAX_QUOTE_AGE_SEC": (float, "3", _positive),
+    "MAX_PARALLEL_POSITIONS": (int, "1", _non_negative),
+    # sizing and profit (fill_simulator, profit_simulator, capital_allocator, signal_engine)
+    "POSITION_SIZE_USD": (Decimal, "100", _positive),
+    "MIN_POSITION_SIZE_USD": (Decimal, "1", _positive),
+    "LEVERAGE": (Decimal, "3", _positive),
+    "MAX_PRICE_IMPACT": (Decimal, "0.5", _positive),
+    "MIN_PROFIT": (Decimal, "1.0", None),
+    "INCLUDE_FUNDING_IN_PROFIT": (_parse_bool, "true", None),
+    "BALANCE_MARGIN_PCT": (Decimal, "20", _non_negative),
+    # exits (position_manager, failover_manager)
+    "TAKE_PROFIT_THRESHOLD": (Decimal, "10", None),
+    "STOP_LOSS_PCT": (Decimal, "1.0", _positive),
+    "MAX_HOLD_TIME_MINUTES": (int, "120", _positive),
+    "FUNDING_SETTLEMENT_EXIT": (_parse_bool, "false", None),
+    "FUNDING_SETTLEMENT_WINDOW_MIN": (int, "15", _non_negative),
+    "FUNDING_SETTLEMENT_MARGIN_SEC": (int, "30", _non_negative),
+    "FAILOVER_TRAILING_STOP_PCT": (Decimal, "1.0", _positive),
+    "FAILOVER_INITIAL_TAKE_PROFIT_PCT": (Decimal, "3.0", _positive),
+    # cooldowns (signal_engine)
+    "COOLDOWN_AFTER_TIMEOUT_MINUTES": (int, "15", _non_negative),
+    "SL_IGNORE_MINUTES": (int, "5", _non_negative),
+}
+
+class SettingsError(ValueError):
+    def __init__(self, errors: list[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+# Parsed strategy thresholds. Read-only: a reload builds a new instance.
+class Settings:
+    __slots__ = tuple(SETTINGS_FIELDS)
+
+    def __init__(self, raw: dict[str, str | None]):
+        errors = []
+        for name, (parser, default, check) in SETTINGS_FIELDS.items():
+            text = raw.get(name)
+            if text is None or not text.strip():
+                text = default
+            if text is None:
+                errors.append(f"{name} is not set")
+                continue
+            try:
+                value = parser(text.strip())
+            except (ValueError, InvalidOperation):
+                expected = "true or false" if parser is _parse_bool else "an integer" if parser is int else "a number"
+                errors.append(f"{name}={text!r}: expected {expected}")
+                continue
+            if check is not None and not check(value):
+                errors.append(f"{name}={text!r}: must be {check.__name__.strip('_').replace('_', '-')}")
+                continue
+            object.__setattr__(self, name, value)
+        if errors:
+            raise SettingsError(errors)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read-only; use reload_settings()")
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in SETTINGS_FIELDS}
+
+    # Validated copy with some fields changed
+    def replace(self, **changes) -> "Settings":
+        unknown = set(changes) - set(SETTINGS_FIELDS)
+        if unknown:
+            raise SettingsError([f"{name} is not a reloadable setting" for name in sorted(unknown)])
+        raw = {name: str(value) for name, value in {**self.as_dict(), **changes}.items()}
+        return Settings(raw)
+
+def _raw_settings(file_values: dict[str, str | None]) -> dict[str, str | None]:
+    return {
+        name: os.environ.get(name) if name in _PROCESS_KEYS else file_values.get(name)
+        for name in SETTINGS_FIELDS
+    }
+
+# Parse the thresholds from the environment into `settings`; raises SettingsError listing every bad key
+def load_settings() -> Settings:
+    global settings
+    settings = Settings({name: os.environ.get(name) for name in SETTINGS_FIELDS})
+    return settings
+
+# `settings` is created by load_settings() on first access; later reads are plain module globals
+def __getattr__(name: str):
+    if name == "settings":
+        return load_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Re-read .env and replace `settings` in one assignment, so every reader sees either the old
+# or the new thresholds. Invalid values keep the current settings and are reported instead.
+# Returns ({name: (old, new)}, errors, keys changed in the file that only apply after a restart).
+def reload_settings() -> tuple[dict[str, tuple], list[str], list[str]]:
+    global settings
+    from logger import logger
+
+    try:
+        file_values = dotenv_values(ENV_PATH) if ENV_PATH else {}
+    except OSError as e:
+        logger.warning(f"[SETTINGS] Failed to read {ENV_PATH}: {e}")
+        return {}, [f"cannot read {ENV_PATH}: {e}"], []
+    try:
+        new = Settings(_raw_settings(file_values))
+    except SettingsError as e:
+        logger.warning(f"[SETTINGS] Reload rejected, keeping current settings: {e}")
+        return {}, e.errors, []
+
+    old = globals().get("settings") or load_settings()
+    changes = {
+        name: (getattr(old, name), getattr(new, name))
+        for name in SETTINGS_FIELDS if getattr(old, name) != getattr(new, name)
+    }
+    settings = new
+    # Keep get_config_value() in line with the reloaded keys
+    for name in SETTINGS_FIELDS:
+        if name not in _PROCESS_KEYS:
+            if file_values.get(name) is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = file_values[name]
+
+    restart_keys = sorted(
+        key for key in set(file_values) | set(_startup_file)
+        if key not in SETTINGS_FIELDS and key not in _PROCESS_KEYS
+        and file_values.get(key) != _startup_file.get(key)
+    )
+    if changes:
+        logger.info("[SETTINGS] Reloaded: " + ", ".join(f"{name} {a} -> {b}" for name, (a, b) in changes.items()))
+    if restart_keys:
+        logger.warning(f"[SETTINGS] Changed in {ENV_PATH} but only applied after a restart: {', '.join(restart_keys)}")
+    return changes, [], restart_keys
+
+def format_reload(changes: dict[str, tuple], errors: list[str], restart_keys: list[str]) -> str:
+    if errors:
+        return "Reload rejected, current settings kept:\n" + "\n".join(errors)
+    lines = [f"{name}: {a} -> {b}" for name, (a, b) in changes.items()] or ["No setting changed."]
+    if restart_keys:
+        lines.append(f"Needs a restart: {', '.join(restart_keys)}")
+    return "\n".join(lines)
+
+# Reload when the .env file changes (mtime polling: no watcher dependency)
+async def settings_watch_loop():
+    if not ENV_PATH or SETTINGS_WATCH_SEC <= 0:
+        return
+    from logger import logger
+
+    def mtime():
+        try:
+            return os.stat(ENV_PATH).st_mtime_ns
+        except OSError:
+            return None
+
+    seen = mtime()
+    while True:
+        await asyncio.sleep(SETTINGS_WATCH_SEC)
+        current = mtime()
+        if current is None or current == seen:
+            continue
+        seen = current
+        logger.info(f"[SETTINGS] {ENV_PATH} changed, reloading")
+        changes, errors, restart_keys = reload_settings()
+        if changes or errors:
+            import html
+            from telegram_bot import notify
+            notify(f"⚙️ <b>.env changed</b>\n<pre>{html.escape(format_reload(changes, errors, restart_keys))}</pre>",
+                   key="settings_reload")
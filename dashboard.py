@@ -0,0 +1,316 @@
+# dashboard.py
+# Local read-only dashboard (DASHBOARD_ENABLED=true): positions, failover legs, per-exchange
+# quote freshness and trading block status, and pipeline queue depths.
+#   GET /          page (no external assets, works offline against exchange_simulator.py)
+#   GET /snapshot  current snapshot as JSON
+#   GET /ws        snapshot, then field-level diffs as they happen
+# Trading code calls publish(section, key, obj) when something changes, which only marks the
+# object dirty (one dict store). The push task renders dirty objects into the snapshot at most
+# every DASHBOARD_PUSH_SEC, serialises the diff once and hands the same string to every viewer,
+# so viewers add nothing to the trading path. Exchange and queue stats are sampled by the
+# dashboard itself, and only while someone is watching.
+import asyncio
+import json
+import time
+from aiohttp import web, WSCloseCode
+from logger import logger
+import config_manager
+from config_manager import get_config_value
+from records import Position, FailoverLeg
+
+DASHBOARD_ENABLED = get_config_value("DASHBOARD_ENABLED", "false").lower() == "true"
+DASHBOARD_HOST = get_config_value("DASHBOARD_HOST", "127.0.0.1")
+DASHBOARD_PORT = int(get_config_value("DASHBOARD_PORT", "8780"))
+DASHBOARD_PUSH_SEC = float(get_config_value("DASHBOARD_PUSH_SEC", "0.5"))
+DASHBOARD_STATS_SEC = float(get_config_value("DASHBOARD_STATS_SEC", "1"))
+DASHBOARD_VIEWER_BACKLOG = int(get_config_value("DASHBOARD_VIEWER_BACKLOG", "64"))  # unsent diffs before a viewer is dropped
+
+_REMOVED = object()
+
+# section -> key -> row (JSON-ready dict)
+_snapshot: dict[str, dict[str, dict]] = {"positions": {}, "failovers": {}, "exchanges": {}, "queues": {}}
+_dirty: dict[tuple[str, str], object] = {}
+_changed = asyncio.Event()
+_version = 0
+
+def _num(value) -> float | None:
+    return None if value is None else round(float(value), 6)
+
+def _position_row(pos: Position) -> dict:
+    return {
+        "symbol": pos.symbol,
+        "long": pos.long_exchange,
+        "short": pos.short_exchange,
+        "status": pos.status,
+        "size_usd": _num(pos.position_size_usd),
+        "pnl": _num(pos.net_profit),
+        "entry_long": _num(pos.entry_prices.get(pos.long_exchange)),
+        "entry_short": _num(pos.entry_prices.get(pos.short_exchange)),
+        "last_long": _num(pos.last_price.get(pos.long_exchange)),
+        "last_short": _num(pos.last_price.get(pos.short_exchange)),
+        "long_status": pos.long_status,
+        "short_status": pos.short_status,
+        "opened_ts": pos.entry_time.timestamp() if pos.entry_time else None,
+    }
+
+def _failover_row(leg: FailoverLeg) -> dict:
+    return {
+        "symbol": leg.symbol,
+        "exchange": leg.exchange,
+        "direction": leg.direction,
+        "status": leg.status,
+        "pnl": _num(leg.current_pnl),
+        "max_pnl": _num(leg.max_pnl),
+        "trail_stop": _num(leg.trailing_stop_pnl),
+        "take_profit": _num(leg.initial_take_profit_pnl),
+        "quote_ts": leg.quote_ts or None,
+        "opened_ts": leg.entry_time.timestamp() if leg.entry_time else None,
+    }
+
+# Sections whose published objects are rendered by the dashboard; others publish rows directly
+_RENDERERS = {"positions": _position_row, "failovers": _failover_row}
+
+# Mark a row changed; obj is rendered on the next push (cheap enough for per-tick callers)
+def publish(section: str, key: str, obj) -> None:
+    _dirty[(section, key)] = obj
+    _changed.set()
+
+def retract(section: str, key: str) -> None:
+    _dirty[(section, key)] = _REMOVED
+    _changed.set()
+
+# Render everything dirty into the snapshot; returns the diff, or None when nothing visible changed
+def apply_changes() -> dict | None:
+    global _version
+    if not _dirty:
+        return None
+    changes = list(_dirty.items())
+    _dirty.clear()
+    updated: dict[str, dict] = {}
+    removed: dict[str, list] = {}
+    for (section, key), obj in changes:
+        rows = _snapshot.setdefault(section, {})
+        if obj is _REMOVED:
+            if rows.pop(key, None) is not None:
+                removed.setdefault(section, []).append(key)
+            continue
+        renderer = _RENDERERS.get(section)
+        try:
+            row = renderer(obj) if renderer else obj
+        except Exception as e:
+            logger.warning(f"[DASHBOARD] Failed to render {section}/{key}: {e}")
+            continue
+        old = rows.get(key)
+        fields = row if old is None else {field: value for field, value in row.items() if old.get(field) != value}
+        if fields:
+            rows[key] = row
+            updated.setdefault(section, {})[key] = fields
+    if not updated and not removed:
+        return None
+    _version += 1
+    return {"type": "diff", "version": _version, "set": updated, "del": removed}
+
+def snapshot() -> dict[str, dict[str, dict]]:
+    apply_changes()
+    return _snapshot
+
+# --- Viewers ---
+class _Viewer:
+    __slots__ = ("ws", "queue")
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=DASHBOARD_VIEWER_BACKLOG)
+
+_viewers: set[_Viewer] = set()
+_closing: set[asyncio.Task] = set()  # close handshakes of dropped viewers
+
+def _broadcast(message: str) -> None:
+    for viewer in list(_viewers):
+        try:
+            viewer.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop it, the page reconnects and starts from a fresh snapshot
+            _viewers.discard(viewer)
+            task = asyncio.create_task(viewer.ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b"lagging"))
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+
+def _push_pending() -> None:
+    diff = apply_changes()
+    if diff is not None and _viewers:
+        _broadcast(json.dumps(diff))
+
+def _sample_stats() -> None:
+    from pair_monitor import latest_quotes, arb_queue
+    from price_feed import price_queue
+    from candidate_scheduler import pending_candidates
+    from balance_watchdog import is_exchange_blocked, get_free_balance
+    from exchange_adapters import get_exchange_names
+    from telegram_bot import queued_notifications
+
+    now = time.time()
+    max_age = config_manager.settings.MAX_QUOTE_AGE_SEC
+    feeds = {name: [0, 0, 0.0, None] for name in get_exchange_names()}  # quotes, stale, newest ts, oldest ts
+    for quotes in latest_quotes.values():
+        for exchange, quote in quotes.items():
+            feed = feeds.get(exchange)
+            if feed is None:
+                continue
+            feed[0] += 1
+            if now - quote.ts > max_age:
+                feed[1] += 1
+            feed[2] = max(feed[2], quote.ts)
+            feed[3] = quote.ts if feed[3] is None else min(feed[3], quote.ts)
+    for exchange, (count, stale, newest, oldest) in feeds.items():
+        publish("exchanges", exchange, {
+            "quotes": count,
+            "stale": stale,
+            "newest_ts": round(newest, 3) or None,
+            "oldest_ts": round(oldest, 3) if oldest else None,
+            "blocked": is_exchange_blocked(exchange),
+            "free_balance": _num(round(get_free_balance(exchange), 2)),
+        })
+    publish("queues", "depth", {
+        "price_queue": price_queue.qsize(),
+        "arb_queue": arb_queue.qsize(),
+        "candidates": pending_candidates(),
+        "notifications": queued_notifications(),
+    })
+
+async def _push_loop():
+    while True:
+        await _changed.wait()
+        _changed.clear()
+        _push_pending()
+        await asyncio.sleep(DASHBOARD_PUSH_SEC)
+
+async def _stats_loop():
+    while True:
+        if _viewers:
+            try:
+                _sample_stats()
+            except Exception as e:
+                logger.warning(f"[DASHBOARD] Failed to sample stats: {e}")
+        await asyncio.sleep(DASHBOARD_STATS_SEC)
+
+# --- HTTP ---
+async def _ws_handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    if not _viewers:
+        _sample_stats()
+    # Bring existing viewers up to date first, so the snapshot and their diffs share a version
+    _push_pending()
+    viewer = _Viewer(ws)
+    _viewers.add(viewer)
+    await ws.send_str(json.dumps({"type": "snapshot", "version": _version, "data": _snapshot}))
+
+    async def writer():
+        try:
+            while True:
+                await ws.send_str(await viewer.queue.get())
+        except (ConnectionError, RuntimeError):
+            pass  # closed while sending; the reader below ends too
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        async for _ in ws:
+            pass  # read-only: incoming messages are ignored
+    finally:
+        _viewers.discard(viewer)
+        writer_task.cancel()
+    return ws
+
+async def _snapshot_handler(request: web.Request) -> web.Response:
+    return web.json_response({"version": _version, "data": snapshot()})
+
+async def _page_handler(request: web.Request) -> web.Response:
+    return web.Response(text=_PAGE, content_type="text/html")
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.add_routes([
+        web.get("/", _page_handler),
+        web.get("/snapshot", _snapshot_handler),
+        web.get("/ws", _ws_handler),
+    ])
+    return app
+
+async def dashboard_server():
+    if not DASHBOARD_ENABLED:
+        return
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, DASHBOARD_HOST, DASHBOARD_PORT)
+    await site.start()
+    logger.info(f"[DASHBOARD] Serving on http://{DASHBOARD_HOST}:{DASHBOARD_PORT}")
+    try:
+        await asyncio.gather(_push_loop(), _stats_loop())
+    finally:
+        for viewer in list(_viewers):
+            await viewer.ws.close(code=WSCloseCode.GOING_AWAY, message=b"shutdown")
+        await runner.cleanup()
+
+# Applies the snapshot and diffs to a local copy and redraws one table per section.
+# Fields ending in _ts are epoch seconds and are shown as ages, ticking client-side.
+_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Arbitrage bot</title>
+<style>
+body{font:13px monospace;margin:16px;background:#111;color:#ddd}
+table{border-collapse:collapse;margin-bottom:20px}
+th,td{padding:3px 10px;border-bottom:1px solid #333;text-align:right}
+th{color:#8ab}td:first-child,th:first-child{text-align:left}
+.neg{color:#e66}.pos{color:#6c6}#status{color:#888}
+</style></head><body>
+<div id="status">connecting…</div><div id="tables"></div>
+<script>
+let state = {}, version = 0;
+const ESC = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"};
+function esc(s) { return String(s).replace(/[&<>"']/g, ch => ESC[ch]); }
+function fmt(k, v) {
+  if (v === null || v === undefined) return "";
+  if (k.endsWith("_ts")) return (Date.now() / 1000 - v).toFixed(1) + "s";
+  if (typeof v === "number") return Number.isInteger(v) ? v : v.toFixed(4);
+  return String(v);
+}
+function render() {
+  let html = "";
+  for (const [section, rows] of Object.entries(state)) {
+    const keys = Object.keys(rows).sort();
+    if (!keys.length) { html += `<h3>${esc(section)}</h3><p>none</p>`; continue; }
+    const cols = [...new Set(keys.flatMap(k => Object.keys(rows[k])))];
+    html += `<h3>${esc(section)}</h3><table><tr><th>key</th>${cols.map(c => `<th>${esc(c.replace(/_ts$/, "_age"))}</th>`).join("")}</tr>`;
+    for (const k of keys) {
+      html += `<tr><td>${esc(k)}</td>` + cols.map(c => {
+        const v = rows[k][c];
+        const cls = typeof v === "number" && c.includes("pnl") ? (v < 0 ? "neg" : "pos") : "";
+        return `<td class="${cls}">${esc(fmt(c, v))}</td>`;
+      }).join("") + "</tr>";
+    }
+    html += "</table>";
+  }
+  document.getElementById("tables").innerHTML = html;
+}
+function connect() {
+  const ws = new WebSocket(`ws://${location.host}/ws`);
+  ws.onmessage = e => {
+    const msg = JSON.parse(e.data);
+    if (msg.type === "snapshot") state = msg.data;
+    else {
+      for (const [section, rows] of Object.entries(msg.set)) {
+        state[section] = state[section] || {};
+        for (const [k, fields] of Object.entries(rows)) state[section][k] = Object.assign(state[section][k] || {}, fields);
+      }
+      for (const [section, keys] of Object.entries(msg.del)) for (const k of keys) delete state[section][k];
+    }
+    version = msg.version;
+    document.getElementById("status").textContent = `live · v${version}`;
+    render();
+  };
+  ws.onclose = () => { document.getElementById("status").textContent = "disconnected, retrying…"; setTimeout(connect, 1000); };
+}
+setInterval(render, 1000);
+connect();
+</script></body></html>
+"""
@@ -0,0 +1,92 @@
+# event_loop.py
+# Event loop setup for the bot and its ingestion shards.
+#   EVENT_LOOP=uvloop     libuv-based loop (pip install uvloop); falls back to asyncio if missing
+#   LOOP_DEBUG=true       asyncio debug mode: logs every callback slower than LOOP_SLOW_CALLBACK_MS
+#                         (expensive: keeps a traceback per handle, for diagnosis only)
+#   LOOP_EXECUTOR_WORKERS default executor size (aiohttp DNS lookups, run_in_executor calls)
+# Without debug mode, loop_lag_monitor() catches the same stalls cheaply by timing its own sleeps.
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger import logger
+from config_manager import get_config_value
+
+EVENT_LOOP = get_config_value("EVENT_LOOP", "asyncio").strip().lower()  # asyncio | uvloop
+LOOP_DEBUG = get_config_value("LOOP_DEBUG", "false").lower() == "true"
+LOOP_SLOW_CALLBACK_MS = float(get_config_value("LOOP_SLOW_CALLBACK_MS", "100"))
+LOOP_EXECUTOR_WORKERS = int(get_config_value("LOOP_EXECUTOR_WORKERS", "0"))  # 0 = Python default
+LOOP_LAG_CHECK_SEC = float(get_config_value("LOOP_LAG_CHECK_SEC", "1"))
+LOOP_MODES = ("asyncio", "uvloop")
+
+# Loop factory for asyncio.Runner; None means the stock asyncio loop
+def loop_factory(mode: str = EVENT_LOOP):
+    if mode not in LOOP_MODES:
+        logger.warning(f"[LOOP] Unknown EVENT_LOOP '{mode}' (use {', '.join(LOOP_MODES)}); using asyncio")
+        return None
+    if mode == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("[LOOP] EVENT_LOOP=uvloop but uvloop is not installed (pip install uvloop); using asyncio")
+            return None
+        return uvloop.new_event_loop
+    return None
+
+def executor_workers() -> int:
+    return LOOP_EXECUTOR_WORKERS if LOOP_EXECUTOR_WORKERS > 0 else min(32, (os.cpu_count() or 1) + 4)
+
+def configure_loop(loop: asyncio.AbstractEventLoop) -> None:
+    loop.set_debug(LOOP_DEBUG)
+    loop.slow_callback_duration = LOOP_SLOW_CALLBACK_MS / 1000
+    if LOOP_EXECUTOR_WORKERS > 0:
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=LOOP_EXECUTOR_WORKERS, thread_name_prefix="loop-executor"))
+
+# asyncio.run() replacement that honours EVENT_LOOP and the LOOP_* settings
+def run(main, mode: str = EVENT_LOOP):
+    with asyncio.Runner(loop_factory=loop_factory(mode)) as runner:
+        configure_loop(runner.get_loop())
+        return runner.run(main)
+
+def loop_name(loop: asyncio.AbstractEventLoop = None) -> str:
+    loop = loop or asyncio.get_running_loop()
+    module = type(loop).__module__.split(".")[0]
+    if module == "uvloop":
+        import uvloop
+        return f"uvloop {uvloop.__version__}"
+    selector = getattr(loop, "_selector", None)
+    return f"asyncio {type(loop).__name__}" + (f" ({type(selector).__name__})" if selector is not None else "")
+
+# Startup self-check: which loop actually runs (vs EVENT_LOOP), its settings, and a short
+# call_soon round-trip measurement as a sanity check of scheduling overhead
+async def report_loop(samples: int = 2000) -> str:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for _ in range(samples):
+        await asyncio.sleep(0)
+    round_trip_us = (time.perf_counter() - started) / samples * 1e6
+
+    active = loop_name(loop)
+    report = (
+        f"[LOOP] {active} (EVENT_LOOP={EVENT_LOOP}) | debug {'on' if loop.get_debug() else 'off'}"
+        f" | slow callbacks > {LOOP_SLOW_CALLBACK_MS:.0f} ms | executor {executor_workers()} workers"
+        f" | yield round trip {round_trip_us:.1f} us"
+    )
+    if EVENT_LOOP == "uvloop" and not active.startswith("uvloop"):
+        logger.warning(f"{report} — uvloop requested but not active")
+    else:
+        logger.info(report)
+    return report
+
+# Logs when the loop wakes up later than LOOP_SLOW_CALLBACK_MS: some callback or coroutine step
+# held it. Costs one timer per LOOP_LAG_CHECK_SEC, so it stays on in production.
+async def loop_lag_monitor():
+    threshold = LOOP_SLOW_CALLBACK_MS / 1000
+    worst = 0.0
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(LOOP_LAG_CHECK_SEC)
+        lag = time.monotonic() - started - LOOP_LAG_CHECK_SEC
+        if lag > threshold:
+            worst = max(worst, lag)
+            logger.warning(f"[LOOP] Event loop blocked for ~{lag * 1000:.0f} ms (worst {worst * 1000:.0f} ms); set LOOP_DEBUG=true to log the slow callback")
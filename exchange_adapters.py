@@ -0,0 +1,232 @@
+# exchange_adapters.py
+# One adapter per venue: WS feed, REST order/position/PnL/funding/balance and
+# symbol normalisation. Modules dispatch through get_adapter(exchange) instead
+# of branching on exchange names, so a new venue is one module calling register_adapter().
+from decimal import Decimal
+from typing import Dict, List
+from config_manager import get_config_value
+
+# Venue base URLs — point them at exchange_simulator.py (or a testnet) to run offline
+BYBIT_REST_URL = get_config_value("BYBIT_REST_URL", "https://api.bybit.com").rstrip("/")
+BYBIT_WS_PUBLIC_URL = get_config_value("BYBIT_WS_PUBLIC_URL", "wss://stream.bybit.com/v5/public/linear")
+BYBIT_WS_PRIVATE_URL = get_config_value("BYBIT_WS_PRIVATE_URL", "wss://stream.bybit.com/v5/private")
+KUCOIN_REST_URL = get_config_value("KUCOIN_REST_URL", "https://api-futures.kucoin.com").rstrip("/")
+
+class ExchangeAdapter:
+    name: str = ""
+    csv_column: str = ""  # column in matched_pairs CSV with the venue symbol
+
+    def __init__(self):
+        self.taker_fee = Decimal("0")
+
+    # Symbols: canonical (Bybit-style, e.g. BTCUSDT) <-> exchange-native
+    def to_exchange_symbol(self, symbol: str) -> str:
+        return symbol
+
+    def to_canonical_symbol(self, symbol: str) -> str:
+        return symbol
+
+    # WS feed
+    def load_symbols(self) -> List[str]:
+        from price_feed import load_symbols
+        return load_symbols(self.csv_column)
+
+    def ws_client_class(self) -> type:
+        raise NotImplementedError
+
+    def create_ws_client(self, symbols: List[str]):
+        return self.ws_client_class()(symbols)
+
+    # REST — all methods take canonical symbols
+    # Returns (specs by exchange symbol, etag); specs is None when unchanged since etag
+    async def fetch_specs(self, etag: str = None) -> tuple[dict | None, str | None]:
+        raise NotImplementedError
+
+    async def fetch_orderbook(self, session, symbol: str) -> tuple[list, list]:
+        raise NotImplementedError
+
+    # Funding calendar of every listed perpetual in one bulk call: [FundingSchedule] with canonical symbols
+    async def fetch_funding_calendar(self, session) -> list:
+        raise NotImplementedError
+
+    # client_id: our own order id (Bybit orderLinkId / KuCoin clientOid), known before the ack arrives
+    async def place_market_order(self, symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+        raise NotImplementedError
+
+    # Cancel by client id; used when an order was sent but never acknowledged
+    async def cancel_order(self, symbol: str, client_id: str) -> None:
+        raise NotImplementedError
+
+    async def get_position_size(self, symbol: str) -> float:
+        raise NotImplementedError
+
+    # Execution report of one order, looked up by venue order id or else by client id:
+    # (filled qty in contracts, avg fill price or None, no longer working), or None if the venue doesn't know it
+    async def fetch_order_fill(self, symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+        raise NotImplementedError
+
+    async def fetch_pnl(self, symbol: str, side: str) -> Decimal:
+        raise NotImplementedError
+
+    async def fetch_final_pnl(self, symbol: str, side: str) -> Decimal:
+        raise NotImplementedError
+
+    async def fetch_balance(self) -> Decimal:
+        raise NotImplementedError
+
+    # Private WS wallet stream: awaits on_balance(Decimal) per push until the connection drops.
+    # Returns False when the venue has no such stream.
+    async def stream_balance(self, on_balance) -> bool:
+        return False
+
+class BybitAdapter(ExchangeAdapter):
+    name = "Bybit"
+    csv_column = "bybit_symbol"
+
+    def __init__(self):
+        super().__init__()
+        self.taker_fee = Decimal(get_config_value("FEE_TAKER_BYBIT", "0.0006"))
+
+    def ws_client_class(self) -> type:
+        from price_feed import BybitWSClient
+        return BybitWSClient
+
+    async def fetch_specs(self, etag: str = None) -> tuple[dict | None, str | None]:
+        from symbol_specs import fetch_bybit_specs
+        return await fetch_bybit_specs(etag)
+
+    async def fetch_orderbook(self, session, symbol: str) -> tuple[list, list]:
+        from fill_simulator import fetch_bybit_orderbook
+        return await fetch_bybit_orderbook(session, symbol)
+
+    async def fetch_funding_calendar(self, session) -> list:
+        from funding_fetcher import fetch_bybit_funding_calendar
+        return await fetch_bybit_funding_calendar(session)
+
+    async def place_market_order(self, symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+        from order_manager import place_bybit_market_order
+        return await place_bybit_market_order(symbol, side, qty, reduce_only, client_id)
+
+    async def cancel_order(self, symbol: str, client_id: str) -> None:
+        from order_manager import cancel_bybit_order
+        await cancel_bybit_order(symbol, client_id)
+
+    async def get_position_size(self, symbol: str) -> float:
+        from order_manager import get_bybit_position_size
+        return await get_bybit_position_size(symbol)
+
+    async def fetch_order_fill(self, symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+        from order_manager import fetch_bybit_order_fill
+        return await fetch_bybit_order_fill(symbol, order_id, client_id)
+
+    async def fetch_pnl(self, symbol: str, side: str) -> Decimal:
+        from pnl_fetcher import fetch_pnl_bybit
+        return await fetch_pnl_bybit(symbol, side)
+
+    async def fetch_final_pnl(self, symbol: str, side: str) -> Decimal:
+        from final_pnl_fetcher import fetch_final_pnl_bybit
+        return await fetch_final_pnl_bybit(symbol, side)
+
+    async def fetch_balance(self) -> Decimal:
+        from balance_watchdog import fetch_bybit_balance
+        return await fetch_bybit_balance()
+
+    async def stream_balance(self, on_balance) -> bool:
+        from balance_watchdog import stream_bybit_wallet
+        await stream_bybit_wallet(on_balance)
+        return True
+
+class KuCoinAdapter(ExchangeAdapter):
+    name = "KuCoin"
+    csv_column = "kucoin_symbol"
+
+    def __init__(self):
+        super().__init__()
+        self.taker_fee = Decimal(get_config_value("FEE_TAKER_KUCOIN", "0.0006"))
+
+    # KuCoin USDT-margined perpetuals carry an "M" suffix (e.g. ETHUSDT -> ETHUSDTM)
+    def to_exchange_symbol(self, symbol: str) -> str:
+        return symbol if symbol.endswith("M") else symbol + "M"
+
+    def to_canonical_symbol(self, symbol: str) -> str:
+        return symbol[:-1] if symbol.endswith("M") else symbol
+
+    def ws_client_class(self) -> type:
+        from price_feed import KuCoinWSClient
+        return KuCoinWSClient
+
+    async def fetch_specs(self, etag: str = None) -> tuple[dict | None, str | None]:
+        from symbol_specs import fetch_kucoin_specs
+        return await fetch_kucoin_specs(etag)
+
+    async def fetch_orderbook(self, session, symbol: str) -> tuple[list, list]:
+        from fill_simulator import fetch_kucoin_orderbook
+        return await fetch_kucoin_orderbook(session, self.to_exchange_symbol(symbol))
+
+    async def fetch_funding_calendar(self, session) -> list:
+        from funding_fetcher import fetch_kucoin_funding_calendar
+        return await fetch_kucoin_funding_calendar(session)
+
+    async def place_market_order(self, symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+        from order_manager import place_kucoin_market_order
+        return await place_kucoin_market_order(self.to_exchange_symbol(symbol), side, qty, reduce_only, client_id)
+
+    async def cancel_order(self, symbol: str, client_id: str) -> None:
+        from order_manager import cancel_kucoin_order
+        await cancel_kucoin_order(self.to_exchange_symbol(symbol), client_id)
+
+    async def get_position_size(self, symbol: str) -> float:
+        from order_manager import get_kucoin_position_size
+        return await get_kucoin_position_size(self.to_exchange_symbol(symbol))
+
+    async def fetch_order_fill(self, symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+        from order_manager import fetch_kucoin_order_fill
+        return await fetch_kucoin_order_fill(self.to_exchange_symbol(symbol), order_id, client_id)
+
+    async def fetch_pnl(self, symbol: str, side: str) -> Decimal:
+        from pnl_fetcher import fetch_pnl_kucoin
+        return await fetch_pnl_kucoin(self.to_exchange_symbol(symbol), side)
+
+    async def fetch_final_pnl(self, symbol: str, side: str) -> Decimal:
+        from final_pnl_fetcher import fetch_final_pnl_kucoin
+        return await fetch_final_pnl_kucoin(self.to_exchange_symbol(symbol), side)
+
+    async def fetch_balance(self) -> Decimal:
+        from balance_watchdog import fetch_kucoin_balance
+        return await fetch_kucoin_balance()
+
+    async def stream_balance(self, on_balance) -> bool:
+        from balance_watchdog import stream_kucoin_wallet
+        await stream_kucoin_wallet(on_balance)
+        return True
+
+# Registry of enabled venues, in registration order
+_adapters: Dict[str, ExchangeAdapter] = {}
+
+def register_adapter(adapter: ExchangeAdapter) -> None:
+    _adapters[adapter.name] = adapter
+
+def unregister_adapter(name: str) -> None:
+    _adapters.pop(name, None)
+
+def get_adapter(exchange: str) -> ExchangeAdapter:
+    adapter = _adapters.get(exchange)
+    if adapter is None:
+        raise ValueError(f"Exchange {exchange} not supported")
+    return adapter
+
+def get_adapters() -> List[ExchangeAdapter]:
+    return list(_adapters.values())
+
+def get_exchange_names() -> List[str]:
+    return list(_adapters.keys())
+
+# Built-in venues; ENABLED_EXCHANGES narrows the set (comma-separated names)
+_BUILTIN_ADAPTERS = (BybitAdapter, KuCoinAdapter)
+ENABLED_EXCHANGES = [
+    name.strip() for name in get_config_value("ENABLED_EXCHANGES", "Bybit,KuCoin").split(",") if name.strip()
+]
+
+for _cls in _BUILTIN_ADAPTERS:
+    if _cls.name in ENABLED_EXCHANGES:
+        register_adapter(_cls())
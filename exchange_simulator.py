@@ -0,0 +1,516 @@
+# exchange_simulator.py
+# Local stand-in for the Bybit and KuCoin futures endpoints this bot uses, for offline
+# load/soak tests of the full pipeline. One aiohttp server serves both venues
+# (their REST paths don't overlap) plus the public ticker and private wallet WS streams.
+#
+#   python exchange_simulator.py
+#
+# Then point the bot at it (KuCoin WS endpoints come from the simulated bullet responses):
+#   BYBIT_REST_URL=http://127.0.0.1:8800
+#   BYBIT_WS_PUBLIC_URL=ws://127.0.0.1:8800/v5/public/linear
+#   BYBIT_WS_PRIVATE_URL=ws://127.0.0.1:8800/v5/private
+#   KUCOIN_REST_URL=http://127.0.0.1:8800
+#
+# Every contract has multiplier 1 and book sizes are in base units, so both venues'
+# quantities mean the same thing. Signatures are not verified.
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from aiohttp import web, WSMsgType
+from logger import logger
+from config_manager import get_config_value
+
+SIM_HOST = get_config_value("SIM_HOST", "127.0.0.1")
+SIM_PORT = int(get_config_value("SIM_PORT", "8800"))
+SIM_SEED = int(get_config_value("SIM_SEED", "42"))
+SIM_SYMBOLS = int(get_config_value("SIM_SYMBOLS", "0"))  # 0 = every pair in the matched pairs CSV
+SIM_TICKS_PER_SEC = float(get_config_value("SIM_TICKS_PER_SEC", "2000"))  # per venue, over all symbols
+SIM_TICK_INTERVAL_SEC = float(get_config_value("SIM_TICK_INTERVAL_SEC", "0.01"))
+SIM_VOLATILITY_BPS = float(get_config_value("SIM_VOLATILITY_BPS", "2"))  # mid random walk step
+SIM_BASIS_BPS = float(get_config_value("SIM_BASIS_BPS", "15"))  # typical cross-venue mispricing
+SIM_HALF_SPREAD_BPS = float(get_config_value("SIM_HALF_SPREAD_BPS", "2"))
+SIM_DEPTH_LEVELS = int(get_config_value("SIM_DEPTH_LEVELS", "10"))
+SIM_LEVEL_USD = float(get_config_value("SIM_LEVEL_USD", "2000"))  # notional per book level
+SIM_LEVEL_STEP_BPS = float(get_config_value("SIM_LEVEL_STEP_BPS", "3"))
+SIM_LATENCY_MS_BYBIT = float(get_config_value("SIM_LATENCY_MS_BYBIT", "20"))  # order ack latency
+SIM_LATENCY_MS_KUCOIN = float(get_config_value("SIM_LATENCY_MS_KUCOIN", "40"))
+SIM_LATENCY_JITTER_MS = float(get_config_value("SIM_LATENCY_JITTER_MS", "10"))
+SIM_REJECT_PROB = float(get_config_value("SIM_REJECT_PROB", "0"))  # order rejected outright
+SIM_PARTIAL_FILL_PROB = float(get_config_value("SIM_PARTIAL_FILL_PROB", "0"))  # order fills 50-99%, on the lot step
+SIM_BALANCE_USD = float(get_config_value("SIM_BALANCE_USD", "1000"))
+SIM_LEVERAGE = float(get_config_value("LEVERAGE", "3"))
+SIM_TAKER_FEE = float(get_config_value("SIM_TAKER_FEE", "0.0006"))
+SIM_FUNDING_INTERVAL_SEC = float(get_config_value("SIM_FUNDING_INTERVAL_SEC", "28800"))
+SIM_STATS_INTERVAL_SEC = float(get_config_value("SIM_STATS_INTERVAL_SEC", "10"))
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def _fmt(value: float) -> str:
+    return f"{value:.8g}"
+
+class SimVenue:
+    def __init__(self, name: str, latency_ms: float, qty_step: float, min_qty: float):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.qty_step = qty_step  # Bybit qtyStep / KuCoin lotSize
+        self.min_qty = min_qty  # Bybit minOrderQty / KuCoin baseMinSize
+        self._qty_decimals = max(0, -math.floor(math.log10(qty_step)))
+        self.wallet = SIM_BALANCE_USD
+        self.positions: dict[str, list[float]] = {}  # symbol -> [signed qty, avg entry, realised pnl]
+        self.orders: dict[str, dict] = {}
+        self.client_orders: dict[str, str] = {}  # client order id -> order id
+        self.closed: list[dict] = []
+        self.funding_rates: dict[str, float] = {}
+        self.quotes: dict[str, tuple[float, float]] = {}  # venue symbol -> (bid, ask)
+        self.ticker_subs: dict[str, set] = {}  # venue symbol -> subscribed ws
+        self.wallet_subs: set = set()
+
+    def unrealised(self, symbol: str) -> float:
+        qty, entry, _ = self.positions.get(symbol, (0.0, 0.0, 0.0))
+        bid, ask = self.quotes.get(symbol, (entry, entry))
+        return qty * ((bid + ask) / 2 - entry)
+
+    # Quantities live on the step grid, like the venue's, so a full close leaves exactly 0
+    def round_qty(self, qty: float) -> float:
+        return round(math.floor(qty / self.qty_step + 1e-9) * self.qty_step, self._qty_decimals)
+
+    def available(self) -> float:
+        margin = sum(abs(qty) * entry / SIM_LEVERAGE for qty, entry, _ in self.positions.values())
+        return self.wallet + sum(self.unrealised(s) for s in self.positions) - margin
+
+    # Market fill: walks the synthetic book, so size moves the average price
+    def fill(self, symbol: str, side: str, qty: float, reduce_only: bool) -> tuple[float, float]:
+        bid, ask = self.quotes[symbol]
+        pos = self.positions.get(symbol, [0.0, 0.0, 0.0])
+        sign = 1.0 if side == "Buy" else -1.0
+        if reduce_only:
+            qty = min(qty, abs(pos[0])) if pos[0] * sign < 0 else 0.0
+        qty = self.round_qty(qty)
+        if qty <= 0:
+            return 0.0, 0.0
+        if random.random() < SIM_PARTIAL_FILL_PROB:
+            qty = max(self.qty_step, self.round_qty(qty * random.uniform(0.5, 0.99)))
+        best = ask if sign > 0 else bid
+        levels_eaten = qty * best / SIM_LEVEL_USD
+        price = best * (1 + sign * SIM_LEVEL_STEP_BPS / 1e4 * levels_eaten / 2)
+        self.wallet -= qty * price * SIM_TAKER_FEE
+
+        held, entry, _ = pos
+        if held == 0 or held * sign > 0:
+            new_qty = round(held + sign * qty, self._qty_decimals)
+            pos[1] = (abs(held) * entry + qty * price) / abs(new_qty)
+            pos[0] = new_qty
+        else:
+            closing = min(qty, abs(held))
+            pnl = closing * (price - entry) * (1 if held > 0 else -1)
+            self.wallet += pnl
+            pos[0] = round(held + sign * closing, self._qty_decimals)
+            pos[2] += pnl
+            if pos[0] == 0:
+                self.closed.append({"symbol": symbol, "side": side, "closedPnl": _fmt(pos[2]), "pnl": _fmt(pos[2]),
+                                    "updatedTime": str(_now_ms()), "closeTime": _now_ms()})
+                del self.closed[:-200]
+                if qty > closing:  # flipped through zero
+                    pos[0], pos[1], pos[2] = round(sign * (qty - closing), self._qty_decimals), price, 0.0
+        if pos[0] == 0:
+            self.positions.pop(symbol, None)
+        else:
+            self.positions[symbol] = pos
+        return qty, price
+
+    def apply_funding(self) -> None:
+        for symbol, (qty, _, _) in self.positions.items():
+            bid, ask = self.quotes[symbol]
+            self.wallet -= qty * (bid + ask) / 2 * self.funding_rates.get(symbol, 0.0)
+
+class ExchangeSimulator:
+    def __init__(self, pairs: list[tuple[str, str]]):
+        rng = random.Random(SIM_SEED)
+        self.pairs = pairs  # (bybit symbol, kucoin symbol)
+        self.bybit = SimVenue("Bybit", SIM_LATENCY_MS_BYBIT, qty_step=0.001, min_qty=0.001)
+        self.kucoin = SimVenue("KuCoin", SIM_LATENCY_MS_KUCOIN, qty_step=1, min_qty=1)
+        self.mid = [10 ** rng.uniform(-3, 4) for _ in pairs]
+        self.basis = [0.0 for _ in pairs]  # kucoin mid / bybit mid - 1, mean-reverting
+        for i, (bybit_symbol, kucoin_symbol) in enumerate(pairs):
+            self._quote(i)
+            self.bybit.funding_rates[bybit_symbol] = rng.uniform(-5e-4, 5e-4)
+            self.kucoin.funding_rates[kucoin_symbol] = rng.uniform(-5e-4, 5e-4)
+        self.ticks_sent = 0
+        self.orders_filled = 0
+        self.ws_clients = 0
+        self.next_funding_ms = _now_ms() + int(SIM_FUNDING_INTERVAL_SEC * 1000)
+
+    def _quote(self, i: int) -> None:
+        bybit_symbol, kucoin_symbol = self.pairs[i]
+        half = SIM_HALF_SPREAD_BPS / 1e4
+        mid = self.mid[i]
+        self.bybit.quotes[bybit_symbol] = (mid * (1 - half), mid * (1 + half))
+        kmid = mid * (1 + self.basis[i])
+        self.kucoin.quotes[kucoin_symbol] = (kmid * (1 - half), kmid * (1 + half))
+
+    def book(self, venue: SimVenue, symbol: str) -> tuple[list, list]:
+        bid, ask = venue.quotes[symbol]
+        step = SIM_LEVEL_STEP_BPS / 1e4
+        bids = [[_fmt(bid * (1 - step * i)), _fmt(SIM_LEVEL_USD / bid)] for i in range(SIM_DEPTH_LEVELS)]
+        asks = [[_fmt(ask * (1 + step * i)), _fmt(SIM_LEVEL_USD / ask)] for i in range(SIM_DEPTH_LEVELS)]
+        return bids, asks
+
+    # --- Market data ---
+    async def tick_loop(self) -> None:
+        vol = SIM_VOLATILITY_BPS / 1e4
+        basis_vol = SIM_BASIS_BPS / 1e4 / 4
+        carry = 0.0
+        while True:
+            started = time.monotonic()
+            carry += SIM_TICKS_PER_SEC * SIM_TICK_INTERVAL_SEC
+            n, carry = int(carry), carry - int(carry)
+            for _ in range(n):
+                i = random.randrange(len(self.pairs))
+                self.mid[i] *= math.exp(random.gauss(0, vol))
+                self.basis[i] += random.gauss(0, basis_vol) - 0.05 * self.basis[i]
+                self._quote(i)
+                await self._publish(i)
+            await asyncio.sleep(max(0.0, SIM_TICK_INTERVAL_SEC - (time.monotonic() - started)))
+
+    async def _publish(self, i: int) -> None:
+        bybit_symbol, kucoin_symbol = self.pairs[i]
+        subs = self.bybit.ticker_subs.get(bybit_symbol)
+        if subs:
+            bid, ask = self.bybit.quotes[bybit_symbol]
+            msg = json.dumps({"topic": f"tickers.{bybit_symbol}", "type": "snapshot", "ts": _now_ms(),
+                              "data": {"symbol": bybit_symbol, "bid1Price": _fmt(bid), "ask1Price": _fmt(ask)}})
+            await self._send_all(subs, msg)
+        subs = self.kucoin.ticker_subs.get(kucoin_symbol)
+        if subs:
+            bid, ask = self.kucoin.quotes[kucoin_symbol]
+            msg = json.dumps({"type": "message", "topic": f"/contractMarket/tickerV2:{kucoin_symbol}", "subject": "tickerV2",
+                              "data": {"symbol": kucoin_symbol, "bestBidPrice": _fmt(bid), "bestAskPrice": _fmt(ask), "ts": time.time_ns()}})
+            await self._send_all(subs, msg)
+
+    async def _send_all(self, subs: set, msg: str) -> None:
+        for ws in list(subs):
+            try:
+                await ws.send_str(msg)
+                self.ticks_sent += 1
+            except ConnectionError:
+                subs.discard(ws)
+
+    async def _push_wallet(self, venue: SimVenue) -> None:
+        if venue is self.bybit:
+            msg = json.dumps({"topic": "wallet", "data": [{"coin": [{"coin": "USDT", "walletBalance": _fmt(venue.wallet)}]}]})
+        else:
+            msg = json.dumps({"type": "message", "topic": "/contractAccount/wallet", "subject": "walletBalance.change",
+                              "data": {"currency": "USDT", "availableBalance": _fmt(venue.available())}})
+        await self._send_all(venue.wallet_subs, msg)
+
+    async def funding_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(0.0, self.next_funding_ms / 1000 - time.time()))
+            self.next_funding_ms += int(SIM_FUNDING_INTERVAL_SEC * 1000)
+            for venue in (self.bybit, self.kucoin):
+                venue.apply_funding()
+                await self._push_wallet(venue)
+
+    async def stats_loop(self) -> None:
+        last_ticks = 0
+        while True:
+            await asyncio.sleep(SIM_STATS_INTERVAL_SEC)
+            rate = (self.ticks_sent - last_ticks) / SIM_STATS_INTERVAL_SEC
+            last_ticks = self.ticks_sent
+            logger.info(
+                f"[SIM] {rate:.0f} ticks/s sent | {self.ws_clients} WS clients | {self.orders_filled} fills | "
+                f"Bybit wallet={self.bybit.wallet:.2f} ({len(self.bybit.positions)} pos) | "
+                f"KuCoin wallet={self.kucoin.wallet:.2f} ({len(self.kucoin.positions)} pos)"
+            )
+
+    # --- Orders ---
+    async def place_order(self, venue: SimVenue, symbol: str, side: str, qty: float, reduce_only: bool, client_id: str = "") -> dict | None:
+        await asyncio.sleep(max(0.0, venue.latency_ms + random.uniform(-1, 1) * SIM_LATENCY_JITTER_MS) / 1000)
+        if symbol not in venue.quotes or random.random() < SIM_REJECT_PROB:
+            return None
+        filled, price = venue.fill(symbol, side, qty, reduce_only)
+        order = {"orderId": uuid.uuid4().hex, "clientId": client_id, "symbol": symbol, "side": side,
+                 "qty": venue.round_qty(qty), "filled": filled, "price": price}
+        venue.orders[order["orderId"]] = order
+        if client_id:
+            venue.client_orders[client_id] = order["orderId"]
+        if len(venue.orders) > 10000:
+            old = venue.orders.pop(next(iter(venue.orders)))
+            venue.client_orders.pop(old["clientId"], None)
+        self.orders_filled += 1
+        await self._push_wallet(venue)
+        return order
+
+    # --- Bybit REST ---
+    @staticmethod
+    def _bybit(result: dict, ret_code: int = 0, ret_msg: str = "OK") -> web.Response:
+        return web.json_response({"retCode": ret_code, "retMsg": ret_msg, "result": result, "time": _now_ms()})
+
+    async def bybit_instruments(self, request: web.Request) -> web.Response:
+        etag = f'"sim-{SIM_SEED}-{len(self.pairs)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        items = [{"symbol": s, "lotSizeFilter": {"minOrderQty": _fmt(self.bybit.min_qty), "qtyStep": _fmt(self.bybit.qty_step)},
+                  "priceFilter": {"tickSize": "0.00000001"}, "fundingInterval": int(SIM_FUNDING_INTERVAL_SEC // 60)}
+                 for s, _ in self.pairs]
+        resp = self._bybit({"category": "linear", "list": items, "nextPageCursor": ""})
+        resp.headers["ETag"] = etag
+        return resp
+
+    async def bybit_orderbook(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        if symbol not in self.bybit.quotes:
+            return self._bybit({}, 10001, "symbol invalid")
+        bids, asks = self.book(self.bybit, symbol)
+        return self._bybit({"s": symbol, "b": bids, "a": asks, "ts": _now_ms()})
+
+    async def bybit_tickers(self, request: web.Request) -> web.Response:
+        items = []
+        for symbol, (bid, ask) in self.bybit.quotes.items():
+            items.append({"symbol": symbol, "bid1Price": _fmt(bid), "ask1Price": _fmt(ask),
+                          "fundingRate": _fmt(self.bybit.funding_rates.get(symbol, 0.0)),
+                          "nextFundingTime": str(self.next_funding_ms)})
+        return self._bybit({"category": "linear", "list": items})
+
+    async def bybit_order_create(self, request: web.Request) -> web.Response:
+        body = json.loads(await request.text())
+        if float(body["qty"]) < self.bybit.min_qty:
+            return self._bybit({}, 10001, "The number of contracts exceeds minimum limit allowed")
+        order = await self.place_order(self.bybit, body["symbol"], body["side"], float(body["qty"]), bool(body.get("reduceOnly")),
+                                       body.get("orderLinkId", ""))
+        if order is None:
+            return self._bybit({}, 110007, "order rejected by simulator")
+        return self._bybit({"orderId": order["orderId"], "orderLinkId": order["clientId"]})
+
+    # Market orders finish on arrival, so there is never anything left to cancel
+    async def bybit_order_cancel(self, request: web.Request) -> web.Response:
+        return self._bybit({}, 110001, "order not exists or too late to cancel")
+
+    async def bybit_order_realtime(self, request: web.Request) -> web.Response:
+        order_id = request.query.get("orderId") or self.bybit.client_orders.get(request.query.get("orderLinkId", ""), "")
+        order = self.bybit.orders.get(order_id)
+        if order is None:
+            return self._bybit({"list": []})
+        return self._bybit({"list": [{
+            "orderId": order["orderId"], "orderLinkId": order["clientId"], "symbol": order["symbol"], "side": order["side"],
+            "qty": _fmt(order["qty"]), "cumExecQty": _fmt(order["filled"]),
+            "avgPrice": _fmt(order["price"]) if order["filled"] else "",
+            "orderStatus": "Filled" if order["filled"] >= order["qty"] else "PartiallyFilledCanceled",
+        }]})
+
+    async def bybit_positions(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        items = []
+        if symbol in self.bybit.positions:
+            qty, entry, _ = self.bybit.positions[symbol]
+            items.append({"symbol": symbol, "side": "Buy" if qty > 0 else "Sell", "size": _fmt(abs(qty)),
+                          "avgPrice": _fmt(entry), "unrealisedPnl": _fmt(self.bybit.unrealised(symbol))})
+        return self._bybit({"category": "linear", "list": items})
+
+    async def bybit_closed_pnl(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        limit = int(request.query.get("limit", "50"))
+        rows = [row for row in reversed(self.bybit.closed) if row["symbol"] == symbol][:limit]
+        return self._bybit({"category": "linear", "list": rows})
+
+    async def bybit_wallet(self, request: web.Request) -> web.Response:
+        return self._bybit({"list": [{"accountType": "UNIFIED", "coin": [{"coin": "USDT", "walletBalance": _fmt(self.bybit.wallet)}]}]})
+
+    # --- KuCoin REST ---
+    @staticmethod
+    def _kucoin(data, code: str = "200000", msg: str = None) -> web.Response:
+        payload = {"code": code, "data": data}
+        if msg:
+            payload["msg"] = msg
+        return web.json_response(payload)
+
+    async def kucoin_contracts(self, request: web.Request) -> web.Response:
+        etag = f'"sim-{SIM_SEED}-{len(self.pairs)}-{self.next_funding_ms}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        items = [{"symbol": s, "baseMinSize": _fmt(self.kucoin.min_qty), "lotSize": _fmt(self.kucoin.qty_step),
+                  "tickSize": "0.00000001", "multiplier": "1",
+                  "fundingFeeRate": self.kucoin.funding_rates[s], "predictedFundingFeeRate": self.kucoin.funding_rates[s],
+                  "fundingRateGranularity": int(SIM_FUNDING_INTERVAL_SEC * 1000), "nextFundingRateDateTime": self.next_funding_ms}
+                 for _, s in self.pairs]
+        resp = self._kucoin(items)
+        resp.headers["ETag"] = etag
+        return resp
+
+    async def kucoin_orderbook(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        if symbol not in self.kucoin.quotes:
+            return self._kucoin(None, "400100", "symbol invalid")
+        bids, asks = self.book(self.kucoin, symbol)
+        return self._kucoin({"symbol": symbol, "bids": bids, "asks": asks, "ts": time.time_ns()})
+
+    async def kucoin_funding(self, request: web.Request) -> web.Response:
+        symbol = request.match_info["symbol"]
+        if symbol not in self.kucoin.funding_rates:
+            return self._kucoin(None, "400100", "symbol invalid")
+        return self._kucoin({"symbol": f".{symbol}FPI8H", "granularity": 28800000,
+                             "value": _fmt(self.kucoin.funding_rates[symbol]), "timePoint": _now_ms()})
+
+    async def kucoin_order_create(self, request: web.Request) -> web.Response:
+        body = json.loads(await request.text())
+        side = "Buy" if body["side"] == "buy" else "Sell"
+        if float(body["size"]) < self.kucoin.min_qty:
+            return self._kucoin(None, "100001", "Order size below the minimum requirement.")
+        order = await self.place_order(self.kucoin, body["symbol"], side, float(body["size"]), bool(body.get("closeOrder")),
+                                       body.get("clientOid", ""))
+        if order is None:
+            return self._kucoin(None, "300000", "order rejected by simulator")
+        return self._kucoin({"orderId": order["orderId"]})
+
+    async def kucoin_order_cancel(self, request: web.Request) -> web.Response:
+        return self._kucoin(None, "100004", "order cannot be canceled")
+
+    async def kucoin_order(self, request: web.Request) -> web.Response:
+        order_id = request.match_info.get("order_id") or self.kucoin.client_orders.get(request.query.get("clientOid", ""), "")
+        order = self.kucoin.orders.get(order_id)
+        if order is None:
+            return self._kucoin(None, "100001", "order not found")
+        return self._kucoin({"id": order["orderId"], "clientOid": order["clientId"], "symbol": order["symbol"], "side": order["side"].lower(),
+                             "size": order["qty"], "filledSize": order["filled"],
+                             "filledValue": _fmt(order["filled"] * order["price"]), "isActive": False})
+
+    async def kucoin_position(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        qty, entry, _ = self.kucoin.positions.get(symbol, (0.0, 0.0, 0.0))
+        return self._kucoin({"symbol": symbol, "currentQty": qty, "avgEntryPrice": _fmt(entry),
+                             "unrealisedPnl": _fmt(self.kucoin.unrealised(symbol)), "isOpen": qty != 0})
+
+    async def kucoin_history_positions(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        limit = int(request.query.get("limit", "10"))
+        rows = [row for row in reversed(self.kucoin.closed) if row["symbol"] == symbol][:limit]
+        return self._kucoin({"currentPage": 1, "pageSize": limit, "totalNum": len(rows), "items": rows})
+
+    async def kucoin_account(self, request: web.Request) -> web.Response:
+        return self._kucoin({"currency": "USDT", "accountEquity": self.kucoin.wallet,
+                             "availableBalance": _fmt(self.kucoin.available())})
+
+    async def kucoin_bullet(self, request: web.Request) -> web.Response:
+        return self._kucoin({"token": uuid.uuid4().hex, "instanceServers": [{
+            "endpoint": f"ws://{request.host}/kucoin/ws", "protocol": "websocket",
+            "encrypt": False, "pingInterval": 18000, "pingTimeout": 10000}]})
+
+    # --- WebSockets ---
+    async def _ws_session(self, request: web.Request, on_message, welcome: dict = None) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=None)
+        await ws.prepare(request)
+        if welcome:
+            await ws.send_str(json.dumps(welcome))
+        self.ws_clients += 1
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    await on_message(ws, json.loads(msg.data))
+        finally:
+            self.ws_clients -= 1
+            for venue in (self.bybit, self.kucoin):
+                venue.wallet_subs.discard(ws)
+                for subs in venue.ticker_subs.values():
+                    subs.discard(ws)
+        return ws
+
+    async def bybit_public_ws(self, request: web.Request) -> web.WebSocketResponse:
+        async def on_message(ws, data):
+            op = data.get("op")
+            if op == "ping":
+                await ws.send_str(json.dumps({"op": "pong", "success": True}))
+                return
+            for topic in data.get("args", []):
+                symbol = topic.split(".", 1)[-1]
+                subs = self.bybit.ticker_subs.setdefault(symbol, set())
+                subs.add(ws) if op == "subscribe" else subs.discard(ws)
+            await ws.send_str(json.dumps({"op": op, "success": True, "ret_msg": ""}))
+        return await self._ws_session(request, on_message)
+
+    async def bybit_private_ws(self, request: web.Request) -> web.WebSocketResponse:
+        async def on_message(ws, data):
+            op = data.get("op")
+            if op == "subscribe" and "wallet" in data.get("args", []):
+                self.bybit.wallet_subs.add(ws)
+            await ws.send_str(json.dumps({"op": op, "success": True, "ret_msg": ""}))
+        return await self._ws_session(request, on_message)
+
+    async def kucoin_ws(self, request: web.Request) -> web.WebSocketResponse:
+        async def on_message(ws, data):
+            msg_type = data.get("type")
+            if msg_type == "ping":
+                await ws.send_str(json.dumps({"id": data.get("id"), "type": "pong"}))
+                return
+            topic = data.get("topic", "")
+            if topic == "/contractAccount/wallet":
+                self.kucoin.wallet_subs.add(ws) if msg_type == "subscribe" else self.kucoin.wallet_subs.discard(ws)
+            elif topic.startswith("/contractMarket/tickerV2:"):
+                for symbol in topic.split(":", 1)[1].split(","):
+                    subs = self.kucoin.ticker_subs.setdefault(symbol, set())
+                    subs.add(ws) if msg_type == "subscribe" else subs.discard(ws)
+            if data.get("response"):
+                await ws.send_str(json.dumps({"id": data.get("id"), "type": "ack"}))
+
+        # KuCoin clients expect a welcome frame before anything else
+        return await self._ws_session(request, on_message, {"id": uuid.uuid4().hex, "type": "welcome"})
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/v5/market/instruments-info", self.bybit_instruments),
+            web.get("/v5/market/orderbook", self.bybit_orderbook),
+            web.get("/v5/market/tickers", self.bybit_tickers),
+            web.post("/v5/order/create", self.bybit_order_create),
+            web.post("/v5/order/cancel", self.bybit_order_cancel),
+            web.get("/v5/order/realtime", self.bybit_order_realtime),
+            web.get("/v5/position/list", self.bybit_positions),
+            web.get("/v5/position/closed-pnl", self.bybit_closed_pnl),
+            web.get("/v5/account/wallet-balance", self.bybit_wallet),
+            web.get("/v5/public/linear", self.bybit_public_ws),
+            web.get("/v5/private", self.bybit_private_ws),
+            web.get("/api/v1/contracts/active", self.kucoin_contracts),
+            web.get("/api/v1/level2/snapshot", self.kucoin_orderbook),
+            web.get("/api/v1/funding-rate/{symbol}/current", self.kucoin_funding),
+            web.post("/api/v1/orders", self.kucoin_order_create),
+            web.get("/api/v1/orders/byClientOid", self.kucoin_order),
+            web.delete("/api/v1/orders/client-order/{client_oid}", self.kucoin_order_cancel),
+            web.get("/api/v1/orders/{order_id}", self.kucoin_order),
+            web.get("/api/v1/position", self.kucoin_position),
+            web.get("/api/v1/history-positions", self.kucoin_history_positions),
+            web.get("/api/v1/account-overview", self.kucoin_account),
+            web.post("/api/v1/bullet-public", self.kucoin_bullet),
+            web.post("/api/v1/bullet-private", self.kucoin_bullet),
+            web.get("/kucoin/ws", self.kucoin_ws),
+        ])
+        return app
+
+def load_sim_pairs() -> list[tuple[str, str]]:
+    try:
+        from price_feed import load_pairs
+        pairs = [(row["bybit_symbol"].strip(), row["kucoin_symbol"].strip())
+                 for row in load_pairs() if row.get("bybit_symbol") and row.get("kucoin_symbol")]
+    except FileNotFoundError:
+        pairs = []
+    if not pairs:
+        # No matched pairs CSV: synthetic symbols (the bot needs the same CSV to subscribe to them)
+        pairs = [(f"SIM{i}USDT", f"SIM{i}USDTM") for i in range(SIM_SYMBOLS or 200)]
+    return pairs[:SIM_SYMBOLS] if SIM_SYMBOLS else pairs
+
+async def run_simulator(host: str = SIM_HOST, port: int = SIM_PORT) -> None:
+    random.seed(SIM_SEED)
+    sim = ExchangeSimulator(load_sim_pairs())
+    runner = web.AppRunner(sim.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"[SIM] Exchange simulator on http://{host}:{port} | {len(sim.pairs)} pairs | {SIM_TICKS_PER_SEC:.0f} ticks/s per venue")
+    try:
+        await asyncio.gather(sim.tick_loop(), sim.funding_loop(), sim.stats_loop())
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(run_simulator())
@@ -1,24 +1,31 @@
 import asyncio
 import csv
+import time
 from datetime import datetime, UTC
 from decimal import Decimal
 from logger import logger
+import config_manager
 from config_manager import get_config_value
 from order_manager import place_market_order
 from pnl_fetcher import fetch_pnl
 from final_pnl_fetcher import fetch_final_pnl
 from advanced_trade_logger import update_position_result
 import position_manager
+from records import FailoverLeg
+from dashboard import publish, retract
 
 BOLD = "\033[1m"
 WHITE = "\033[97m"
 RESET = "\033[0m"
 
-FAILOVER_TRAILING_STOP_PCT = Decimal(get_config_value("FAILOVER_TRAILING_STOP_PCT", "1.0"))
-FAILOVER_INITIAL_TAKE_PROFIT_PCT = Decimal(get_config_value("FAILOVER_INITIAL_TAKE_PROFIT_PCT", "3.0"))
-FAILOVER_CHECK_INTERVAL_SEC = int(get_config_value("FAILOVER_CHECK_INTERVAL_SEC", "30"))
+FAILOVER_CHECK_INTERVAL_SEC = int(get_config_value("FAILOVER_CHECK_INTERVAL_SEC", "30"))  # REST reconciliation period
+FAILOVER_QUOTE_STALE_SEC = float(get_config_value("FAILOVER_QUOTE_STALE_SEC", "10"))
+FAILOVER_PNL_DRIFT_PCT = Decimal(get_config_value("FAILOVER_PNL_DRIFT_PCT", "0.5"))  # of notional
 
-failover_positions = {}
+failover_positions: dict[str, FailoverLeg] = {}
+# (symbol, surviving exchange) -> {position_id: leg}, so a tick only touches its own legs
+_legs_by_quote: dict[tuple[str, str], dict[str, FailoverLeg]] = {}
+_exit_tasks: set[asyncio.Task] = set()
 
 async def start_failover(position_id: str, exchange: str, direction: str, symbol: str,
                          entry_price: Decimal, qty: Decimal,
@@ -26,35 +33,90 @@ async def start_failover(position_id: str, exchange: str, direction: str, symbol
                          position_notional: Decimal):
     
     from symbol_specs import get_specs
-    specs = get_specs(exchange, symbol)
+    from exchange_adapters import get_adapter
+    specs = get_specs(exchange, get_adapter(exchange).to_exchange_symbol(symbol))
     contract_value = specs.get("contract_value", Decimal("1"))
+    if "contract_value" not in specs:
+        logger.warning(f"[FAILOVER] No contract value for {exchange} {symbol}, assuming 1 for local PnL (REST reconciliation will flag drift)")
 
     logger.debug(f"[FAILOVER DEBUG] Qty = {qty} | Entry Price = {entry_price} | Contract Value = {contract_value} | Notional = {position_notional}")
 
-    failover_positions[position_id] = {
-        "exchange": exchange,
-        "symbol": symbol,
-        "direction": direction,
-        "entry_price": entry_price,
-        "qty": qty,
-        "start_pnl": start_pnl,
-        "current_pnl": start_pnl,
-        "max_pnl": start_pnl,
-        "trailing_stop_pnl": start_pnl - (position_notional * (FAILOVER_TRAILING_STOP_PCT / 100)),
-        "initial_take_profit_pnl": position_notional * (FAILOVER_INITIAL_TAKE_PROFIT_PCT / 100),
-        "entry_fee": entry_fee,
-        "funding": funding,
-        "position_notional": position_notional,
-        "entry_time": datetime.now(UTC)
-    }
+    settings = config_manager.settings  # a reload only affects legs started after it
+    trail_distance = position_notional * (settings.FAILOVER_TRAILING_STOP_PCT / 100)
+    leg = FailoverLeg(
+        exchange=exchange,
+        symbol=symbol,
+        direction=direction,
+        entry_price=entry_price,
+        qty=qty,
+        start_pnl=start_pnl,
+        trailing_stop_pnl=start_pnl - trail_distance,
+        initial_take_profit_pnl=position_notional * (settings.FAILOVER_INITIAL_TAKE_PROFIT_PCT / 100),
+        entry_fee=entry_fee,
+        funding=funding,
+        position_notional=position_notional,
+        entry_time=datetime.now(UTC),
+        contract_value=contract_value,
+        trail_distance=trail_distance,
+    )
+    failover_positions[position_id] = leg
+    _legs_by_quote.setdefault((symbol, exchange), {})[position_id] = leg
+    publish("failovers", position_id, leg)
 
     logger.info(f"[FAILOVER] ✅ Activated for {position_id} | {symbol} | {exchange} | {direction} | entry_price={entry_price} | qty={qty}")
-    from telegram_bot import send_message
-    asyncio.create_task(send_message(
+    from telegram_bot import notify
+    notify(
         f"✅ <b>Failover activated</b>\n"
         f"{symbol} | {exchange} ({direction})\n"
-        f"Entry price: {entry_price}, Qty: {qty}"
-    ))
+        f"Entry price: {entry_price}, Qty: {qty}",
+        critical=True,
+    )
+
+# Unrealised PnL of the leg if closed at this price (long sells at the bid, short buys at the ask)
+def _local_pnl(pos: FailoverLeg, price: Decimal) -> Decimal:
+    move = price - pos.entry_price if pos.direction == "long" else pos.entry_price - price
+    return move * pos.qty * pos.contract_value
+
+# Trailing stop / take-profit step for one PnL observation: O(1), no I/O. Returns the exit reason, if any.
+def _update_trailing(pos: FailoverLeg, net_pnl: Decimal) -> str | None:
+    pos.current_pnl = net_pnl
+    if net_pnl > pos.max_pnl:
+        pos.max_pnl = net_pnl
+        pos.trailing_stop_pnl = net_pnl - pos.trail_distance
+
+    if net_pnl <= pos.trailing_stop_pnl:
+        return "trailing_stop_exit"
+    if net_pnl >= pos.initial_take_profit_pnl:
+        return "take_profit_exit"
+    return None
+
+def _schedule_exit(position_id: str, pos: FailoverLeg, reason: str) -> None:
+    pos.status = "closing"  # later ticks skip it while the close order is in flight
+    publish("failovers", position_id, pos)
+    logger.info(
+        f"[FAILOVER CHECK✅] {position_id} | PnL = {BOLD}{WHITE}{pos.current_pnl:.4f}{RESET} | "
+        f"Max = {pos.max_pnl:.4f} | Trail stop = {pos.trailing_stop_pnl:.4f} | Take profit = {pos.initial_take_profit_pnl:.4f} -> {reason}"
+    )
+    task = asyncio.create_task(exit_position(position_id, reason))
+    _exit_tasks.add(task)
+    task.add_done_callback(_exit_tasks.discard)
+
+# Called by pair_monitor for every quote; only legs held on the quote's venue are evaluated
+def on_quote(quote) -> None:
+    legs = _legs_by_quote.get((quote.symbol, quote.exchange))
+    if not legs:
+        return
+    for position_id, pos in list(legs.items()):
+        if pos.status != "open":
+            continue
+        price = quote.bid if pos.direction == "long" else quote.ask
+        if price <= 0:
+            continue
+        pos.quote_ts = quote.ts
+        reason = _update_trailing(pos, _local_pnl(pos, Decimal(str(price))))
+        publish("failovers", position_id, pos)
+        if reason:
+            _schedule_exit(position_id, pos, reason)
 
 async def _check_positions_loop():
     while True:
@@ -62,116 +124,85 @@ async def _check_positions_loop():
         logger.info(f"[FAILOVER LOOP] Check loop alive. Position count: {len(failover_positions)}")
         await check_positions()
 
+# Low-frequency REST reconciliation: compares the exchange's unrealised PnL with the local
+# estimate, and drives the trailing stop from REST only while the leg's quotes are stale
 async def check_positions():
+    now = time.time()
     for position_id, pos in list(failover_positions.items()):
-        logger.info(f"[FAILOVER LOOP] Checking position {position_id} (total {len(failover_positions)} being monitored)")
+        if pos.status != "open":
+            continue
         try:
-            pnl = await fetch_pnl(pos["exchange"], pos["symbol"], side=pos["direction"])
-            net_pnl = pnl  # Fees and funding already included by the exchange in unrealisedPnl
-
+            rest_pnl = await fetch_pnl(pos.exchange, pos.symbol, side=pos.direction)
+            if rest_pnl == 0:
+                logger.warning(f"[FAILOVER WARNING] PnL for position {position_id} = 0. Possible issue with fetch_pnl. Skipping reconciliation.")
+                continue
+
+            quote_age = now - pos.quote_ts
+            age_text = f"{quote_age:.1f}s" if pos.quote_ts else "no quote yet"
+            drift = rest_pnl - pos.current_pnl
             logger.info(
-                f"[FAILOVER CHECK✅] {position_id} | PnL = {BOLD}{WHITE}{net_pnl:.4f}{RESET} | "
-                f"Trail stop = {pos['trailing_stop_pnl']:.4f} | Take profit = {pos['initial_take_profit_pnl']:.4f}"
+                f"[FAILOVER CHECK✅] {position_id} | Local PnL = {BOLD}{WHITE}{pos.current_pnl:.4f}{RESET} | REST PnL = {rest_pnl:.4f} | "
+                f"Trail stop = {pos.trailing_stop_pnl:.4f} | Take profit = {pos.initial_take_profit_pnl:.4f} | Quote age = {age_text}"
             )
 
-            if net_pnl == 0:
-                logger.warning(f"[FAILOVER WARNING] PnL for position {position_id} = 0. Possible issue with fetch_pnl or WS. Skipping check.")
-                return  # <-- add return to skip further check
-
-            pos["current_pnl"] = net_pnl
-
-            if net_pnl > pos["max_pnl"]:
-                pos["max_pnl"] = net_pnl
-                pos["trailing_stop_pnl"] = pos["max_pnl"] - (pos["position_notional"] * (FAILOVER_TRAILING_STOP_PCT / 100))
-                
-
-            if net_pnl <= pos["trailing_stop_pnl"]:
-                await exit_position(position_id, "trailing_stop_exit")
-            elif net_pnl >= pos["initial_take_profit_pnl"]:
-                await exit_position(position_id, "take_profit_exit")
+            if quote_age > FAILOVER_QUOTE_STALE_SEC:
+                logger.warning(f"[FAILOVER] {position_id}: {pos.exchange} quote stale ({age_text}), using REST PnL")
+                reason = _update_trailing(pos, rest_pnl)
+                publish("failovers", position_id, pos)
+                if reason:
+                    _schedule_exit(position_id, pos, reason)
+            elif abs(drift) > pos.position_notional * FAILOVER_PNL_DRIFT_PCT / 100:
+                logger.warning(f"[FAILOVER] {position_id}: local PnL differs from REST by {drift:+.4f} (check entry price / qty / contract value)")
 
         except Exception as e:
             logger.error(f"[FAILOVER MANAGER] Error checking position {position_id}: {e}")
 
-async def check_position(position_id: str):
-    pos = failover_positions.get(position_id)
-    if not pos:
-        return
-
-    try:
-        pnl = await fetch_pnl(pos["exchange"], pos["symbol"], side=pos["direction"])
-        net_pnl = pnl  # Fees and funding already included by the exchange in unrealisedPnl
-
-        logger.info(
-            f"[FAILOVER CHECK✅] {position_id} | PnL = {BOLD}{WHITE}{net_pnl:.4f}{RESET} | "
-            f"Trail stop = {pos['trailing_stop_pnl']:.4f} | Take profit = {pos['initial_take_profit_pnl']:.4f}"
-        )
-
-        if net_pnl == 0:
-            logger.warning(f"[FAILOVER WARNING] PnL for position {position_id} = 0. Possible issue with fetch_pnl or WS. Skipping check.")
-            return  # <-- add return to skip further check
-
-        pos["current_pnl"] = net_pnl
-
-        if net_pnl > pos["max_pnl"]:
-            pos["max_pnl"] = net_pnl
-            pos["trailing_stop_pnl"] = pos["max_pnl"] - (pos["position_notional"] * (FAILOVER_TRAILING_STOP_PCT / 100))
-            
-
-        if net_pnl <= pos["trailing_stop_pnl"]:
-            await exit_position(position_id, "trailing_stop_exit")
-        elif net_pnl >= pos["initial_take_profit_pnl"]:
-            await exit_position(position_id, "take_profit_exit")
-
-    except Exception as e:
-        logger.error(f"[FAILOVER MANAGER] Error checking position {position_id}: {e}")
-
-
 async def exit_position(position_id: str, reason: str):
     pos = failover_positions.get(position_id)
-    logger.warning(f"[FAILOVER] ❌ Closing position {position_id} | {pos['symbol']} | Reason: {reason}")
     if not pos:
         logger.warning(f"[FAILOVER] Tried to exit non-existent position {position_id}")
         return
+    logger.warning(f"[FAILOVER] ❌ Closing position {position_id} | {pos.symbol} | Reason: {reason}")
 
-    if pos.get("status") == "closed":
+    if pos.status == "closed":
         logger.warning(f"[FAILOVER] Position {position_id} already closed, skipping duplicate exit.")
         return
 
-    side = "Sell" if pos["direction"] == "long" else "Buy"
-    qty = float(pos["qty"])
-    symbol = pos["symbol"]
+    side = "Sell" if pos.direction == "long" else "Buy"
+    qty = float(pos.qty)
+    symbol = pos.symbol
 
     try:
-        await place_market_order(pos["exchange"], symbol, side, qty, reduce_only=True)
+        await place_market_order(pos.exchange, symbol, side, qty, reduce_only=True)
         await asyncio.sleep(1)  
 
         # --- Fetch final PnL of closed leg ---
-        side = "long" if pos["direction"] == "long" else "short"
-        pnl = await fetch_final_pnl(pos["exchange"], pos["symbol"], side)
+        side = "long" if pos.direction == "long" else "short"
+        pnl = await fetch_final_pnl(pos.exchange, pos.symbol, side)
 
-        if pos["direction"] == "long":
-            pos["final_pnl_long"] = pnl
+        if pos.direction == "long":
+            pos.final_pnl_long = pnl
         else:
-            pos["final_pnl_short"] = pnl
+            pos.final_pnl_short = pnl
 
-        pos["final_pnl_total"] = pos.get("final_pnl_long", Decimal("0")) + pos.get("final_pnl_short", Decimal("0"))
+        pos.final_pnl_total = pos.final_pnl_long + pos.final_pnl_short
 
     except Exception as e:
         logger.error(f"[FAILOVER MANAGER] ❌ Error while closing position {position_id}: {e}")
 
     # Marking position as closed
-    pos["exit_time"] = datetime.now(UTC)
-    pos["status"] = "closed"
-    pos["exit_reason"] = reason
+    pos.exit_time = datetime.now(UTC)
+    pos.status = "closed"
+    pos.exit_reason = reason
 
      # --- Sync with position_manager ---
     try:
         from position_manager import open_positions, clear_pending
         if position_id in position_manager.open_positions:
-            open_positions[position_id]["status"] = "closed"
-            open_positions[position_id]["exit_reason"] = reason
-            symbol = pos["symbol"]
+            open_positions[position_id].status = "closed"
+            retract("positions", position_id)
+            open_positions[position_id].exit_reason = reason
+            symbol = pos.symbol
             clear_pending(symbol)
     except Exception as e:
         logger.error(f"[FAILOVER] Error syncing position status in position_manager: {e}")
@@ -179,10 +210,10 @@ async def exit_position(position_id: str, reason: str):
 
     
 
-    from telegram_bot import send_message
+    from telegram_bot import notify
 
-    final_pnl_failover = pos.get('final_pnl_total', Decimal("0"))
-    final_pnl_pm = pos.get("start_pnl", Decimal("0"))
+    final_pnl_failover = pos.final_pnl_total or Decimal("0")
+    final_pnl_pm = pos.start_pnl
     final_pnl = final_pnl_failover + final_pnl_pm
     if final_pnl is not None and final_pnl != 0:
         pnl_text = (
@@ -193,14 +224,15 @@ async def exit_position(position_id: str, reason: str):
     else:
         pnl_text = (
             f"⚠ Failed to fetch actual PnL (exchange may not have returned data). "
-            f"Showing estimated: ${pos.get('current_pnl', Decimal('0')):.4f}"
+            f"Showing estimated: ${pos.current_pnl:.4f}"
         )
 
-    asyncio.create_task(send_message(
+    notify(
         f"❌ <b>Position closed in failover</b>\n"
-        f"{pos['symbol']} | Reason: {reason}\n"
-        f"{pnl_text}"
-    ))
+        f"{pos.symbol} | Reason: {reason}\n"
+        f"{pnl_text}",
+        critical=True,
+    )
 
 
     # --- Sync with position_manager and CSV --- 
@@ -209,15 +241,21 @@ async def exit_position(position_id: str, reason: str):
 
         # First update the position's PnL
         pm_pos = position_manager.open_positions[position_id]
-        pm_pos["final_pnl_total"] = pos.get("final_pnl_total", Decimal("0")) + pos.get("start_pnl", Decimal("0"))
+        pm_pos.final_pnl_total = final_pnl_failover + pos.start_pnl
 
-        pm_pos["exit_time"] = datetime.now(UTC)
-        pm_pos["exit_reason"] = reason
+        pm_pos.exit_time = datetime.now(UTC)
+        pm_pos.exit_reason = reason
 
         update_position_result(pm_pos)
     # --- End sync ---
 
     # Remove position from memory
     del failover_positions[position_id]
+    retract("failovers", position_id)
+    legs = _legs_by_quote.get((pos.symbol, pos.exchange))
+    if legs is not None:
+        legs.pop(position_id, None)
+        if not legs:
+            del _legs_by_quote[(pos.symbol, pos.exchange)]
 
 
@@ -2,113 +2,162 @@ import aiohttp
 from logger import logger
 from decimal import Decimal, getcontext
 import asyncio
-from config_manager import get_config_value
+from bisect import bisect_left
+import config_manager
+from single_flight import single_flight
+from rate_limiter import acquire_slot, observe_response
+from exchange_adapters import get_adapter, BYBIT_REST_URL, KUCOIN_REST_URL
+from records import ArbCandidate
+from funnel import record_outcome
 
 # Decimal precision settings
 getcontext().prec = 18
 
-# Configuration
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD", "100"))
-LEVERAGE = Decimal(get_config_value("LEVERAGE", "3"))
-MAX_PRICE_IMPACT = Decimal(get_config_value("MAX_PRICE_IMPACT", "0.5"))  # in %
+# Shared by every orderbook fetch: a single-flight call outlives the caller that started it,
+# so it must not run on that caller's session
+_http_session: aiohttp.ClientSession | None = None
+
+def _session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+    return _http_session
+
+async def close_session() -> None:
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+
+# Cumulative fill curve of one book side, built in a single pass.
+# One (cum_usd, cum_qty, price) point per level; cum_* include that level.
+def build_fill_curve(orderbook_side: list[tuple[str, str]]) -> list[tuple[Decimal, Decimal, Decimal]]:
+    curve = []
+    cum_usd = Decimal("0")
+    cum_qty = Decimal("0")
+    for price_str, qty_str in orderbook_side:
+        price = Decimal(str(price_str))
+        qty = Decimal(str(qty_str))
+        if price <= 0 or qty <= 0:
+            continue
+        cum_usd += price * qty
+        cum_qty += qty
+        curve.append((cum_usd, cum_qty, price))
+    return curve
+
+# Average fill price of a market order for `usd` notional; None when the book is too thin
+def curve_vwap(curve: list[tuple[Decimal, Decimal, Decimal]], usd: Decimal) -> Decimal | None:
+    if not curve or usd <= 0 or usd > curve[-1][0]:
+        return None
+    i = bisect_left(curve, usd, key=lambda point: point[0])
+    prev_usd, prev_qty = (curve[i - 1][0], curve[i - 1][1]) if i else (Decimal("0"), Decimal("0"))
+    qty = prev_qty + (usd - prev_usd) / curve[i][2]
+    return usd / qty
+
+# Largest notional whose VWAP stays within `max_impact` % of the best price
+def impact_limit_usd(curve: list[tuple[Decimal, Decimal, Decimal]], max_impact: Decimal) -> Decimal:
+    if not curve:
+        return Decimal("0")
+    best_price = curve[0][2]
+    prev_usd = prev_qty = Decimal("0")
+    for cum_usd, cum_qty, price in curve:
+        vwap = cum_usd / cum_qty
+        if abs(vwap - best_price) / best_price * 100 > max_impact:
+            # Limit falls inside this level: solve usd / (prev_qty + (usd - prev_usd) / price) = target
+            sign = 1 if price > best_price else -1
+            target = best_price * (1 + sign * max_impact / 100)
+            return target * (prev_qty - prev_usd / price) / (1 - target / price)
+        prev_usd, prev_qty = cum_usd, cum_qty
+    return prev_usd
 
 # Market order simulation using orderbook
 def simulate_market_fill(orderbook_side: list[tuple[str, str]], total_usd: Decimal) -> tuple[Decimal, Decimal] | None:
-    filled_qty = Decimal("0")
-    cost = Decimal("0")
-    best_price = Decimal(orderbook_side[0][0]) if orderbook_side else Decimal("0")
-
-    for price_str, qty_str in orderbook_side:
-        price = Decimal(price_str)
-        qty = Decimal(qty_str)
-        level_value = price * qty
-
-        if cost + level_value >= total_usd:
-            needed_qty = (total_usd - cost) / price
-            filled_qty += needed_qty
-            cost += needed_qty * price
-            break
-        else:
-            filled_qty += qty
-            cost += level_value
-
-    if filled_qty == 0:
+    curve = build_fill_curve(orderbook_side)
+    avg_price = curve_vwap(curve, total_usd)
+    if avg_price is None:
         return None
-
-    avg_price = cost / filled_qty
-    impact = abs(avg_price - best_price) / best_price * 100
+    impact = abs(avg_price - curve[0][2]) / curve[0][2] * 100
     return avg_price, impact
 
+async def fetch_bybit_orderbook(session: aiohttp.ClientSession, symbol: str):
+    url = f"{BYBIT_REST_URL}/v5/market/orderbook?category=linear&symbol={symbol}&limit=10"
+    await acquire_slot("Bybit", "market", endpoint="/v5/market/orderbook")
+    async with session.get(url) as resp:
+        observe_response("Bybit", "market", resp, endpoint="/v5/market/orderbook")
+        data = await resp.json()
+
+        if data.get("retCode") != 0:
+            raise ValueError(f"Bybit error for {symbol}: {data}")
+
+        result = data.get("result")
+        if not result or "b" not in result or "a" not in result:
+            raise ValueError(f"Bybit returned invalid orderbook for {symbol}: {data}")
+
+        return result["b"], result["a"]
+
+async def fetch_kucoin_orderbook(session: aiohttp.ClientSession, symbol: str):
+    url = f"{KUCOIN_REST_URL}/api/v1/level2/snapshot?symbol={symbol}"
+    await acquire_slot("KuCoin", "market")
+    async with session.get(url) as resp:
+        observe_response("KuCoin", "market", resp)
+        data = await resp.json()
+        return data["data"]["bids"], data["data"]["asks"]
+
+# Workers evaluating the same symbol share one snapshot
+async def fetch_orderbook(exchange: str, symbol: str):
+    return await single_flight(
+        (exchange, "orderbook", symbol),
+        lambda: get_adapter(exchange).fetch_orderbook(_session(), symbol)
+    )
+
 # Main function
-async def simulate_fill(arb: dict) -> bool:
-    symbol = arb["symbol"]
-    usd_amount = POSITION_SIZE_USD * LEVERAGE
+async def simulate_fill(arb: ArbCandidate) -> bool:
+    symbol = arb.symbol
+    settings = config_manager.settings  # one snapshot for the whole evaluation
+    leverage = settings.LEVERAGE
+    max_impact = settings.MAX_PRICE_IMPACT  # in %
+    usd_amount = settings.POSITION_SIZE_USD * leverage
 
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-            # BYBIT
-            async def get_bybit_orderbook(symbol: str):
-                url = f"https://api.bybit.com/v5/market/orderbook?category=linear&symbol={symbol}&limit=10"
-                async with session.get(url) as resp:
-                    data = await resp.json()
-
-                    if data.get("retCode") != 0:
-                        raise ValueError(f"Bybit error for {symbol}: {data}")
-
-                    result = data.get("result")
-                    if not result or "b" not in result or "a" not in result:
-                        raise ValueError(f"Bybit returned invalid orderbook for {symbol}: {data}")
-
-                    return result["b"], result["a"]
-
-
-            # KUCOIN
-            async def get_kucoin_orderbook(symbol: str):
-                if not symbol.endswith("M"):
-                    symbol += "M"
-                url = f"https://api-futures.kucoin.com/api/v1/level2/snapshot?symbol={symbol}"
-                async with session.get(url) as resp:
-                    data = await resp.json()
-                    return data["data"]["bids"], data["data"]["asks"]
-
-            if arb["long_exchange"] == "Bybit":
-                long_bids, long_asks = await get_bybit_orderbook(symbol)
-            else:
-                long_bids, long_asks = await get_kucoin_orderbook(symbol)
-
-            if arb["short_exchange"] == "Bybit":
-                short_bids, short_asks = await get_bybit_orderbook(symbol)
-            else:
-                short_bids, short_asks = await get_kucoin_orderbook(symbol)
-
-            long_result = simulate_market_fill(long_asks, usd_amount)
-            short_result = simulate_market_fill(short_bids, usd_amount)
-
-            if not long_result or not short_result:
-                logger.warning(f"[FILL SIMULATOR] Insufficient depth for {symbol}")
-                return False
-
-            long_price, long_impact = long_result
-            short_price, short_impact = short_result
-
-            max_impact = max(long_impact, short_impact)
-            if max_impact > MAX_PRICE_IMPACT:
-                logger.info(f"[FILL SIMULATOR] Price impact too high for {symbol}: {max_impact:.6f}%")
-                return False
-
-            arb["long_avg_price"] = long_price
-            arb["short_avg_price"] = short_price
-            arb["price_impact"] = max_impact
-
-            # logger.info(f"[FILL SIMULATOR] OK: {symbol}, long={long_price:.8f}, short={short_price:.8f}, impact={max_impact:.4f}%")
-
-            # print(f"[DEBUG FILL] {symbol=} | long_price={long_price} | short_price={short_price} | impact={max_impact}")
-
-            return True
+        long_bids, long_asks = await fetch_orderbook(arb.long_exchange, symbol)
+        short_bids, short_asks = await fetch_orderbook(arb.short_exchange, symbol)
+
+        long_curve = build_fill_curve(long_asks)
+        short_curve = build_fill_curve(short_bids)
+
+        # Largest notional both books absorb within MAX_PRICE_IMPACT, capped by config
+        max_notional = min(
+            impact_limit_usd(long_curve, max_impact),
+            impact_limit_usd(short_curve, max_impact),
+            usd_amount
+        )
+        if max_notional < settings.MIN_POSITION_SIZE_USD * leverage:
+            logger.info(f"[FILL SIMULATOR] Insufficient depth within {max_impact}% impact for {symbol}: ${max_notional:.2f}")
+            record_outcome(arb, "insufficient_depth")
+            return False
+
+        long_price = curve_vwap(long_curve, max_notional)
+        short_price = curve_vwap(short_curve, max_notional)
+        long_impact = abs(long_price - long_curve[0][2]) / long_curve[0][2] * 100
+        short_impact = abs(short_price - short_curve[0][2]) / short_curve[0][2] * 100
+
+        arb.long_avg_price = long_price
+        arb.short_avg_price = short_price
+        arb.price_impact = max(long_impact, short_impact)
+        # Curves are reused by profit_simulator to pick the most profitable size up to max_size_usd
+        arb.long_curve = long_curve
+        arb.short_curve = short_curve
+        arb.max_size_usd = max_notional / leverage
+
+        # logger.info(f"[FILL SIMULATOR] OK: {symbol}, long={long_price:.8f}, short={short_price:.8f}, impact={max_impact:.4f}%")
+
+        # print(f"[DEBUG FILL] {symbol=} | long_price={long_price} | short_price={short_price} | impact={max_impact}")
+
+        return True
 
     except asyncio.TimeoutError:
         logger.warning(f"[FILL SIMULATOR] Timeout while fetching orderbook for {symbol}. Skipping arb.")
+        record_outcome(arb, "orderbook_timeout")
         return False
     except Exception as e:
         logger.warning(f"[FILL SIMULATOR] Error for {symbol}: {e}")
+        record_outcome(arb, "orderbook_error")
         return False
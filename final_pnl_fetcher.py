@@ -3,6 +3,8 @@ import asyncio
 from decimal import Decimal
 from order_manager import sign_bybit_request, sign_kucoin_request
 from config_manager import get_config_value
+from rate_limiter import acquire_slot, observe_response
+from exchange_adapters import get_adapter, BYBIT_REST_URL, KUCOIN_REST_URL
 from logger import logger
 
 BYBIT_KEY = get_config_value("BYBIT_KEY")
@@ -14,11 +16,13 @@ KUCOIN_PASSPHRASE = get_config_value("KUCOIN_PASSPHRASE")
 async def fetch_final_pnl_bybit(symbol: str, side: str) -> Decimal:
     try:
         await asyncio.sleep(3) # give time for exchange to register closed position
-        url = f"https://api.bybit.com/v5/position/closed-pnl?category=linear&symbol={symbol}&limit=5"
+        url = f"{BYBIT_REST_URL}/v5/position/closed-pnl?category=linear&symbol={symbol}&limit=5"
+        await acquire_slot("Bybit", "position", endpoint="/v5/position/closed-pnl")
         headers = sign_bybit_request(BYBIT_KEY, BYBIT_SECRET, method="GET", path_or_body="category=linear&symbol=" + symbol + "&limit=5")
 
         async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
             async with session.get(url, headers=headers) as resp:
+                observe_response("Bybit", "position", resp, endpoint="/v5/position/closed-pnl")
                 data = await resp.json()
                 # print(f"[BYBIT PNL DEBUG] Symbol={symbol}, Side={side}")
                 # print(f"[BYBIT PNL DEBUG] Full API response:\n{data}")
@@ -48,18 +52,18 @@ async def fetch_final_pnl_bybit(symbol: str, side: str) -> Decimal:
 async def fetch_final_pnl_kucoin(symbol: str, side: str) -> Decimal:
     try:
         await asyncio.sleep(3) # give time for exchange to register closed position
-        if not symbol.endswith("M"):
-            symbol += "M"
 
         url_path = f"/api/v1/history-positions?symbol={symbol}&limit=10"
-        url = f"https://api-futures.kucoin.com{url_path}"
+        url = f"{KUCOIN_REST_URL}{url_path}"
 
+        await acquire_slot("KuCoin", "position")
         headers = sign_kucoin_request(
             KUCOIN_KEY, KUCOIN_SECRET, KUCOIN_PASSPHRASE, "GET", url_path
         )
 
         async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
             async with session.get(url, headers=headers) as resp:
+                observe_response("KuCoin", "position", resp)
                 data = await resp.json()
                 # print(f"[KUCOIN PNL DEBUG] Symbol={symbol}, Side={side} (searching in history-positions)")
                 # print(f"[KUCOIN PNL DEBUG] Full API response:\n{data}")
@@ -95,12 +99,11 @@ async def fetch_final_pnl(exchange: str, symbol: str, side: str) -> Decimal:
     delay = 2  # seconds between attempts
 
     for attempt in range(attempts):
-        if exchange == "Bybit":
-            pnl = await fetch_final_pnl_bybit(symbol, side)
-        elif exchange == "KuCoin":
-            pnl = await fetch_final_pnl_kucoin(symbol, side)
-        else:
-            pnl = Decimal("0")
+        try:
+            pnl = await get_adapter(exchange).fetch_final_pnl(symbol, side)
+        except ValueError as e:
+            logger.warning(f"[FINAL_PNL_FETCHER] {e}")
+            return Decimal("0")
 
         if pnl != 0:
             return pnl
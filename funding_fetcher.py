@@ -1,88 +1,177 @@
 from logger import logger
+import asyncio
 import aiohttp
+import time
 from decimal import Decimal, getcontext
 
+import config_manager
 from config_manager import get_config_value
+from rate_limiter import acquire_slot, observe_response
+from exchange_adapters import get_adapter, get_adapters, BYBIT_REST_URL, KUCOIN_REST_URL
+from records import ArbCandidate, FundingLeg, FundingSchedule
 
 getcontext().prec = 18
 
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD", "100"))
-LEVERAGE = Decimal(get_config_value("LEVERAGE", "3"))
-MAX_HOLD_TIME_MINUTES = int(get_config_value("MAX_HOLD_TIME_MINUTES", "120"))
-HOLD_HOURS = Decimal(MAX_HOLD_TIME_MINUTES) / Decimal(60)
+FUNDING_REFRESH_SEC = int(get_config_value("FUNDING_REFRESH_SEC", "60"))
+FUNDING_INTERVALS_REFRESH_SEC = int(get_config_value("FUNDING_INTERVALS_REFRESH_SEC", "3600"))
+DEFAULT_FUNDING_INTERVAL_SEC = 8 * 3600
 
-async def fetch_funding(arb: dict) -> None:
-    symbol = arb["symbol"]
-    long_ex = arb["long_exchange"]
-    short_ex = arb["short_exchange"]
+# (exchange, canonical symbol) -> next settlement time, interval and predicted rate.
+# Refreshed in bulk by funding_calendar_loop(); the candidate path only does dict lookups.
+funding_calendar: dict[tuple[str, str], FundingSchedule] = {}
+_last_refresh = 0.0
+_missing_logged: set[tuple[str, str]] = set()  # warn once per leg without a calendar entry
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+# --- Bybit: rates and next settlement from tickers, intervals from instruments-info ---
+_bybit_intervals: dict[str, float] = {}  # symbol -> funding interval (sec)
+_bybit_intervals_at = 0.0
 
-        async def get_bybit_rate(sym: str) -> Decimal:
-            try:
-                url = "https://api.bybit.com/v5/market/tickers?category=linear"
-                async with session.get(url) as resp:
-                    data = await resp.json()
-                    for item in data.get("result", {}).get("list", []):
-                        if item.get("symbol") == sym:
-                            rate_str = item.get("fundingRate", "0")
-                            # logger.info(f"[FUNDING] Bybit {sym} rate = {rate_str}")
-                            return Decimal(rate_str)
-            except Exception as e:
-                logger.warning(f"[FUNDING] Bybit error for {sym}: {e}")
-            return Decimal("0")
+async def fetch_bybit_funding_intervals(session: aiohttp.ClientSession) -> dict[str, float]:
+    base_url = f"{BYBIT_REST_URL}/v5/market/instruments-info?category=linear&limit=1000"
+    intervals = {}
+    cursor = ""
+    while True:
+        url = f"{base_url}&cursor={cursor}" if cursor else base_url
+        await acquire_slot("Bybit", "market", endpoint="/v5/market/instruments-info")
+        async with session.get(url) as resp:
+            observe_response("Bybit", "market", resp, endpoint="/v5/market/instruments-info")
+            data = await resp.json()
+        result = data.get("result", {})
+        for item in result.get("list", []):
+            minutes = item.get("fundingInterval")
+            if item.get("symbol") and minutes:
+                intervals[item["symbol"]] = int(minutes) * 60
+        cursor = result.get("nextPageCursor") or ""
+        if not cursor:
+            return intervals
+
+# The tickers endpoint returns every linear symbol, so one call covers the whole venue
+async def fetch_bybit_funding_calendar(session: aiohttp.ClientSession) -> list[FundingSchedule]:
+    global _bybit_intervals_at
+    if not _bybit_intervals or time.monotonic() - _bybit_intervals_at > FUNDING_INTERVALS_REFRESH_SEC:
+        _bybit_intervals.update(await fetch_bybit_funding_intervals(session))
+        _bybit_intervals_at = time.monotonic()
+
+    url = f"{BYBIT_REST_URL}/v5/market/tickers?category=linear"
+    await acquire_slot("Bybit", "market", endpoint="/v5/market/tickers")
+    async with session.get(url) as resp:
+        observe_response("Bybit", "market", resp, endpoint="/v5/market/tickers")
+        data = await resp.json()
+
+    now = time.time()
+    schedules = []
+    for item in data.get("result", {}).get("list", []):
+        symbol = item.get("symbol")
+        next_ms = item.get("nextFundingTime")
+        if not symbol or not next_ms:
+            continue  # not a perpetual
+        schedules.append(FundingSchedule(
+            "Bybit", symbol, Decimal(item.get("fundingRate") or "0"),
+            _bybit_intervals.get(symbol, DEFAULT_FUNDING_INTERVAL_SEC), int(next_ms) / 1000, updated_at=now,
+        ))
+    return schedules
+
+# --- KuCoin: the active contracts list carries rate, predicted rate, granularity and next settlement ---
+async def fetch_kucoin_funding_calendar(session: aiohttp.ClientSession) -> list[FundingSchedule]:
+    url = f"{KUCOIN_REST_URL}/api/v1/contracts/active"
+    await acquire_slot("KuCoin", "market")
+    async with session.get(url) as resp:
+        observe_response("KuCoin", "market", resp)
+        data = await resp.json()
+    if data.get("code") != "200000" or not data.get("data"):
+        logger.warning(f"[FUNDING] KuCoin invalid contracts response: {str(data)[:200]}")
+        return []
 
-        async def get_kucoin_rate(sym: str) -> Decimal:
+    adapter = get_adapter("KuCoin")
+    now = time.time()
+    schedules = []
+    for item in data["data"]:
+        rate = item.get("fundingFeeRate")
+        if rate in [None, "", "null"]:
+            continue  # not a perpetual
+        granularity_ms = item.get("fundingRateGranularity") or DEFAULT_FUNDING_INTERVAL_SEC * 1000
+        next_ms = item.get("nextFundingRateDateTime")
+        # Older responses only carry the countdown (ms until the next settlement)
+        next_ts = int(next_ms) / 1000 if next_ms else now + int(item.get("nextFundingRateTime") or 0) / 1000
+        predicted = item.get("predictedFundingFeeRate")
+        schedules.append(FundingSchedule(
+            "KuCoin", adapter.to_canonical_symbol(item["symbol"]), Decimal(str(rate)), int(granularity_ms) / 1000,
+            next_ts, Decimal(str(predicted)) if predicted not in [None, "", "null"] else None, now,
+        ))
+    return schedules
+
+# --- Calendar ---
+async def refresh_funding_calendar() -> int:
+    global _last_refresh
+    count = 0
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        for adapter in get_adapters():
             try:
-                if not sym.endswith("M"):
-                    sym += "M"
-                url = f"https://api-futures.kucoin.com/api/v1/funding-rate/{sym}/current"
-                async with session.get(url) as resp:
-                    data = await resp.json()
-                    if data.get("code") != "200000" or not data.get("data"):
-                        logger.warning(f"[FUNDING] KuCoin invalid response for {sym}: {data}")
-                        return Decimal("0")
-
-                    rate = data["data"].get("value")
-                    if rate in [None, "", "null"]:
-                        logger.warning(f"[FUNDING] KuCoin missing funding rate for {sym}")
-                        return Decimal("0")
-
-                    # logger.info(f"[FUNDING] KuCoin {sym} rate = {Decimal(rate):.8f}")
-                    return Decimal(rate)
+                schedules = await adapter.fetch_funding_calendar(session)
             except Exception as e:
-                logger.warning(f"[FUNDING] KuCoin exception for {sym}: {e}")
-                return Decimal("0")
+                logger.warning(f"[FUNDING] Calendar refresh failed for {adapter.name}: {e}")
+                continue
+            for schedule in schedules:
+                funding_calendar[(adapter.name, schedule.symbol)] = schedule
+            count += len(schedules)
+    _last_refresh = time.monotonic()
+    return count
 
+async def init_funding_calendar():
+    started = time.perf_counter()
+    count = await refresh_funding_calendar()
+    logger.info(f"[FUNDING] Calendar loaded: {count} symbols in {(time.perf_counter() - started) * 1000:.0f} ms")
 
-        async def build(exchange: str) -> dict:
-            try:
-                if exchange == "Bybit":
-                    rate = await get_bybit_rate(symbol)
-                elif exchange == "KuCoin":
-                    rate = await get_kucoin_rate(symbol)
-                else:
-                    rate = Decimal("0")
-
-                cost = rate * POSITION_SIZE_USD * LEVERAGE * (HOLD_HOURS / Decimal(8))
-                return {
-                    "exchange": exchange,
-                    "rate": round(rate, 6),
-                    "hours": float(HOLD_HOURS),
-                    "cost": round(cost, 4)
-                }
+async def funding_calendar_loop():
+    while True:
+        # Skip the first round if init_funding_calendar() just loaded everything
+        wait = _last_refresh + FUNDING_REFRESH_SEC - time.monotonic() if _last_refresh else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await refresh_funding_calendar()
+        except Exception as e:
+            logger.warning(f"[FUNDING] Calendar refresh failed: {e}")
+            await asyncio.sleep(FUNDING_REFRESH_SEC)
 
-            except Exception as e:
-                logger.warning(f"[FUNDING] Failed to build for {exchange}/{symbol}: {e}")
-                return {
-                    "exchange": exchange,
-                    "rate": Decimal("0"),
-                    "hours": float(HOLD_HOURS),
-                    "cost": Decimal("0"),
-                    "fallback": True
-                }
-
-        arb["funding"] = {
-            "long": await build(long_ex),
-            "short": await build(short_ex)
-        }
+def get_funding_schedule(exchange: str, symbol: str) -> FundingSchedule | None:
+    return funding_calendar.get((exchange, symbol))
+
+# Expected funding of one leg held from `start` for the configured hold time: the exact sum of
+# the settlements crossed, signed by direction (no network, O(1))
+def expected_funding(exchange: str, symbol: str, direction: str, notional: Decimal, start: float) -> FundingLeg:
+    hold_minutes = config_manager.settings.MAX_HOLD_TIME_MINUTES
+    schedule = funding_calendar.get((exchange, symbol))
+    if schedule is None:
+        return FundingLeg(exchange, Decimal("0"), hold_minutes / 60, Decimal("0"), fallback=True)
+    cost, settlements = schedule.cost(direction, notional, start, start + hold_minutes * 60)
+    return FundingLeg(exchange, round(schedule.rate, 6), hold_minutes / 60, round(cost, 4), settlements=settlements)
+
+async def fetch_funding(arb: ArbCandidate) -> None:
+    settings = config_manager.settings
+    notional = settings.POSITION_SIZE_USD * settings.LEVERAGE  # reference size; profit_simulator rescales to the chosen size
+    now = time.time()
+    arb.funding_long = expected_funding(arb.long_exchange, arb.symbol, "long", notional, now)
+    arb.funding_short = expected_funding(arb.short_exchange, arb.symbol, "short", notional, now)
+    for leg in (arb.funding_long, arb.funding_short):
+        if leg.fallback and (leg.exchange, arb.symbol) not in _missing_logged:
+            _missing_logged.add((leg.exchange, arb.symbol))
+            logger.warning(f"[FUNDING] No calendar entry for {leg.exchange}/{arb.symbol}, assuming no funding")
+
+# Net funding both legs of a position pay at the next settlement after `after`, as (time, cost);
+# None when neither leg has a calendar entry. Legs on different intervals are taken separately.
+def next_settlement(symbol: str, long_ex: str, short_ex: str, notional: Decimal, after: float) -> tuple[float, Decimal] | None:
+    upcoming = []
+    for exchange, direction in ((long_ex, "long"), (short_ex, "short")):
+        schedule = funding_calendar.get((exchange, symbol))
+        if schedule is not None:
+            first, _ = schedule.settlements(after, after)
+            upcoming.append((first, schedule, direction))
+    if not upcoming:
+        return None
+    at = min(first for first, _, _ in upcoming)
+    cost = Decimal("0")
+    for first, schedule, direction in upcoming:
+        if first == at:
+            cost += schedule.cost(direction, notional, after, at)[0]
+    return at, cost
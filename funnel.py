@@ -0,0 +1,237 @@
+# funnel.py
+# Where candidates end up: every ArbCandidate is recorded once with its final outcome
+# (insufficient_depth, low_net_profit, quarantine, opened, ...), by the stage that decided it.
+#   - rolling counts per (symbol, outcome) in FUNNEL_BUCKET_SEC buckets over FUNNEL_WINDOW_MIN,
+#     for /funnel in Telegram
+#   - an event log flushed every FUNNEL_FLUSH_SEC to column files under FUNNEL_DIR/<run>/
+#     (ts.f64, symbol.u32, outcome.u8, delta.f32, net_profit.f32; symbols.txt and outcomes.txt
+#     map the ids), loadable with load_funnel()
+# record() indexes preallocated arrays only: no dicts, lists or records are created per event.
+import asyncio
+import math
+import os
+import time
+from array import array
+from datetime import datetime, UTC
+from logger import logger
+from config_manager import get_config_value
+from records import ArbCandidate
+
+FUNNEL_ENABLED = get_config_value("FUNNEL_ENABLED", "true").lower() == "true"
+FUNNEL_BUCKET_SEC = int(get_config_value("FUNNEL_BUCKET_SEC", "300"))
+FUNNEL_WINDOW_MIN = int(get_config_value("FUNNEL_WINDOW_MIN", "60"))
+FUNNEL_FLUSH_SEC = float(get_config_value("FUNNEL_FLUSH_SEC", "60"))
+FUNNEL_BUFFER_ROWS = int(get_config_value("FUNNEL_BUFFER_ROWS", "65536"))  # events held between flushes
+FUNNEL_DIR = get_config_value("FUNNEL_DIR", "logs/funnel")
+
+# Outcome codes are written to disk: only append to this list
+OUTCOMES = (
+    # fill_simulator
+    "insufficient_depth", "orderbook_timeout", "orderbook_error",
+    # profit_simulator
+    "unprofitable", "profit_error",
+    # candidate_scheduler / capital_allocator
+    "superseded", "expired", "scheduler_error", "too_many_open_positions", "low_net_profit", "insufficient_capital",
+    # signal_engine
+    "quarantine", "signal_with_sl_ignored", "recent_sl", "signal_after_timeout_blocked",
+    # decision_engine / order_manager
+    "duplicate_position", "balance_blocked", "order_timeout", "order_error", "order_exception", "order_failed",
+    "paper_pass", "opened",
+    "other",
+    # order_manager: a leg rounds below the venue's minimum order size
+    "below_min_qty",
+)
+OUTCOME_CODES = {name: code for code, name in enumerate(OUTCOMES)}
+_OTHER = OUTCOME_CODES["other"]
+_N_OUTCOMES = len(OUTCOMES)
+_N_BUCKETS = max(1, math.ceil(FUNNEL_WINDOW_MIN * 60 / FUNNEL_BUCKET_SEC))
+
+# Symbol dictionary: ids index the count arrays and the symbol column
+_symbol_ids: dict[str, int] = {}
+_symbols: list[str] = []
+
+# Ring of buckets. _counts[slot] is symbol-major (id * _N_OUTCOMES + code) and grows by one
+# row per new symbol; _totals[slot] is the same summed over symbols.
+_bucket_epoch = array("q", [-1] * _N_BUCKETS)  # bucket number (ts // FUNNEL_BUCKET_SEC) held by each slot
+_counts = [array("I") for _ in range(_N_BUCKETS)]
+_totals = [array("I", bytes(4 * _N_OUTCOMES)) for _ in range(_N_BUCKETS)]
+_zero_row = array("I", bytes(4 * _N_OUTCOMES))
+
+# Event columns, appended to the files and reset on each flush
+class _Columns:
+    __slots__ = ("ts", "symbol", "outcome", "delta", "net_profit", "rows")
+
+    def __init__(self, capacity: int):
+        self.ts = array("d", bytes(8 * capacity))
+        self.symbol = array("I", bytes(4 * capacity))
+        self.outcome = array("B", bytes(capacity))
+        self.delta = array("f", bytes(4 * capacity))
+        self.net_profit = array("f", bytes(4 * capacity))
+        self.rows = 0
+
+_events = _Columns(FUNNEL_BUFFER_ROWS)
+_dropped = 0  # events not logged to disk because the buffer was full (still counted)
+_run_dir: str | None = None
+_symbols_written = 0
+
+def _register(symbol: str) -> int:
+    symbol_id = _symbol_ids[symbol] = len(_symbols)
+    _symbols.append(symbol)
+    for counts in _counts:
+        counts.extend(_zero_row)
+    return symbol_id
+
+def _rotate(slot: int, epoch: int) -> None:
+    counts = _counts[slot]
+    counts[:] = array("I", bytes(4 * len(counts)))
+    _totals[slot][:] = _zero_row
+    _bucket_epoch[slot] = epoch
+
+# Final outcome of one candidate
+def record_outcome(arb: ArbCandidate, outcome: str) -> None:
+    global _dropped
+    if not FUNNEL_ENABLED:
+        return
+    code = OUTCOME_CODES.get(outcome, _OTHER)
+    symbol_id = _symbol_ids.get(arb.symbol)
+    if symbol_id is None:
+        symbol_id = _register(arb.symbol)
+    now = time.time()
+    epoch = int(now // FUNNEL_BUCKET_SEC)
+    slot = epoch % _N_BUCKETS
+    if _bucket_epoch[slot] != epoch:
+        _rotate(slot, epoch)
+    _counts[slot][symbol_id * _N_OUTCOMES + code] += 1
+    _totals[slot][code] += 1
+
+    columns = _events
+    row = columns.rows
+    if row == FUNNEL_BUFFER_ROWS:
+        _dropped += 1
+        return
+    columns.ts[row] = now
+    columns.symbol[row] = symbol_id
+    columns.outcome[row] = code
+    columns.delta[row] = arb.raw_delta
+    columns.net_profit[row] = math.nan if arb.net_profit is None else arb.net_profit
+    columns.rows = row + 1
+
+# --- Queries over the rolling window ---
+def _live_slots(window_sec: float) -> list[int]:
+    current = int(time.time() // FUNNEL_BUCKET_SEC)
+    oldest = current - min(_N_BUCKETS, max(1, math.ceil(window_sec / FUNNEL_BUCKET_SEC))) + 1
+    return [slot for slot in range(_N_BUCKETS) if oldest <= _bucket_epoch[slot] <= current]
+
+# Outcome -> count over the last window_sec (whole buckets), for one symbol or all
+def funnel_counts(window_sec: float = FUNNEL_WINDOW_MIN * 60, symbol: str = None) -> dict[str, int]:
+    totals = [0] * _N_OUTCOMES
+    if symbol is not None:
+        symbol_id = _symbol_ids.get(symbol)
+        if symbol_id is None:
+            return {}
+        start = symbol_id * _N_OUTCOMES
+    for slot in _live_slots(window_sec):
+        row = _totals[slot] if symbol is None else _counts[slot][start:start + _N_OUTCOMES]
+        for code in range(_N_OUTCOMES):
+            totals[code] += row[code]
+    return {OUTCOMES[code]: count for code, count in enumerate(totals) if count}
+
+def top_symbols(outcome: str, window_sec: float = FUNNEL_WINDOW_MIN * 60, limit: int = 5) -> list[tuple[str, int]]:
+    code = OUTCOME_CODES[outcome]
+    per_symbol = [0] * len(_symbols)
+    for slot in _live_slots(window_sec):
+        for symbol_id, count in enumerate(_counts[slot][code::_N_OUTCOMES]):
+            per_symbol[symbol_id] += count
+    ranked = sorted(((count, symbol_id) for symbol_id, count in enumerate(per_symbol) if count), reverse=True)
+    return [(_symbols[symbol_id], count) for count, symbol_id in ranked[:limit]]
+
+def format_funnel(window_sec: float = FUNNEL_WINDOW_MIN * 60, symbol: str = None) -> str:
+    window_sec = min(window_sec, _N_BUCKETS * FUNNEL_BUCKET_SEC)
+    counts = funnel_counts(window_sec, symbol)
+    total = sum(counts.values())
+    scope = symbol or "all symbols"
+    if not total:
+        return f"No candidates for {scope} in the last {window_sec / 60:.0f} min."
+    lines = [f"{scope}, last {window_sec / 60:.0f} min: {total} candidates"]
+    for outcome, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"{outcome:<30} {count:>7} {count / total * 100:5.1f}%")
+    if symbol is None:
+        lines.append("\nTop symbols:")
+        for outcome, _ in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:3]:
+            top = top_symbols(outcome, window_sec)
+            lines.append(f"{outcome}: " + ", ".join(f"{s} {c}" for s, c in top))
+    if _dropped:
+        lines.append(f"\n{_dropped} events not logged to disk yet (buffer full)")
+    return "\n".join(lines)
+
+# --- Event log ---
+def _open_run_dir() -> str:
+    global _run_dir
+    if _run_dir is None:
+        _run_dir = os.path.join(FUNNEL_DIR, datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ"))
+        os.makedirs(_run_dir, exist_ok=True)
+        with open(os.path.join(_run_dir, "outcomes.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(OUTCOMES) + "\n")
+    return _run_dir
+
+def _write(columns: _Columns, symbols: list[str]) -> None:
+    run_dir = _open_run_dir()
+    if symbols:
+        with open(os.path.join(run_dir, "symbols.txt"), "a", encoding="utf-8") as f:
+            f.write("\n".join(symbols) + "\n")
+    rows = columns.rows
+    for name, column, suffix in (
+        ("ts", columns.ts, "f64"), ("symbol", columns.symbol, "u32"), ("outcome", columns.outcome, "u8"),
+        ("delta", columns.delta, "f32"), ("net_profit", columns.net_profit, "f32"),
+    ):
+        with open(os.path.join(run_dir, f"{name}.{suffix}"), "ab") as f:
+            f.write(memoryview(column)[:rows])
+
+# Append the buffered events to the column files. A flush interval is at most
+# FUNNEL_BUFFER_ROWS rows (~1.4 MB at the default), so this is a short synchronous write.
+def flush_funnel() -> int:
+    global _symbols_written, _dropped
+    rows = _events.rows
+    if not rows:
+        return 0
+    try:
+        _write(_events, _symbols[_symbols_written:])
+        _symbols_written = len(_symbols)
+    except Exception as e:
+        logger.warning(f"[FUNNEL] Failed to write {rows} events to {_run_dir or FUNNEL_DIR}: {e}")
+    _events.rows = 0
+    if _dropped:
+        logger.warning(f"[FUNNEL] Buffer full: {_dropped} events counted but not logged (raise FUNNEL_BUFFER_ROWS or lower FUNNEL_FLUSH_SEC)")
+        _dropped = 0
+    return rows
+
+async def funnel_flush_loop():
+    if not FUNNEL_ENABLED:
+        return
+    try:
+        while True:
+            await asyncio.sleep(FUNNEL_FLUSH_SEC)
+            flush_funnel()
+    finally:
+        flush_funnel()  # shutdown: keep what the last interval collected
+
+# Event log of one run as a DataFrame (pandas is only needed here)
+def load_funnel(run_dir: str):
+    import numpy as np
+    import pandas as pd
+
+    def column(name, dtype):
+        return np.fromfile(os.path.join(run_dir, name), dtype=dtype)
+
+    with open(os.path.join(run_dir, "symbols.txt"), encoding="utf-8") as f:
+        symbols = f.read().split()
+    with open(os.path.join(run_dir, "outcomes.txt"), encoding="utf-8") as f:
+        outcomes = f.read().split()
+    frame = pd.DataFrame({
+        "ts": pd.to_datetime(column("ts.f64", "<f8"), unit="s", utc=True),
+        "symbol": pd.Categorical.from_codes(column("symbol.u32", "<u4").astype("int64"), symbols),
+        "outcome": pd.Categorical.from_codes(column("outcome.u8", "u1").astype("int64"), outcomes),
+        "delta": column("delta.f32", "<f4"),
+        "net_profit": column("net_profit.f32", "<f4"),
+    })
+    return frame
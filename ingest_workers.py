@@ -0,0 +1,335 @@
+# ingest_workers.py
+# Optional multi-process market-data ingestion (INGEST_PROCESSES > 0).
+# The venue WS clients run in N shard processes: each decodes its frames and writes top of
+# book into a shared quote_table.QuoteTable. The trading process only drains the table's
+# update rings into its own Quote objects and price_queue, so JSON decoding never competes
+# with order execution for the event loop.
+#
+# Each shard runs one client per venue for its share of the symbols. The trading process
+# owns the symbol -> (shard, slot) assignment; price_feed.ws_clients holds ShardedFeedClient
+# stand-ins so universe_manager hot-(un)subscribes exactly as with in-process clients.
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from typing import Dict, List
+from logger import logger
+from config_manager import get_config_value
+import event_loop
+from quote_table import QuoteTable, FLAG_UNTRADEABLE
+from records import Quote
+
+INGEST_PROCESSES = int(get_config_value("INGEST_PROCESSES", "0"))  # 0 = feeds run in the trading process
+INGEST_TABLE_SLOTS = int(get_config_value("INGEST_TABLE_SLOTS", "8192"))  # (venue, symbol) capacity
+INGEST_RING_SIZE = int(get_config_value("INGEST_RING_SIZE", "65536"))  # pending updates per shard before a rescan
+INGEST_POLL_INTERVAL_SEC = float(get_config_value("INGEST_POLL_INTERVAL_SEC", "0.001"))
+
+# --- Shard process side ---
+
+# Mixed into a venue's WS client class inside a shard: quotes go to the shared table
+# instead of price_queue, feed health goes to the slot flags instead of untradeable_quotes.
+class SharedTableClientMixin:
+    table: QuoteTable = None
+    writer = 0
+    slots: Dict[str, int] = {}  # venue symbol -> table slot
+
+    def _publish(self, symbol: str, quote: Quote):
+        quote.ts = time.time()
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            self.table.write(self.writer, slot, quote.bid, quote.ask, quote.ts, 0)
+
+    def _write_flags(self, symbol: str):
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return
+        quote = self.quotes.get(symbol)
+        flags = FLAG_UNTRADEABLE if symbol in self.stale_symbols else 0
+        if quote is None:
+            self.table.write(self.writer, slot, 0.0, 0.0, 0.0, flags)
+        else:
+            self.table.write(self.writer, slot, quote.bid, quote.ask, quote.ts, flags)
+
+    def _mark_untradeable(self, symbols: List[str]):
+        super()._mark_untradeable(symbols)
+        for symbol in symbols:
+            self._write_flags(symbol)
+
+    def _mark_tradeable(self, symbol: str):
+        was_stale = symbol in self.stale_symbols
+        super()._mark_tradeable(symbol)
+        if was_stale:
+            self._write_flags(symbol)
+
+def shared_client(adapter, table: QuoteTable, writer: int, pairs: List[tuple[str, int]]):
+    base = adapter.ws_client_class()
+    cls = type(f"Shared{base.__name__}", (SharedTableClientMixin, base), {})
+    client = cls([symbol for symbol, _ in pairs])
+    client.table = table
+    client.writer = writer
+    client.slots = dict(pairs)
+    return client
+
+# Commands from the trading process: ("add", exchange, [(symbol, slot)]), ("remove", exchange, [symbol]),
+# ("rebalance", exchange), ("stop",)
+async def _run_shard(writer: int, table_spec: tuple, conn, assignments: Dict[str, List[tuple[str, int]]]):
+    from exchange_adapters import get_adapters
+
+    table = QuoteTable.attach(table_spec)
+    clients = {adapter.name: shared_client(adapter, table, writer, assignments.get(adapter.name, [])) for adapter in get_adapters()}
+    commands: asyncio.Queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    def on_command():
+        try:
+            commands.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            # Trading process is gone
+            loop.remove_reader(conn.fileno())
+            commands.put_nowait(("stop",))
+
+    loop.add_reader(conn.fileno(), on_command)
+    tasks = [asyncio.create_task(client.connect()) for client in clients.values()]
+    logger.info(f"[INGEST {writer}] Shard started: " + ", ".join(f"{name}={len(c.symbols)}" for name, c in clients.items()))
+    try:
+        while True:
+            op, *args = await commands.get()
+            if op == "stop":
+                break
+            client = clients.get(args[0])
+            if client is None:
+                continue
+            try:
+                if op == "add":
+                    client.slots.update(args[1])
+                    await client.add_symbols([symbol for symbol, _ in args[1]])
+                elif op == "remove":
+                    await client.remove_symbols(args[1])
+                    for symbol in args[1]:
+                        client.slots.pop(symbol, None)
+                elif op == "rebalance":
+                    await client.rebalance()
+            except Exception as e:
+                logger.warning(f"[INGEST {writer}] Command {op} for {args[0]} failed: {e}")
+    finally:
+        try:
+            loop.remove_reader(conn.fileno())
+        except Exception:
+            pass
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        table.close()
+
+def _shard_main(writer: int, table_spec: tuple, conn, assignments: Dict[str, List[tuple[str, int]]]):
+    try:
+        event_loop.run(_run_shard(writer, table_spec, conn, assignments))
+    except KeyboardInterrupt:
+        pass
+
+# --- Trading process side ---
+
+# Stands in for a venue's BaseWSClient in price_feed.ws_clients
+class ShardedFeedClient:
+    def __init__(self, exchange: str, feed: "ShardedFeed"):
+        self.exchange = exchange
+        self.feed = feed
+        self.symbol_slot: Dict[str, int] = {}  # venue symbol -> slot
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.symbol_slot)
+
+    def get_symbols(self) -> set[str]:
+        return set(self.symbol_slot)
+
+    async def add_symbols(self, symbols: List[str]):
+        self.feed.add_symbols(self.exchange, symbols)
+
+    async def remove_symbols(self, symbols: List[str]):
+        self.feed.remove_symbols(self.exchange, symbols)
+
+    async def rebalance(self):
+        self.feed.send_all(("rebalance", self.exchange))
+
+class ShardedFeed:
+    def __init__(self, processes: int, capacity: int = INGEST_TABLE_SLOTS, ring_size: int = INGEST_RING_SIZE):
+        self.table = QuoteTable(capacity, processes, ring_size)
+        # Freed slots go to the back: a shard may still write a removed symbol's slot until
+        # it has processed the "remove" command, so slots are reused as late as possible
+        self.free_slots = deque(range(capacity))
+        self.slot_quote: List[Quote | None] = [None] * capacity
+        self.slot_shard = [0] * capacity
+        self.last_seq = [0] * capacity
+        self.slot_flags = [0] * capacity
+        self.shard_slots: List[set[int]] = [set() for _ in range(processes)]
+        self.clients: Dict[str, ShardedFeedClient] = {}
+        self.conns = []
+        self.processes = []
+        self.rescans = 0  # ring overflows, each costing a scan of the shard's slots
+
+    def client(self, exchange: str) -> ShardedFeedClient:
+        client = self.clients.get(exchange)
+        if client is None:
+            client = self.clients[exchange] = ShardedFeedClient(exchange, self)
+        return client
+
+    # New symbols go to the least-loaded shard; returns {shard: [(symbol, slot)]}
+    def _assign(self, exchange: str, symbols: List[str]) -> Dict[int, List[tuple[str, int]]]:
+        from exchange_adapters import get_adapter
+
+        adapter = get_adapter(exchange)
+        client = self.client(exchange)
+        assigned: Dict[int, List[tuple[str, int]]] = {}
+        for symbol in dict.fromkeys(symbols):
+            if symbol in client.symbol_slot:
+                continue
+            if not self.free_slots:
+                logger.error(f"[INGEST] Quote table full ({self.table.capacity} slots); {exchange} {symbol} not subscribed. Raise INGEST_TABLE_SLOTS.")
+                break
+            slot = self.free_slots.popleft()
+            shard = min(range(len(self.shard_slots)), key=lambda i: len(self.shard_slots[i]))
+            client.symbol_slot[symbol] = slot
+            self.slot_quote[slot] = Quote(adapter.to_canonical_symbol(symbol), exchange)
+            self.slot_shard[slot] = shard
+            self.last_seq[slot] = self.table.seq(slot)  # whatever a previous owner left there is not new
+            self.slot_flags[slot] = 0
+            self.shard_slots[shard].add(slot)
+            assigned.setdefault(shard, []).append((symbol, slot))
+        return assigned
+
+    def add_symbols(self, exchange: str, symbols: List[str]) -> None:
+        for shard, pairs in self._assign(exchange, symbols).items():
+            self.conns[shard].send(("add", exchange, pairs))
+
+    def remove_symbols(self, exchange: str, symbols: List[str]) -> None:
+        from price_feed import untradeable_quotes
+
+        client = self.client(exchange)
+        removed: Dict[int, List[str]] = {}
+        for symbol in symbols:
+            slot = client.symbol_slot.pop(symbol, None)
+            if slot is None:
+                continue
+            quote = self.slot_quote[slot]
+            untradeable_quotes.discard((exchange, quote.symbol))
+            self.slot_quote[slot] = None
+            shard = self.slot_shard[slot]
+            self.shard_slots[shard].discard(slot)
+            self.free_slots.append(slot)
+            removed.setdefault(shard, []).append(symbol)
+        for shard, shard_symbols in removed.items():
+            self.conns[shard].send(("remove", exchange, shard_symbols))
+
+    def send_all(self, command: tuple) -> None:
+        for conn in self.conns:
+            conn.send(command)
+
+    def _shard_assignments(self, shard: int) -> Dict[str, List[tuple[str, int]]]:
+        return {
+            exchange: [(symbol, slot) for symbol, slot in client.symbol_slot.items() if self.slot_shard[slot] == shard]
+            for exchange, client in self.clients.items()
+        }
+
+    def _spawn(self, writer: int) -> None:
+        # spawn: a fork of a process with a running event loop is not safe
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(
+            target=_shard_main,
+            args=(writer, self.table.spec(), child_conn, self._shard_assignments(writer)),
+            name=f"ingest-{writer}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        if writer < len(self.processes):
+            self.conns[writer].close()
+            self.conns[writer], self.processes[writer] = parent_conn, process
+        else:
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+
+    def start(self, universe: Dict[str, List[str]]) -> None:
+        for exchange, symbols in universe.items():
+            self._assign(exchange, symbols)
+        for writer in range(self.table.writers):
+            self._spawn(writer)
+        logger.info(f"[INGEST] {len(self.processes)} shard processes started for " +
+                    ", ".join(f"{name}={len(c.symbol_slot)}" for name, c in self.clients.items()) + " symbols")
+
+    # Copies every updated slot into its Quote and queues it for pair_monitor; returns the count
+    def drain(self) -> int:
+        from price_feed import price_queue, untradeable_quotes
+
+        table = self.table
+        count = 0
+        for writer in range(table.writers):
+            slots = table.updated_slots(writer)
+            if slots is None:
+                self.rescans += 1
+                slots = [slot for slot in self.shard_slots[writer] if table.seq(slot) != self.last_seq[slot]]
+            for slot in slots:
+                quote = self.slot_quote[slot]
+                if quote is None:
+                    continue
+                snapshot = table.read(slot)
+                if snapshot is None or snapshot[0] == self.last_seq[slot]:
+                    continue
+                self.last_seq[slot], quote.bid, quote.ask, ts, flags = snapshot
+                if flags != self.slot_flags[slot]:
+                    self.slot_flags[slot] = flags
+                    if flags & FLAG_UNTRADEABLE:
+                        untradeable_quotes.add((quote.exchange, quote.symbol))
+                    else:
+                        untradeable_quotes.discard((quote.exchange, quote.symbol))
+                if not ts:
+                    continue  # flag change before the first tick
+                quote.ts = ts
+                count += 1
+                if not quote.queued:
+                    quote.queued = True
+                    price_queue.put_nowait(quote)
+        return count
+
+    async def run(self) -> None:
+        last_check = time.monotonic()
+        while True:
+            if self.drain():
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(INGEST_POLL_INTERVAL_SEC)
+            now = time.monotonic()
+            if now - last_check > 5:
+                last_check = now
+                for writer, process in enumerate(self.processes):
+                    if not process.is_alive():
+                        logger.error(f"[INGEST] Shard {process.name} exited with code {process.exitcode}, restarting")
+                        self._spawn(writer)
+
+    def stop(self) -> None:
+        for conn in self.conns:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self.conns:
+            conn.close()
+        self.table.close()
+
+# price_feed.main() in multi-process mode
+async def run_sharded_feeds(universe: Dict[str, List[str]], processes: int = INGEST_PROCESSES) -> None:
+    from price_feed import ws_clients
+
+    feed = ShardedFeed(processes)
+    for exchange in universe:
+        ws_clients[exchange] = feed.client(exchange)
+    feed.start(universe)
+    try:
+        await feed.run()
+    finally:
+        feed.stop()
@@ -1,6 +1,7 @@
 import asyncio
 from logger import logger
-from symbol_specs import init_symbol_specs
+from symbol_specs import init_symbol_specs, symbol_specs_refresh_loop
+from funding_fetcher import init_funding_calendar, funding_calendar_loop
 from price_feed import main as price_feed_main
 from pair_monitor import monitor_loop
 from arb_worker import arb_worker
@@ -8,13 +9,28 @@ from position_manager import close_all_positions
 from position_manager import _position_stop_loss_check_loop
 from datetime import datetime, UTC
 import failover_manager
-from telegram_bot import telegram_bot_runner, send_message, get_stop_event
+from telegram_bot import telegram_bot_runner, notification_sender_loop, format_notification_stats, get_stop_event
 from balance_watchdog import balance_watchdog_loop
+from universe_manager import universe_manager_loop
+from candidate_scheduler import candidate_scheduler_loop, drain_dispatched
+from rate_limiter import format_throttle_stats
+from single_flight import format_single_flight_stats
+from signal_engine import format_signal_stats
+from funnel import funnel_flush_loop
+from dashboard import dashboard_server
+import config_manager
+from config_manager import settings_watch_loop
+from profiler import install_task_tracking
+import event_loop
 
 NUM_WORKERS = 3  # or more or less))
  
 async def dev_main():
+    config_manager.load_settings()  # fail at launch on missing or invalid strategy thresholds
+    install_task_tracking()
+    await event_loop.report_loop()
     await init_symbol_specs()
+    await init_funding_calendar()
 
     telegram_task = asyncio.create_task(telegram_bot_runner())
 
@@ -25,8 +41,17 @@ async def dev_main():
     stop_loss_task = asyncio.create_task(_position_stop_loss_check_loop())
     failover_task = asyncio.create_task(failover_manager._check_positions_loop())
     balance_watchdog_task = asyncio.create_task(balance_watchdog_loop())
-
-    all_tasks = [task1, task2, *workers, heartbeat_task, stop_loss_task, failover_task, balance_watchdog_task, telegram_task]
+    specs_refresh_task = asyncio.create_task(symbol_specs_refresh_loop())
+    funding_calendar_task = asyncio.create_task(funding_calendar_loop())
+    universe_task = asyncio.create_task(universe_manager_loop())
+    scheduler_task = asyncio.create_task(candidate_scheduler_loop())
+    loop_lag_task = asyncio.create_task(event_loop.loop_lag_monitor())
+    funnel_task = asyncio.create_task(funnel_flush_loop())
+    notification_task = asyncio.create_task(notification_sender_loop())
+    dashboard_task = asyncio.create_task(dashboard_server())
+    settings_task = asyncio.create_task(settings_watch_loop())
+
+    all_tasks = [task1, task2, *workers, heartbeat_task, stop_loss_task, failover_task, balance_watchdog_task, specs_refresh_task, funding_calendar_task, universe_task, scheduler_task, loop_lag_task, funnel_task, notification_task, dashboard_task, settings_task, telegram_task]
 
     stop_event = get_stop_event()
 
@@ -43,6 +68,11 @@ async def dev_main():
     except asyncio.CancelledError:
         logger.info("\n🧹 Ctrl+C caught. Starting graceful shutdown...")
         try:
+            # Step 0. No new entries: finish (or cancel) the ones already dispatched
+            scheduler_task.cancel()
+            if not await drain_dispatched(timeout=10):
+                logger.warning("[SCHEDULER] Shutdown cancelled entries still in flight; check venues for unregistered legs")
+
             # Step 1. Try to close all positions
             await close_all_positions()
             logger.info("✅ All active positions successfully closed.")
@@ -56,13 +86,17 @@ async def dev_main():
         finally:
             # Step 3. Cancel all tasks
             logger.info("⏳ Останавливаем все фоновые процессы...")
-            from telegram_bot import send_message
-            await send_message("🛑 Bot stopped. Closing all positions.")            
+            from telegram_bot import notify, flush_notifications
+            notify("🛑 Bot stopped. Closing all positions.", critical=True)
+            if not await flush_notifications(timeout=10):
+                logger.warning("[TELEGRAM] Shutdown with undelivered notifications")
             for task in all_tasks:
                 task.cancel()
 
             # Step 4. Wait for all tasks to complete
             results = await asyncio.gather(*all_tasks, return_exceptions=True)
+            from fill_simulator import close_session
+            await close_session()
 
             # Step 5. Suppress CancelledError to keep console clean
             for r in results:
@@ -76,16 +110,28 @@ async def heartbeat():
         try:
             await asyncio.sleep(30)
             logger.info(f"[HEARTBEAT] Still alive at {datetime.now(UTC).isoformat()}")
+            throttle_stats = format_throttle_stats()
+            if throttle_stats:
+                logger.info(f"[RATE LIMIT] {throttle_stats}")
+            coalescing_stats = format_single_flight_stats()
+            if coalescing_stats:
+                logger.info(f"[SINGLE FLIGHT] {coalescing_stats}")
+            signal_stats = format_signal_stats()
+            if signal_stats:
+                logger.info(f"[SIGNAL ENGINE] {signal_stats}")
+            notification_stats = format_notification_stats()
+            if notification_stats:
+                logger.info(f"[TELEGRAM] {notification_stats}")
         except Exception as e:
             logger.warning(f"[HEARTBEAT] Error in heartbeat: {e}")
 
 if __name__ == "__main__":
     try:
-        asyncio.run(dev_main())
+        event_loop.run(dev_main())
     except KeyboardInterrupt:
         logger.info("\n❗ Forced termination of the program.")
         try:
             from telegram_bot import send_message
-            asyncio.run(send_message("🛑 Bot manually stopped (Ctrl+C)."))
+            event_loop.run(send_message("🛑 Bot manually stopped (Ctrl+C)."))
         except:
             pass
@@ -7,18 +7,21 @@ import hmac
 import hashlib
 import base64
 from decimal import Decimal, getcontext
+import config_manager
 from config_manager import get_config_value
+from single_flight import single_flight
+from rate_limiter import acquire_slot, observe_response
 import json
 from symbol_specs import get_specs, round_step
 from hashlib import sha256
-from profit_simulator import FEE_TAKER_BYBIT, FEE_TAKER_KUCOIN
+from exchange_adapters import get_adapter, BYBIT_REST_URL, KUCOIN_REST_URL
+from records import ArbCandidate, Position
 
 getcontext().prec = 18
 
 # Configuration — no defaults. Should raise if missing
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD"))
-LEVERAGE = Decimal(get_config_value("LEVERAGE"))
 ORDER_TIMEOUT_SEC = int(get_config_value("ORDER_TIMEOUT_SEC"))
+FILL_CONFIRM_TIMEOUT_SEC = float(get_config_value("FILL_CONFIRM_TIMEOUT_SEC", "1.0"))
 
 API_KEYS = {
     "Bybit": {
@@ -32,11 +35,8 @@ API_KEYS = {
     }
 }
 
-# TODO: add unit tests for quantity calculation logic
-def calculate_quantity(price: Decimal, exchange: str, symbol: str) -> float:
-    raw_qty = None
-
-    symbol_for_specs = symbol + "M" if exchange == "KuCoin" and not symbol.endswith("M") else symbol
+def calculate_quantity(price: Decimal, exchange: str, symbol: str, size_usd: Decimal = None) -> float:
+    symbol_for_specs = get_adapter(exchange).to_exchange_symbol(symbol)
     specs = get_specs(exchange, symbol_for_specs)
     if not specs:
         raise ValueError(f"[QTY ERROR] No specs for {exchange} {symbol_for_specs}")
@@ -44,11 +44,9 @@ def calculate_quantity(price: Decimal, exchange: str, symbol: str) -> float:
     step = specs.get("step_qty", Decimal("0.01"))
     contract_value = specs.get("contract_value", Decimal("1"))
 
-    if exchange == "KuCoin":
-        # contracts = usd * leverage / (price * contract value in FLM)
-        raw_qty = (POSITION_SIZE_USD * LEVERAGE) / (price * contract_value)
-    else:
-        raw_qty = (POSITION_SIZE_USD * LEVERAGE) / price
+    # contracts = usd * leverage / (price * contract value); linear USDT contracts have value 1
+    settings = config_manager.settings
+    raw_qty = ((size_usd or settings.POSITION_SIZE_USD) * settings.LEVERAGE) / (price * contract_value)
 
     qty = round_step(Decimal(raw_qty), step)
 
@@ -99,252 +97,469 @@ def sign_kucoin_request(api_key: str, api_secret: str, passphrase: str, method:
         "Content-Type": "application/json"
     }
 
-async def place_market_order(exchange: str, symbol: str, side: str, qty: float, reduce_only: bool = False) -> dict:
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-
-            if exchange == "Bybit":
-                url = "https://api.bybit.com/v5/order/create"
-                data = {
-                    "category": "linear",
-                    "symbol": symbol,
-                    "side": side,
-                    "orderType": "Market",
-                    "qty": str(qty),
-                    "timeInForce": "FillOrKill",
-                    "reduceOnly": reduce_only
-                    
-                }
-                body_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-
-                headers = sign_bybit_request(
-                    API_KEYS["Bybit"]["key"],
-                    API_KEYS["Bybit"]["secret"],
-                    method="POST",
-                    path_or_body=body_str
-                )
-
-                async with session.post(url, headers=headers, data=body_str) as resp:
-                    result = await resp.json()
-                    logger.info(f"[ORDER] ✅ Bybit {side} {symbol} result: {result}")
-                    logger.info(f"[POSITION OPEN] {symbol} | {exchange} | Side = {side} | Qty = {qty}")
-                    return {"success": True, "exchange": exchange, "side": side, "qty": qty, "symbol": symbol, "response": result}
-
-            elif exchange == "KuCoin":
-                if not symbol.endswith("M"):
-                    symbol += "M"
-                url_path = "/api/v1/orders"
-                url = f"https://api-futures.kucoin.com{url_path}"
-                data = {
-                    "clientOid": str(uuid.uuid4()),
-                    "symbol": symbol,
-                    "side": side.lower(),
-                    "type": "market", 
-                    "size": str(int(qty)),
-                    "leverage": str(int(LEVERAGE)),                    
-                }
-
-                if reduce_only:
-                    data["closeOrder"] = True  # ← tells KuCoin this is a close order, not a new entry
-
-
-                body_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-
-                headers = sign_kucoin_request(
-                    API_KEYS["KuCoin"]["key"],
-                    API_KEYS["KuCoin"]["secret"],
-                    API_KEYS["KuCoin"]["passphrase"],
-                    "POST",
-                    url_path,
-                    body_str  # ← already serialized string passed here
-                )
-
-
-                async with session.post(url, headers=headers, data=body_str) as resp:
-                    result = await resp.json()
-                    logger.info(f"[ORDER] ✅ KuCoin {side} {symbol} result: {result}")
-                    logger.info(f"[POSITION OPEN] {symbol} | {exchange} | Side = {side} | Qty = {qty}")
-                    return {"success": True, "exchange": exchange, "side": side, "qty": qty, "symbol": symbol, "response": result}
+# Order ack latency per exchange (EWMA, seconds); orders the legs in execute_order
+ack_latency: dict[str, float] = {}
+ACK_LATENCY_ALPHA = 0.2
 
+def _record_ack_latency(exchange: str, elapsed: float) -> None:
+    prev = ack_latency.get(exchange)
+    ack_latency[exchange] = elapsed if prev is None else prev + ACK_LATENCY_ALPHA * (elapsed - prev)
 
+async def place_market_order(exchange: str, symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+    started = time.perf_counter()
+    try:
+        result = await get_adapter(exchange).place_market_order(symbol, side, qty, reduce_only, client_id)
+        _record_ack_latency(exchange, time.perf_counter() - started)
+        return result
     except Exception as e:
         logger.warning(f"[ORDER] {exchange} {side} order failed for {symbol}: {e}")
         return None
+    finally:
+        # Entries, closes and failsafe reversals all move the balance
+        from balance_watchdog import request_balance_refresh
+        request_balance_refresh(exchange)
+
+async def place_bybit_market_order(symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url = f"{BYBIT_REST_URL}/v5/order/create"
+        data = {
+            "category": "linear",
+            "symbol": symbol,
+            "side": side,
+            "orderType": "Market",
+            "qty": str(qty),
+            "timeInForce": "FillOrKill",
+            "reduceOnly": reduce_only
+        }
+        if client_id:
+            data["orderLinkId"] = client_id
+        body_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+        # Orders (entries and closes) use the priority lane
+        await acquire_slot("Bybit", "order", priority=True, endpoint="/v5/order/create")
+        headers = sign_bybit_request(
+            API_KEYS["Bybit"]["key"],
+            API_KEYS["Bybit"]["secret"],
+            method="POST",
+            path_or_body=body_str
+        )
+
+        async with session.post(url, headers=headers, data=body_str) as resp:
+            observe_response("Bybit", "order", resp, endpoint="/v5/order/create")
+            result = await resp.json()
+            logger.info(f"[ORDER] ✅ Bybit {side} {symbol} result: {result}")
+            logger.info(f"[POSITION OPEN] {symbol} | Bybit | Side = {side} | Qty = {qty}")
+            return {"success": True, "exchange": "Bybit", "side": side, "qty": qty, "symbol": symbol, "response": result}
+
+async def place_kucoin_market_order(symbol: str, side: str, qty: float, reduce_only: bool = False, client_id: str = None) -> dict:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url_path = "/api/v1/orders"
+        url = f"{KUCOIN_REST_URL}{url_path}"
+        data = {
+            "clientOid": client_id or str(uuid.uuid4()),
+            "symbol": symbol,
+            "side": side.lower(),
+            "type": "market",
+            "size": str(int(qty)),
+            "leverage": str(int(config_manager.settings.LEVERAGE)),
+        }
+
+        if reduce_only:
+            data["closeOrder"] = True  # ← tells KuCoin this is a close order, not a new entry
+
+        body_str = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+        await acquire_slot("KuCoin", "order", priority=True)
+        headers = sign_kucoin_request(
+            API_KEYS["KuCoin"]["key"],
+            API_KEYS["KuCoin"]["secret"],
+            API_KEYS["KuCoin"]["passphrase"],
+            "POST",
+            url_path,
+            body_str  # ← already serialized string passed here
+        )
+
+        async with session.post(url, headers=headers, data=body_str) as resp:
+            observe_response("KuCoin", "order", resp)
+            result = await resp.json()
+            logger.info(f"[ORDER] ✅ KuCoin {side} {symbol} result: {result}")
+            logger.info(f"[POSITION OPEN] {symbol} | KuCoin | Side = {side} | Qty = {qty}")
+            return {"success": True, "exchange": "KuCoin", "side": side, "qty": qty, "symbol": symbol, "response": result}
+
+async def cancel_order(exchange: str, symbol: str, client_id: str) -> None:
+    await get_adapter(exchange).cancel_order(symbol, client_id)
+
+async def cancel_bybit_order(symbol: str, client_id: str) -> None:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url = f"{BYBIT_REST_URL}/v5/order/cancel"
+        body_str = json.dumps({"category": "linear", "symbol": symbol, "orderLinkId": client_id}, separators=(',', ':'))
+        await acquire_slot("Bybit", "order", priority=True, endpoint="/v5/order/cancel")
+        headers = sign_bybit_request(
+            API_KEYS["Bybit"]["key"],
+            API_KEYS["Bybit"]["secret"],
+            method="POST",
+            path_or_body=body_str
+        )
+        async with session.post(url, headers=headers, data=body_str) as resp:
+            observe_response("Bybit", "order", resp, endpoint="/v5/order/cancel")
+            result = await resp.json()
+            logger.info(f"[ORDER] Bybit cancel {symbol} {client_id}: {result.get('retCode')} {result.get('retMsg')}")
+
+async def cancel_kucoin_order(symbol: str, client_id: str) -> None:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url_path = f"/api/v1/orders/client-order/{client_id}?symbol={symbol}"
+        url = f"{KUCOIN_REST_URL}{url_path}"
+        await acquire_slot("KuCoin", "order", priority=True)
+        headers = sign_kucoin_request(
+            API_KEYS["KuCoin"]["key"],
+            API_KEYS["KuCoin"]["secret"],
+            API_KEYS["KuCoin"]["passphrase"],
+            "DELETE",
+            url_path
+        )
+        async with session.delete(url, headers=headers) as resp:
+            observe_response("KuCoin", "order", resp)
+            result = await resp.json()
+            logger.info(f"[ORDER] KuCoin cancel {symbol} {client_id}: {result.get('code')} {result.get('msg', '')}")
 
 async def get_position_size(exchange: str, symbol: str) -> float:
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-            if exchange == "Bybit":
-                url = f"https://api.bybit.com/v5/position/list?category=linear&symbol={symbol}"
-                query_string = f"category=linear&symbol={symbol}"
-                headers = sign_bybit_request(
-                    API_KEYS["Bybit"]["key"],
-                    API_KEYS["Bybit"]["secret"],
-                    method="GET",
-                    path_or_body=query_string
-                )
-                async with session.get(url, headers=headers) as resp:
-                    data = await resp.json()
-                    positions = data.get("result", {}).get("list", [])
-                    if positions:
-                        return abs(float(positions[0].get("size", 0)))
-                    return 0.0
-
-            elif exchange == "KuCoin":
-                if not symbol.endswith("M"):
-                    symbol += "M"
-                url = f"https://api-futures.kucoin.com/api/v1/position?symbol={symbol}"
-                headers = sign_kucoin_request(
-                    API_KEYS["KuCoin"]["key"],
-                    API_KEYS["KuCoin"]["secret"],
-                    API_KEYS["KuCoin"]["passphrase"],
-                    "GET",
-                    f"/api/v1/position?symbol={symbol}"
-                )
-                async with session.get(url, headers=headers) as resp:
-                    data = await resp.json()
-                    position_data = data.get("data")
-                    if position_data:
-                        return abs(float(position_data.get("currentQty", 0)))
-                    return 0.0
-
+        return await single_flight(
+            (exchange, "position_size", symbol),
+            lambda: get_adapter(exchange).get_position_size(symbol)
+        )
     except Exception as e:
         logger.error(f"[GET POSITION SIZE] Error fetching position size for {exchange} {symbol}: {e}")
         return 0.0
 
-async def execute_order(arb: dict) -> bool:
-    symbol = arb["symbol"]
-    long_ex = arb["long_exchange"]
-    short_ex = arb["short_exchange"]
-    long_price = Decimal(str(arb["long_avg_price"]))
-    short_price = Decimal(str(arb["short_avg_price"]))
-
-    qty_long = calculate_quantity(long_price, long_ex, symbol)
-    qty_short = calculate_quantity(short_price, short_ex, symbol)
-
-    async def order_long():
-        return await place_market_order(long_ex, symbol, "Buy", qty_long)
-
-    async def order_short():
-        return await place_market_order(short_ex, symbol, "Sell", qty_short)
+async def get_bybit_position_size(symbol: str) -> float:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url = f"{BYBIT_REST_URL}/v5/position/list?category=linear&symbol={symbol}"
+        query_string = f"category=linear&symbol={symbol}"
+        await acquire_slot("Bybit", "position", endpoint="/v5/position/list")
+        headers = sign_bybit_request(
+            API_KEYS["Bybit"]["key"],
+            API_KEYS["Bybit"]["secret"],
+            method="GET",
+            path_or_body=query_string
+        )
+        async with session.get(url, headers=headers) as resp:
+            observe_response("Bybit", "position", resp, endpoint="/v5/position/list")
+            data = await resp.json()
+            positions = data.get("result", {}).get("list", [])
+            if positions:
+                return abs(float(positions[0].get("size", 0)))
+            return 0.0
+
+async def get_kucoin_position_size(symbol: str) -> float:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url_path = f"/api/v1/position?symbol={symbol}"
+        url = f"{KUCOIN_REST_URL}{url_path}"
+        await acquire_slot("KuCoin", "position")
+        headers = sign_kucoin_request(
+            API_KEYS["KuCoin"]["key"],
+            API_KEYS["KuCoin"]["secret"],
+            API_KEYS["KuCoin"]["passphrase"],
+            "GET",
+            url_path
+        )
+        async with session.get(url, headers=headers) as resp:
+            observe_response("KuCoin", "position", resp)
+            data = await resp.json()
+            position_data = data.get("data")
+            if position_data:
+                return abs(float(position_data.get("currentQty", 0)))
+            return 0.0
+
+# Actual fill of an order from the venue's execution report: (filled qty, avg price or None, finished),
+# or None when the venue has no such order
+async def get_order_fill(exchange: str, symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+    return await get_adapter(exchange).fetch_order_fill(symbol, order_id, client_id)
+
+async def fetch_bybit_order_fill(symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        lookup = f"orderId={order_id}" if order_id else f"orderLinkId={client_id}"
+        query_string = f"category=linear&symbol={symbol}&{lookup}"
+        url = f"{BYBIT_REST_URL}/v5/order/realtime?{query_string}"
+        await acquire_slot("Bybit", "order", priority=True, endpoint="/v5/order/realtime")
+        headers = sign_bybit_request(
+            API_KEYS["Bybit"]["key"],
+            API_KEYS["Bybit"]["secret"],
+            method="GET",
+            path_or_body=query_string
+        )
+        async with session.get(url, headers=headers) as resp:
+            observe_response("Bybit", "order", resp, endpoint="/v5/order/realtime")
+            data = await resp.json()
+            orders = data.get("result", {}).get("list", [])
+            if not orders:
+                return None
+            order = orders[0]
+            filled = Decimal(str(order.get("cumExecQty") or "0"))
+            avg_price = Decimal(str(order["avgPrice"])) if order.get("avgPrice") not in (None, "", "0") else None
+            finished = order.get("orderStatus") in ("Filled", "Cancelled", "Rejected", "PartiallyFilledCanceled", "Deactivated")
+            return filled, avg_price, finished
+
+async def fetch_kucoin_order_fill(symbol: str, order_id: str = None, client_id: str = None) -> tuple[Decimal, Decimal | None, bool] | None:
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        url_path = f"/api/v1/orders/{order_id}" if order_id else f"/api/v1/orders/byClientOid?clientOid={client_id}"
+        url = f"{KUCOIN_REST_URL}{url_path}"
+        await acquire_slot("KuCoin", "order", priority=True)
+        headers = sign_kucoin_request(
+            API_KEYS["KuCoin"]["key"],
+            API_KEYS["KuCoin"]["secret"],
+            API_KEYS["KuCoin"]["passphrase"],
+            "GET",
+            url_path
+        )
+        async with session.get(url, headers=headers) as resp:
+            observe_response("KuCoin", "order", resp)
+            data = await resp.json()
+            order = data.get("data")
+            if not order:
+                return None
+            filled = Decimal(str(order.get("filledSize") or "0"))
+            specs = get_specs("KuCoin", symbol)
+            contract_value = specs.get("contract_value", Decimal("1")) if specs else Decimal("1")
+            filled_value = Decimal(str(order.get("filledValue") or "0"))
+            avg_price = filled_value / (filled * contract_value) if filled > 0 and filled_value > 0 else None
+            finished = order.get("isActive") is False
+            return filled, avg_price, finished
+
+def _order_id(result: dict | None) -> str | None:
+    if not result or not result.get("success"):
+        return None
+    response = result.get("response") or {}
+    if "retCode" in response and response.get("retCode", 0) == 0:
+        return (response.get("result") or {}).get("orderId")
+    if "code" in response and str(response.get("code")) == "200000":
+        return (response.get("data") or {}).get("orderId")
+    return None
+
+# Slower venue first (by ack latency) so both acks land together; without latency
+# history, the leg with the thinner book goes first.
+def _leg_order(arb: ArbCandidate, legs: list[dict]) -> list[dict]:
+    latencies = [ack_latency.get(leg["exchange"]) for leg in legs]
+    if None not in latencies and abs(latencies[0] - latencies[1]) > 0.005:
+        return sorted(legs, key=lambda leg: ack_latency[leg["exchange"]], reverse=True)
+    depth = {"Buy": arb.long_curve, "Sell": arb.short_curve}
+    return sorted(legs, key=lambda leg: depth[leg["side"]][-1][0] if depth[leg["side"]] else Decimal("0"))
+
+async def _confirm_fill(leg: dict) -> None:
+    exchange, symbol, client_id = leg["exchange"], leg["symbol"], leg["client_id"]
+    result = leg["result"]
+    order_id = _order_id(result)
+    if result is not None and order_id is None:
+        return  # the venue answered and refused the order: nothing filled
+    if order_id is None:
+        # No ack (timeout or transport error): the order may still reach the venue.
+        # Cancel it by client id first, so it cannot fill after this leg is reconciled.
+        try:
+            await cancel_order(exchange, symbol, client_id)
+        except Exception as e:
+            logger.warning(f"[ORDER_MANAGER] Cancel of unacknowledged order {client_id} failed on {exchange} {symbol}: {e}")
+
+    deadline = time.monotonic() + FILL_CONFIRM_TIMEOUT_SEC
+    while True:
+        try:
+            report = await get_order_fill(exchange, symbol, order_id, client_id)
+        except Exception as e:
+            logger.warning(f"[ORDER_MANAGER] Fill report failed for {exchange} {symbol}: {e}")
+            break
+        if report is not None:
+            leg["filled"], leg["avg_price"], finished = report
+            if finished or time.monotonic() >= deadline:
+                return
+        elif time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(0.1)
+    # No execution report: this order's fill is the change in position since just before the submit
+    size = Decimal(str(await get_position_size(exchange, symbol)))
+    leg["filled"] = max(Decimal("0"), size - leg["size_before"])
+    leg["avg_price"] = None
+    logger.warning(f"[ORDER_MANAGER] No execution report for {client_id} on {exchange} {symbol}: filled {leg['filled']} from the position change")
+
+def _base_qty(leg: dict) -> Decimal:
+    return leg["filled"] * leg["contract_value"]
+
+# Reverses `base_qty` of a leg; returns the contracts actually unwound (0 if the order failed)
+async def _unwind(leg: dict, base_qty: Decimal) -> Decimal:
+    qty = round_step(base_qty / leg["contract_value"], leg["step"])
+    if qty <= 0:
+        return Decimal("0")
+    opposite_side = "Sell" if leg["side"] == "Buy" else "Buy"
+    logger.warning(f"[ORDER_MANAGER] UNWIND: {leg['exchange']} {opposite_side} {qty} {leg['symbol']}")
+    result = await place_market_order(leg["exchange"], leg["symbol"], opposite_side, float(qty), reduce_only=True)
+    if _order_id(result) is None:
+        logger.error(f"[ORDER_MANAGER] UNWIND FAILED: {leg['exchange']} {opposite_side} {qty} {leg['symbol']}: {result}")
+        return Decimal("0")
+    return qty
+
+# A one-sided fill whose unwind failed is a naked leg on the venue: failover watches it with
+# its trailing stop / take profit and closes it like the surviving leg of a broken position
+async def _hand_to_failover(leg: dict) -> None:
+    from failover_manager import start_failover
+    entry_price = leg["avg_price"] or leg["price"]
+    notional = leg["filled"] * entry_price * leg["contract_value"]
+    await start_failover(
+        position_id=uuid.uuid4().hex,
+        exchange=leg["exchange"],
+        direction="long" if leg["side"] == "Buy" else "short",
+        symbol=leg["symbol"],
+        entry_price=entry_price,
+        qty=leg["filled"],
+        start_pnl=Decimal("0"),
+        entry_fee=get_adapter(leg["exchange"]).taker_fee * notional,
+        funding=Decimal("0"),
+        position_notional=notional,
+    )
+
+async def execute_order(arb: ArbCandidate) -> bool:
+    symbol = arb.symbol
+    long_ex = arb.long_exchange
+    short_ex = arb.short_exchange
+    long_price = Decimal(str(arb.long_avg_price))
+    short_price = Decimal(str(arb.short_avg_price))
+    # Margin chosen by capital_allocator
+    size_usd = Decimal(str(arb.position_size_usd or config_manager.settings.POSITION_SIZE_USD))
+
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+
+    def mark(phase: str):
+        timings[phase] = round((time.perf_counter() - started) * 1000, 1)
+
+    legs = []
+    for exchange, side, price in ((long_ex, "Buy", long_price), (short_ex, "Sell", short_price)):
+        specs = get_specs(exchange, get_adapter(exchange).to_exchange_symbol(symbol))
+        legs.append({
+            "exchange": exchange,
+            "symbol": symbol,
+            "side": side,
+            "price": price,
+            "qty": calculate_quantity(price, exchange, symbol, size_usd),
+            "min_qty": specs.get("min_qty", Decimal("0")),
+            "contract_value": specs.get("contract_value", Decimal("1")),
+            "step": specs.get("step_qty", Decimal("0.01")),
+            "client_id": uuid.uuid4().hex,
+            "size_before": Decimal("0"),
+            "result": None,
+            "filled": Decimal("0"),
+            "avg_price": None,
+        })
+    long_leg, short_leg = legs
+
+    # A leg below the venue minimum would be rejected and leave the other leg to unwind
+    for leg in legs:
+        if leg["qty"] <= 0 or Decimal(str(leg["qty"])) < leg["min_qty"]:
+            logger.warning(f"[ORDER_MANAGER] {symbol}: {leg['exchange']} qty {leg['qty']} below min order size {leg['min_qty']} for ${size_usd}, skipped")
+            arb.exit_reason = "below_min_qty"
+            return False
 
     try:
-        task_long = asyncio.create_task(order_long())
-        task_short = asyncio.create_task(order_short())
+        # Position sizes before the submit: fallback fill measure for legs without an execution report
+        sizes = await asyncio.gather(*(get_position_size(leg["exchange"], symbol) for leg in legs))
+        for leg, size in zip(legs, sizes):
+            leg["size_before"] = Decimal(str(size))
+        mark("sized")
+
+        # --- Submit: slower leg first, faster one staggered by the latency difference ---
+        first, second = _leg_order(arb, legs)
+        lead = max(0.0, ack_latency.get(first["exchange"], 0.0) - ack_latency.get(second["exchange"], 0.0))
+
+        async def submit(leg: dict, delay: float):
+            if delay:
+                await asyncio.sleep(min(delay, ORDER_TIMEOUT_SEC / 2))
+            leg["result"] = await place_market_order(leg["exchange"], symbol, leg["side"], leg["qty"], client_id=leg["client_id"])
+            mark(f"ack_{leg['exchange']}")
+
+        tasks = [asyncio.create_task(submit(first, 0.0)), asyncio.create_task(submit(second, lead))]
+        mark("submitted")
+        done, pending = await asyncio.wait(tasks, timeout=ORDER_TIMEOUT_SEC)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"[ORDER_MANAGER] TIMEOUT: {len(pending)} leg(s) without ack after {ORDER_TIMEOUT_SEC}s for {symbol}")
+
+        # --- Confirm: real filled quantity per leg from the execution reports ---
+        await asyncio.gather(_confirm_fill(long_leg), _confirm_fill(short_leg))
+        mark("confirmed")
+
+        # --- Reconcile: unwind the exact residual so both legs hold the same base quantity ---
+        long_base = _base_qty(long_leg)
+        short_base = _base_qty(short_leg)
+        if long_base <= 0 or short_base <= 0:
+            for leg in legs:
+                if leg["filled"] > 0:
+                    leg["filled"] -= await _unwind(leg, _base_qty(leg))
+                    if leg["filled"] >= leg["step"]:
+                        await _hand_to_failover(leg)
+            mark("unwound")
+            arb.exit_reason = "order_timeout" if pending else "order_error"
+            arb.execution_timings = timings
+            logger.warning(f"[ORDER_MANAGER] FAILSAFE: {symbol} one-sided fill (long={long_leg['filled']}, short={short_leg['filled']}) | timings(ms)={timings}")
+            return False
 
-        done, pending = await asyncio.wait(
-            [task_long, task_short],
-            timeout=ORDER_TIMEOUT_SEC
+        if long_base != short_base:
+            bigger = long_leg if long_base > short_base else short_leg
+            residual = abs(long_base - short_base)
+            unwound = await _unwind(bigger, residual)
+            bigger["filled"] -= unwound
+            if unwound == 0 and residual >= bigger["step"] * bigger["contract_value"]:
+                # Registered with what each venue holds, so the close still flattens the residual
+                from telegram_bot import notify
+                notify(
+                    f"⚠️ <b>Residual unwind failed</b>\n"
+                    f"{symbol} | {bigger['exchange']} holds {residual} more than the hedge until the position closes",
+                    critical=True,
+                )
+            mark("residual_unwound")
+
+        arb.position_id = uuid.uuid4().hex
+        logger.info(f"[ORDER_MANAGER] ✅ EXECUTED: {symbol}, position_id={arb.position_id}")
+
+        from position_manager import register_position  # import should be at the top
+
+        # Gather data to register position — actual fills where the venue reported them
+        entry_prices = {
+            long_ex: long_leg["avg_price"] or long_price,
+            short_ex: short_leg["avg_price"] or short_price
+        }
+        qty_long = long_leg["filled"]
+        qty_short = short_leg["filled"]
+
+        real_notional_long = qty_long * entry_prices[long_ex] * long_leg["contract_value"]
+        real_notional_short = qty_short * entry_prices[short_ex] * short_leg["contract_value"]
+        avg_position_notional = (real_notional_long + real_notional_short) / 2
+
+        qty = min(qty_long, qty_short)
+        entry_fee_long = get_adapter(long_ex).taker_fee * real_notional_long
+        entry_fee_short = get_adapter(short_ex).taker_fee * real_notional_short
+        entry_fee = entry_fee_long + entry_fee_short
+
+        position = Position(
+            position_id=arb.position_id,
+            symbol=symbol,
+            long_exchange=long_ex,
+            short_exchange=short_ex,
+            entry_prices=entry_prices,
+            qty=qty,
+            qty_long=qty_long,
+            qty_short=qty_short,
+            entry_fee=entry_fee,
+            position_notional=avg_position_notional,
+            position_size_usd=size_usd,
+            funding=arb.funding_cost(),
         )
+        register_position(position)
+        mark("registered")
+        arb.execution_timings = timings
+        logger.info(f"[ORDER_MANAGER] {symbol} timings(ms): {timings} | first leg: {first['exchange']}")
 
-        if len(done) < 2:
-            for task in pending:
-                task.cancel()
+        return True
 
-            results = [t.result() for t in done if t.done() and t.result() is not None]
-            if results:
-                filled = results[0]
-                opposite_side = "Sell" if filled["side"] == "Buy" else "Buy"
-                logger.warning(f"[ORDER_MANAGER] TIMEOUT: Canceling filled side {filled['exchange']} with opposite order")
-                reversed_price = long_price if filled["side"] == "Sell" else short_price
-                reversed_qty = calculate_quantity(reversed_price, filled["exchange"], filled["symbol"])
-                await place_market_order(filled["exchange"], filled["symbol"], opposite_side, reversed_qty)
-
-            arb["exit_reason"] = "order_timeout"
-            return False
-
-        results = [t.result() for t in done]
-
-        valid_results = []
-        for r in results:
-            if r and r.get("success"):
-                if "retCode" in r["response"] and r["response"].get("retCode", 0) == 0:
-                    valid_results.append(r)
-                elif "code" in r["response"] and str(r["response"].get("code")) == "200000":
-                    valid_results.append(r)
-
-        # If both sides succeeded — all good
-        if len(valid_results) == 2:
-            arb["entry_time"] = uuid.uuid4().hex
-            arb["position_id"] = uuid.uuid4().hex
-            logger.info(f"[ORDER_MANAGER] ✅ EXECUTED: {symbol}, position_id={arb['position_id']}")
-
-            from position_manager import register_position  # import should be at the top
-
-            # Gather data to register position
-            entry_prices = {
-                long_ex: long_price,
-                short_ex: short_price
-            }
-            qty_long = calculate_quantity(long_price, long_ex, symbol)
-            qty_short = calculate_quantity(short_price, short_ex, symbol)
-
-            symbol_long = symbol if long_ex == "Bybit" else symbol + "M"
-            symbol_short = symbol if short_ex == "Bybit" else symbol + "M"
-
-            contract_value_long = get_specs(long_ex, symbol_long)["contract_value"]
-            contract_value_short = get_specs(short_ex, symbol_short)["contract_value"]
-
-            real_notional_long = Decimal(str(qty_long)) * long_price * contract_value_long
-            real_notional_short = Decimal(str(qty_short)) * short_price * contract_value_short
-            avg_position_notional = (real_notional_long + real_notional_short) / 2
-
-            qty = min(qty_long, qty_short)
-            entry_fee_long = (FEE_TAKER_BYBIT if long_ex == "Bybit" else FEE_TAKER_KUCOIN) * POSITION_SIZE_USD * LEVERAGE
-            entry_fee_short = (FEE_TAKER_BYBIT if short_ex == "Bybit" else FEE_TAKER_KUCOIN) * POSITION_SIZE_USD * LEVERAGE
-            entry_fee = entry_fee_long + entry_fee_short
-
-            position_data = {
-                "position_id": arb["position_id"],
-                "symbol": symbol,
-                "long_exchange": long_ex,
-                "short_exchange": short_ex,
-                "entry_prices": entry_prices,
-                "qty": Decimal(str(qty)),  # keep qty for compatibility
-                "qty_long": Decimal(str(qty_long)),
-                "qty_short": Decimal(str(qty_short)),
-                "entry_fee": entry_fee,
-                "position_notional": avg_position_notional,
-                "funding": Decimal(str(arb.get("funding", {}).get("long", {}).get("cost", 0))) +
-                           Decimal(str(arb.get("funding", {}).get("short", {}).get("cost", 0)))
-            }
-            register_position(position_data)
-
-            return True
-
-        # If only one side succeeded — apply failsafe
-        if len(valid_results) == 1:
-            filled = valid_results[0]
-            opposite_side = "Sell" if filled["side"] == "Buy" else "Buy"
-            logger.warning(f"[ORDER_MANAGER] FAILSAFE: reversing {filled['exchange']} {opposite_side} {filled['symbol']}")
-
-            reverse_price = long_price if filled["side"] == "Sell" else short_price
-            response_data = filled.get("response", {}).get("result", {})
-
-            executed_qty = (
-                response_data.get("qty") or
-                response_data.get("origQty") or
-                response_data.get("size") or
-                filled.get("qty")
-            )
-
-            if executed_qty is None:
-                logger.warning(f"[ORDER_MANAGER] Could not determine executed qty for {filled['exchange']} {filled['symbol']}. Using fallback 0.")
-                executed_qty = 0
-
-            await place_market_order(
-                filled["exchange"],
-                filled["symbol"],
-                opposite_side,
-                executed_qty,
-                reduce_only=True
-            )
-
-
-        arb["exit_reason"] = "order_error"
-        return False
-  
     except Exception as e:
         logger.exception(f"[ORDER_MANAGER] Critical error on order execution: {e}")
-        arb["exit_reason"] = "order_exception"
+        arb.exit_reason = "order_exception"
+        arb.execution_timings = timings
         return False
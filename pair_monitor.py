@@ -1,159 +1,157 @@
 import asyncio
+import time
 from logger import logger
-from datetime import datetime, UTC
 from typing import Dict
-from config_manager import get_config_value
+import config_manager
 from fill_simulator import simulate_fill
 from funding_fetcher import fetch_funding
 from profit_simulator import simulate_profit
 from signal_engine import process_signal
 from position_manager import get_active_symbols, on_price_update
-from failover_manager import check_position, failover_positions
+from failover_manager import on_quote as on_failover_quote
+from records import Quote, ArbCandidate
 
 # Quote update queue
-from price_feed import price_queue
+from price_feed import price_queue, untradeable_quotes
 
 arb_queue: asyncio.Queue = asyncio.Queue()
 
-# Configuration
-MIN_DELTA = float(get_config_value("MIN_DELTA"))
-MAX_QUOTE_AGE_SEC = int(get_config_value("MAX_QUOTE_AGE_SEC"))
-MIN_DELTA_LIFETIME = int(get_config_value("MIN_DELTA_LIFETIME", 2))
-DELTA_CACHE_EXPIRATION_SEC = int(get_config_value("DELTA_CACHE_EXPIRATION_SEC", 10))
-
-# Latest quotes by exchange and symbol
-latest_quotes: Dict[str, Dict[str, Dict]] = {}
-# Delta cache with timestamps
-delta_cache: Dict[str, Dict] = {}
-
-# TODO: unify timestamp parsing across modules (duplicate with signal_engine)
-def parse_timestamp(ts_str: str) -> datetime:
-    return datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-
-async def handle_price_update(payload: Dict):
-    symbol_raw = payload["pair_id"].split("-")[0]
-    # Strip 'M' suffix from KuCoin symbols
-    symbol = symbol_raw[:-1] if payload["exchange"] == "KuCoin" and symbol_raw.endswith("M") else symbol_raw
-    exchange = payload["exchange"]
-    bid = payload["bid"]
-    ask = payload["ask"]
-    timestamp = payload["timestamp"]
-
-    # Update cache
-    if symbol not in latest_quotes:
-        latest_quotes[symbol] = {}
-    latest_quotes[symbol][exchange] = {
-        "bid": bid,
-        "ask": ask,
-        "timestamp": timestamp
-    }
-
-    # If both sides exist — calculate deltas
-    if len(latest_quotes[symbol]) < 2:
+# Latest quotes by symbol and exchange (the price_feed Quote objects themselves)
+latest_quotes: Dict[str, Dict[str, Quote]] = {}
+# symbol -> epoch seconds when its delta first crossed MIN_DELTA
+delta_cache: Dict[str, float] = {}
+# Live spread statistics: EWMA of the best cross-venue delta (%) per symbol, used by universe_manager
+spread_stats: Dict[str, float] = {}
+SPREAD_EWMA_ALPHA = 0.05
+
+# Best long/short venue pair across N fresh quotes in one pass.
+# Tracks the two lowest asks and two highest bids so the pair never uses the same venue twice.
+# Venues whose feed is down or silent for `symbol` (price_feed.untradeable_quotes) are skipped.
+# Returns (delta %, long venue, short venue, long price, short price, ts of the older of the two quotes).
+def select_best_pair(quotes: Dict[str, Quote], now: float, symbol: str = None):
+    check_feed = symbol is not None and bool(untradeable_quotes)
+    max_age = config_manager.settings.MAX_QUOTE_AGE_SEC
+    ask1 = ask2 = bid1 = bid2 = None  # (price, exchange)
+    for exchange, q in quotes.items():
+        if now - q.ts > max_age:
+            continue
+        if check_feed and (exchange, symbol) in untradeable_quotes:
+            continue
+        ask, bid = q.ask, q.bid
+        if ask > 0:
+            if ask1 is None or ask < ask1[0]:
+                ask1, ask2 = (ask, exchange), ask1
+            elif ask2 is None or ask < ask2[0]:
+                ask2 = (ask, exchange)
+        if bid > 0:
+            if bid1 is None or bid > bid1[0]:
+                bid1, bid2 = (bid, exchange), bid1
+            elif bid2 is None or bid > bid2[0]:
+                bid2 = (bid, exchange)
+
+    if ask1 is None or bid1 is None:
+        return None
+
+    if ask1[1] != bid1[1]:
+        long_leg, short_leg = ask1, bid1
+    else:
+        # Same venue has both best ask and best bid — take the better of the runner-ups
+        options = []
+        if bid2 is not None:
+            options.append((ask1, bid2))
+        if ask2 is not None:
+            options.append((ask2, bid1))
+        if not options:
+            return None
+        long_leg, short_leg = max(options, key=lambda o: (o[1][0] - o[0][0]) / o[0][0])
+
+    delta = ((short_leg[0] - long_leg[0]) / long_leg[0]) * 100
+    quote_ts = min(quotes[long_leg[1]].ts, quotes[short_leg[1]].ts)
+    return delta, long_leg[1], short_leg[1], long_leg[0], short_leg[0], quote_ts
+
+async def handle_price_update(quote: Quote):
+    # Taken off the queue: the next tick for this pair queues it again
+    quote.queued = False
+    symbol = quote.symbol
+
+    # Update cache (after the first tick this is the same object)
+    quotes = latest_quotes.get(symbol)
+    if quotes is None:
+        quotes = latest_quotes[symbol] = {}
+    quotes[quote.exchange] = quote
+
+    # Failover legs held on this venue: trailing stop from the live quote, no REST
+    try:
+        on_failover_quote(quote)
+    except Exception as e:
+        logger.warning(f"[PAIR_MONITOR] Failed to check failover legs for {symbol}: {e}")
+
+    # Need at least two venues to calculate deltas
+    if len(quotes) < 2:
         return
 
-    quotes = latest_quotes[symbol]
-    exchanges = list(quotes.keys())
-    ex1, ex2 = exchanges[0], exchanges[1]
-    q1, q2 = quotes[ex1], quotes[ex2]
-
-    now = datetime.now(UTC)
-    age1 = (now - parse_timestamp(q1["timestamp"])).total_seconds()
-    age2 = (now - parse_timestamp(q2["timestamp"])).total_seconds()
-
-    if age1 > MAX_QUOTE_AGE_SEC or age2 > MAX_QUOTE_AGE_SEC:
+    now = time.time()
+    best = select_best_pair(quotes, now, symbol)
+    if best is None:
         return
 
-    # Delta calculation
-    delta_1 = ((q2["bid"] - q1["ask"]) / q1["ask"]) * 100
-    delta_2 = ((q1["bid"] - q2["ask"]) / q2["ask"]) * 100
+    best_delta, long_ex, short_ex, long_price, short_price, quote_ts = best
+    prev_spread = spread_stats.get(symbol, best_delta)
+    spread_stats[symbol] = prev_spread + SPREAD_EWMA_ALPHA * (best_delta - prev_spread)
 
-    best_delta = max(delta_1, delta_2)
-
-    if best_delta < MIN_DELTA:
+    settings = config_manager.settings
+    if best_delta < settings.MIN_DELTA:
         # Even if delta is small, update active positions      
         if symbol in get_active_symbols():
             try:
-                await on_price_update(symbol, bid, ask, timestamp)
+                await on_price_update(symbol, quote.bid, quote.ask, quote.timestamp)
             except Exception as e:
                 logger.warning(f"[PAIR_MONITOR] Failed to update position manager for {symbol}: {e}")
-        # Update all failovers for this symbol
-        for position_id, pos in failover_positions.items():
-            # print(f"[PAIR_MONITOR] Failover check: {position_id} | {pos['symbol']} | status={pos.get('status')}")
-            # print(symbol)
-            if pos["symbol"] == symbol and pos.get("status") != "closed":
-                logger.debug(f"[PAIR_MONITOR] Calling check_position for {position_id}")
-                try:
-                    await check_position(position_id)
-                except Exception as e:
-                    logger.warning(f"[PAIR_MONITOR] Failed to check failover position {position_id} for {symbol}: {e}")
         return
     
     # Check or initialize delta cache
-    cache_entry = delta_cache.get(symbol)
-    if cache_entry:
-        age = (now - cache_entry["timestamp"]).total_seconds()
+    first_seen = delta_cache.get(symbol)
+    if first_seen is not None:
+        age = now - first_seen
 
-        if age >= MIN_DELTA_LIFETIME and age <= DELTA_CACHE_EXPIRATION_SEC:
+        if age >= settings.MIN_DELTA_LIFETIME and age <= settings.DELTA_CACHE_EXPIRATION_SEC:
             del delta_cache[symbol]  # sufficient time passed — trigger
         else:
             return  # either too early or expired
     else:
-        delta_cache[symbol] = {"delta": best_delta, "timestamp": now}
+        delta_cache[symbol] = now
         return
 
     # Determine best opportunity
-    if delta_1 > delta_2:
-        arb = {
-            "symbol": symbol,
-            "long_exchange": ex1,
-            "short_exchange": ex2,
-            "long_price": q1["ask"],
-            "short_price": q2["bid"],
-            "raw_delta": delta_1,
-            "timestamp": now.isoformat()
-        }
-    else:
-        arb = {
-            "symbol": symbol,
-            "long_exchange": ex2,
-            "short_exchange": ex1,
-            "long_price": q2["ask"],
-            "short_price": q1["bid"],
-            "raw_delta": delta_2,
-            "timestamp": now.isoformat()
-        }
-
-    logger.info(f"[PAIR_MONITOR] {symbol}: Δ={arb['raw_delta']:.4f}%, long={arb['long_exchange']}, short={arb['short_exchange']}")
+    arb = ArbCandidate(symbol, long_ex, short_ex, long_price, short_price, best_delta, quote_ts)
+
+    logger.info(f"[PAIR_MONITOR] {symbol}: Δ={arb.raw_delta:.4f}%, long={arb.long_exchange}, short={arb.short_exchange}")
 
     # Send to position manager if symbol is active
     if symbol in get_active_symbols():
         try:
-            await on_price_update(symbol, bid, ask, timestamp)
+            await on_price_update(symbol, quote.bid, quote.ask, quote.timestamp)
         except Exception as e:
             logger.warning(f"[PAIR_MONITOR] Failed to update position manager for {symbol}: {e}")
 
-    # Also check failover regardless
-    for position_id, pos in failover_positions.items():
-        if pos["symbol"] == symbol and pos.get("status") != "closed":
-            # logger.debug(f"[PAIR_MONITOR] Calling check_position for {position_id}")
-            try:
-                await check_position(position_id)
-            except Exception as e:
-                logger.warning(f"[PAIR_MONITOR] Failed to check failover position {position_id} for {symbol}: {e}")
-
     # Launch simulations
     await arb_queue.put(arb)
 
+# Drop per-symbol state once a symbol leaves the traded universe
+def prune_symbol(symbol: str):
+    latest_quotes.pop(symbol, None)
+    delta_cache.pop(symbol, None)
+    spread_stats.pop(symbol, None)
+
 async def monitor_loop():
     while True:
-        payload = await price_queue.get()
+        quote = await price_queue.get()
         try:
-            await handle_price_update(payload)
+            await handle_price_update(quote)
         except Exception as e:
-            logger.exception(f"[PAIR_MONITOR] Error handling payload: {e}")
+            logger.exception(f"[PAIR_MONITOR] Error handling {quote!r}: {e}")
 
-async def arb_pipeline(arb: dict):
+async def arb_pipeline(arb: ArbCandidate):
     from fill_simulator import simulate_fill
     from funding_fetcher import fetch_funding
     from profit_simulator import simulate_profit
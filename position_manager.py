@@ -5,24 +5,22 @@ from decimal import Decimal
 from typing import Dict, Optional
 import aiohttp
 from order_manager import sign_bybit_request, sign_kucoin_request
+import config_manager
 from config_manager import get_config_value
 from order_manager import place_market_order, get_position_size
 from failover_manager import start_failover
 from pnl_fetcher import fetch_pnl
 from final_pnl_fetcher import fetch_final_pnl
 from advanced_trade_logger import log_new_position, update_position_result
+from records import Position
+from signal_engine import record_exit
+from dashboard import publish, retract
 
-TAKE_PROFIT_THRESHOLD = Decimal(get_config_value("TAKE_PROFIT_THRESHOLD", "10"))
-MAX_HOLD_TIME_MINUTES = int(get_config_value("MAX_HOLD_TIME_MINUTES", "120"))
-SL_IGNORE_MINUTES = int(get_config_value("SL_IGNORE_MINUTES", "5"))
 REST_POLL_INTERVAL = 5  # TODO: move to .env if adjustable in production
-STOP_LOSS_PCT = Decimal(get_config_value("STOP_LOSS_PCT", "1.0"))
 POSITION_CHECK_INTERVAL_SEC = int(get_config_value("POSITION_CHECK_INTERVAL_SEC", "60"))
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD", "100"))
-LEVERAGE = Decimal(get_config_value("LEVERAGE", "3"))
 
 # Storage for all active positions
-open_positions: Dict[str, dict] = {}
+open_positions: Dict[str, Position] = {}
 
 # Pairs currently being opened
 pending_positions: set[tuple[str, str, str]] = set()
@@ -35,37 +33,70 @@ async def on_price_update(symbol: str, bid: float, ask: float, timestamp: str):
     symbol_quotes[symbol] = {"bid": Decimal(str(bid)), "ask": Decimal(str(ask))}
 
     for pos_id, pos in open_positions.items():
-        if pos["symbol"] != symbol or pos["status"] != "open":
+        if pos.symbol != symbol or pos.status != "open":
             continue
 
-        long_ex = pos["long_exchange"]
-        short_ex = pos["short_exchange"]
+        long_ex = pos.long_exchange
+        short_ex = pos.short_exchange
 
         quotes = symbol_quotes.get(symbol, {})
         if "bid" not in quotes or "ask" not in quotes:
             continue
 
-        pos["last_price"] = {
+        pos.last_price = {
             long_ex: Decimal(str(quotes["ask"])) if long_ex else Decimal("0"),
             short_ex: Decimal(str(quotes["bid"])) if short_ex else Decimal("0")
         }
+        publish("positions", pos_id, pos)
 
         await check_position_exit(pos_id)
 
+# Time exit: MAX_HOLD_TIME_MINUTES after entry. With FUNDING_SETTLEMENT_EXIT, a settlement within
+# FUNDING_SETTLEMENT_WINDOW_MIN of that deadline moves it: the position leaves just before one it
+# would pay (net of both legs) and stays just past one it would collect.
+def _hold_deadline(pos: Position) -> tuple[datetime, str]:
+    settings = config_manager.settings
+    deadline = pos.entry_time + timedelta(minutes=settings.MAX_HOLD_TIME_MINUTES)
+    if not settings.FUNDING_SETTLEMENT_EXIT:
+        return deadline, "timeout"
+
+    from funding_fetcher import next_settlement
+    settlement = next_settlement(pos.symbol, pos.long_exchange, pos.short_exchange, pos.position_notional,
+                                 datetime.now(UTC).timestamp())
+    if settlement is None:
+        return deadline, "timeout"
+    at, cost = settlement
+    window = settings.FUNDING_SETTLEMENT_WINDOW_MIN * 60
+    deadline_ts = deadline.timestamp()
+    if cost > 0 and deadline_ts - window <= at <= deadline_ts:
+        return datetime.fromtimestamp(at - settings.FUNDING_SETTLEMENT_MARGIN_SEC, UTC), "funding_exit"
+    if cost < 0 and deadline_ts < at <= deadline_ts + window:
+        return datetime.fromtimestamp(at + settings.FUNDING_SETTLEMENT_MARGIN_SEC, UTC), "timeout"
+    return deadline, "timeout"
+
+# Notional the stop-loss percentages refer to: the filled one, so a LEVERAGE or
+# POSITION_SIZE_USD reload does not rescale positions that are already open
+def _position_value(pos: Position) -> Decimal:
+    if pos.position_notional:
+        return pos.position_notional
+    settings = config_manager.settings
+    return (pos.position_size_usd or settings.POSITION_SIZE_USD) * settings.LEVERAGE
+
 # Logic to check exit by TP/SL inside check_position_exit
 async def check_position_exit(pos_id: str):
     pos = open_positions[pos_id]
 
-    if pos["status"] != "open":
+    if pos.status != "open":
         return
 
-    if datetime.now(UTC) >= pos["entry_time"] + timedelta(minutes=MAX_HOLD_TIME_MINUTES):
-        await close_position(pos_id, reason="timeout")
+    deadline, reason = _hold_deadline(pos)
+    if datetime.now(UTC) >= deadline:
+        await close_position(pos_id, reason=reason)
         return
 
-    long_ex = pos["long_exchange"]
-    short_ex = pos["short_exchange"]
-    symbol = pos["symbol"]
+    long_ex = pos.long_exchange
+    short_ex = pos.short_exchange
+    symbol = pos.symbol
 
     pnl_long = await fetch_pnl(long_ex, symbol, side="long")
     pnl_short = await fetch_pnl(short_ex, symbol, side="short")
@@ -81,26 +112,22 @@ async def check_position_exit(pos_id: str):
         return
     #### ---- END OF SAFEGUARD ---- ####
 
-    entry_fee = pos.get("entry_fee", Decimal("0"))
-    funding = Decimal("0")
-    if isinstance(pos.get("funding"), dict):
-        funding = Decimal(str(pos["funding"].get("long", {}).get("cost", 0))) + Decimal(str(pos["funding"].get("short", {}).get("cost", 0)))
-    else:
-        funding = pos.get("funding", Decimal("0"))
-
-    INCLUDE_FUNDING = get_config_value("INCLUDE_FUNDING_IN_PROFIT", "true").lower() == "true"
+    entry_fee = pos.entry_fee
+    funding = pos.funding
 
-    if INCLUDE_FUNDING:
+    settings = config_manager.settings
+    if settings.INCLUDE_FUNDING_IN_PROFIT:
         total_funding = funding
     else:
         total_funding = Decimal("0")
 
     net_profit = pnl_long + pnl_short - (entry_fee * 2) - total_funding
 
-    pos["net_profit"] = net_profit
+    pos.net_profit = net_profit
+    publish("positions", pos_id, pos)
     
     # DEBUG: full profit breakdown for manual review
-    # print(f"[POSITION CHECK🔥] {symbol}: Net Profit (from PnL) = {net_profit} USD (Take Profit Threshold = {TAKE_PROFIT_THRESHOLD} USD)")
+    # print(f"[POSITION CHECK🔥] {symbol}: Net Profit (from PnL) = {net_profit} USD (Take Profit Threshold = {settings.TAKE_PROFIT_THRESHOLD} USD)")
 
     total_fees = entry_fee * 2  # entry + exit
     # ANSI Colors
@@ -124,7 +151,7 @@ async def check_position_exit(pos_id: str):
 
     logger.info(
         f"{profit_color}  ➔ Net Profit (from PnL) = {BOLD}{WHITE}{net_profit:.4f} USD{RESET} "
-        f"(Take Profit Threshold = {TAKE_PROFIT_THRESHOLD} USD) {profit_emoji}{RESET}"
+        f"(Take Profit Threshold = {settings.TAKE_PROFIT_THRESHOLD} USD) {profit_emoji}{RESET}"
     )
     logger.info(
         f"{CYAN}\n"
@@ -135,27 +162,27 @@ async def check_position_exit(pos_id: str):
     )
 
     # Take Profit check
-    if net_profit >= TAKE_PROFIT_THRESHOLD:
+    if net_profit >= settings.TAKE_PROFIT_THRESHOLD:
         await close_position(pos_id, reason="tp", net_profit=net_profit)
         return
 
     # Stop Loss check per leg (component-wise PnL)
-    position_value = POSITION_SIZE_USD * LEVERAGE
+    position_value = _position_value(pos)
 
     pnl_long_pct = (pnl_long / position_value) * 100
     pnl_short_pct = (pnl_short / position_value) * 100
 
-    if pnl_long_pct <= -STOP_LOSS_PCT or pnl_short_pct <= -STOP_LOSS_PCT:
+    if pnl_long_pct <= -settings.STOP_LOSS_PCT or pnl_short_pct <= -settings.STOP_LOSS_PCT:
         await handle_stop_loss(pos_id, net_profit)
         return
 
 async def handle_stop_loss(pos_id: str, net_profit: Decimal):
     pos = open_positions[pos_id]
-    symbol = pos["symbol"]
-    long_ex = pos["long_exchange"]
-    short_ex = pos["short_exchange"]
-    entry_fee = pos.get("entry_fee", Decimal("0"))
-    funding = pos.get("funding", Decimal("0"))
+    symbol = pos.symbol
+    long_ex = pos.long_exchange
+    short_ex = pos.short_exchange
+    entry_fee = pos.entry_fee
+    funding = pos.funding
 
     pnl_long = await fetch_pnl(long_ex, symbol, side="long")
     pnl_short = await fetch_pnl(short_ex, symbol, side="short")
@@ -164,7 +191,7 @@ async def handle_stop_loss(pos_id: str, net_profit: Decimal):
     net_pnl_long = pnl_long - (entry_fee) - (funding / 2)
     net_pnl_short = pnl_short - (entry_fee) - (funding / 2)
 
-    position_value = POSITION_SIZE_USD * LEVERAGE
+    position_value = _position_value(pos)
 
     pnl_long_pct = (net_pnl_long / position_value) * 100
     pnl_short_pct = (net_pnl_short / position_value) * 100
@@ -176,18 +203,19 @@ async def handle_stop_loss(pos_id: str, net_profit: Decimal):
         await close_position_side(pos_id, side="long", reason="sl")
         survivor_exchange = short_ex
         survivor_direction = "short"
-        survivor_entry_price = pos["entry_prices"][short_ex]
+        survivor_entry_price = pos.entry_prices[short_ex]
     else:
         # Stop triggered on short side
         await close_position_side(pos_id, side="short", reason="sl")
         survivor_exchange = long_ex
         survivor_direction = "long"
-        survivor_entry_price = pos["entry_prices"][long_ex]
+        survivor_entry_price = pos.entry_prices[long_ex]
 
     # Transition to failover mode
-    pos["status"] = "failover"
+    pos.status = "failover"
+    publish("positions", pos_id, pos)
 
-    logger.warning(f"[STOP LOSS CLOSED] 🟥Passing to failover qty = {pos['qty']} | symbol = {pos['symbol']} | position_id = {pos_id}")
+    logger.warning(f"[STOP LOSS CLOSED] 🟥Passing to failover qty = {pos.qty} | symbol = {pos.symbol} | position_id = {pos_id}")
 
     # --- Pass real PnL of closed side to failover ---
     if survivor_direction == "long":
@@ -195,7 +223,7 @@ async def handle_stop_loss(pos_id: str, net_profit: Decimal):
     else:
         closed_side = "long"
 
-    final_closed_pnl = pos.get(f"final_pnl_{closed_side}", Decimal("0"))
+    final_closed_pnl = pos.final_pnl_long if closed_side == "long" else pos.final_pnl_short
 
     await start_failover_from_position(
         position_id=pos_id,
@@ -203,7 +231,7 @@ async def handle_stop_loss(pos_id: str, net_profit: Decimal):
         direction=survivor_direction,
         symbol=symbol,
         entry_price=survivor_entry_price,
-        qty=pos["qty"],
+        qty=pos.qty,
         entry_fee=entry_fee,
         funding=funding,
         start_pnl=final_closed_pnl
@@ -220,13 +248,13 @@ async def start_failover_from_position(position_id: str, exchange: str, directio
     initial_pnl = start_pnl
 
     if direction == "long":
-        qty_for_failover = pos.get("qty_long", pos.get("qty", Decimal("0")))
+        qty_for_failover = pos.qty_long
     else:
-        qty_for_failover = pos.get("qty_short", pos.get("qty", Decimal("0")))
+        qty_for_failover = pos.qty_short
 
     logger.info(f"[FAILOVER INIT POSITION MANAGER] Passing to failover qty = {qty_for_failover} | Entry Price = {entry_price} | Position ID = {position_id}")
 
-    position_notional = pos.get("position_notional", qty * entry_price)
+    position_notional = pos.position_notional or qty * entry_price
 
     await start_failover(
         position_id=position_id,
@@ -243,9 +271,9 @@ async def start_failover_from_position(position_id: str, exchange: str, directio
 
 async def close_position_side(pos_id: str, side: str, reason: str):
     pos = open_positions[pos_id]
-    exchange = pos["long_exchange"] if side == "long" else pos["short_exchange"]
-    symbol = pos["symbol"]
-    qty = pos["qty_long"] if side == "long" else pos["qty_short"]
+    exchange = pos.long_exchange if side == "long" else pos.short_exchange
+    symbol = pos.symbol
+    qty = pos.qty_long if side == "long" else pos.qty_short
     opposite_side = "Sell" if side == "long" else "Buy"
     
     try:
@@ -264,16 +292,19 @@ async def close_position_side(pos_id: str, side: str, reason: str):
         # --- Fetch final PnL of the closed side ---
         pnl = await fetch_final_pnl(exchange, symbol, side)
         # If the other side is not closed yet — treat as delta-PnL
-        other_side = "short" if side == "long" else "long"
-        if pos.get(f"{other_side}_status") != "closed":
-            pos["start_pnl"] = pnl
+        other_status = pos.short_status if side == "long" else pos.long_status
+        if other_status != "closed":
+            pos.start_pnl = pnl
         if side == "long":
-            pos["final_pnl_long"] = pnl
+            pos.final_pnl_long = pnl
+            pos.long_status = "closed"
         else:
-            pos["final_pnl_short"] = pnl
-        pos[f"{side}_status"] = "closed"
-        pos["exit_reason"] = reason
-        pos["start_reason"] = reason
+            pos.final_pnl_short = pnl
+            pos.short_status = "closed"
+        pos.exit_reason = reason
+        pos.start_reason = reason
+        record_exit(symbol, reason)
+        publish("positions", pos_id, pos)
         logger.info(f"[STOP LOSS] Closed {side} position {pos_id} on {exchange} by stop-loss.")
         # --- Print final PnL to console ---
         print(
@@ -281,15 +312,16 @@ async def close_position_side(pos_id: str, side: str, reason: str):
         )
 
         # --- Send to Telegram ---
-        from telegram_bot import send_message
+        from telegram_bot import notify
 
         pnl_text = f"Final PnL: ${pnl:.4f}" if pnl != 0 else "⚠ Exchange returned PnL = 0. Please verify manually."
 
-        await send_message(
+        notify(
             f"❌ <b>Side closed {side.upper()} by stop-loss</b>\n"
             f"{symbol} | {exchange}\n"
             f"Reason: {reason}\n"
-            f"{pnl_text}"
+            f"{pnl_text}",
+            critical=True,
         )
     except Exception as e:
         logger.error(f"[STOP LOSS] Failed to close {side} position {pos_id}: {e}")
@@ -300,7 +332,7 @@ async def _position_stop_loss_check_loop():
         for pos_id in list(open_positions.keys()):
             try:
                 pos = open_positions[pos_id]
-                if pos["status"] == "open":
+                if pos.status == "open":
                     await check_position_exit(pos_id)
             except Exception as e:
                 logger.error(f"[POSITION CHECK LOOP] Error checking position {pos_id}: {e}")
@@ -309,21 +341,22 @@ async def _position_stop_loss_check_loop():
 # Closing position on both sides
 async def close_position(pos_id: str, reason: str, net_profit: Optional[Decimal] = None):
     pos = open_positions[pos_id]
-    if pos["status"] != "open":
+    if pos.status != "open":
         return
 
-    symbol = pos["symbol"]
-    long_exchange = pos["long_exchange"]
-    short_exchange = pos["short_exchange"]
+    symbol = pos.symbol
+    long_exchange = pos.long_exchange
+    short_exchange = pos.short_exchange
 
     # Enable duplicate protection during full close
     set_pending_open(symbol, long_exchange, short_exchange, True)
 
-    pos["status"] = "closing"
+    pos.status = "closing"
+    publish("positions", pos_id, pos)
 
     try:
-        qty_long = pos["qty_long"]
-        qty_short = pos["qty_short"]
+        qty_long = pos.qty_long
+        qty_short = pos.qty_short
 
         success = True
 
@@ -356,26 +389,28 @@ async def close_position(pos_id: str, reason: str, net_profit: Optional[Decimal]
                     success = False
 
         if success:
-            pos["status"] = "closed"
-            pos["exit_time"] = datetime.now(UTC)
-            pos["exit_reason"] = reason
-            pos["start_reason"] = reason
+            pos.status = "closed"
+            retract("positions", pos_id)
+            pos.exit_time = datetime.now(UTC)
+            pos.exit_reason = reason
+            pos.start_reason = reason
+            record_exit(symbol, reason)
 
             # --- Fetch final PnL of both sides ---
             pnl_long = await fetch_final_pnl(long_exchange, symbol, "long")
             pnl_short = await fetch_final_pnl(short_exchange, symbol, "short")
 
-            pos["final_pnl_long"] = pnl_long
-            pos["final_pnl_short"] = pnl_short
-            pos["final_pnl_total"] = pnl_long + pnl_short
-            pos["start_pnl"] = pos["final_pnl_long"] + pos["final_pnl_short"]
+            pos.final_pnl_long = pnl_long
+            pos.final_pnl_short = pnl_short
+            pos.final_pnl_total = pnl_long + pnl_short
+            pos.start_pnl = pos.final_pnl_long + pos.final_pnl_short
 
-            logger.info(f"[POSITION MANAGER] ✅ Final total PnL: LONG={pnl_long:.4f} + SHORT={pnl_short:.4f} = {pos['final_pnl_total']:.4f} USD")
+            logger.info(f"[POSITION MANAGER] ✅ Final total PnL: LONG={pnl_long:.4f} + SHORT={pnl_short:.4f} = {pos.final_pnl_total:.4f} USD")
 
-            from telegram_bot import send_message
+            from telegram_bot import notify
 
-            final_pnl_long = pos.get("final_pnl_long", Decimal("0"))
-            final_pnl_short = pos.get("final_pnl_short", Decimal("0"))
+            final_pnl_long = pos.final_pnl_long
+            final_pnl_short = pos.final_pnl_short
             final_pnl = final_pnl_long + final_pnl_short
 
             if final_pnl != 0:
@@ -387,24 +422,27 @@ async def close_position(pos_id: str, reason: str, net_profit: Optional[Decimal]
             else:
                 pnl_text = (
                     f"⚠ Failed to fetch actual PnL (exchange may not have returned data). "
-                    f"Showing estimated: ${pos.get('net_profit', Decimal('0')):.4f}"
+                    f"Showing estimated: ${pos.net_profit:.4f}"
                 )
 
-            await send_message(
+            notify(
                 f"❌ <b>Position closed</b>\n"
                 f"{symbol} | {long_exchange}/{short_exchange}\n"
                 f"Reason: {reason}\n"
-                f"{pnl_text}"
+                f"{pnl_text}",
+                critical=True,
             )
 
         else:
-            pos["status"] = "error"
+            pos.status = "error"
+            publish("positions", pos_id, pos)
             logger.warning(f"[POSITION MANAGER] ⚠️ Position {symbol} closed with errors. Needs review.")
 
     except Exception as e:
         logger.error(f"[POSITION MANAGER] ❌❌❌ Critical error closing position {symbol}: {e}")
-        pos["status"] = "error"
-        pos["error"] = str(e)
+        pos.status = "error"
+        pos.error = str(e)
+        publish("positions", pos_id, pos)
 
     finally:
         # Clear pending regardless
@@ -412,41 +450,45 @@ async def close_position(pos_id: str, reason: str, net_profit: Optional[Decimal]
     update_position_result(pos)
 
 # Register new position
-def register_position(position: dict):
-    pos_id = position["position_id"]
-    open_positions[pos_id] = {
-        **position,
-        "status": "open",
-        "entry_time": datetime.now(UTC),
-        "last_price": {},
-    }
-    active_symbols.add(position["symbol"])
-    logger.info(f"[POSITION MANAGER] ▶️ REGISTERED: {position['symbol']} | ID = {pos_id}")
-
-    from telegram_bot import send_message
-    asyncio.create_task(send_message(
+def register_position(position: Position):
+    pos_id = position.position_id
+    position.status = "open"
+    position.entry_time = datetime.now(UTC)
+    position.last_price = {}
+    open_positions[pos_id] = position
+    active_symbols.add(position.symbol)
+    publish("positions", pos_id, position)
+    logger.info(f"[POSITION MANAGER] ▶️ REGISTERED: {position.symbol} | ID = {pos_id}")
+
+    from telegram_bot import notify
+    settings = config_manager.settings
+    notify(
         f"✅ <b>Position opened</b>\n"
-        f"{position['symbol']} | {position['long_exchange']}/{position['short_exchange']}\n"
-        f"Size: {POSITION_SIZE_USD} x{LEVERAGE}\n"
+        f"{position.symbol} | {position.long_exchange}/{position.short_exchange}\n"
+        f"Size: {position.position_size_usd or settings.POSITION_SIZE_USD} x{settings.LEVERAGE}\n"
         f"PnL: $0.00"
-    ))
+    )
     # Log the trade
     log_new_position(position)
 
 def get_active_symbols() -> set[str]:
     return active_symbols
 
+def prune_symbol_quotes(symbol: str) -> None:
+    if symbol not in active_symbols:
+        symbol_quotes.pop(symbol, None)
+
 # Get all active positions
-def get_open_positions() -> list[dict]:
-    return [p for p in open_positions.values() if p["status"] == "open"]
+def get_open_positions() -> list[Position]:
+    return [p for p in open_positions.values() if p.status == "open"]
 
 def can_open_position(symbol: str, long_ex: str, short_ex: str) -> bool:
     for p in open_positions.values():
         if (
-            p["status"] == "open" and
-            p["symbol"] == symbol and
-            p["long_exchange"] == long_ex and
-            p["short_exchange"] == short_ex
+            p.status == "open" and
+            p.symbol == symbol and
+            p.long_exchange == long_ex and
+            p.short_exchange == short_ex
         ):
             return False
     return True
@@ -458,36 +500,17 @@ async def close_all_positions():
     # Close regular positions
     for pos_id in list(open_positions.keys()):
         pos = open_positions[pos_id]
-        if pos["status"] == "open":
+        if pos.status == "open":
             await close_position(pos_id, reason="manual_shutdown")
 
     # Close failover positions
     from failover_manager import failover_positions, exit_position
     for pos_id in list(failover_positions.keys()):
         pos = failover_positions[pos_id]
-        if pos.get("status") != "closed":
-            print(f"[SHUTDOWN] Closing failover position {pos_id} ({pos['symbol']})...")
+        if pos.status == "open":  # "closing" legs already have their exit order in flight
+            print(f"[SHUTDOWN] Closing failover position {pos_id} ({pos.symbol})...")
             await exit_position(pos_id, reason="manual_shutdown")
 
-# Return position info for UI charts
-def get_position_data_for_ui() -> list[dict]:
-    return [
-        {
-            "position_id": p["position_id"],
-            "symbol": p["symbol"],
-            "long_exchange": p["long_exchange"],
-            "short_exchange": p["short_exchange"],
-            "entry_prices": p.get("entry_prices", {}),
-            "current_prices": p.get("last_price", {}),
-            "TP": TAKE_PROFIT_THRESHOLD,
-            "SL": "on_exchange",
-            "PnL": p.get("net_profit", Decimal("0")),
-            "status": p["status"],
-            "opened_at": p["entry_time"].isoformat(),
-        }
-        for p in open_positions.values() if p["status"] == "open"
-    ]
-
 def is_pending_open(symbol: str, long_ex: str, short_ex: str) -> bool:
     return (symbol, long_ex, short_ex) in pending_positions
 
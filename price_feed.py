@@ -1,48 +1,381 @@
 import asyncio
 import csv
 import json
+import random
+import time
 from logger import logger
+from rate_limiter import TokenBucket, acquire_slot, observe_response
 import websockets
 import aiohttp
-from datetime import datetime, UTC
 from pathlib import Path
 from typing import Dict, List
+from config_manager import get_config_value
+from exchange_adapters import BYBIT_WS_PUBLIC_URL, KUCOIN_REST_URL
+from records import Quote
 
-# Queue for sending data to pair_monitor
+# Queue of Quote objects for pair_monitor. A quote is queued at most once: ticks arriving
+# before pair_monitor takes it only overwrite its fields (conflation).
 price_queue: asyncio.Queue = asyncio.Queue()
 
 # Path to CSV
 CSV_PATH = Path("data/matched_pairs_enriched_filtered.csv")
 
-# Interface for Bybit
-class BybitWSClient:
+# Running WS clients by exchange name (used by universe_manager for hot (un)subscribe)
+ws_clients: Dict[str, "BaseWSClient"] = {}
+
+# Connection supervision
+WS_BACKOFF_BASE_SEC = float(get_config_value("WS_BACKOFF_BASE_SEC", "1"))
+WS_BACKOFF_MAX_SEC = float(get_config_value("WS_BACKOFF_MAX_SEC", "60"))
+WS_STABLE_AFTER_SEC = float(get_config_value("WS_STABLE_AFTER_SEC", "30"))  # uptime that resets the backoff
+WS_SYMBOL_STALE_SEC = float(get_config_value("WS_SYMBOL_STALE_SEC", "60"))  # silent symbol -> resubscribe
+WS_CHUNK_STALE_SEC = float(get_config_value("WS_CHUNK_STALE_SEC", "30"))  # silent connection -> reconnect
+WS_WATCHDOG_INTERVAL_SEC = float(get_config_value("WS_WATCHDOG_INTERVAL_SEC", "5"))
+
+# (exchange, canonical symbol) whose feed is down or silent; pair_monitor ignores these quotes
+untradeable_quotes: set[tuple[str, str]] = set()
+
+# Shared chunk bookkeeping: symbols are spread over connections of up to
+# max_symbols_per_ws each, and can be added/removed on live sockets without reconnecting.
+class BaseWSClient:
+    exchange = ""
+
     def __init__(self, symbols: List[str]):
         self.symbols = symbols
-        self.ws_url = "wss://stream.bybit.com/v5/public/linear"
         self.max_symbols_per_ws = 100
         self.connections = []  # WebSocket task list
-        self.last_quotes = {}  # symbol -> {'bid': float, 'ask': float}
+        self.chunks: Dict[int, List[str]] = {}  # chunk_id -> symbols (mutated in place)
+        self.chunk_ws: Dict[int, object] = {}  # chunk_id -> live socket
+        self.chunk_tasks: Dict[int, asyncio.Task] = {}
+        self.symbol_chunk: Dict[str, int] = {}  # symbol -> chunk_id
+        self._next_chunk_id = 0
+        self.started_at = 0.0
+        self._awaiting_first_quote: set[str] = set()
+        # Supervision state
+        self.last_update: Dict[str, float] = {}  # venue symbol -> monotonic time of last tick
+        self.stale_symbols: set[str] = set()  # venue symbols currently marked untradeable
+        self.chunk_connected_at: Dict[int, float] = {}
+        self.chunk_down_since: Dict[int, float] = {}
+        self.chunk_outage_total: Dict[int, float] = {}  # chunk_id -> accumulated outage seconds
+        self.chunk_reconnects: Dict[int, int] = {}
+        self._resubscribed_at: Dict[str, float] = {}
+        self._canonical_symbols: Dict[str, str] = {}
+        self.quotes: Dict[str, Quote] = {}  # venue symbol -> reusable Quote
 
     async def connect(self):
+        self.started_at = time.perf_counter()
+        self._awaiting_first_quote = set(self.symbols)
         symbol_chunks = self.split_symbols(self.symbols, self.max_symbols_per_ws)
         for chunk in symbol_chunks:
-            task = asyncio.create_task(self.connect_chunk(chunk))
-            self.connections.append(task)
-        await asyncio.gather(*self.connections)
+            self._start_chunk(chunk)
+        watchdog_task = asyncio.create_task(self.watchdog())
+        try:
+            # Chunks come and go at runtime, so wait until cancelled instead of gathering a fixed list
+            await asyncio.Event().wait()
+        finally:
+            watchdog_task.cancel()
+            for task in list(self.chunk_tasks.values()):
+                task.cancel()
 
     def split_symbols(self, symbols: List[str], max_per_chunk: int) -> List[List[str]]:
         return [symbols[i:i + max_per_chunk] for i in range(0, len(symbols), max_per_chunk)]
 
-    async def connect_chunk(self, chunk: List[str]):
-        while True:
+    def _start_chunk(self, chunk: List[str]) -> int:
+        chunk_id = self._next_chunk_id
+        self._next_chunk_id += 1
+        self.chunks[chunk_id] = chunk
+        for symbol in chunk:
+            self.symbol_chunk[symbol] = chunk_id
+        task = asyncio.create_task(self.connect_chunk(chunk_id))
+        self.chunk_tasks[chunk_id] = task
+        self.connections.append(task)
+        return chunk_id
+
+    async def _stop_chunk(self, chunk_id: int):
+        self.chunks.pop(chunk_id, None)
+        self.chunk_connected_at.pop(chunk_id, None)
+        self.chunk_down_since.pop(chunk_id, None)
+        self.chunk_outage_total.pop(chunk_id, None)
+        self.chunk_reconnects.pop(chunk_id, None)
+        task = self.chunk_tasks.pop(chunk_id, None)
+        if task:
+            task.cancel()
+            if task in self.connections:
+                self.connections.remove(task)
+        ws = self.chunk_ws.pop(chunk_id, None)
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    # Time-to-first-quote for the whole universe, logged once when every symbol has ticked
+    def _record_first_quote(self, symbol: str):
+        self._awaiting_first_quote.discard(symbol)
+        if not self._awaiting_first_quote:
+            elapsed = time.perf_counter() - self.started_at
+            logger.info(f"[{self.exchange.upper()}] First quote received for all {len(self.symbols)} symbols in {elapsed:.2f} s")
+
+    def get_symbols(self) -> set[str]:
+        return set(self.symbol_chunk.keys())
+
+    async def add_symbols(self, symbols: List[str]):
+        new_symbols = [s for s in dict.fromkeys(symbols) if s not in self.symbol_chunk]
+        if not new_symbols:
+            return
+
+        # Fill the least-loaded chunks first, open new connections only when all are full
+        added: Dict[int, List[str]] = {}
+        for symbol in new_symbols:
+            open_chunks = [cid for cid, chunk in self.chunks.items() if len(chunk) < self.max_symbols_per_ws]
+            if not open_chunks:
+                break
+            chunk_id = min(open_chunks, key=lambda cid: len(self.chunks[cid]))
+            self.chunks[chunk_id].append(symbol)
+            self.symbol_chunk[symbol] = chunk_id
+            added.setdefault(chunk_id, []).append(symbol)
+
+        for chunk_id, chunk_symbols in added.items():
+            ws = self.chunk_ws.get(chunk_id)
+            if ws is None:
+                continue  # connect_chunk subscribes to the whole chunk on (re)connect
+            try:
+                await self.subscribe(ws, chunk_symbols)
+            except Exception as e:
+                logger.warning(f"[{self.exchange.upper()}] Hot subscribe failed for {len(chunk_symbols)} symbols: {e}")
+
+        remaining = [s for s in new_symbols if s not in self.symbol_chunk]
+        for chunk in self.split_symbols(remaining, self.max_symbols_per_ws):
+            self._start_chunk(chunk)
+
+        self.symbols = list(self.symbol_chunk.keys())
+        logger.info(f"[{self.exchange.upper()}] Added {len(new_symbols)} symbols ({len(self.chunks)} connections)")
+
+    async def remove_symbols(self, symbols: List[str]):
+        removed: Dict[int, List[str]] = {}
+        for symbol in symbols:
+            chunk_id = self.symbol_chunk.pop(symbol, None)
+            if chunk_id is None:
+                continue
+            self.chunks[chunk_id].remove(symbol)
+            removed.setdefault(chunk_id, []).append(symbol)
+            self._forget_symbol(symbol)
+            self.on_symbol_removed(symbol)
+
+        for chunk_id, chunk_symbols in removed.items():
+            if not self.chunks.get(chunk_id):
+                await self._stop_chunk(chunk_id)
+                continue
+            ws = self.chunk_ws.get(chunk_id)
+            if ws is None:
+                continue
             try:
-                ws = await asyncio.wait_for(websockets.connect(self.ws_url), timeout=10)
-                await self.subscribe(ws, chunk)
-                logger.info(f"[BYBIT] Subscribed to {len(chunk)} symbols")
-                await self.handle_messages(ws)
+                await self.unsubscribe(ws, chunk_symbols)
             except Exception as e:
-                logger.warning(f"[BYBIT] WS connection failed for chunk {chunk[:3]}... ({len(chunk)} symbols). Retrying in 5s. Reason: {e}")
-                await asyncio.sleep(5)
+                logger.warning(f"[{self.exchange.upper()}] Hot unsubscribe failed for {len(chunk_symbols)} symbols: {e}")
+
+        self.symbols = list(self.symbol_chunk.keys())
+        if removed:
+            logger.info(f"[{self.exchange.upper()}] Removed {sum(len(v) for v in removed.values())} symbols ({len(self.chunks)} connections)")
+
+    # Drain the smallest chunk into the others while fewer connections would do
+    async def rebalance(self):
+        while len(self.chunks) > 1:
+            total = sum(len(chunk) for chunk in self.chunks.values())
+            needed = -(-total // self.max_symbols_per_ws)
+            if len(self.chunks) <= needed:
+                break
+            smallest = min(self.chunks, key=lambda cid: len(self.chunks[cid]))
+            moved = list(self.chunks[smallest])
+            await self._stop_chunk(smallest)
+            for symbol in moved:
+                self.symbol_chunk.pop(symbol, None)
+            await self.add_symbols(moved)
+            logger.info(f"[{self.exchange.upper()}] Rebalanced {len(moved)} symbols, {len(self.chunks)} connections left")
+
+    def on_symbol_removed(self, symbol: str):
+        self.quotes.pop(symbol, None)
+
+    # --- Tradeability ---
+    def _canonical(self, symbol: str) -> str:
+        canonical = self._canonical_symbols.get(symbol)
+        if canonical is None:
+            from exchange_adapters import get_adapter
+            canonical = get_adapter(self.exchange).to_canonical_symbol(symbol)
+            self._canonical_symbols[symbol] = canonical
+        return canonical
+
+    def _mark_untradeable(self, symbols: List[str]):
+        for symbol in symbols:
+            if symbol not in self.stale_symbols:
+                self.stale_symbols.add(symbol)
+                untradeable_quotes.add((self.exchange, self._canonical(symbol)))
+
+    def _mark_tradeable(self, symbol: str):
+        self.stale_symbols.discard(symbol)
+        untradeable_quotes.discard((self.exchange, self._canonical(symbol)))
+
+    def _forget_symbol(self, symbol: str):
+        self._mark_tradeable(symbol)
+        self.last_update.pop(symbol, None)
+        self._resubscribed_at.pop(symbol, None)
+        self._awaiting_first_quote.discard(symbol)
+
+    # Called by parse_message on every tick — keep it to a couple of dict/set operations
+    def _on_quote(self, symbol: str):
+        self.last_update[symbol] = time.monotonic()
+        if symbol in self.stale_symbols:
+            self._mark_tradeable(symbol)
+        if self._awaiting_first_quote:
+            self._record_first_quote(symbol)
+
+    def _quote(self, symbol: str) -> Quote:
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            quote = self.quotes[symbol] = Quote(self._canonical(symbol), self.exchange)
+        return quote
+
+    # Stamp the updated quote and hand it to pair_monitor unless it is still queued
+    def _publish(self, symbol: str, quote: Quote):
+        quote.ts = time.time()
+        if not quote.queued:
+            quote.queued = True
+            price_queue.put_nowait(quote)
+
+    # --- Outage accounting ---
+    def _mark_chunk_down(self, chunk_id: int):
+        if chunk_id in self.chunk_down_since or chunk_id not in self.chunks:
+            return
+        self.chunk_down_since[chunk_id] = time.monotonic()
+        self._mark_untradeable(self.chunks[chunk_id])
+
+    def _mark_chunk_up(self, chunk_id: int):
+        down_since = self.chunk_down_since.pop(chunk_id, None)
+        if down_since is None:
+            return
+        outage = time.monotonic() - down_since
+        self.chunk_outage_total[chunk_id] = self.chunk_outage_total.get(chunk_id, 0.0) + outage
+        logger.info(
+            f"[{self.exchange.upper()}] Chunk {chunk_id} recovered after {outage:.1f}s outage "
+            f"(total {self.chunk_outage_total[chunk_id]:.1f}s, {self.chunk_reconnects.get(chunk_id, 0)} reconnects)"
+        )
+
+    def get_outage_stats(self) -> Dict[int, dict]:
+        now = time.monotonic()
+        return {
+            chunk_id: {
+                "symbols": len(chunk),
+                "connected": chunk_id in self.chunk_ws,
+                "down_for_sec": now - self.chunk_down_since[chunk_id] if chunk_id in self.chunk_down_since else 0.0,
+                "outage_total_sec": self.chunk_outage_total.get(chunk_id, 0.0),
+                "reconnects": self.chunk_reconnects.get(chunk_id, 0),
+            }
+            for chunk_id, chunk in self.chunks.items()
+        }
+
+    # Full-jitter exponential backoff
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(WS_BACKOFF_BASE_SEC, min(WS_BACKOFF_MAX_SEC, WS_BACKOFF_BASE_SEC * (2 ** attempt)))
+
+    # --- Connection supervisor (one per chunk) ---
+    async def connect_chunk(self, chunk_id: int):
+        attempt = 0
+        tag = self.exchange.upper()
+        while chunk_id in self.chunks:
+            chunk = self.chunks[chunk_id]
+            connected_at = None
+            ws = None
+            try:
+                ws = await self.open_connection(chunk_id)
+                connected_at = time.monotonic()
+                self.chunk_ws[chunk_id] = ws
+                self.chunk_connected_at[chunk_id] = connected_at
+                started = time.perf_counter()
+                await self.subscribe(ws, list(chunk))
+                logger.info(f"[{tag}] Subscribed to {len(chunk)} symbols in {(time.perf_counter() - started) * 1000:.0f} ms")
+                await self.handle_messages(ws, chunk_id)
+                reason = "connection closed"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+            finally:
+                self.chunk_ws.pop(chunk_id, None)
+                await self.close_connection(chunk_id)
+                if ws is not None:
+                    try:
+                        await ws.close()  # also on cancellation, so the socket doesn't outlive its chunk
+                    except Exception:
+                        pass
+
+            if chunk_id not in self.chunks:
+                break
+            self._mark_chunk_down(chunk_id)
+            self.chunk_reconnects[chunk_id] = self.chunk_reconnects.get(chunk_id, 0) + 1
+
+            if connected_at is not None and time.monotonic() - connected_at >= WS_STABLE_AFTER_SEC:
+                attempt = 0
+            delay = self._backoff_delay(attempt)
+            attempt += 1
+            logger.warning(f"[{tag}] WS connection failed for chunk {chunk[:3]}... ({len(chunk)} symbols). Retrying in {delay:.1f}s. Reason: {reason}")
+            await asyncio.sleep(delay)
+
+    # --- Watchdog: silent symbols get resubscribed, silent connections get recycled ---
+    async def watchdog(self):
+        tag = self.exchange.upper()
+        while True:
+            await asyncio.sleep(WS_WATCHDOG_INTERVAL_SEC)
+            now = time.monotonic()
+            for chunk_id, chunk in list(self.chunks.items()):
+                ws = self.chunk_ws.get(chunk_id)
+                if ws is None or not chunk:
+                    continue
+                connected_at = self.chunk_connected_at.get(chunk_id, now)
+                try:
+                    last_any = max(self.last_update.get(s, 0.0) for s in chunk)
+                    if now - max(last_any, connected_at) > WS_CHUNK_STALE_SEC:
+                        logger.warning(f"[{tag}] Chunk {chunk_id} open but silent for {now - max(last_any, connected_at):.0f}s, forcing reconnect")
+                        await ws.close()
+                        continue
+
+                    silent = [s for s in chunk if now - max(self.last_update.get(s, 0.0), connected_at) > WS_SYMBOL_STALE_SEC]
+                    if not silent:
+                        continue
+                    self._mark_untradeable(silent)
+                    to_resubscribe = [s for s in silent if now - self._resubscribed_at.get(s, 0.0) > WS_SYMBOL_STALE_SEC]
+                    if to_resubscribe:
+                        logger.info(f"[{tag}] Resubscribing {len(to_resubscribe)} silent symbols on chunk {chunk_id}")
+                        await self.unsubscribe(ws, to_resubscribe)
+                        await self.subscribe(ws, to_resubscribe)
+                        for symbol in to_resubscribe:
+                            self._resubscribed_at[symbol] = now
+                except Exception as e:
+                    logger.warning(f"[{tag}] Watchdog failed for chunk {chunk_id}: {e}")
+
+    async def open_connection(self, chunk_id: int):
+        raise NotImplementedError
+
+    async def close_connection(self, chunk_id: int):
+        pass
+
+    async def handle_messages(self, ws, chunk_id: int):
+        raise NotImplementedError
+
+    async def subscribe(self, ws, chunk: List[str]):
+        raise NotImplementedError
+
+    async def unsubscribe(self, ws, chunk: List[str]):
+        raise NotImplementedError
+
+# Interface for Bybit
+class BybitWSClient(BaseWSClient):
+    exchange = "Bybit"
+
+    def __init__(self, symbols: List[str]):
+        super().__init__(symbols)
+        self.ws_url = BYBIT_WS_PUBLIC_URL
+
+    async def open_connection(self, chunk_id: int):
+        return await asyncio.wait_for(websockets.connect(self.ws_url), timeout=10)
 
     async def subscribe(self, ws, chunk: List[str]):
         args = [f"tickers.{symbol}" for symbol in chunk]
@@ -52,8 +385,18 @@ class BybitWSClient:
         }
         await ws.send(json.dumps(sub_msg))
 
-    async def handle_messages(self, ws):
+    async def unsubscribe(self, ws, chunk: List[str]):
+        args = [f"tickers.{symbol}" for symbol in chunk]
+        unsub_msg = {
+            "op": "unsubscribe",
+            "args": args
+        }
+        await ws.send(json.dumps(unsub_msg))
+
+    async def handle_messages(self, ws, chunk_id: int):
         async for message in ws:
+            if chunk_id in self.chunk_down_since:
+                self._mark_chunk_up(chunk_id)
             try:
                 data = json.loads(message)
                 if "data" not in data:
@@ -64,84 +407,103 @@ class BybitWSClient:
 
     async def parse_message(self, msg: Dict):
         symbol = msg["data"]["symbol"]
-        prev = self.last_quotes.get(symbol, {})
+        self._on_quote(symbol)
+        quote = self._quote(symbol)
 
-        bid = float(msg["data"].get("bid1Price") or prev.get("bid", 0))
-        ask = float(msg["data"].get("ask1Price") or prev.get("ask", 0))
+        # Delta updates omit unchanged sides; keep the previous value
+        quote.bid = float(msg["data"].get("bid1Price") or quote.bid)
+        quote.ask = float(msg["data"].get("ask1Price") or quote.ask)
 
-        self.last_quotes[symbol] = {'bid': bid, 'ask': ask}
-
-        timestamp = datetime.now(UTC).isoformat()
-
-        payload = {
-            "pair_id": f"{symbol}-Bybit",
-            "exchange": "Bybit",
-            "bid": bid,
-            "ask": ask,
-            "timestamp": timestamp,
-        }
+        self._publish(symbol, quote)
+        # logger.info(f"[BYBIT] {symbol}: bid={quote.bid:.8f}, ask={quote.ask:.8f} @ {quote.timestamp}")
 
-        await price_queue.put(payload)
-        # logger.info(f"[BYBIT] {symbol}: bid={bid:.8f}, ask={ask:.8f} @ {timestamp}")
+# KuCoin futures public WS limits: 100 uplink messages per 10 s per connection,
+# up to 100 symbols per comma-joined topic
+KUCOIN_MAX_SYMBOLS_PER_TOPIC = 100
+KUCOIN_UPLINK_RATE = 10  # messages per second
+KUCOIN_UPLINK_BURST = 100
+KUCOIN_TOKEN_TTL_SEC = 12 * 3600  # bullet tokens live 24h; refresh well before
 
 # Interface for KuCoin
-class KuCoinWSClient:
+class KuCoinWSClient(BaseWSClient):
+    exchange = "KuCoin"
+
     def __init__(self, symbols: List[str]):
-        self.symbols = symbols
+        super().__init__(symbols)
         self.token = None
         self.endpoint = None
-        self.max_symbols_per_ws = 100
-        self.connections = []
+        self.ping_interval = 15  # sec, replaced by server-advertised pingInterval
+        self.token_fetched_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._http_session = None
+        self.chunk_buckets: Dict[int, TokenBucket] = {}
+        self.ping_tasks: Dict[int, asyncio.Task] = {}
 
-    async def connect(self):
-        symbol_chunks = self.split_symbols(self.symbols, self.max_symbols_per_ws)
-        for chunk in symbol_chunks:
-            task = asyncio.create_task(self.connect_chunk(chunk))
-            self.connections.append(task)
-        await asyncio.gather(*self.connections)
-
-    def split_symbols(self, symbols: List[str], max_per_chunk: int) -> List[List[str]]:
-        return [symbols[i:i + max_per_chunk] for i in range(0, len(symbols), max_per_chunk)]
-
-    async def get_ws_token(self):
-        url = "https://api-futures.kucoin.com/api/v1/bullet-public"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url) as resp:
+    # One bullet token is shared by every chunk; only refetched when stale or rejected
+    async def get_ws_token(self, force: bool = False):
+        async with self._token_lock:
+            fresh = self.token and time.monotonic() - self.token_fetched_at < KUCOIN_TOKEN_TTL_SEC
+            if fresh and not force:
+                return
+            if self._http_session is None or self._http_session.closed:
+                self._http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+            url = f"{KUCOIN_REST_URL}/api/v1/bullet-public"
+            await acquire_slot("KuCoin", "market")
+            async with self._http_session.post(url) as resp:
+                observe_response("KuCoin", "market", resp)
                 res = await resp.json()
+                server = res["data"]["instanceServers"][0]
                 self.token = res["data"]["token"]
-                self.endpoint = res["data"]["instanceServers"][0]["endpoint"]
+                self.endpoint = server["endpoint"]
+                self.ping_interval = int(server.get("pingInterval", 15000)) / 1000
+                self.token_fetched_at = time.monotonic()
 
-    async def connect_chunk(self, chunk: List[str]):
-        while True:
-            try:
-                await self.get_ws_token()
-                ws_url = f"{self.endpoint}?token={self.token}"
-                ws = await asyncio.wait_for(websockets.connect(ws_url, ping_interval=None), timeout=10)
-                asyncio.create_task(self.ws_ping(ws))
-                await self.subscribe(ws, chunk)
-                logger.info(f"[KUCOIN] Subscribed to {len(chunk)} symbols")
-                await self.handle_messages(ws)
-            except Exception as e:
-                logger.warning(f"[KUCOIN] WS connection failed for chunk {chunk[:3]}... Retrying. Reason: {e}")
-                await asyncio.sleep(5)
+    async def open_connection(self, chunk_id: int):
+        # Reconnecting after a drop: the token may have been rejected, fetch a new one
+        await self.get_ws_token(force=chunk_id in self.chunk_down_since)
+        ws_url = f"{self.endpoint}?token={self.token}"
+        ws = await asyncio.wait_for(websockets.connect(ws_url, ping_interval=None), timeout=10)
+        self.chunk_buckets[chunk_id] = TokenBucket(KUCOIN_UPLINK_RATE, KUCOIN_UPLINK_BURST)
+        self.ping_tasks[chunk_id] = asyncio.create_task(self.ws_ping(ws))
+        return ws
 
-    async def subscribe(self, ws, chunk: List[str]):
-        for i, symbol in enumerate(chunk):
-            sub_msg = {
-                "id": f"sub-{symbol}",
-                "type": "subscribe",
-                "topic": f"/contractMarket/tickerV2:{symbol}",
+    async def close_connection(self, chunk_id: int):
+        ping_task = self.ping_tasks.pop(chunk_id, None)
+        if ping_task:
+            ping_task.cancel()
+        self.chunk_buckets.pop(chunk_id, None)
+
+    def _chunk_bucket(self, ws) -> TokenBucket:
+        for chunk_id, chunk_ws in self.chunk_ws.items():
+            if chunk_ws is ws:
+                return self.chunk_buckets.setdefault(chunk_id, TokenBucket(KUCOIN_UPLINK_RATE, KUCOIN_UPLINK_BURST))
+        return TokenBucket(KUCOIN_UPLINK_RATE, KUCOIN_UPLINK_BURST)
+
+    # One message per batch of symbols: /contractMarket/tickerV2:SYM1,SYM2,...
+    async def _send_topics(self, ws, op: str, chunk: List[str]):
+        bucket = self._chunk_bucket(ws)
+        for i in range(0, len(chunk), KUCOIN_MAX_SYMBOLS_PER_TOPIC):
+            batch = chunk[i:i + KUCOIN_MAX_SYMBOLS_PER_TOPIC]
+            await bucket.acquire()
+            msg = {
+                "id": f"{op}-{int(time.time() * 1000)}-{i}",
+                "type": op,
+                "topic": f"/contractMarket/tickerV2:{','.join(batch)}",
                 "privateChannel": False,
                 "response": True
             }
-            await ws.send(json.dumps(sub_msg))
-            if i % 50 == 0 and i != 0:
-                await asyncio.sleep(1)
-            else:
-                await asyncio.sleep(0.01)
+            await ws.send(json.dumps(msg))
+
+    async def subscribe(self, ws, chunk: List[str]):
+        await self._send_topics(ws, "subscribe", chunk)
 
-    async def handle_messages(self, ws):
+    async def unsubscribe(self, ws, chunk: List[str]):
+        await self._send_topics(ws, "unsubscribe", chunk)
+
+    async def handle_messages(self, ws, chunk_id: int):
         async for message in ws:
+            if chunk_id in self.chunk_down_since:
+                self._mark_chunk_up(chunk_id)
             try:
                 data = json.loads(message)
                 if not isinstance(data, dict) or "data" not in data or not isinstance(data["data"], dict):
@@ -152,62 +514,71 @@ class KuCoinWSClient:
 
     async def parse_message(self, msg: Dict):
         symbol = msg["data"]["symbol"]
-        bid = float(msg["data"].get("bestBidPrice", 0))
-        ask = float(msg["data"].get("bestAskPrice", 0))
-        timestamp = datetime.now(UTC).isoformat()
-
-        payload = {
-            "pair_id": f"{symbol}-KuCoin",
-            "exchange": "KuCoin",
-            "bid": bid,
-            "ask": ask,
-            "timestamp": timestamp,
-        }
+        self._on_quote(symbol)
+        quote = self._quote(symbol)
+        quote.bid = float(msg["data"].get("bestBidPrice", 0))
+        quote.ask = float(msg["data"].get("bestAskPrice", 0))
 
-        await price_queue.put(payload)
-        # logger.info(f"[KUCOIN] {symbol}: bid={bid:.8f}, ask={ask:.8f} @ {timestamp}")
+        self._publish(symbol, quote)
+        # logger.info(f"[KUCOIN] {symbol}: bid={quote.bid:.8f}, ask={quote.ask:.8f} @ {quote.timestamp}")
 
     async def ws_ping(self, ws):
         while True:
             try:
-                await ws.ping()
-                await asyncio.sleep(15)
+                await asyncio.sleep(self.ping_interval)
+                await self._chunk_bucket(ws).acquire()
+                await ws.send(json.dumps({"id": str(int(time.time() * 1000)), "type": "ping"}))
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.warning(f"[KUCOIN] WebSocket ping failed: {e}")
                 break
-            
-# Load pairs from CSV
-def load_bybit_symbols() -> List[str]:
+
+# Load pairs from CSV — parsed once and re-read only when the file changes
+_pairs_cache: Dict[str, object] = {"mtime": None, "rows": []}
+
+def load_pairs() -> List[Dict[str, str]]:
+    mtime = CSV_PATH.stat().st_mtime
+    if _pairs_cache["mtime"] != mtime:
+        with open(CSV_PATH, newline='') as csvfile:
+            _pairs_cache["rows"] = list(csv.DictReader(csvfile))
+        _pairs_cache["mtime"] = mtime
+    return _pairs_cache["rows"]
+
+def load_symbols(column: str) -> List[str]:
     symbols = set()
-    with open(CSV_PATH, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row.get("bybit_symbol"):
-                symbols.add(row["bybit_symbol"].strip())
+    for row in load_pairs():
+        if row.get(column):
+            symbols.add(row[column].strip())
     return list(symbols)
 
+def load_bybit_symbols() -> List[str]:
+    return load_symbols("bybit_symbol")
+
 def load_kucoin_symbols() -> List[str]:
-    symbols = set()
-    with open(CSV_PATH, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row.get("kucoin_symbol"):
-                symbols.add(row["kucoin_symbol"].strip())
-    return list(symbols)
+    return load_symbols("kucoin_symbol")
 
 # Entry point
 async def main():
-    bybit_symbols = load_bybit_symbols()
-    kucoin_symbols = load_kucoin_symbols()
-    logger.info(f"Loaded {len(bybit_symbols)} Bybit symbols and {len(kucoin_symbols)} KuCoin symbols from CSV.")
+    from exchange_adapters import get_adapters
+    from universe_manager import select_universe
+    from ingest_workers import INGEST_PROCESSES, run_sharded_feeds
+
+    universe = select_universe()
+    if INGEST_PROCESSES > 0:
+        # WS decoding in shard processes; quotes arrive through the shared quote table
+        await run_sharded_feeds(universe, INGEST_PROCESSES)
+        return
 
-    bybit_client = BybitWSClient(bybit_symbols)
-    kucoin_client = KuCoinWSClient(kucoin_symbols)
+    clients = []
+    for adapter in get_adapters():
+        symbols = universe.get(adapter.name, [])
+        logger.info(f"Loaded {len(symbols)} {adapter.name} symbols from CSV.")
+        client = adapter.create_ws_client(symbols)
+        ws_clients[adapter.name] = client
+        clients.append(client)
 
-    await asyncio.gather(
-        bybit_client.connect(),
-        kucoin_client.connect(),
-    )
+    await asyncio.gather(*(client.connect() for client in clients))
 
 if __name__ == "__main__":
     asyncio.run(main())
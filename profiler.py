@@ -0,0 +1,259 @@
+# profiler.py
+# On-demand profiling of the running bot (toggled from Telegram, no restart).
+# Nothing is installed until a window starts and everything is removed when it ends,
+# so there is no overhead while idle. Reports are written to logs/.
+#   cpu   — cProfile over the window: top functions by own and cumulative time (+ .prof for snakeviz)
+#   mem   — tracemalloc snapshots at both ends: top allocation sites by growth
+#   stack — SIGPROF timer sampling the event loop thread's own stack: hot stacks per asyncio task
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+from datetime import datetime, UTC
+from logger import logger
+from config_manager import get_config_value
+
+PROFILE_DIR = get_config_value("PROFILE_DIR", "logs")
+PROFILE_MAX_SEC = float(get_config_value("PROFILE_MAX_SEC", "300"))
+PROFILE_TOP_N = int(get_config_value("PROFILE_TOP_N", "30"))
+PROFILE_SAMPLE_INTERVAL_SEC = float(get_config_value("PROFILE_SAMPLE_INTERVAL_SEC", "0.005"))
+PROFILE_MODES = ("cpu", "mem", "stack")
+
+_running: str | None = None  # mode of the active window
+
+# Creation time per task, for /tasks ages (one dict insert per task, independent of profiling)
+_task_started: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+
+def install_task_tracking(loop: asyncio.AbstractEventLoop = None) -> None:
+    loop = loop or asyncio.get_running_loop()
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        _task_started[task] = time.monotonic()
+        return task
+
+    loop.set_task_factory(factory)
+
+# "30s", "2m", "45" -> seconds
+def parse_duration(text: str) -> float:
+    text = text.strip().lower()
+    scale = 60 if text.endswith("m") else 1
+    return float(text.rstrip("sm")) * scale
+
+def is_profiling() -> str | None:
+    return _running
+
+def _report_path(kind: str, ext: str = "txt") -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f"profile_{kind}_{datetime.now(UTC).strftime('%Y%m%d_%H%M%S')}.{ext}")
+
+def _short(filename: str) -> str:
+    return os.path.basename(filename)
+
+async def _profile_cpu(duration: float) -> tuple[str, str]:
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profile.disable()
+
+    stats_path = _report_path("cpu", "prof")
+    profile.dump_stats(stats_path)
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out).strip_dirs()
+    out.write(f"cProfile over {duration:.0f}s — top {PROFILE_TOP_N} by own time\n")
+    stats.sort_stats("tottime").print_stats(PROFILE_TOP_N)
+    out.write(f"\nTop {PROFILE_TOP_N} by cumulative time\n")
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    report_path = _report_path("cpu")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+
+    top = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:10]
+    summary = "\n".join(
+        f"{tottime * 1000:8.1f} ms  {ncalls:>7}x  {func}:{line} ({_short(file)})"
+        for (file, line, func), (_, ncalls, tottime, _, _) in top
+    )
+    return summary, f"{report_path} (+ {stats_path})"
+
+async def _profile_mem(duration: float) -> tuple[str, str]:
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(10)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(duration)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    by_line = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    by_trace = after.filter_traces(filters).compare_to(before.filter_traces(filters), "traceback")
+    report_path = _report_path("mem")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(f"tracemalloc over {duration:.0f}s — top {PROFILE_TOP_N} allocation sites by growth\n")
+        for stat in by_line[:PROFILE_TOP_N]:
+            f.write(f"{stat}\n")
+        f.write("\nTop 5 tracebacks by growth\n")
+        for stat in by_trace[:5]:
+            f.write(f"\n{stat.size_diff / 1024:+.1f} KiB, {stat.count_diff:+d} blocks\n")
+            f.write("\n".join(stat.traceback.format()) + "\n")
+
+    summary = "\n".join(
+        f"{stat.size_diff / 1024:+9.1f} KiB  {stat.count_diff:+7d}  {_short(stat.traceback[0].filename)}:{stat.traceback[0].lineno}"
+        for stat in by_line[:10]
+    )
+    return summary, report_path
+
+# "task;outer;...;leaf" folded-stack key
+def _stack_key(frame, task) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(f"{frame.f_code.co_name} ({_short(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})")
+        frame = frame.f_back
+    task_name = task.get_name() if task is not None else "<loop>"
+    return f"{task_name};" + ";".join(reversed(stack))
+
+# SIGPROF fires every PROFILE_SAMPLE_INTERVAL_SEC of process CPU time and its handler runs on the
+# main (loop) thread, so each sample is the frame the loop was executing. Returns the stop function,
+# or None where that isn't possible (no setitimer, or the loop isn't on the main thread).
+def _start_signal_sampler(loop: asyncio.AbstractEventLoop, counts: Counter):
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        return None
+
+    def on_sample(signum, frame):
+        counts[_stack_key(frame, asyncio.current_task(loop))] += 1
+
+    previous = signal.signal(signal.SIGPROF, on_sample)
+    signal.setitimer(signal.ITIMER_PROF, PROFILE_SAMPLE_INTERVAL_SEC, PROFILE_SAMPLE_INTERVAL_SEC)
+
+    def stop():
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+    return stop
+
+# Fallback: a helper thread reading the loop thread's stack. It only runs when the loop thread
+# releases the GIL, so CPU-bound stretches are under-counted and blocking waits over-counted.
+def _sample_stacks(thread_id: int, loop: asyncio.AbstractEventLoop, stop: threading.Event, counts: Counter) -> None:
+    current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+    while not stop.wait(PROFILE_SAMPLE_INTERVAL_SEC):
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            counts[_stack_key(frame, current_tasks.get(loop))] += 1
+
+async def _profile_stack(duration: float) -> tuple[str, str]:
+    counts: Counter = Counter()
+    loop = asyncio.get_running_loop()
+    stop_sampler = _start_signal_sampler(loop, counts)
+    if stop_sampler is not None:
+        method = "SIGPROF on the loop thread, per CPU time: idle waits take no samples"
+    else:
+        method = ("helper thread (SIGPROF unavailable): samples land only when the loop thread releases "
+                  "the GIL, so CPU-bound code is under-counted and select()/blocking calls over-counted")
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=_sample_stacks,
+            args=(threading.get_ident(), loop, stop, counts),
+            name="stack-sampler",
+            daemon=True,
+        )
+        sampler.start()
+
+        def stop_sampler():
+            stop.set()
+            sampler.join()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        stop_sampler()
+
+    total = sum(counts.values()) or 1
+    # Leaf function -> share of samples, and task -> share of samples
+    leaves: Counter = Counter()
+    tasks: Counter = Counter()
+    for stack, n in counts.items():
+        leaves[stack.rsplit(";", 1)[-1]] += n
+        tasks[stack.split(";", 1)[0]] += n
+
+    report_path = _report_path("stack")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(f"{total} stack samples over {duration:.0f}s every {PROFILE_SAMPLE_INTERVAL_SEC * 1000:.0f} ms\n")
+        f.write(f"Sampler: {method}\n\n")
+        f.write("Samples by task\n")
+        for name, n in tasks.most_common(PROFILE_TOP_N):
+            f.write(f"{n / total * 100:6.1f}%  {name}\n")
+        f.write("\nSamples by leaf function\n")
+        for name, n in leaves.most_common(PROFILE_TOP_N):
+            f.write(f"{n / total * 100:6.1f}%  {name}\n")
+    folded_path = report_path.replace(".txt", ".folded")
+    with open(folded_path, "w", encoding="utf-8") as f:
+        # flamegraph.pl / speedscope input
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
+
+    summary = "\n".join(f"{n / total * 100:5.1f}%  {name}" for name, n in leaves.most_common(10))
+    return summary, f"{report_path} (+ {folded_path})"
+
+_PROFILERS = {"cpu": _profile_cpu, "mem": _profile_mem, "stack": _profile_stack}
+
+# Runs one profiling window; returns (top-10 summary, report path). One window at a time.
+async def run_profile(duration: float, mode: str = "cpu") -> tuple[str, str]:
+    global _running
+    if mode not in _PROFILERS:
+        raise ValueError(f"Unknown profile mode '{mode}' (use {', '.join(PROFILE_MODES)})")
+    if _running:
+        raise RuntimeError(f"A {_running} profile is already running")
+    duration = max(1.0, min(duration, PROFILE_MAX_SEC))
+    _running = mode
+    logger.info(f"[PROFILER] {mode} profile started for {duration:.0f}s")
+    try:
+        summary, path = await _PROFILERS[mode](duration)
+    finally:
+        _running = None
+    logger.info(f"[PROFILER] {mode} profile written to {path}")
+    return summary, path
+
+def _await_point(task: asyncio.Task) -> str:
+    frames = task.get_stack()
+    if not frames:
+        return "-"
+    frame = frames[-1]
+    return f"{frame.f_code.co_name} ({_short(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+# Running tasks, oldest first: (name, coroutine, current await point, age in seconds or None)
+def list_tasks() -> list[tuple[str, str, str, float | None]]:
+    now = time.monotonic()
+    rows = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        started = _task_started.get(task)
+        rows.append((
+            task.get_name(),
+            getattr(coro, "__qualname__", type(coro).__name__),
+            _await_point(task),
+            now - started if started is not None else None,
+        ))
+    rows.sort(key=lambda row: -(row[3] if row[3] is not None else float("inf")))
+    return rows
+
+def format_tasks(limit: int = 40) -> str:
+    rows = list_tasks()
+    lines = [f"{len(rows)} running tasks"]
+    for name, coro, await_point, age in rows[:limit]:
+        age_text = f"{age:,.0f}s" if age is not None else "?"
+        lines.append(f"{age_text:>8}  {coro} [{name}] @ {await_point}")
+    if len(rows) > limit:
+        lines.append(f"... {len(rows) - limit} more")
+    return "\n".join(lines)
@@ -1,46 +1,116 @@
 from logger import logger
 from decimal import Decimal, getcontext
-import asyncio
-import time
-from config_manager import get_config_value
+import config_manager
+from exchange_adapters import get_adapter
+from candidate_scheduler import submit_candidate
+from records import ArbCandidate
+from funnel import record_outcome
 
 getcontext().prec = 18
 
-arb_candidates = []
-BATCH_TIME_SEC = 0.5
-last_batch_time = time.time()
-
-# Configuration
-POSITION_SIZE_USD = Decimal(get_config_value("POSITION_SIZE_USD", "100"))
-LEVERAGE = Decimal(get_config_value("LEVERAGE", "3"))
-FEE_TAKER_BYBIT = Decimal(get_config_value("FEE_TAKER_BYBIT", "0.0006"))
-FEE_TAKER_KUCOIN = Decimal(get_config_value("FEE_TAKER_KUCOIN", "0.0006"))
-
-async def simulate_profit(arb: dict) -> None:
+# Net profit at `notional` from the fill curves: gross spread at both VWAPs minus
+# fees and funding, which scale linearly with notional
+def net_profit_at(arb: ArbCandidate, notional: Decimal, fee_rate: Decimal, funding_rate: Decimal):
+    from fill_simulator import curve_vwap
+
+    long_price = curve_vwap(arb.long_curve, notional)
+    short_price = curve_vwap(arb.short_curve, notional)
+    if long_price is None or short_price is None:
+        return None
+    gross_profit = (short_price - long_price) * (notional / long_price)
+    return gross_profit - notional * (fee_rate + funding_rate), long_price, short_price
+
+# Net profit is piecewise smooth between book levels and the marginal spread only shrinks
+# with depth, so the optimum sits on a level boundary or on the size limits.
+def optimal_notional(arb: ArbCandidate, fee_rate: Decimal, funding_rate: Decimal):
+    settings = config_manager.settings
+    max_notional = Decimal(str(arb.max_size_usd)) * settings.LEVERAGE
+    min_notional = settings.MIN_POSITION_SIZE_USD * settings.LEVERAGE
+    points = {min_notional, max_notional}
+    for curve in (arb.long_curve, arb.short_curve):
+        for cum_usd, _, _ in curve:
+            if cum_usd >= max_notional:
+                break
+            if cum_usd > min_notional:
+                points.add(cum_usd)
+
+    best = None
+    for notional in points:
+        result = net_profit_at(arb, notional, fee_rate, funding_rate)
+        if result is not None and (best is None or result[0] > best[1]):
+            best = (notional, *result)
+    return best
+
+# Entry + exit taker fees of both legs, per notional dollar
+def fee_rate_of(arb: ArbCandidate) -> Decimal:
+    return Decimal("2") * (get_adapter(arb.long_exchange).taker_fee + get_adapter(arb.short_exchange).taker_fee)
+
+# Re-prices a candidate at `size_usd` of margin (capital_allocator cut it below optimal_size_usd):
+# VWAPs from the fill curves, fees and funding scaled to the new notional. Updates net_profit,
+# profit_percent, fees, funding legs and avg prices in place; returns the new net profit, or None
+# when the books cannot fill that size.
+def reprice_at_size(arb: ArbCandidate, size_usd: Decimal) -> Decimal | None:
+    settings = config_manager.settings
+    notional = size_usd * settings.LEVERAGE
+    # Funding legs were scaled to the optimal notional by simulate_profit
+    planned = Decimal(str(arb.optimal_size_usd or settings.POSITION_SIZE_USD)) * settings.LEVERAGE
+    fee_rate = fee_rate_of(arb)
+    funding_rate = arb.funding_cost() / planned if settings.INCLUDE_FUNDING_IN_PROFIT else Decimal("0")
+
+    if arb.long_curve is not None:
+        result = net_profit_at(arb, notional, fee_rate, funding_rate)
+        if result is None:
+            return None
+        net_profit, long_price, short_price = result
+    else:
+        # Top-of-book prices: every term is linear in notional
+        long_price = Decimal(str(arb.long_avg_price))
+        short_price = Decimal(str(arb.short_avg_price))
+        net_profit = (short_price - long_price) * (notional / long_price) - notional * (fee_rate + funding_rate)
+
+    arb.long_avg_price = long_price
+    arb.short_avg_price = short_price
+    for leg in (arb.funding_long, arb.funding_short):
+        if leg is not None:
+            leg.cost = round(Decimal(str(leg.cost)) * notional / planned, 4)
+    arb.net_profit = round(net_profit, 4)
+    arb.profit_percent = round(net_profit / notional * Decimal("100"), 2)
+    arb.total_fees = round(notional * fee_rate, 4)
+    arb.total_funding = round(notional * funding_rate, 4)
+    return arb.net_profit
+
+async def simulate_profit(arb: ArbCandidate) -> None:
     try:
-        symbol = arb["symbol"]
-        long_ex = arb["long_exchange"]
-        short_ex = arb["short_exchange"]
-        long_price = Decimal(str(arb["long_avg_price"]))
-        short_price = Decimal(str(arb["short_avg_price"]))
-
-        position_value = POSITION_SIZE_USD * LEVERAGE
-
-        # Select fee by exchange
-        fee_long = position_value * (FEE_TAKER_BYBIT if long_ex == "Bybit" else FEE_TAKER_KUCOIN)
-        fee_short = position_value * (FEE_TAKER_BYBIT if short_ex == "Bybit" else FEE_TAKER_KUCOIN)
-        total_fees = Decimal("2") * (fee_long + fee_short)  # entry + exit
+        symbol = arb.symbol
+        long_price = Decimal(str(arb.long_avg_price))
+        short_price = Decimal(str(arb.short_avg_price))
 
-        # Funding cost
-        funding_long = Decimal(str(arb["funding"]["long"]["cost"]))
-        funding_short = Decimal(str(arb["funding"]["short"]["cost"]))
+        settings = config_manager.settings
+        reference_value = settings.POSITION_SIZE_USD * settings.LEVERAGE
+        fee_rate = fee_rate_of(arb)
 
-        INCLUDE_FUNDING = get_config_value("INCLUDE_FUNDING_IN_PROFIT", "true").lower() == "true"
+        # Funding cost (fetched for the reference size)
+        funding_long = Decimal(str(arb.funding_long.cost))
+        funding_short = Decimal(str(arb.funding_short.cost))
 
-        if INCLUDE_FUNDING:
-            total_funding = funding_long + funding_short
+        if settings.INCLUDE_FUNDING_IN_PROFIT:
+            funding_rate = (funding_long + funding_short) / reference_value
         else:
-            total_funding = Decimal("0")
+            funding_rate = Decimal("0")
+
+        position_value = reference_value
+        if arb.long_curve is not None:
+            # Pick the size that maximises net profit along both fill curves
+            best = optimal_notional(arb, fee_rate, funding_rate)
+            if best is not None:
+                position_value, _, long_price, short_price = best
+                arb.long_avg_price = long_price
+                arb.short_avg_price = short_price
+                for leg in (arb.funding_long, arb.funding_short):
+                    leg.cost = round(Decimal(str(leg.cost)) * position_value / reference_value, 4)
+
+        total_fees = position_value * fee_rate
+        total_funding = position_value * funding_rate
 
         # Gross profit (without fees/funding)
         gross_profit = (short_price - long_price) * (position_value / long_price)
@@ -50,33 +120,19 @@ async def simulate_profit(arb: dict) -> None:
         profit_percent = (net_profit / position_value) * Decimal("100")
 
         # Write to arb
-        arb["net_profit"] = round(net_profit, 4)
-        arb["profit_percent"] = round(profit_percent, 2)
-        arb["total_fees"] = round(total_fees, 4)
-        arb["total_funding"] = round(total_funding, 4)
-
-        logger.info(f"[PROFIT SIMULATOR] {symbol}: Net Profit = ${net_profit:.2f} ({profit_percent:.2f}%)")
-        # --- ADD TO CANDIDATES ---
-        global arb_candidates, last_batch_time
-    
-        net_profit = Decimal(str(arb.get("net_profit", "0")))
+        arb.net_profit = round(net_profit, 4)
+        arb.profit_percent = round(profit_percent, 2)
+        arb.total_fees = round(total_fees, 4)
+        arb.total_funding = round(total_funding, 4)
+        arb.optimal_size_usd = round(position_value / settings.LEVERAGE, 2)
+
+        logger.info(f"[PROFIT SIMULATOR] {symbol}: Net Profit = ${net_profit:.2f} ({profit_percent:.2f}%) at ${arb.optimal_size_usd} x{settings.LEVERAGE}")
+        # --- ADD TO CANDIDATES (candidate_scheduler picks the best within CANDIDATE_FLUSH_SEC) ---
         if net_profit > 0:
-            arb_candidates.append(arb)
-
-        # --- If more than BATCH_TIME_SEC passed — pick the best ---
-        if time.time() - last_batch_time >= BATCH_TIME_SEC:
-            if arb_candidates:
-                best_arb = max(arb_candidates, key=lambda x: Decimal(str(x.get("net_profit", "0"))))
-                logger.info(
-                    f"[PROFIT SIMULATOR] Best arbitrage in batch: {best_arb['symbol']} | "
-                    f"Net Profit = ${best_arb['net_profit']:.4f} ({best_arb.get('profit_percent', 0):.2f}%)"
-                )
-
-                from signal_engine import process_signal
-                asyncio.create_task(process_signal(best_arb))
-
-            arb_candidates = []
-            last_batch_time = time.time()
+            submit_candidate(arb)
+        else:
+            record_outcome(arb, "unprofitable")
 
     except Exception as e:
-        logger.warning(f"[PROFIT SIMULATOR] Error for {arb.get('symbol', '???')}: {e}")
+        logger.warning(f"[PROFIT SIMULATOR] Error for {arb.symbol}: {e}")
+        record_outcome(arb, "profit_error")
@@ -0,0 +1,127 @@
+# quote_table.py
+# Top-of-book table in shared memory, written by the ingestion processes and read by the
+# trading process without locks or pickling.
+#
+# Layout (one SharedMemory block):
+#   slots  capacity x 40 bytes: seq u64 | bid f64 | ask f64 | ts f64 | flags u64
+#   rings  one per writer:       head u64 | ring_size x slot index u32
+#
+# Each slot has exactly one writer. Writes are seqlock-versioned: seq goes odd, fields are
+# written, seq goes even; a reader retries (or skips) when seq is odd or changed under it.
+# After each write the writer appends the slot index to its own ring (single producer,
+# single consumer), so the reader only touches slots that changed. If the reader falls a
+# full ring behind, it rescans every assigned slot for a changed seq instead.
+# The ordering argument relies on stores becoming visible in program order (x86-64 / TSO);
+# Python has no fence to restore it on weaker models (aarch64), so the table refuses them.
+import platform
+import struct
+from multiprocessing import shared_memory
+
+SLOT = struct.Struct("=QdddQ")
+SEQ = struct.Struct("=Q")
+DATA = struct.Struct("=dddQ")
+INDEX = struct.Struct("=I")
+SLOT_SIZE = SLOT.size  # 40
+
+FLAG_UNTRADEABLE = 1  # the writer's feed for this symbol is down or silent
+
+TSO_MACHINES = {"x86_64", "amd64", "i386", "i686", "x86"}
+
+class QuoteTable:
+    def __init__(self, capacity: int, writers: int, ring_size: int, name: str = None):
+        machine = platform.machine()
+        if machine.lower() not in TSO_MACHINES:
+            raise RuntimeError(
+                f"Shared quote table needs x86 store ordering; {machine or 'this CPU'} could return torn "
+                f"quotes. Set INGEST_PROCESSES=0 to run the feeds in the trading process."
+            )
+        self.capacity = capacity
+        self.writers = writers
+        self.ring_size = ring_size
+        self._ring_bytes = SEQ.size + ring_size * INDEX.size
+        size = capacity * SLOT_SIZE + writers * self._ring_bytes
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.buf = self.shm.buf
+        if self.owner:
+            self.buf[:size] = bytes(size)
+        self._rings_at = capacity * SLOT_SIZE
+        self._heads = [0] * writers  # writer side: local copy of its ring head
+        self._tails = [0] * writers  # reader side: consumed position per ring
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # Arguments a worker process needs to attach to the same table
+    def spec(self) -> tuple:
+        return self.capacity, self.writers, self.ring_size, self.name
+
+    @classmethod
+    def attach(cls, spec: tuple) -> "QuoteTable":
+        capacity, writers, ring_size, name = spec
+        table = cls(capacity, writers, ring_size, name=name)
+        for writer in range(writers):
+            table._heads[writer] = SEQ.unpack_from(table.buf, table._ring_at(writer))[0]
+        return table
+
+    def _ring_at(self, writer: int) -> int:
+        return self._rings_at + writer * self._ring_bytes
+
+    # --- Writer side (one writer per slot, one ring per writer) ---
+    def write(self, writer: int, slot: int, bid: float, ask: float, ts: float, flags: int) -> None:
+        buf = self.buf
+        offset = slot * SLOT_SIZE
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, seq + 1)
+        DATA.pack_into(buf, offset + 8, bid, ask, ts, flags)
+        SEQ.pack_into(buf, offset, seq + 2)
+
+        ring = self._ring_at(writer)
+        head = self._heads[writer]
+        INDEX.pack_into(buf, ring + SEQ.size + (head % self.ring_size) * INDEX.size, slot)
+        self._heads[writer] = head + 1
+        SEQ.pack_into(buf, ring, head + 1)
+
+    # --- Reader side (single reader) ---
+    def seq(self, slot: int) -> int:
+        return SEQ.unpack_from(self.buf, slot * SLOT_SIZE)[0]
+
+    # Consistent (seq, bid, ask, ts, flags), or None if the writer kept it busy for every try.
+    # A skipped slot is not lost: the write in progress lands in the ring again.
+    def read(self, slot: int, tries: int = 4):
+        buf = self.buf
+        offset = slot * SLOT_SIZE
+        for _ in range(tries):
+            seq = SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            bid, ask, ts, flags = DATA.unpack_from(buf, offset + 8)
+            if SEQ.unpack_from(buf, offset)[0] == seq:
+                return seq, bid, ask, ts, flags
+        return None
+
+    # Slots written since the last call, deduplicated; None for a writer whose ring overflowed
+    # (the caller must rescan its slots)
+    def updated_slots(self, writer: int) -> set[int] | None:
+        buf = self.buf
+        ring = self._ring_at(writer)
+        head = SEQ.unpack_from(buf, ring)[0]
+        tail = self._tails[writer]
+        self._tails[writer] = head
+        if head == tail:
+            return set()
+        if head - tail > self.ring_size:
+            return None
+        base = ring + SEQ.size
+        size = self.ring_size
+        return {INDEX.unpack_from(buf, base + (i % size) * INDEX.size)[0] for i in range(tail, head)}
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,232 @@
+# rate_limiter.py
+import asyncio
+import time
+from logger import logger
+from config_manager import get_config_value
+
+# Classic token bucket: `rate` tokens per second, bursts up to `capacity`
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # Seconds until `tokens` would be available
+    def wait_time(self, tokens: float = 1) -> float:
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    # Waits until `tokens` are available; returns seconds spent waiting
+    async def acquire(self, tokens: float = 1) -> float:
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+# --- REST governor: one limiter per (exchange, endpoint class) ---
+# Endpoint classes: "order" (entries/closes), "position", "account", "market".
+# Defaults are requests/sec and burst, kept below the documented venue limits;
+# override with RATE_LIMIT_<EXCHANGE>_<CLASS>=rate/burst (e.g. RATE_LIMIT_BYBIT_MARKET=20/40).
+DEFAULT_LIMITS = {
+    "Bybit": {"order": (10, 10), "position": (10, 10), "account": (5, 5), "market": (50, 50)},
+    "KuCoin": {"order": (10, 10), "position": (8, 8), "account": (5, 5), "market": (20, 20)},
+}
+FALLBACK_LIMIT = (5, 5)
+
+# Share of the venue-reported window kept free for priority (order/close) traffic
+RATE_LIMIT_PRIORITY_RESERVE = float(get_config_value("RATE_LIMIT_PRIORITY_RESERVE", "0.2"))
+
+# Venue-reported window from response headers: one per endpoint path on Bybit, one per
+# resource pool on KuCoin (key "")
+class _Window:
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self):
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0  # monotonic
+
+# Priority (order) acquires waiting for a slot, per exchange. Market-data polling on that
+# venue holds back until they are through, whatever class they are in.
+_priority_waiting: dict[str, int] = {}
+_priority_idle: dict[str, asyncio.Event] = {}
+
+def _idle_event(exchange: str) -> asyncio.Event:
+    event = _priority_idle.get(exchange)
+    if event is None:
+        event = _priority_idle[exchange] = asyncio.Event()
+        event.set()
+    return event
+
+class EndpointLimiter:
+    def __init__(self, exchange: str, endpoint_class: str):
+        self.exchange = exchange
+        self.endpoint_class = endpoint_class
+        rate, burst = DEFAULT_LIMITS.get(exchange, {}).get(endpoint_class, FALLBACK_LIMIT)
+        override = get_config_value(f"RATE_LIMIT_{exchange.upper()}_{endpoint_class.upper()}", "")
+        if override:
+            rate, _, burst = override.partition("/")
+            rate = float(rate)
+            burst = float(burst or rate)
+        self.bucket = TokenBucket(float(rate), float(burst))
+        self.priority_waiting = 0
+        self.windows: dict[str, _Window] = {}
+        # Metrics
+        self.requests = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.rejected = 0  # HTTP 429 / venue rate-limit errors
+
+    # Delay imposed by the venue window; normal traffic stops at the priority reserve
+    def _window_delay(self, window: _Window | None, priority: bool, now: float) -> float:
+        if window is None or window.remaining is None or now >= window.reset_at:
+            return 0.0
+        floor = 0 if priority else int((window.limit or 0) * RATE_LIMIT_PRIORITY_RESERVE)
+        return window.reset_at - now if window.remaining <= floor else 0.0
+
+    async def acquire(self, priority: bool = False, endpoint: str = "") -> float:
+        started = time.monotonic()
+        exchange = self.exchange
+        if priority:
+            self.priority_waiting += 1
+            _priority_waiting[exchange] = _priority_waiting.get(exchange, 0) + 1
+            _idle_event(exchange).clear()
+        try:
+            while True:
+                if not priority and self.endpoint_class == "market" and _priority_waiting.get(exchange):
+                    await _idle_event(exchange).wait()  # orders on this venue go first
+                    continue
+                now = time.monotonic()
+                delay = self._window_delay(self.windows.get(endpoint), priority, now)
+                if delay <= 0:
+                    if not priority and self.priority_waiting:
+                        delay = 1 / self.bucket.rate  # let the priority lane go first
+                    elif self.bucket.try_acquire():
+                        break
+                    else:
+                        delay = self.bucket.wait_time()
+                await asyncio.sleep(delay)
+        finally:
+            if priority:
+                self.priority_waiting -= 1
+                _priority_waiting[exchange] -= 1
+                if not _priority_waiting[exchange]:
+                    _idle_event(exchange).set()
+
+        window = self.windows.get(endpoint)
+        if window is not None and window.remaining is not None:
+            window.remaining -= 1
+        waited = time.monotonic() - started
+        self.requests += 1
+        if waited > 0.001:
+            self.throttled += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def observe(self, headers, status: int = 200, endpoint: str = "") -> None:
+        now = time.monotonic()
+        window = self.windows.get(endpoint)
+        if window is None:
+            window = self.windows[endpoint] = _Window()
+        if "X-Bapi-Limit-Status" in headers:
+            # Bybit: per-endpoint window, reset given as epoch ms
+            window.remaining = int(headers["X-Bapi-Limit-Status"])
+            window.limit = int(headers.get("X-Bapi-Limit", window.limit or 0))
+            reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+            if reset_ms:
+                window.reset_at = now + max(0.0, int(reset_ms) / 1000 - time.time())
+        elif "gw-ratelimit-remaining" in headers:
+            # KuCoin: per-pool window, reset given as ms from now
+            window.remaining = int(headers["gw-ratelimit-remaining"])
+            window.limit = int(headers.get("gw-ratelimit-limit", window.limit or 0))
+            reset_ms = headers.get("gw-ratelimit-reset")
+            if reset_ms:
+                window.reset_at = now + int(reset_ms) / 1000
+
+        if status == 429:
+            self.rejected += 1
+            window.remaining = 0
+            if window.reset_at <= now:
+                window.reset_at = now + 1.0
+            logger.warning(f"[RATE LIMIT] {self.exchange} {self.endpoint_class} {endpoint}: rate limited by venue, pausing {window.reset_at - now:.1f}s")
+
+    # Lowest venue-reported remaining count across this limiter's windows
+    @property
+    def remaining(self) -> int | None:
+        counts = [w.remaining for w in self.windows.values() if w.remaining is not None]
+        return min(counts) if counts else None
+
+_limiters: dict[tuple[str, str], EndpointLimiter] = {}
+
+# KuCoin reports one window per resource pool, shared by every endpoint in it
+_KUCOIN_POOLS = {"market": "public", "order": "private", "position": "private", "account": "private"}
+
+def get_limiter(exchange: str, endpoint_class: str) -> EndpointLimiter:
+    key = (exchange, endpoint_class)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = EndpointLimiter(exchange, endpoint_class)
+    return limiter
+
+# Call before signing/sending a REST request; returns seconds spent throttled.
+# `endpoint` is the request path on venues with per-endpoint windows (Bybit).
+async def acquire_slot(exchange: str, endpoint_class: str, priority: bool = False, endpoint: str = "") -> float:
+    return await get_limiter(exchange, endpoint_class).acquire(priority, endpoint)
+
+# Call with every response to feed the venue-reported limits back into the governor
+def observe_response(exchange: str, endpoint_class: str, resp, endpoint: str = "") -> None:
+    try:
+        headers = resp.headers
+        status = resp.status
+        if exchange == "KuCoin":
+            pool = _KUCOIN_POOLS.get(endpoint_class)
+            for (ex, cls), limiter in list(_limiters.items()):
+                if ex == exchange and _KUCOIN_POOLS.get(cls) == pool:
+                    limiter.observe(headers, status if cls == endpoint_class else 200)
+        else:
+            get_limiter(exchange, endpoint_class).observe(headers, status, endpoint)
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.debug(f"[RATE LIMIT] Could not parse limit headers from {exchange}: {e}")
+
+def get_throttle_stats() -> dict[str, dict]:
+    return {
+        f"{limiter.exchange}/{limiter.endpoint_class}": {
+            "requests": limiter.requests,
+            "throttled": limiter.throttled,
+            "wait_total_sec": round(limiter.wait_total, 3),
+            "wait_max_sec": round(limiter.wait_max, 3),
+            "rejected": limiter.rejected,
+            "remaining": limiter.remaining,
+        }
+        for limiter in _limiters.values()
+    }
+
+def format_throttle_stats() -> str:
+    parts = [
+        f"{name}: {s['requests']} req, {s['throttled']} throttled ({s['wait_total_sec']:.2f}s, max {s['wait_max_sec']:.2f}s), {s['rejected']} rejected"
+        for name, s in get_throttle_stats().items()
+        if s["throttled"] or s["rejected"]
+    ]
+    return " | ".join(parts)
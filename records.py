@@ -0,0 +1,224 @@
+# records.py
+# Typed records passed between modules instead of free-form dicts.
+# All are __slots__ classes: no per-instance __dict__, fixed fields, fast attribute access.
+from datetime import datetime, UTC
+from decimal import Decimal
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, UTC).isoformat()
+
+# Top of book for one (symbol, exchange). One instance per pair, owned by the WS client
+# and updated in place on every tick; pair_monitor.latest_quotes holds the same object.
+class Quote:
+    __slots__ = ("symbol", "exchange", "bid", "ask", "ts", "queued")
+
+    def __init__(self, symbol: str, exchange: str):
+        self.symbol = symbol  # canonical symbol
+        self.exchange = exchange
+        self.bid = 0.0
+        self.ask = 0.0
+        self.ts = 0.0  # epoch seconds of the last update
+        self.queued = False  # already waiting in price_queue; newer ticks just overwrite it
+
+    @property
+    def timestamp(self) -> str:
+        return _iso(self.ts)
+
+    def __repr__(self) -> str:
+        return f"Quote({self.symbol} {self.exchange} bid={self.bid} ask={self.ask} ts={self.ts:.3f})"
+
+# Funding calendar entry for one (exchange, symbol) (funding_fetcher.funding_calendar)
+class FundingSchedule:
+    __slots__ = ("exchange", "symbol", "rate", "next_rate", "interval_sec", "next_ts", "updated_at")
+
+    def __init__(self, exchange: str, symbol: str, rate: Decimal, interval_sec: float, next_ts: float,
+                 next_rate: Decimal | None = None, updated_at: float = 0.0):
+        self.exchange = exchange
+        self.symbol = symbol  # canonical symbol
+        self.rate = rate  # predicted rate of the next settlement
+        self.next_rate = rate if next_rate is None else next_rate  # assumed for the settlements after it
+        self.interval_sec = interval_sec
+        self.next_ts = next_ts  # epoch seconds of the next settlement
+        self.updated_at = updated_at
+
+    # First settlement in (start, end] and how many fall in that window. The calendar can lag
+    # behind a settlement, so next_ts is rolled forward by whole intervals.
+    def settlements(self, start: float, end: float) -> tuple[float, int]:
+        first = self.next_ts
+        if first <= start:
+            first += ((start - first) // self.interval_sec + 1) * self.interval_sec
+        if first > end:
+            return first, 0
+        return first, int((end - first) // self.interval_sec) + 1
+
+    # Funding paid over (start, end] by a leg of this notional, as (cost, settlements crossed).
+    # Longs pay a positive rate and shorts receive it, so a negative cost is income.
+    def cost(self, direction: str, notional: Decimal, start: float, end: float) -> tuple[Decimal, int]:
+        first, count = self.settlements(start, end)
+        if not count:
+            return Decimal("0"), 0
+        rates = (self.rate if first == self.next_ts else self.next_rate) + self.next_rate * (count - 1)
+        return (notional * rates if direction == "long" else -notional * rates), count
+
+    def __repr__(self) -> str:
+        return f"FundingSchedule({self.exchange} {self.symbol} rate={self.rate} every {self.interval_sec / 3600:g}h next={_iso(self.next_ts)})"
+
+# Funding estimate for one leg of a candidate (set by funding_fetcher)
+class FundingLeg:
+    __slots__ = ("exchange", "rate", "hours", "cost", "fallback", "settlements")
+
+    def __init__(self, exchange: str, rate: Decimal, hours: float, cost: Decimal, fallback: bool = False,
+                 settlements: int = 0):
+        self.exchange = exchange
+        self.rate = rate
+        self.hours = hours  # hold window the cost covers
+        self.cost = cost  # signed: negative when the leg collects funding
+        self.fallback = fallback  # no calendar entry for this leg, cost assumed 0
+        self.settlements = settlements  # funding settlements inside the hold window
+
+    def __repr__(self) -> str:
+        return f"FundingLeg({self.exchange} rate={self.rate} cost={self.cost} x{self.settlements}{' fallback' if self.fallback else ''})"
+
+# One cross-venue opportunity. Created by pair_monitor, then filled in stage by stage:
+# fill_simulator -> funding_fetcher -> profit_simulator -> capital_allocator -> order_manager.
+class ArbCandidate:
+    __slots__ = (
+        "symbol", "long_exchange", "short_exchange", "long_price", "short_price", "raw_delta", "quote_ts",
+        # fill_simulator
+        "long_avg_price", "short_avg_price", "price_impact", "long_curve", "short_curve", "max_size_usd",
+        # funding_fetcher
+        "funding_long", "funding_short",
+        # profit_simulator
+        "net_profit", "profit_percent", "total_fees", "total_funding", "optimal_size_usd",
+        # capital_allocator
+        "position_size_usd", "allocation_id",
+        # order_manager / signal_engine
+        "position_id", "exit_reason", "execution_timings",
+    )
+
+    def __init__(self, symbol: str, long_exchange: str, short_exchange: str,
+                 long_price: float, short_price: float, raw_delta: float, quote_ts: float):
+        self.symbol = symbol
+        self.long_exchange = long_exchange
+        self.short_exchange = short_exchange
+        self.long_price = long_price
+        self.short_price = short_price
+        self.raw_delta = raw_delta
+        self.quote_ts = quote_ts  # epoch seconds of the quotes the delta was computed from
+        self.long_avg_price = None
+        self.short_avg_price = None
+        self.price_impact = None
+        self.long_curve = None
+        self.short_curve = None
+        self.max_size_usd = None
+        self.funding_long: FundingLeg | None = None
+        self.funding_short: FundingLeg | None = None
+        self.net_profit = None
+        self.profit_percent = None
+        self.total_fees = None
+        self.total_funding = None
+        self.optimal_size_usd = None
+        self.position_size_usd = None
+        self.allocation_id = None
+        self.position_id = None
+        self.exit_reason = None
+        self.execution_timings = None
+
+    @property
+    def timestamp(self) -> str:
+        return _iso(self.quote_ts)
+
+    # Funding cost of both legs; 0 until funding_fetcher has run
+    def funding_cost(self) -> Decimal:
+        total = Decimal("0")
+        for leg in (self.funding_long, self.funding_short):
+            if leg is not None:
+                total += Decimal(str(leg.cost))
+        return total
+
+    def __repr__(self) -> str:
+        return (f"ArbCandidate({self.symbol} long={self.long_exchange} short={self.short_exchange} "
+                f"delta={self.raw_delta:.4f}% net_profit={self.net_profit})")
+
+# Open delta-neutral position (position_manager.open_positions)
+class Position:
+    __slots__ = (
+        "position_id", "symbol", "long_exchange", "short_exchange", "entry_prices",
+        "qty", "qty_long", "qty_short", "entry_fee", "position_notional", "position_size_usd", "funding",
+        "status", "entry_time", "exit_time", "last_price", "net_profit", "error",
+        "long_status", "short_status", "final_pnl_long", "final_pnl_short", "final_pnl_total",
+        "start_pnl", "exit_reason", "start_reason",
+    )
+
+    def __init__(self, position_id: str, symbol: str, long_exchange: str, short_exchange: str,
+                 entry_prices: dict[str, Decimal], qty: Decimal, qty_long: Decimal, qty_short: Decimal,
+                 entry_fee: Decimal, position_notional: Decimal, position_size_usd: Decimal, funding: Decimal):
+        self.position_id = position_id
+        self.symbol = symbol
+        self.long_exchange = long_exchange
+        self.short_exchange = short_exchange
+        self.entry_prices = entry_prices
+        self.qty = qty  # min of both legs, kept for compatibility
+        self.qty_long = qty_long
+        self.qty_short = qty_short
+        self.entry_fee = entry_fee
+        self.position_notional = position_notional
+        self.position_size_usd = position_size_usd
+        self.funding = funding
+        self.status = "open"  # open | closing | failover | closed | error
+        self.entry_time: datetime | None = None
+        self.exit_time: datetime | None = None
+        self.last_price: dict[str, Decimal] = {}
+        self.net_profit = Decimal("0")
+        self.error = None
+        self.long_status = None  # "closed" once that side is closed on its own (stop-loss)
+        self.short_status = None
+        self.final_pnl_long = Decimal("0")
+        self.final_pnl_short = Decimal("0")
+        self.final_pnl_total = None
+        self.start_pnl = Decimal("0")
+        self.exit_reason = None
+        self.start_reason = None
+
+    def __repr__(self) -> str:
+        return f"Position({self.position_id} {self.symbol} {self.long_exchange}/{self.short_exchange} {self.status})"
+
+# Surviving leg after a stop-loss (failover_manager.failover_positions)
+class FailoverLeg:
+    __slots__ = (
+        "exchange", "symbol", "direction", "entry_price", "qty", "start_pnl", "current_pnl", "max_pnl",
+        "trailing_stop_pnl", "initial_take_profit_pnl", "entry_fee", "funding", "position_notional",
+        "entry_time", "exit_time", "status", "exit_reason", "final_pnl_long", "final_pnl_short", "final_pnl_total",
+        "contract_value", "trail_distance", "quote_ts",
+    )
+
+    def __init__(self, exchange: str, symbol: str, direction: str, entry_price: Decimal, qty: Decimal,
+                 start_pnl: Decimal, trailing_stop_pnl: Decimal, initial_take_profit_pnl: Decimal,
+                 entry_fee: Decimal, funding: Decimal, position_notional: Decimal, entry_time: datetime,
+                 contract_value: Decimal = Decimal("1"), trail_distance: Decimal = Decimal("0")):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.direction = direction  # "long" | "short"
+        self.entry_price = entry_price
+        self.qty = qty
+        self.start_pnl = start_pnl  # realised PnL of the closed side
+        self.current_pnl = start_pnl
+        self.max_pnl = start_pnl
+        self.trailing_stop_pnl = trailing_stop_pnl
+        self.initial_take_profit_pnl = initial_take_profit_pnl
+        self.entry_fee = entry_fee
+        self.funding = funding
+        self.position_notional = position_notional
+        self.entry_time = entry_time
+        self.exit_time: datetime | None = None
+        self.status = "open"  # open | closing | closed
+        self.exit_reason = None
+        self.final_pnl_long = Decimal("0")
+        self.final_pnl_short = Decimal("0")
+        self.final_pnl_total = None
+        self.contract_value = contract_value
+        self.trail_distance = trail_distance  # trailing stop sits this far below max_pnl
+        self.quote_ts = 0.0  # epoch seconds of the last quote the leg was evaluated on
+
+    def __repr__(self) -> str:
+        return f"FailoverLeg({self.symbol} {self.exchange} {self.direction} {self.status})"
@@ -1,66 +1,118 @@
 from logger import logger
-from datetime import datetime, timedelta
-from decimal import Decimal
-import csv
-from pathlib import Path
+import heapq
+import logging
+import time
+import config_manager
 from config_manager import get_config_value
+from capital_allocator import release_allocation
+from records import ArbCandidate
+from funnel import record_outcome
 
-# Settings from .env
-MIN_PROFIT = Decimal(get_config_value("MIN_PROFIT", "1.0"))
-COOLDOWN_AFTER_TIMEOUT_MINUTES = int(get_config_value("COOLDOWN_AFTER_TIMEOUT_MINUTES", "15"))
-SL_IGNORE_MINUTES = int(get_config_value("SL_IGNORE_MINUTES", "5"))
+# Settings from .env; MIN_PROFIT and the cooldown lengths come from config_manager.settings
 LIVE_MODE = get_config_value("LIVE_MODE", "false").lower() == "true"
 
-# Internal state per pair
-pair_state: dict[str, dict] = {}
+# Cooldowns are on the time.monotonic_ns() clock, so the hot path only compares ints
+_MINUTE_NS = 60 * 1_000_000_000
 
-# Timestamp parser
-def parse_iso(ts: str) -> datetime:
-    return datetime.fromisoformat(ts.replace("Z", "+00:00")) if "Z" in ts else datetime.fromisoformat(ts)
+REJECT_REASONS = ("quarantine", "signal_with_sl_ignored", "recent_sl", "signal_after_timeout_blocked", "low_net_profit")
+
+# Cooldown state of one symbol; 0 means "not set"
+class PairState:
+    __slots__ = ("blocked_until", "sl_until", "expires_at")
+
+    def __init__(self):
+        self.blocked_until = 0  # quarantine after a timeout close
+        self.sl_until = 0  # signals ignored after a stop-loss
+        self.expires_at = 0  # max of the two: the entry is evicted after this
+
+# Only symbols inside a cooldown have an entry, so the table is bounded by the number of
+# recent stops/timeouts rather than by the universe size. _expiry_heap holds (expires_at, symbol);
+# an entry whose cooldown was extended since it was pushed is skipped when popped.
+pair_state: dict[str, PairState] = {}
+_expiry_heap: list[tuple[int, str]] = []
+
+# Outcome counters since startup ("pass" plus one per reject reason), reported by the heartbeat
+signal_counts: dict[str, int] = dict.fromkeys(("pass", *REJECT_REASONS), 0)
+
+def _evict_expired(now: int) -> None:
+    heap = _expiry_heap
+    while heap and heap[0][0] <= now:
+        _, symbol = heapq.heappop(heap)
+        state = pair_state.get(symbol)
+        if state is not None and state.expires_at <= now:
+            del pair_state[symbol]
+
+def _extend(symbol: str, blocked_until: int = 0, sl_until: int = 0) -> None:
+    state = pair_state.get(symbol)
+    if state is None:
+        state = pair_state[symbol] = PairState()
+    state.blocked_until = max(state.blocked_until, blocked_until)
+    state.sl_until = max(state.sl_until, sl_until)
+    expires_at = max(state.blocked_until, state.sl_until)
+    if expires_at > state.expires_at:
+        state.expires_at = expires_at
+        heapq.heappush(_expiry_heap, (expires_at, symbol))
+        # Superseded heap items wait for their own expiry; rebuild if a symbol that keeps
+        # getting re-stopped lets them pile up
+        if len(_expiry_heap) > 2 * len(pair_state) + 64:
+            _expiry_heap[:] = [(s.expires_at, sym) for sym, s in pair_state.items()]
+            heapq.heapify(_expiry_heap)
+
+# Start the cooldowns for a symbol whose position just closed on a stop-loss ("sl")
+# or at the hold deadline ("timeout"); other reasons leave it tradeable
+def record_exit(symbol: str, reason: str) -> None:
+    now = time.monotonic_ns()
+    settings = config_manager.settings
+    if reason == "sl":
+        _extend(symbol, sl_until=now + settings.SL_IGNORE_MINUTES * _MINUTE_NS)
+    elif reason == "timeout":
+        _extend(symbol, blocked_until=now + settings.COOLDOWN_AFTER_TIMEOUT_MINUTES * _MINUTE_NS,
+                sl_until=now + settings.SL_IGNORE_MINUTES * _MINUTE_NS)
+
+def format_signal_stats() -> str:
+    counts = " | ".join(f"{reason}: {count}" for reason, count in signal_counts.items() if count)
+    if not counts:
+        return ""
+    return f"{counts} | cooling down: {len(pair_state)} symbols"
 
 # Main function
-async def process_signal(arb: dict):
-    symbol = arb["symbol"]
-    now = datetime.utcnow()
+async def process_signal(arb: ArbCandidate):
+    symbol = arb.symbol
+    now = time.monotonic_ns()
+    if _expiry_heap and _expiry_heap[0][0] <= now:
+        _evict_expired(now)
+    state = pair_state.get(symbol)
     reason = None
 
-    # Retrieve or initialize state
-    state = pair_state.setdefault(symbol, {
-        "blocked_until": None,
-        "last_stopped_at": None,
-        "fail_count": 0,
-        "last_signal_ts": None
-    })
-
     # Quarantine after timeout
-    if state["blocked_until"] and now < state["blocked_until"]:
+    if state is not None and now < state.blocked_until:
         reason = "quarantine"
-    elif arb.get("exit_reason") == "sl":
-        state["last_stopped_at"] = now
+    elif arb.exit_reason == "sl":
+        record_exit(symbol, "sl")
         reason = "signal_with_sl_ignored"
-    elif state["last_stopped_at"] and now - state["last_stopped_at"] < timedelta(minutes=SL_IGNORE_MINUTES):
+    elif state is not None and now < state.sl_until:
         reason = "recent_sl"
-    elif arb.get("exit_reason") == "timeout":
-        state["blocked_until"] = now + timedelta(minutes=COOLDOWN_AFTER_TIMEOUT_MINUTES)
-        state["last_stopped_at"] = now
+    elif arb.exit_reason == "timeout":
+        record_exit(symbol, "timeout")
         reason = "signal_after_timeout_blocked"
-    elif Decimal(str(arb.get("net_profit", "0"))) < MIN_PROFIT:
+    elif (arb.net_profit or 0) < config_manager.settings.MIN_PROFIT:  # at the allocated size
         reason = "low_net_profit"
 
     if reason:
-        if not LIVE_MODE:
-            print(f"[SIGNAL ENGINE] {symbol}: ❌ REJECT ({reason})")
-        logger.info(f"[SIGNAL ENGINE] REJECTED: {symbol} - reason={reason}")
+        signal_counts[reason] += 1
+        record_outcome(arb, reason)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[SIGNAL ENGINE] REJECTED: {symbol} - reason={reason}")
+        release_allocation(arb)
         return
 
-    state["last_signal_ts"] = now
+    signal_counts["pass"] += 1
 
     if not LIVE_MODE:
-        print(f"[SIGNAL ENGINE] {symbol}: ✅ PASS | Net Profit = ${arb['net_profit']:.2f} ({arb['profit_percent']:.2f}%)")
+        print(f"[SIGNAL ENGINE] {symbol}: ✅ PASS | Net Profit = ${arb.net_profit:.2f} ({arb.profit_percent:.2f}%)")
 
     try:
         from decision_engine import process_decision
         await process_decision(arb)
     except Exception as e:
         logger.exception(f"[SIGNAL ENGINE] Error passing to decision_engine: {e}")
-
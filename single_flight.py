@@ -0,0 +1,75 @@
+# single_flight.py
+# Concurrent identical exchange queries share one in-flight call (and optionally a short-lived result).
+import asyncio
+import time
+from typing import Awaitable, Callable
+from config_manager import get_config_value
+
+# Micro-cache TTL (sec) per endpoint type; 0 = only share calls that overlap in time.
+# Override with SINGLE_FLIGHT_TTL_<ENDPOINT>=seconds.
+DEFAULT_TTLS = {
+    "orderbook": 0.2,
+    "pnl": 0.5,
+    "position_size": 0.0,
+}
+
+_ttls: dict[str, float] = {}
+_inflight: dict[tuple, asyncio.Future] = {}
+_cache: dict[tuple, tuple[float, object]] = {}  # key -> (expires_at, result)
+_stats: dict[str, dict[str, int]] = {}
+
+def _ttl(endpoint: str) -> float:
+    ttl = _ttls.get(endpoint)
+    if ttl is None:
+        ttl = _ttls[endpoint] = float(get_config_value(f"SINGLE_FLIGHT_TTL_{endpoint.upper()}", DEFAULT_TTLS.get(endpoint, 0.0)))
+    return ttl
+
+# key = (exchange, endpoint, *params). Exceptions reach every waiter and are never cached.
+async def single_flight(key: tuple, fetch: Callable[[], Awaitable]):
+    endpoint = key[1]
+    stats = _stats.get(endpoint)
+    if stats is None:
+        stats = _stats[endpoint] = {"upstream": 0, "coalesced": 0, "cache_hits": 0}
+
+    cached = _cache.get(key)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            stats["cache_hits"] += 1
+            return cached[1]
+        del _cache[key]
+
+    task = _inflight.get(key)
+    if task is not None:
+        stats["coalesced"] += 1
+    else:
+        stats["upstream"] += 1
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _on_done(key, t))
+    # Shielded so one caller being cancelled doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+def _on_done(key: tuple, task: asyncio.Future) -> None:
+    _inflight.pop(key, None)
+    now = time.monotonic()
+    # Drop expired results here too: keys that are never read again would otherwise stay forever
+    for stale in [k for k, (expires_at, _) in _cache.items() if expires_at <= now]:
+        del _cache[stale]
+    if task.cancelled() or task.exception() is not None:
+        return
+    ttl = _ttl(key[1])
+    if ttl > 0:
+        _cache[key] = (now + ttl, task.result())
+
+def get_single_flight_stats() -> dict[str, dict[str, int]]:
+    return {
+        endpoint: {**stats, "saved": stats["coalesced"] + stats["cache_hits"]}
+        for endpoint, stats in _stats.items()
+    }
+
+def format_single_flight_stats() -> str:
+    return " | ".join(
+        f"{endpoint}: {s['upstream']} upstream, {s['saved']} saved ({s['coalesced']} joined, {s['cache_hits']} cached)"
+        for endpoint, s in get_single_flight_stats().items()
+        if s["saved"]
+    )
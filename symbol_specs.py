@@ -1,72 +1,242 @@
 import asyncio
 import aiohttp
+import hashlib
+import json
+import os
+import time
 from logger import logger
 from decimal import Decimal, ROUND_DOWN
+from pathlib import Path
+from config_manager import get_config_value
+from rate_limiter import acquire_slot, observe_response
+from exchange_adapters import get_adapters, get_exchange_names, BYBIT_REST_URL, KUCOIN_REST_URL
 
-symbol_specs = {
-    "Bybit": {},
-    "KuCoin": {}
-}
+symbol_specs = {name: {} for name in get_exchange_names()}
 
-async def fetch_bybit_specs():
-    url = "https://api.bybit.com/v5/market/instruments-info?category=linear"
+# Local cache so startup doesn't wait on instruments downloads
+SPECS_CACHE_PATH = Path(get_config_value("SYMBOL_SPECS_CACHE_PATH", "data/symbol_specs_cache.json"))
+SPECS_CACHE_VERSION = 1  # bump when the cached spec fields change
+SYMBOL_SPECS_REFRESH_SEC = int(get_config_value("SYMBOL_SPECS_REFRESH_SEC", "3600"))
+
+# Last ETag per exchange (sent as If-None-Match on refresh), and the traded-symbol set the cached
+# specs were filtered to: the ETag only covers the venue's list, so a new symbol must bypass it
+_etags: dict[str, str] = {}
+_etag_symbols: dict[str, str] = {}
+_last_refresh = 0.0
+
+def _spec_fields(min_qty, step_qty, tick_size, contract_value) -> dict:
+    return {
+        "min_qty": Decimal(str(min_qty)),
+        "step_qty": Decimal(str(step_qty)),
+        "tick_size": Decimal(str(tick_size)),
+        "contract_value": Decimal(str(contract_value))
+    }
+
+def _traded_symbols(exchange: str) -> set[str]:
+    # Only keep specs for symbols listed in the matched pairs CSV
+    from exchange_adapters import get_adapter
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            async with session.get(url) as resp:
+        return set(get_adapter(exchange).load_symbols())
+    except Exception as e:
+        logger.warning(f"[SYMBOL SPECS] Could not load traded symbols for {exchange}: {e}")
+        return set()
+
+def _symbols_key(symbols: set[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(symbols)).encode()).hexdigest()[:16]
+
+# Returns (specs, etag); specs is None when the server answered 304 Not Modified
+async def fetch_bybit_specs(etag: str = None) -> tuple[dict | None, str | None]:
+    base_url = f"{BYBIT_REST_URL}/v5/market/instruments-info?category=linear&limit=1000"
+    wanted = _traded_symbols("Bybit")
+    specs = {}
+    cursor = ""
+    new_etag = None
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        while True:
+            url = f"{base_url}&cursor={cursor}" if cursor else base_url
+            headers = {"If-None-Match": etag} if etag and not cursor else {}
+            await acquire_slot("Bybit", "market", endpoint="/v5/market/instruments-info")
+            async with session.get(url, headers=headers) as resp:
+                observe_response("Bybit", "market", resp, endpoint="/v5/market/instruments-info")
+                if resp.status == 304:
+                    return None, etag
+                if not cursor:
+                    new_etag = resp.headers.get("ETag")
                 data = await resp.json()
-                for item in data.get("result", {}).get("list", []):
-                    symbol = item.get("symbol")
-                    filters = item.get("lotSizeFilter", {})
-                    price_filter = item.get("priceFilter", {})
-                    contract_value = Decimal("1")  # Bybit USDT perpetual = $1 per contract
-                    symbol_specs["Bybit"][symbol] = {
-                        "min_qty": Decimal(filters.get("minOrderQty", "0")),
-                        "step_qty": Decimal(filters.get("qtyStep", "1")),
-                        "tick_size": Decimal(price_filter.get("tickSize", "0.0001")),
-                        "contract_value": contract_value
-                    }
-        logger.info(f"[SYMBOL SPECS] Loaded {len(symbol_specs['Bybit'])} Bybit symbols")
+
+            result = data.get("result", {})
+            for item in result.get("list", []):
+                symbol = item.get("symbol")
+                if wanted and symbol not in wanted:
+                    continue
+                filters = item.get("lotSizeFilter", {})
+                price_filter = item.get("priceFilter", {})
+                specs[symbol] = _spec_fields(
+                    filters.get("minOrderQty", "0"),
+                    filters.get("qtyStep", "1"),
+                    price_filter.get("tickSize", "0.0001"),
+                    "1"  # Bybit USDT perpetual = $1 per contract
+                )
+
+            cursor = result.get("nextPageCursor") or ""
+            if not cursor:
+                break
+
+    return specs, new_etag
+
+async def fetch_kucoin_specs(etag: str = None) -> tuple[dict | None, str | None]:
+    url = f"{KUCOIN_REST_URL}/api/v1/contracts/active"
+    wanted = _traded_symbols("KuCoin")
+    specs = {}
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        headers = {"If-None-Match": etag} if etag else {}
+        await acquire_slot("KuCoin", "market")
+        async with session.get(url, headers=headers) as resp:
+            observe_response("KuCoin", "market", resp)
+            if resp.status == 304:
+                return None, etag
+            new_etag = resp.headers.get("ETag")
+            data = await resp.json()
+
+    for item in data.get("data", []):
+        symbol = item.get("symbol")
+        if wanted and symbol not in wanted:
+            continue
+        specs[symbol] = _spec_fields(
+            item.get("baseMinSize", "0"),
+            item.get("lotSize", "1"),
+            item.get("tickSize", "0.0001"),
+            item.get("multiplier", "1")
+        )
+        # print(f"[DEBUG CONTRACT] {symbol=} | multiplier={item.get('multiplier')} | parsed={specs[symbol]['contract_value']}")
+
+    return specs, new_etag
+
+# --- Cache file ---
+def load_specs_cache() -> bool:
+    if not SPECS_CACHE_PATH.exists():
+        return False
+    try:
+        with SPECS_CACHE_PATH.open("r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != SPECS_CACHE_VERSION:
+            logger.info("[SYMBOL SPECS] Cache version mismatch, ignoring cache.")
+            return False
+
+        for exchange, specs in cache.get("specs", {}).items():
+            symbol_specs[exchange] = {
+                symbol: {k: Decimal(v) for k, v in fields.items()}
+                for symbol, fields in specs.items()
+            }
+        _etags.update(cache.get("etags", {}))
+        _etag_symbols.update(cache.get("etag_symbols", {}))
+        logger.info(
+            f"[SYMBOL SPECS] Loaded cache from {SPECS_CACHE_PATH} "
+            f"({', '.join(f'{ex}={len(s)}' for ex, s in symbol_specs.items())})"
+        )
+        return any(symbol_specs.values())
     except Exception as e:
-        logger.warning(f"[SYMBOL SPECS] Failed to fetch Bybit specs: {e}")
+        logger.warning(f"[SYMBOL SPECS] Failed to read cache {SPECS_CACHE_PATH}: {e}")
+        return False
 
-async def fetch_kucoin_specs():
-    url = "https://api-futures.kucoin.com/api/v1/contracts/active"
+def save_specs_cache() -> None:
+    cache = {
+        "version": SPECS_CACHE_VERSION,
+        "saved_at": int(time.time()),
+        "etags": _etags,
+        "etag_symbols": _etag_symbols,
+        "specs": {
+            exchange: {symbol: {k: str(v) for k, v in fields.items()} for symbol, fields in specs.items()}
+            for exchange, specs in symbol_specs.items()
+        }
+    }
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            async with session.get(url) as resp:
-                data = await resp.json()
-                for item in data.get("data", []):
-                    symbol = item.get("symbol")
-                    symbol_specs["KuCoin"][symbol] = {
-                        "min_qty": Decimal(item.get("baseMinSize", "0")),
-                        "step_qty": Decimal(item.get("lotSize", "1")),
-                        "tick_size": Decimal(item.get("tickSize", "0.0001")),
-                        "contract_value": Decimal(str(item.get("multiplier", "1")))                
-                    }
-                    # print(f"[DEBUG CONTRACT] {symbol=} | multiplier={item.get('multiplier')} | parsed={symbol_specs['KuCoin'][symbol]['contract_value']}")
-        logger.info(f"[SYMBOL SPECS] Loaded {len(symbol_specs['KuCoin'])} KuCoin symbols")
+        SPECS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = SPECS_CACHE_PATH.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, SPECS_CACHE_PATH)  # atomic on the same filesystem
     except Exception as e:
-        logger.warning(f"[SYMBOL SPECS] Failed to fetch KuCoin specs: {e}")
+        logger.warning(f"[SYMBOL SPECS] Failed to write cache {SPECS_CACHE_PATH}: {e}")
 
-async def load_all_specs():
-    await asyncio.gather(
-        fetch_bybit_specs(),
-        fetch_kucoin_specs()
+# --- Refresh ---
+async def refresh_exchange_specs(adapter) -> bool:
+    exchange = adapter.name
+    symbols_key = _symbols_key(_traded_symbols(exchange))
+    # Traded symbols changed since the cached specs were filtered: fetch in full
+    cached_etag = _etags.get(exchange) if _etag_symbols.get(exchange) == symbols_key else None
+    try:
+        specs, etag = await adapter.fetch_specs(cached_etag)
+    except Exception as e:
+        logger.warning(f"[SYMBOL SPECS] Failed to fetch {exchange} specs: {e}")
+        return False
+
+    if specs is None:
+        logger.info(f"[SYMBOL SPECS] {exchange} specs not modified")
+        return False
+    if not specs:
+        # Never wipe known specs with an empty answer
+        logger.warning(f"[SYMBOL SPECS] {exchange} returned no specs, keeping {len(symbol_specs.get(exchange, {}))} cached")
+        return False
+
+    old = symbol_specs.get(exchange, {})
+    added = specs.keys() - old.keys()
+    removed = old.keys() - specs.keys()
+    changed = [s for s in specs.keys() & old.keys() if specs[s] != old[s]]
+
+    # Single reference swap — readers see either the old or the new dict, never a mix
+    symbol_specs[exchange] = specs
+    etag_changed = bool(etag) and (_etags.get(exchange) != etag or cached_etag is None)
+    if etag:
+        _etags[exchange] = etag
+        _etag_symbols[exchange] = symbols_key
+
+    logger.info(
+        f"[SYMBOL SPECS] {exchange}: {len(specs)} symbols "
+        f"(+{len(added)} / -{len(removed)} / ~{len(changed)})"
     )
+    return bool(added or removed or changed) or etag_changed
+
+async def load_all_specs():
+    global _last_refresh
+    _last_refresh = time.monotonic()
+    for adapter in get_adapters():
+        symbol_specs.setdefault(adapter.name, {})
+    results = await asyncio.gather(*(refresh_exchange_specs(adapter) for adapter in get_adapters()))
+    if any(results):
+        save_specs_cache()
 
 def get_specs(exchange: str, symbol: str) -> dict:
     if exchange not in symbol_specs:
         raise ValueError(f"Exchange {exchange} not supported")
-    
+
     # print(f"[DEBUG SPECS] {exchange=} | {symbol=} → {symbol_specs[exchange].get(symbol)}")
 
     return symbol_specs[exchange].get(symbol, {})
 
-# Initialization function to be called at project start
+# Initialization function to be called at project start.
+# With a warm cache this returns immediately and symbol_specs_refresh_loop() updates in the background.
 async def init_symbol_specs():
+    started = time.perf_counter()
+    if load_specs_cache():
+        logger.info(f"[SYMBOL SPECS] Using cached specs ({(time.perf_counter() - started) * 1000:.1f} ms), refreshing in background.")
+        return
     await load_all_specs()
     logger.info("[SYMBOL SPECS] All symbol specs loaded.")
 
+async def symbol_specs_refresh_loop():
+    while True:
+        # Skip the first round if init_symbol_specs() just downloaded everything
+        wait = _last_refresh + SYMBOL_SPECS_REFRESH_SEC - time.monotonic() if _last_refresh else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await load_all_specs()
+        except Exception as e:
+            logger.warning(f"[SYMBOL SPECS] Background refresh failed: {e}")
+
 # Universal round-down for step size
 def round_step(value: Decimal, step: Decimal) -> Decimal:
     return (value // step) * step
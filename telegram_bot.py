@@ -1,15 +1,25 @@
 import asyncio
+import html
+from collections import deque
 from logger import logger
 import os
 from aiogram import Bot, Dispatcher, types
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 from aiogram.fsm.storage.memory import MemoryStorage
-from position_manager import get_open_positions, close_all_positions
-from decimal import Decimal
-from failover_manager import failover_positions
+from config_manager import get_config_value
+from rate_limiter import TokenBucket
+from position_manager import close_all_positions
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = int(os.getenv("TELEGRAM_CHAT_ID"))
+# Outbound queue: Telegram allows ~1 message/s per chat (20/min in groups) before flood waits
+TELEGRAM_MSGS_PER_MIN = float(get_config_value("TELEGRAM_MSGS_PER_MIN", "20"))
+TELEGRAM_BURST = float(get_config_value("TELEGRAM_BURST", "3"))
+TELEGRAM_COALESCE_SEC = float(get_config_value("TELEGRAM_COALESCE_SEC", "0.5"))  # wait for the rest of a burst
+TELEGRAM_QUEUE_MAX = int(get_config_value("TELEGRAM_QUEUE_MAX", "200"))  # queued notifications before dropping
+TELEGRAM_SEND_RETRIES = int(get_config_value("TELEGRAM_SEND_RETRIES", "3"))
+TELEGRAM_MAX_MESSAGE_LEN = 4096
 
 from aiogram.client.default import DefaultBotProperties
 
@@ -22,12 +32,158 @@ dp = Dispatcher(storage=MemoryStorage())
 # Event for graceful shutdown
 stop_event = asyncio.Event()
 
-# Notifications 
-async def send_message(text: str):
+# --- Notifications ---
+# notify() only appends to an in-memory queue; notification_sender_loop() is the one task that
+# talks to Telegram. It sends critical notifications first, merges whatever queued up while it
+# waited for the per-chat rate limit into one message, and honours flood waits (retry_after).
+# When the backlog exceeds TELEGRAM_QUEUE_MAX the oldest non-critical notifications are
+# dropped and the next message starts with a count of what was lost.
+class _Notification:
+    __slots__ = ("chat_id", "text", "key", "critical")
+
+    def __init__(self, chat_id: int, text: str, key: str | None, critical: bool):
+        self.chat_id = chat_id
+        self.text = text
+        self.key = key  # a newer notification with the same key replaces this one while queued
+        self.critical = critical
+
+_critical: deque[_Notification] = deque()
+_normal: deque[_Notification] = deque()
+_keyed: dict[tuple[int, str], _Notification] = {}
+_chat_buckets: dict[int, TokenBucket] = {}
+_queued = asyncio.Event()
+_idle = asyncio.Event()
+_idle.set()
+_dropped = 0  # not yet reported in a message
+notification_stats = {"queued": 0, "sent": 0, "merged": 0, "replaced": 0, "dropped": 0, "flood_waits": 0, "failed": 0}
+
+# Command work that outlives its handler (/profile); referenced so it isn't garbage collected mid-run
+_command_tasks: set[asyncio.Task] = set()
+
+# Queue a notification; never blocks and never raises (safe from trading code)
+def notify(text: str, critical: bool = False, key: str = None, chat_id: int = None) -> None:
+    global _dropped
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    notification_stats["queued"] += 1
+    if key is not None:
+        queued = _keyed.get((chat_id, key))
+        if queued is not None:
+            notification_stats["replaced"] += 1
+            if not critical or queued.critical:
+                queued.text = text
+                return
+            # Now critical: move it to the front queue
+            _normal.remove(queued)
+            del _keyed[(chat_id, key)]
+    note = _Notification(chat_id, text, key, critical)
+    if key is not None:
+        _keyed[(chat_id, key)] = note
+    (_critical if critical else _normal).append(note)
+    while len(_critical) + len(_normal) > TELEGRAM_QUEUE_MAX:
+        dropped = (_normal or _critical).popleft()
+        _forget(dropped)
+        _dropped += 1
+        notification_stats["dropped"] += 1
+    _idle.clear()
+    _queued.set()
+
+def queued_notifications() -> int:
+    return len(_critical) + len(_normal)
+
+def _forget(note: _Notification) -> None:
+    if note.key is not None and _keyed.get((note.chat_id, note.key)) is note:
+        del _keyed[(note.chat_id, note.key)]
+
+def _bucket(chat_id: int) -> TokenBucket:
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        bucket = _chat_buckets[chat_id] = TokenBucket(TELEGRAM_MSGS_PER_MIN / 60, TELEGRAM_BURST)
+    return bucket
+
+# Pops the next batch for one chat: critical first, then normal, up to Telegram's message size
+def _next_batch() -> tuple[int, list[str]] | None:
+    chat_id = None
+    parts: list[str] = []
+    size = 0
+    for queue in (_critical, _normal):
+        while queue:
+            note = queue[0]
+            if chat_id is not None and note.chat_id != chat_id:
+                break
+            if parts and size + len(note.text) + 2 > TELEGRAM_MAX_MESSAGE_LEN:
+                return chat_id, parts
+            queue.popleft()
+            _forget(note)
+            chat_id = note.chat_id
+            parts.append(note.text)
+            size += len(note.text) + 2
+    return (chat_id, parts) if parts else None
+
+# Direct send with flood-wait handling; only the sender loop and shutdown paths call this
+async def send_message(text: str, chat_id: int = None) -> bool:
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    for attempt in range(TELEGRAM_SEND_RETRIES + 1):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            notification_stats["sent"] += 1
+            return True
+        except TelegramRetryAfter as e:
+            notification_stats["flood_waits"] += 1
+            logger.warning(f"[TELEGRAM] Flood limit hit, retrying in {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if attempt == TELEGRAM_SEND_RETRIES:
+                break
+            await asyncio.sleep(min(2 ** attempt, 30))
+            logger.warning(f"[TELEGRAM] Send failed ({e}), retry {attempt + 1}/{TELEGRAM_SEND_RETRIES}")
+        except Exception as e:
+            logger.error(f"[TELEGRAM] Failed to send message: {e}")
+            break
+    notification_stats["failed"] += 1
+    return False
+
+async def notification_sender_loop():
+    global _dropped
+    while True:
+        if not _critical and not _normal:
+            _queued.clear()
+            _idle.set()
+            await _queued.wait()
+            if not _critical and TELEGRAM_COALESCE_SEC > 0:
+                await asyncio.sleep(TELEGRAM_COALESCE_SEC)
+        if not _critical and not _normal:
+            continue
+        # Whatever arrives while waiting for the chat's rate limit joins this message
+        await _bucket((_critical or _normal)[0].chat_id).acquire()
+        batch = _next_batch()
+        if batch is None:
+            continue
+        chat_id, parts = batch
+        notification_stats["merged"] += len(parts) - 1
+        if _dropped:
+            parts.insert(0, f"⚠️ {_dropped} notifications dropped (backlog over {TELEGRAM_QUEUE_MAX})")
+            _dropped = 0
+        try:
+            await send_message("\n\n".join(parts), chat_id)
+        except Exception as e:
+            logger.error(f"[TELEGRAM] Sender error: {e}")
+
+# Waits until the queue is delivered (e.g. before shutdown); False on timeout
+async def flush_notifications(timeout: float = 10) -> bool:
     try:
-        await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=text)
-    except Exception as e:
-        logger.error(f"[TELEGRAM] Failed to send message: {e}")
+        await asyncio.wait_for(_idle.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def format_notification_stats() -> str:
+    s = notification_stats
+    if not s["queued"]:
+        return ""
+    return (
+        f"{s['queued']} queued, {s['sent']} sent ({s['merged']} merged, {s['replaced']} replaced), "
+        f"{len(_critical) + len(_normal)} waiting, {s['dropped']} dropped, {s['flood_waits']} flood waits, {s['failed']} failed"
+    )
 
 # Commands
 @dp.message(lambda message: message.text and message.text.startswith("/stop"))
@@ -35,7 +191,7 @@ async def cmd_stop(message: types.Message):
     if message.chat.id != TELEGRAM_CHAT_ID:
         return  # ignore non-authorized chats
     await message.reply("⛔ /stop command received. Closing all positions and shutting down...")
-    await send_message("🛑 /stop command activated. Initiating bot shutdown.")
+    notify("🛑 /stop command activated. Initiating bot shutdown.", critical=True)
     stop_event.set()  # trigger shutdown
 
 @dp.message(lambda message: message.text and message.text.startswith("/status"))
@@ -49,8 +205,11 @@ async def cmd_positions(message: types.Message):
     if message.chat.id != TELEGRAM_CHAT_ID:
         return
 
-    positions = get_open_positions()
-    failovers = list(failover_positions.values())
+    # Rows from the dashboard snapshot, kept current as positions change
+    from dashboard import snapshot
+    rows = snapshot()
+    positions = [p for p in rows["positions"].values() if p["status"] == "open"]
+    failovers = [f for f in rows["failovers"].values() if f["status"] != "closed"]
 
     if not positions and not failovers:
         await message.reply("No open positions.")
@@ -59,27 +218,96 @@ async def cmd_positions(message: types.Message):
 
         # Emojis for regular positions
         for p in positions:
-            net_profit = p.get('net_profit', Decimal("0"))
+            net_profit = p["pnl"] or 0
             emoji = "💰" if net_profit >= 0 else "💩"
             text += (
-                f"<b>{p['symbol']}</b> | {p['long_exchange']}/{p['short_exchange']}\n"
+                f"<b>{p['symbol']}</b> | {p['long']}/{p['short']}\n"
                 f"PnL: <code>{net_profit:.4f} USD</code> {emoji}\n\n"
             )
 
         # Failover positions
         for f in failovers:
-            if f.get("status") != "closed":
-                pnl = f.get("current_pnl", Decimal("0"))
-                emoji = "🟢" if pnl >= 0 else "🔻"
-                direction = "🟩 Long" if f["direction"] == "long" else "🟥 Short"
+            pnl = f["pnl"] or 0
+            emoji = "🟢" if pnl >= 0 else "🔻"
+            direction = "🟩 Long" if f["direction"] == "long" else "🟥 Short"
 
-                text += (
-                    f"<b>{f['symbol']}</b> | {f['exchange']} ({direction}, <b>FAILOVER</b>)\n"
-                    f"PnL: <code>{pnl:.4f} USD</code> {emoji}\n\n"
-                )
+            text += (
+                f"<b>{f['symbol']}</b> | {f['exchange']} ({direction}, <b>FAILOVER</b>)\n"
+                f"PnL: <code>{pnl:.4f} USD</code> {emoji}\n\n"
+            )
 
         await message.reply(text)
 
+# /profile 30s [cpu|mem|stack] — profiles the live bot for a window, reports the hot spots
+@dp.message(lambda message: message.text and message.text.startswith("/profile"))
+async def cmd_profile(message: types.Message):
+    if message.chat.id != TELEGRAM_CHAT_ID:
+        return
+    from profiler import run_profile, parse_duration, is_profiling, PROFILE_MODES
+
+    args = message.text.split()[1:]
+    try:
+        duration = parse_duration(args[0]) if args else 30.0
+    except ValueError:
+        await message.reply(f"Usage: /profile 30s [{'|'.join(PROFILE_MODES)}]")
+        return
+    mode = args[1].lower() if len(args) > 1 else "cpu"
+    if mode not in PROFILE_MODES:
+        await message.reply(f"Usage: /profile 30s [{'|'.join(PROFILE_MODES)}]")
+        return
+    if is_profiling():
+        await message.reply(f"⏳ A {is_profiling()} profile is already running.")
+        return
+
+    await message.reply(f"🔬 {mode} profile started for {duration:.0f}s.")
+
+    async def run():
+        try:
+            summary, path = await run_profile(duration, mode)
+            await message.reply(f"🔬 <b>{mode} profile</b> → <code>{html.escape(path)}</code>\n<pre>{html.escape(summary[:3500])}</pre>")
+        except Exception as e:
+            logger.warning(f"[TELEGRAM] Profile failed: {e}")
+            await message.reply(f"❌ Profile failed: {html.escape(str(e))}")
+
+    task = asyncio.create_task(run(), name="profile")
+    _command_tasks.add(task)
+    task.add_done_callback(_command_tasks.discard)
+
+@dp.message(lambda message: message.text and message.text.startswith("/tasks"))
+async def cmd_tasks(message: types.Message):
+    if message.chat.id != TELEGRAM_CHAT_ID:
+        return
+    from profiler import format_tasks
+
+    await message.reply(f"<pre>{html.escape(format_tasks()[:3900])}</pre>")
+
+# /funnel [15m] [SYMBOL] — where candidates ended up over the rolling window
+@dp.message(lambda message: message.text and message.text.startswith("/funnel"))
+async def cmd_funnel(message: types.Message):
+    if message.chat.id != TELEGRAM_CHAT_ID:
+        return
+    from funnel import format_funnel, FUNNEL_WINDOW_MIN
+    from profiler import parse_duration
+
+    window_sec, symbol = FUNNEL_WINDOW_MIN * 60, None
+    for arg in message.text.split()[1:]:
+        try:
+            window_sec = parse_duration(arg)
+        except ValueError:
+            symbol = arg.upper()
+    await message.reply(f"<pre>{html.escape(format_funnel(window_sec, symbol)[:3900])}</pre>")
+
+# /reload — re-read the strategy thresholds from .env without restarting
+@dp.message(lambda message: message.text and message.text.startswith("/reload"))
+async def cmd_reload(message: types.Message):
+    if message.chat.id != TELEGRAM_CHAT_ID:
+        return
+    from config_manager import reload_settings, format_reload
+
+    changes, errors, restart_keys = reload_settings()
+    icon = "❌" if errors else "⚙️"
+    await message.reply(f"{icon} <b>Reload</b>\n<pre>{html.escape(format_reload(changes, errors, restart_keys)[:3900])}</pre>")
+
 async def telegram_bot_runner():
     try:
         await dp.start_polling(bot)
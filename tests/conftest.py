@@ -0,0 +1,20 @@
+# conftest.py
+# Tests import the flat modules from the repo root. Modules read .env at import time, so the
+# keys they require get harmless defaults here (real environment values take precedence)
+# and trading stays in paper mode unless a test switches it on.
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+for _key, _value in {
+    "TELEGRAM_BOT_TOKEN": "123456:TEST", "TELEGRAM_CHAT_ID": "1",
+    "POSITION_SIZE_USD": "100", "LEVERAGE": "3", "ORDER_TIMEOUT_SEC": "3",
+    "MIN_DELTA": "0.5", "MAX_QUOTE_AGE_SEC": "3", "MIN_PROFIT": "0.01",
+    "BYBIT_KEY": "test", "BYBIT_SECRET": "test",
+    "KUCOIN_KEY": "test", "KUCOIN_SECRET": "test", "KUCOIN_PASSPHRASE": "test",
+    "FUNNEL_ENABLED": "false", "DASHBOARD_ENABLED": "false", "ENABLE_FILE_LOGGING": "false",
+}.items():
+    os.environ.setdefault(_key, _value)
@@ -0,0 +1,20 @@
+# Dispatched candidates are kept referenced and drained at shutdown
+import asyncio
+import candidate_scheduler
+
+def test_drain_waits_for_entries_then_cancels_stragglers():
+    async def run():
+        finished = []
+
+        async def entry(delay):
+            await asyncio.sleep(delay)
+            finished.append(delay)
+
+        for delay in (0.01, 5):
+            task = asyncio.create_task(entry(delay))
+            candidate_scheduler._dispatched.add(task)
+            task.add_done_callback(candidate_scheduler._dispatched.discard)
+        drained = await candidate_scheduler.drain_dispatched(timeout=0.2)
+        return drained, finished, len(candidate_scheduler._dispatched)
+
+    assert asyncio.run(run()) == (False, [0.01], 0)
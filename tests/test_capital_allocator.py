@@ -0,0 +1,53 @@
+# Candidates cut below their optimal size are re-priced and re-checked against MIN_PROFIT
+from decimal import Decimal
+import pytest
+import balance_watchdog
+import capital_allocator
+import config_manager
+from fill_simulator import build_fill_curve
+from profit_simulator import fee_rate_of, net_profit_at
+from records import ArbCandidate, FundingLeg
+
+@pytest.fixture
+def balances(monkeypatch):
+    free = {}
+    monkeypatch.setattr(capital_allocator, "LIVE_MODE", True)
+    monkeypatch.setattr(balance_watchdog, "get_free_balances", lambda: free)
+    monkeypatch.setattr(balance_watchdog, "reserve_margin", lambda exchange, key, usd: None)
+    monkeypatch.setattr(capital_allocator, "record_outcome", lambda arb, reason: None)
+    return free
+
+def _arb() -> ArbCandidate:
+    # Spread decays with depth: optimum at 100 USD margin (300 notional at LEVERAGE=3)
+    arb = ArbCandidate("ALLOCUSDT", "Bybit", "KuCoin", 100.0, 101.0, 1.0, 0.0)
+    arb.long_curve = build_fill_curve([("100", "0.6"), ("100.2", "2.4")])
+    arb.short_curve = build_fill_curve([("101", "0.6"), ("100.9", "2.4")])
+    arb.max_size_usd = Decimal("100")
+    arb.funding_long = FundingLeg("Bybit", Decimal("0.0001"), 8, Decimal("0.03"))
+    arb.funding_short = FundingLeg("KuCoin", Decimal("0.0001"), 8, Decimal("0.03"))
+    notional = Decimal("300")
+    net, arb.long_avg_price, arb.short_avg_price = net_profit_at(arb, notional, fee_rate_of(arb), Decimal("0.06") / notional)
+    arb.net_profit = round(net, 4)
+    arb.profit_percent = round(net / notional * 100, 2)
+    arb.optimal_size_usd = Decimal("100")
+    return arb
+
+def test_cut_candidate_is_repriced_on_the_fill_curves(balances):
+    balances.update({"Bybit": 24.0, "KuCoin": 1000.0})  # 20 USD margin after the 20% buffer
+    arb = _arb()
+    (selected,) = capital_allocator.allocate([arb], slots=1)
+    assert selected.position_size_usd == Decimal("20")
+    # 60 notional fills inside the first level on both books; funding scales with notional
+    expected, _, _ = net_profit_at(_arb(), Decimal("60"), fee_rate_of(arb), Decimal("0.06") / 300)
+    assert selected.net_profit == round(expected, 4)
+    assert (selected.long_avg_price, selected.short_avg_price) == (Decimal("100"), Decimal("101"))
+    assert selected.funding_cost() == Decimal("0.012")
+
+def test_cut_candidate_below_min_profit_is_rejected(balances, monkeypatch):
+    arb = _arb()
+    # Passes MIN_PROFIT at the optimal size, not at the 20 USD that is free
+    monkeypatch.setattr(config_manager, "settings", config_manager.settings.replace(MIN_PROFIT=str(arb.net_profit * Decimal("0.9"))))
+    balances.update({"Bybit": 24.0, "KuCoin": 1000.0})
+    assert capital_allocator.allocate([arb], slots=1) == []
+    balances.update({"Bybit": 1000.0})
+    assert capital_allocator.allocate([_arb()], slots=1)[0].position_size_usd == Decimal("100")
@@ -0,0 +1,80 @@
+# Adapter registry and N-venue pair selection, on local stub adapters (no network)
+import time
+import pytest
+from exchange_adapters import ExchangeAdapter, register_adapter, unregister_adapter, get_adapter, get_exchange_names
+from records import Quote
+
+class StubVenue(ExchangeAdapter):
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+@pytest.fixture
+def stub_venues():
+    names = ["StubA", "StubB", "StubC"]
+    for name in names:
+        register_adapter(StubVenue(name))
+    yield names
+    for name in names:
+        unregister_adapter(name)
+
+def _quote(exchange: str, bid: float, ask: float, age: float = 0.0, symbol: str = "TESTUSDT") -> Quote:
+    quote = Quote(symbol, exchange)
+    quote.bid, quote.ask, quote.ts = bid, ask, time.time() - age
+    return quote
+
+def test_registry_dispatches_by_name(stub_venues):
+    assert get_adapter("StubB").name == "StubB"
+    assert get_exchange_names()[-3:] == stub_venues
+    unregister_adapter("StubB")
+    with pytest.raises(ValueError):
+        get_adapter("StubB")
+    assert "StubB" not in get_exchange_names()
+
+def test_best_pair_across_three_venues(stub_venues):
+    from pair_monitor import select_best_pair
+
+    quotes = {q.exchange: q for q in (
+        _quote("StubA", 99.9, 100.0),
+        _quote("StubB", 101.0, 101.1),
+        _quote("StubC", 100.4, 100.5),
+    )}
+    delta, long_ex, short_ex, long_price, short_price, _ = select_best_pair(quotes, time.time())
+    assert (long_ex, short_ex) == ("StubA", "StubB")
+    assert (long_price, short_price) == (100.0, 101.0)
+    assert delta == pytest.approx(1.0)
+
+def test_best_pair_never_uses_one_venue_for_both_legs(stub_venues):
+    from pair_monitor import select_best_pair
+
+    # StubA has both the lowest ask and the highest bid: the better runner-up pairing wins
+    # (long StubB at 100.2 / short StubA at 102 beats long StubA at 99 / short StubC at 100.5)
+    quotes = {q.exchange: q for q in (
+        _quote("StubA", 102.0, 99.0),
+        _quote("StubB", 100.0, 100.2),
+        _quote("StubC", 100.5, 101.0),
+    )}
+    _, long_ex, short_ex, _, _, _ = select_best_pair(quotes, time.time())
+    assert long_ex != short_ex
+    assert (long_ex, short_ex) == ("StubB", "StubA")
+
+def test_best_pair_skips_stale_quotes(stub_venues):
+    import config_manager
+    from pair_monitor import select_best_pair
+
+    stale = config_manager.settings.MAX_QUOTE_AGE_SEC + 1
+    quotes = {q.exchange: q for q in (
+        _quote("StubA", 99.9, 100.0),
+        _quote("StubB", 105.0, 105.1, age=stale),
+        _quote("StubC", 100.9, 101.0),
+    )}
+    _, long_ex, short_ex, _, _, _ = select_best_pair(quotes, time.time())
+    assert (long_ex, short_ex) == ("StubA", "StubC")
+    assert select_best_pair({"StubA": quotes["StubA"], "StubB": quotes["StubB"]}, time.time()) is None
+
+def test_best_pair_carries_the_older_quote_time(stub_venues):
+    from pair_monitor import select_best_pair
+
+    quotes = {q.exchange: q for q in (_quote("StubA", 99.9, 100.0, age=2.0), _quote("StubB", 101.0, 101.1))}
+    *_, quote_ts = select_best_pair(quotes, time.time())
+    assert quote_ts == quotes["StubA"].ts
@@ -0,0 +1,22 @@
+# Simulated venue fills stay on the lot grid, so partial fills still close out to exactly zero
+import exchange_simulator
+from exchange_simulator import SimVenue
+
+def test_partial_fills_close_to_zero_and_record_pnl(monkeypatch):
+    monkeypatch.setattr(exchange_simulator, "SIM_PARTIAL_FILL_PROB", 1.0)
+    venue = SimVenue("Bybit", 0, qty_step=0.001, min_qty=0.001)
+    venue.quotes["TESTUSDT"] = (99.9, 100.1)
+    filled, _ = venue.fill("TESTUSDT", "Buy", 1.2345, reduce_only=False)
+    assert filled == venue.round_qty(filled) and filled < 1.234
+    for _ in range(100):
+        if "TESTUSDT" not in venue.positions:
+            break
+        venue.fill("TESTUSDT", "Sell", abs(venue.positions["TESTUSDT"][0]), reduce_only=True)
+    assert "TESTUSDT" not in venue.positions
+    assert len(venue.closed) == 1
+
+def test_lot_sized_venue_fills_whole_lots():
+    venue = SimVenue("KuCoin", 0, qty_step=1, min_qty=1)
+    venue.quotes["TESTUSDTM"] = (99.9, 100.1)
+    assert venue.fill("TESTUSDTM", "Buy", 7.6, reduce_only=False)[0] == 7
+    assert venue.fill("TESTUSDTM", "Buy", 0.4, reduce_only=False) == (0.0, 0.0)
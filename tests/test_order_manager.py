@@ -0,0 +1,153 @@
+# calculate_quantity, and execute_order against the local exchange simulator: partial fills,
+# late acks, min order size, failed unwinds
+import asyncio
+from decimal import Decimal
+import pytest
+from aiohttp import web
+import exchange_simulator
+import order_manager
+import position_manager
+import telegram_bot
+from exchange_simulator import ExchangeSimulator, SimVenue
+from symbol_specs import symbol_specs
+from records import ArbCandidate
+
+SYMBOL = "TESTUSDT"
+
+@pytest.fixture
+def sim(monkeypatch):
+    monkeypatch.setattr(exchange_simulator, "SIM_LATENCY_JITTER_MS", 0.0)
+    sim = ExchangeSimulator([(SYMBOL, SYMBOL + "M")])
+    sim.mid[0] = 100.0
+    sim._quote(0)
+    monkeypatch.setitem(symbol_specs["Bybit"], SYMBOL, {
+        "min_qty": Decimal("0.001"), "step_qty": Decimal("0.001"), "tick_size": Decimal("0.01"), "contract_value": Decimal("1")})
+    monkeypatch.setitem(symbol_specs["KuCoin"], SYMBOL + "M", {
+        "min_qty": Decimal("1"), "step_qty": Decimal("1"), "tick_size": Decimal("0.01"), "contract_value": Decimal("1")})
+    monkeypatch.setattr(order_manager, "ack_latency", {})
+    registered = []
+    monkeypatch.setattr(position_manager, "register_position", registered.append)
+    sim.registered = registered
+    return sim
+
+def test_calculate_quantity(monkeypatch):
+    monkeypatch.setitem(symbol_specs["Bybit"], "QTYUSDT", {"step_qty": Decimal("0.01"), "contract_value": Decimal("1")})
+    monkeypatch.setitem(symbol_specs["KuCoin"], "QTYUSDTM", {"step_qty": Decimal("1"), "contract_value": Decimal("0.01")})
+    # POSITION_SIZE_USD=100 at LEVERAGE=3 (conftest): 300 USD of exposure
+    assert order_manager.calculate_quantity(Decimal("100"), "Bybit", "QTYUSDT") == 3.0
+    # Rounded down to the step, never up past the size
+    assert order_manager.calculate_quantity(Decimal("7"), "Bybit", "QTYUSDT") == 42.85
+    # KuCoin sizes in contracts of `contract_value` base units; the allocator's margin overrides the default
+    assert order_manager.calculate_quantity(Decimal("100"), "KuCoin", "QTYUSDT") == 300.0
+    assert order_manager.calculate_quantity(Decimal("100"), "KuCoin", "QTYUSDT", Decimal("50")) == 150.0
+    assert order_manager.calculate_quantity(Decimal("100000"), "KuCoin", "QTYUSDT") == 0.0
+
+def test_calculate_quantity_without_specs():
+    with pytest.raises(ValueError, match="No specs"):
+        order_manager.calculate_quantity(Decimal("100"), "Bybit", "NOSPECSUSDT")
+
+def _arb(size_usd: str = "100") -> ArbCandidate:
+    arb = ArbCandidate(SYMBOL, "Bybit", "KuCoin", 100.0, 100.2, 0.2, 0.0)
+    arb.long_avg_price = Decimal("100")
+    arb.short_avg_price = Decimal("100")
+    arb.position_size_usd = Decimal(size_usd)
+    return arb
+
+# Serves the simulator on a free local port for the duration of `scenario`
+def _run(sim: ExchangeSimulator, monkeypatch, scenario):
+    async def run():
+        runner = web.AppRunner(sim.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        monkeypatch.setattr(order_manager, "BYBIT_REST_URL", f"http://{host}:{port}")
+        monkeypatch.setattr(order_manager, "KUCOIN_REST_URL", f"http://{host}:{port}")
+        try:
+            return await scenario()
+        finally:
+            await runner.cleanup()
+    return asyncio.run(run())
+
+def _held(venue) -> float:
+    return abs(next(iter(venue.positions.values()), [0.0])[0])
+
+def test_partial_fills_end_hedged(sim, monkeypatch):
+    # Entries fill 50-99%; the residual unwind fills in full
+    fill = SimVenue.fill
+
+    def partial_entries(venue, symbol, side, qty, reduce_only):
+        exchange_simulator.SIM_PARTIAL_FILL_PROB = 0.0 if reduce_only else 1.0
+        return fill(venue, symbol, side, qty, reduce_only)
+
+    monkeypatch.setattr(exchange_simulator, "SIM_PARTIAL_FILL_PROB", 1.0)
+    monkeypatch.setattr(SimVenue, "fill", partial_entries)
+    sim.bybit.latency_ms, sim.kucoin.latency_ms = 20, 40
+    arb = _arb()
+    assert _run(sim, monkeypatch, lambda: order_manager.execute_order(arb))
+    (position,) = sim.registered
+    assert 0 < position.qty_short < 3
+    # Registered quantities are what each venue holds; any residual is below one KuCoin lot
+    assert _held(sim.bybit) == float(position.qty_long)
+    assert _held(sim.kucoin) == float(position.qty_short)
+    assert abs(position.qty_long - position.qty_short) < 1
+
+def test_late_fill_after_ack_timeout_is_reconciled(sim, monkeypatch):
+    monkeypatch.setattr(order_manager, "ORDER_TIMEOUT_SEC", 0.2)
+    monkeypatch.setattr(order_manager, "FILL_CONFIRM_TIMEOUT_SEC", 1.0)
+    sim.bybit.latency_ms, sim.kucoin.latency_ms = 20, 500  # KuCoin acks after the timeout
+    arb = _arb()
+    assert _run(sim, monkeypatch, lambda: order_manager.execute_order(arb))
+    (position,) = sim.registered
+    assert position.qty_long == position.qty_short == 3
+    assert _held(sim.bybit) == _held(sim.kucoin) == 3
+
+# Rejects every reduce-only (unwind) order; `entries_on` limits which venues accept entries
+def _failing_unwinds(monkeypatch, entries_on=("Bybit", "KuCoin")):
+    place_order = ExchangeSimulator.place_order
+
+    async def reject(sim, venue, symbol, side, qty, reduce_only, client_id=""):
+        if reduce_only or venue.name not in entries_on:
+            return None
+        return await place_order(sim, venue, symbol, side, qty, reduce_only, client_id)
+
+    monkeypatch.setattr(ExchangeSimulator, "place_order", reject)
+    alerts = []
+    monkeypatch.setattr(telegram_bot, "notify", lambda text, critical=False, **kwargs: alerts.append((text, critical)))
+    return alerts
+
+def test_failed_residual_unwind_registers_actual_holdings(sim, monkeypatch):
+    alerts = _failing_unwinds(monkeypatch)
+    fill = SimVenue.fill
+
+    def short_one_lot(venue, symbol, side, qty, reduce_only):
+        return fill(venue, symbol, side, qty - 1 if venue.name == "KuCoin" else qty, reduce_only)
+
+    monkeypatch.setattr(SimVenue, "fill", short_one_lot)
+    arb = _arb()
+    assert _run(sim, monkeypatch, lambda: order_manager.execute_order(arb))
+    (position,) = sim.registered
+    assert _held(sim.bybit) == float(position.qty_long) == 3
+    assert _held(sim.kucoin) == float(position.qty_short) == 2
+    assert any("Residual unwind failed" in text and critical for text, critical in alerts)
+
+def test_failed_one_sided_unwind_goes_to_failover(sim, monkeypatch):
+    _failing_unwinds(monkeypatch, entries_on=("Bybit",))
+    started = []
+
+    async def start_failover(**kwargs):
+        started.append(kwargs)
+
+    monkeypatch.setattr("failover_manager.start_failover", start_failover)
+    arb = _arb()
+    assert not _run(sim, monkeypatch, lambda: order_manager.execute_order(arb))
+    assert not sim.registered
+    (leg,) = started
+    assert (leg["exchange"], leg["direction"], leg["qty"]) == ("Bybit", "long", Decimal("3"))
+    assert _held(sim.bybit) == 3
+
+def test_leg_below_min_order_size_is_not_sent(sim, monkeypatch):
+    arb = _arb("0.1")  # 0.3 base: fine on Bybit, 0 lots on KuCoin
+    assert not _run(sim, monkeypatch, lambda: order_manager.execute_order(arb))
+    assert arb.exit_reason == "below_min_qty"
+    assert not sim.bybit.orders and not sim.kucoin.orders
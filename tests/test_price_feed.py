@@ -0,0 +1,143 @@
+# Bybit WS client against the simulator's ticker stream: drops, stalled symbols and floods
+import asyncio
+import time
+import pytest
+from aiohttp import web
+import price_feed
+from price_feed import BybitWSClient, price_queue, untradeable_quotes
+from exchange_simulator import ExchangeSimulator
+from pair_monitor import select_best_pair
+from records import Quote
+
+LIVE, SILENT = "LIVEUSDT", "SILENTUSDT"
+
+@pytest.fixture
+def feed(monkeypatch):
+    monkeypatch.setattr(price_feed, "WS_WATCHDOG_INTERVAL_SEC", 0.05)
+    monkeypatch.setattr(price_feed, "WS_SYMBOL_STALE_SEC", 0.3)
+    monkeypatch.setattr(price_feed, "WS_CHUNK_STALE_SEC", 60.0)
+    sim = ExchangeSimulator([(LIVE, LIVE + "M"), (SILENT, SILENT + "M")])
+    untradeable_quotes.clear()
+    yield sim
+    untradeable_quotes.clear()
+    while not price_queue.empty():
+        price_queue.get_nowait()
+
+async def _until(condition, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+# Serves the simulator, runs a Bybit client subscribed to both symbols, then `scenario(client)`
+def _run(sim: ExchangeSimulator, scenario, client: BybitWSClient = None):
+    async def run():
+        runner = web.AppRunner(sim.create_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        ws_client = client or BybitWSClient([LIVE, SILENT])
+        ws_client.ws_url = f"ws://{host}:{port}/v5/public/linear"
+        task = asyncio.create_task(ws_client.connect())
+        try:
+            await _until(lambda: all(sim.bybit.ticker_subs.get(s) for s in (LIVE, SILENT)))
+            return await scenario(ws_client)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+    return asyncio.run(run())
+
+async def _drop(sim: ExchangeSimulator):
+    for ws in {ws for subs in sim.bybit.ticker_subs.values() for ws in subs}:
+        await ws.close()
+
+def test_dropped_connection_reconnects_with_backoff(feed, monkeypatch):
+    sim = feed
+    monkeypatch.setattr(price_feed, "WS_STABLE_AFTER_SEC", 60.0)
+    attempts = []
+    client = BybitWSClient([LIVE, SILENT])
+    client._backoff_delay = lambda attempt: attempts.append(attempt) or 0.05
+
+    async def scenario(client):
+        for expected in (1, 2):
+            await _drop(sim)
+            await _until(lambda: client.chunk_reconnects.get(0) == expected)
+            assert ("Bybit", LIVE) in untradeable_quotes  # chunk down: its quotes are not traded
+            await _until(lambda: 0 in client.chunk_ws and sim.bybit.ticker_subs.get(LIVE))
+        await sim._publish(0)
+        await _until(lambda: ("Bybit", LIVE) not in untradeable_quotes)
+        return client.get_outage_stats()[0]
+
+    stats = _run(sim, scenario, client)
+    assert attempts == [0, 1]  # quick drops back off further
+    assert stats["reconnects"] == 2 and stats["outage_total_sec"] > 0
+
+def test_backoff_resets_after_stable_uptime(feed, monkeypatch):
+    sim = feed
+    monkeypatch.setattr(price_feed, "WS_STABLE_AFTER_SEC", 0.0)
+    attempts = []
+    client = BybitWSClient([LIVE, SILENT])
+    client._backoff_delay = lambda attempt: attempts.append(attempt) or 0.05
+
+    async def scenario(client):
+        for expected in (1, 2):
+            await _drop(sim)
+            await _until(lambda: client.chunk_reconnects.get(0) == expected and sim.bybit.ticker_subs.get(LIVE))
+
+    _run(sim, scenario, client)
+    assert attempts == [0, 0]
+
+def test_backoff_delay_bounds(monkeypatch):
+    monkeypatch.setattr(price_feed, "WS_BACKOFF_BASE_SEC", 1.0)
+    monkeypatch.setattr(price_feed, "WS_BACKOFF_MAX_SEC", 8.0)
+    client = BybitWSClient([])
+    for attempt in range(8):
+        for _ in range(50):
+            assert 1.0 <= client._backoff_delay(attempt) <= min(8.0, 2 ** attempt)
+
+def test_silent_symbol_is_untradeable_and_resubscribed(feed):
+    sim = feed
+
+    async def scenario(client):
+        subscribed = sim.bybit.ticker_subs[SILENT]
+        for _ in range(40):  # only LIVE ticks for ~0.4s
+            await sim._publish(0)
+            await asyncio.sleep(0.01)
+        await _until(lambda: SILENT in client._resubscribed_at)
+        assert ("Bybit", SILENT) in untradeable_quotes
+        assert ("Bybit", LIVE) not in untradeable_quotes
+        assert sim.bybit.ticker_subs[SILENT] == subscribed  # unsubscribed and subscribed again
+
+        # pair_monitor ignores the silent venue's quote
+        now = time.time()
+        quotes = {}
+        for exchange, bid, ask in (("Bybit", 101.0, 101.1), ("KuCoin", 99.9, 100.0)):
+            quotes[exchange] = Quote(SILENT, exchange)
+            quotes[exchange].bid, quotes[exchange].ask, quotes[exchange].ts = bid, ask, now
+        assert select_best_pair(quotes, now, SILENT) is None
+
+        await sim._publish(1)
+        await _until(lambda: ("Bybit", SILENT) not in untradeable_quotes)
+
+    _run(sim, scenario)
+
+def test_flood_is_conflated_to_one_queued_quote(feed):
+    sim = feed
+
+    async def scenario(client):
+        for _ in range(500):
+            sim.mid[0] *= 1.0001
+            sim._quote(0)
+            await sim._publish(0)
+        expected_bid = sim.bybit.quotes[LIVE][0]
+        await _until(lambda: client.quotes.get(LIVE) is not None and client.quotes[LIVE].bid == pytest.approx(expected_bid, rel=1e-7))
+        queued = []
+        while not price_queue.empty():
+            queued.append(price_queue.get_nowait())
+        return queued, expected_bid
+
+    queued, expected_bid = _run(sim, scenario)
+    live = [q for q in queued if q.symbol == LIVE]
+    assert len(live) == 1
+    assert live[0].bid == pytest.approx(expected_bid, rel=1e-7)  # the last of 500 ticks
@@ -0,0 +1,30 @@
+# Stack-mode profiling: samples are taken on the loop thread and attributed to the running task
+import asyncio
+import time
+import profiler
+
+def test_stack_samples_land_on_busy_task(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+
+    def spin(until):
+        while time.monotonic() < until:
+            pass
+
+    async def busy():
+        until = time.monotonic() + 0.4
+        while time.monotonic() < until:
+            spin(min(until, time.monotonic() + 0.02))
+            await asyncio.sleep(0.001)
+
+    async def run():
+        worker = asyncio.create_task(busy(), name="busy-worker")
+        summary, _ = await profiler._profile_stack(0.4)
+        await worker
+        return summary
+
+    summary = asyncio.run(run())
+    report = next(tmp_path.glob("profile_stack_*.txt")).read_text(encoding="utf-8")
+    assert "Sampler: SIGPROF" in report
+    top_task = report.split("Samples by task\n", 1)[1].splitlines()[0]
+    assert "busy-worker" in top_task
+    assert "spin (test_profiler.py" in summary.splitlines()[0]
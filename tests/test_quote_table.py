@@ -0,0 +1,19 @@
+# Shared quote table: the seqlock is only sound under x86 store ordering
+import platform
+import pytest
+import quote_table
+
+def test_refuses_weakly_ordered_machines(monkeypatch):
+    monkeypatch.setattr(platform, "machine", lambda: "aarch64")
+    with pytest.raises(RuntimeError, match="INGEST_PROCESSES=0"):
+        quote_table.QuoteTable(capacity=4, writers=1, ring_size=8)
+
+def test_round_trip_on_x86(monkeypatch):
+    monkeypatch.setattr(platform, "machine", lambda: "x86_64")
+    table = quote_table.QuoteTable(capacity=4, writers=1, ring_size=8)
+    try:
+        table.write(0, 2, 100.5, 100.6, 1.0, 0)
+        assert table.read(2)[1:4] == (100.5, 100.6, 1.0)
+        assert table.updated_slots(0) == {2}
+    finally:
+        table.close()
@@ -0,0 +1,42 @@
+# REST governor: cross-class priority lane and per-endpoint venue windows
+import asyncio
+import time
+import rate_limiter
+from rate_limiter import EndpointLimiter
+
+class _Resp:
+    def __init__(self, headers: dict, status: int = 200):
+        self.headers = headers
+        self.status = status
+
+def test_market_polling_waits_for_queued_orders():
+    async def run():
+        order = EndpointLimiter("StubVenue", "order")
+        market = EndpointLimiter("StubVenue", "market")
+        order.bucket.tokens = 0  # the order waits ~0.1s for a token
+        events = []
+
+        async def send_order():
+            await order.acquire(priority=True)
+            events.append("order")
+
+        async def poll_market():
+            await asyncio.sleep(0.01)  # starts while the order is queued
+            await market.acquire()
+            events.append("market")
+
+        await asyncio.gather(send_order(), poll_market())
+        return events
+
+    assert asyncio.run(run()) == ["order", "market"]
+    assert not rate_limiter._priority_waiting["StubVenue"]
+
+def test_bybit_windows_are_per_endpoint():
+    limiter = EndpointLimiter("Bybit", "market")
+    reset_ms = str(int((time.time() + 5) * 1000))
+    limiter.observe({"X-Bapi-Limit-Status": "0", "X-Bapi-Limit": "10", "X-Bapi-Limit-Reset-Timestamp": reset_ms},
+                    endpoint="/v5/market/tickers")
+    now = time.monotonic()
+    assert limiter._window_delay(limiter.windows.get("/v5/market/tickers"), False, now) > 0
+    assert limiter._window_delay(limiter.windows.get("/v5/market/orderbook"), False, now) == 0
+    assert limiter.remaining == 0
@@ -0,0 +1,38 @@
+# Shared in-flight calls: cancellation of the first caller and micro-cache expiry
+import asyncio
+import time
+import single_flight
+from single_flight import single_flight as shared_call
+
+def test_first_caller_cancelled_others_still_get_result():
+    async def run():
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "book"
+
+        key = ("StubVenue", "orderbook", "CANCELUSDT")
+        first = asyncio.create_task(shared_call(key, fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(shared_call(key, fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, len(calls)
+
+    assert asyncio.run(run()) == ("book", 1)
+
+def test_expired_results_are_pruned():
+    async def run():
+        async def fetch():
+            return "book"
+
+        stale = ("StubVenue", "orderbook", "STALEUSDT")
+        single_flight._cache[stale] = (time.monotonic() - 1, "old")
+        await shared_call(("StubVenue", "orderbook", "FRESHUSDT"), fetch)
+        await asyncio.sleep(0)  # done callbacks run on the next loop iteration
+
+    asyncio.run(run())
+    assert ("StubVenue", "orderbook", "STALEUSDT") not in single_flight._cache
+    assert ("StubVenue", "orderbook", "FRESHUSDT") in single_flight._cache
@@ -0,0 +1,42 @@
+# Spec refresh: the venue ETag only covers its instruments list, not the traded-symbol filter
+import asyncio
+import pytest
+import symbol_specs
+from exchange_adapters import ExchangeAdapter, register_adapter, unregister_adapter
+
+class StubVenue(ExchangeAdapter):
+    name = "StubSpecs"
+    listed = ["AUSDT", "BUSDT"]
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    # Like fetch_bybit_specs: 304 on a matching ETag, otherwise the listing filtered to traded symbols
+    async def fetch_specs(self, etag: str = None):
+        self.requests.append(etag)
+        if etag == '"v1"':
+            return None, etag
+        wanted = symbol_specs._traded_symbols(self.name)
+        return {s: symbol_specs._spec_fields("1", "1", "0.01", "1") for s in self.listed if s in wanted}, '"v1"'
+
+@pytest.fixture
+def venue(monkeypatch):
+    adapter = StubVenue()
+    register_adapter(adapter)
+    traded = {"AUSDT"}
+    monkeypatch.setattr(symbol_specs, "_traded_symbols", lambda exchange: set(traded))
+    monkeypatch.setitem(symbol_specs.symbol_specs, adapter.name, {})
+    adapter.traded = traded
+    yield adapter
+    unregister_adapter(adapter.name)
+    symbol_specs._etags.pop(adapter.name, None)
+    symbol_specs._etag_symbols.pop(adapter.name, None)
+
+def test_new_traded_symbol_bypasses_the_etag(venue):
+    assert asyncio.run(symbol_specs.refresh_exchange_specs(venue))
+    assert not asyncio.run(symbol_specs.refresh_exchange_specs(venue))  # unchanged: 304
+    venue.traded.add("BUSDT")
+    assert asyncio.run(symbol_specs.refresh_exchange_specs(venue))
+    assert venue.requests == [None, '"v1"', None]
+    assert set(symbol_specs.symbol_specs[venue.name]) == {"AUSDT", "BUSDT"}
@@ -0,0 +1,136 @@
+# universe_manager.py
+# Periodically re-ranks matched pairs and hot-(un)subscribes symbols on the running WS clients.
+import asyncio
+import math
+from typing import Dict, List
+from logger import logger
+from config_manager import get_config_value
+from exchange_adapters import get_adapters
+
+UNIVERSE_REFRESH_SEC = int(get_config_value("UNIVERSE_REFRESH_SEC", "900"))
+UNIVERSE_MAX_SYMBOLS = int(get_config_value("UNIVERSE_MAX_SYMBOLS", "0"))  # 0 = every pair in the CSV
+UNIVERSE_MIN_VOLUME = float(get_config_value("UNIVERSE_MIN_VOLUME", "0"))
+UNIVERSE_SPREAD_WEIGHT = float(get_config_value("UNIVERSE_SPREAD_WEIGHT", "1.0"))
+
+# Canonical symbols currently traded
+current_universe: set[str] = set()
+
+def _canonical_symbol(row: Dict[str, str]) -> str | None:
+    for adapter in get_adapters():
+        raw = (row.get(adapter.csv_column) or "").strip()
+        if raw:
+            return adapter.to_canonical_symbol(raw)
+    return None
+
+def _pair_volume(row: Dict[str, str]) -> float:
+    # Liquidity of a pair is bounded by its thinnest venue
+    volumes = []
+    for key, value in row.items():
+        if key and key.endswith("_avg_volume") and value:
+            try:
+                volumes.append(float(value))
+            except ValueError:
+                continue
+    return min(volumes) if volumes else 0.0
+
+def rank_pairs(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    from pair_monitor import spread_stats
+
+    scored = []
+    for row in rows:
+        symbol = _canonical_symbol(row)
+        if not symbol:
+            continue
+        # Pair must be listed on at least two enabled venues to be tradeable
+        if sum(1 for adapter in get_adapters() if (row.get(adapter.csv_column) or "").strip()) < 2:
+            continue
+        volume = _pair_volume(row)
+        if volume < UNIVERSE_MIN_VOLUME:
+            continue
+        # log-volume base score, boosted by the observed average cross-venue spread (%)
+        spread = max(spread_stats.get(symbol, 0.0), 0.0)
+        score = math.log1p(volume) * (1 + UNIVERSE_SPREAD_WEIGHT * spread)
+        scored.append((score, symbol, row))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [row for _, _, row in scored]
+
+# Returns exchange name -> venue symbols for the selected pairs
+def select_universe() -> Dict[str, List[str]]:
+    from price_feed import load_pairs, ws_clients
+    from position_manager import get_active_symbols
+    from failover_manager import failover_positions
+
+    rows = load_pairs()
+    ranked = rank_pairs(rows)
+    selected = list(ranked[:UNIVERSE_MAX_SYMBOLS] if UNIVERSE_MAX_SYMBOLS > 0 else ranked)
+
+    # Never drop a symbol that still has exposure: pinned rows come from the unfiltered CSV,
+    # since rank_pairs drops low-volume and single-venue rows
+    pinned = set(get_active_symbols()) | {f.symbol for f in failover_positions.values() if f.status != "closed"}
+    selected_symbols = {_canonical_symbol(row) for row in selected}
+    for row in rows:
+        symbol = _canonical_symbol(row)
+        if symbol in pinned and symbol not in selected_symbols:
+            selected.append(row)
+            selected_symbols.add(symbol)
+
+    universe = {
+        adapter.name: [row[adapter.csv_column].strip() for row in selected if (row.get(adapter.csv_column) or "").strip()]
+        for adapter in get_adapters()
+    }
+    # ...and keep their current subscriptions even if the reloaded CSV lost the row or a venue column
+    if pinned:
+        for adapter in get_adapters():
+            client = ws_clients.get(adapter.name)
+            if client is None:
+                continue
+            wanted = set(universe[adapter.name])
+            for venue_symbol in sorted(client.get_symbols() - wanted):
+                symbol = adapter.to_canonical_symbol(venue_symbol)
+                if symbol in pinned:
+                    universe[adapter.name].append(venue_symbol)
+                    selected_symbols.add(symbol)
+
+    current_universe.clear()
+    current_universe.update(selected_symbols)
+    return universe
+
+async def apply_universe(universe: Dict[str, List[str]]):
+    from price_feed import ws_clients
+    from pair_monitor import prune_symbol
+    from position_manager import prune_symbol_quotes
+    from exchange_adapters import get_adapter
+
+    left: set[str] = set()
+    for exchange, symbols in universe.items():
+        client = ws_clients.get(exchange)
+        if client is None:
+            continue
+        wanted = set(symbols)
+        current = client.get_symbols()
+        to_add = sorted(wanted - current)
+        to_remove = sorted(current - wanted)
+
+        if to_remove:
+            await client.remove_symbols(to_remove)
+            left.update(get_adapter(exchange).to_canonical_symbol(s) for s in to_remove)
+        if to_add:
+            await client.add_symbols(to_add)
+        await client.rebalance()
+
+        if to_add or to_remove:
+            logger.info(f"[UNIVERSE] {exchange}: +{len(to_add)} / -{len(to_remove)} symbols → {len(client.get_symbols())} subscribed")
+
+    for symbol in left - current_universe:
+        prune_symbol(symbol)
+        prune_symbol_quotes(symbol)
+
+async def universe_manager_loop():
+    # price_feed.main() subscribes the initial universe; re-rank from here on
+    while True:
+        await asyncio.sleep(UNIVERSE_REFRESH_SEC)
+        try:
+            await apply_universe(select_universe())
+        except Exception as e:
+            logger.exception(f"[UNIVERSE] Refresh failed: {e}")